@@ -1,10 +1,14 @@
+import asyncio
 import uuid
-from typing import List, Dict, Any, Optional
+import json
+import hmac
+from typing import List, Dict, Any, Optional, AsyncIterator
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, BaseMessage
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
 import os
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware  
@@ -18,18 +22,26 @@ from Agents.customer_support_agent import (
 from Agents.knowledge_agent import (
     build_rag_agent,
     setup_knowledge_base,  
-    map_to_knowledge_agent_state
+    map_to_knowledge_agent_state,
+    get_knowledge_cache_stats,
+    start_knowledge_base_rebuild,
+    get_knowledge_base_rebuild_status
 )
 from Agents.slack_agent import (
     build_slack_agent_graph,
     map_to_slack_agent_state
 )
 
-from Agents.router_agent import build_router_graph, route_agent 
-from Agents.personality_agent import build_personality_graph, map_to_personality_state
+from Agents.router_agent import build_router_graph, route_agent, aroute_agent, get_suspicious_rule_stats, get_router_stats, ROUTER_MODE
+from Agents.exemplar_router import load_exemplar_index
+from Agents.personality_agent import build_personality_graph, map_to_personality_state, get_personality_stats, get_personality_cache_stats
 from Agents.custom_agent import build_custom_agent_graph, map_to_custom_agent_state
-from Agents.slack_agent import send_slack_notification
-from utils.lang_detect import detect_language 
+from Agents.slack_agent import send_slack_notification, asend_slack_notification
+from utils.lang_detect import detect_language, warm_up_language_detector
+from utils.load_prompt import preload_prompt_templates, get_prompt_cache_stats
+from utils.embeddings import get_embedding_cache_stats
+from utils.web_search import get_web_search_stats
+from utils.checkpointer import create_checkpointer, get_checkpointer_stats
 
 # Global instances of compiled sub-graphs
 customer_support_app = None
@@ -38,7 +50,7 @@ router_app = None
 personality_app = None
 custom_agent_app = None
 slack_agent_app = None
-global_vectorstore = None # This will now remain None until first use by KnowledgeAgent
+global_vectorstore = None # Loaded at startup together with the knowledge retrieval pipeline (None while first built)
 overall_app = None # The main LangGraph application
 
  
@@ -48,6 +60,16 @@ async def lifespan(app: FastAPI):
     print("Initializing all agents for FastAPI. Please wait...")
     global customer_support_app, knowledge_app, router_app,slack_agent_app, personality_app, custom_agent_app, global_vectorstore, overall_app
 
+    # Load every prompt template into memory before serving requests
+    print(f"Preloaded {preload_prompt_templates()} prompt templates.")
+    warm_up_language_detector()
+    if ROUTER_MODE == "knn":
+        # Load (or build) the exemplar index now so the first query does not pay for it
+        await asyncio.to_thread(load_exemplar_index)
+    # Load the knowledge base and build its retrieval pipeline once, before the first query.
+    # A missing index is built in the background; startup does not wait for it.
+    global_vectorstore = setup_knowledge_base()
+
     # Build sub-graphs
     customer_support_app = build_customer_support_graph()
     knowledge_app = build_rag_agent() 
@@ -80,6 +102,9 @@ class QueryRequest(BaseModel):
     message: str
     user_id: str
 
+class RebuildRequest(BaseModel):
+    full: bool = False # Rebuild from scratch instead of re-embedding only the changed pages
+
 class WorkflowStep(BaseModel):
     agent_name: str
     tool_calls: Dict[str, Any]
@@ -97,15 +122,8 @@ ROUTING_CONFIG = {
     "default": "PersonalityLayer"  
 }
 
-def route_agent_wrapper(state: OverallAgentState) -> OverallAgentState:
-    """
-    Wrapper for router agent to capture its decision and add to workflow trace.
-    Calls the actual `route_agent` function.
-    """
-    print("\n--- Calling Router Agent ---")
-    # The actual route_agent updates state["next_agent"] and state["language"]
-    result_state = route_agent(state)
-
+def _record_router_decision(result_state: OverallAgentState) -> OverallAgentState:
+    """Adds the router's decision to the workflow trace."""
     # Capture router decision for logging and routing in the overall graph
     router_decision_key = result_state.get("next_agent", "default")
     decided_agent_name = ROUTING_CONFIG.get(router_decision_key, ROUTING_CONFIG["default"])
@@ -114,11 +132,26 @@ def route_agent_wrapper(state: OverallAgentState) -> OverallAgentState:
     result_state["workflow_trace"].append({
         "agent_name": "RouterAgent",
         "tool_calls": {
-            "LLM_decision": decided_agent_name # More descriptive for router's output
+            "LLM_decision": decided_agent_name, # More descriptive for router's output
+            **(result_state.get("route_metadata") or {}) # e.g. the suspicious rule that fired
         }
     })
     return result_state
 
+def route_agent_wrapper(state: OverallAgentState) -> OverallAgentState:
+    """
+    Wrapper for router agent to capture its decision and add to workflow trace.
+    Calls the actual `route_agent` function.
+    """
+    print("\n--- Calling Router Agent ---")
+    # The actual route_agent updates state["next_agent"] and state["language"]
+    return _record_router_decision(route_agent(state))
+
+async def aroute_agent_wrapper(state: OverallAgentState) -> OverallAgentState:
+    """Async version of `route_agent_wrapper`."""
+    print("\n--- Calling Router Agent ---")
+    return _record_router_decision(await aroute_agent(state))
+
 def _extract_tool_calls_from_langgraph_result(agent_result_messages: List[BaseMessage]) -> Dict[str, Any]:
     """Extracts tool calls and their outputs from a list of LangGraph messages."""
     tool_calls_dict = {}
@@ -147,13 +180,10 @@ def _extract_tool_calls_from_langgraph_result(agent_result_messages: List[BaseMe
     return tool_calls_dict
 
 
-# Wrapper functions for sub-agent execution
-def call_customer_support_executor(state: OverallAgentState) -> OverallAgentState:
-    print("\n--- Calling Customer Support Agent ---")
-    cs_input_state = map_to_customer_support_state(state)
-    config = {"configurable": {"thread_id": state["session_user_id"]}}
-    cs_result = customer_support_app.invoke(cs_input_state, config)
-
+# Wrapper functions for sub-agent execution.
+# Each executor has a sync version (used by `overall_app.invoke`) and an async version
+# (used by `overall_app.ainvoke`) that awaits the sub-graph instead of holding a worker thread.
+def _apply_customer_support_result(state: OverallAgentState, cs_result: Dict[str, Any]) -> OverallAgentState:
     # Append valid messages from sub-agent result to overall state messages
     state["messages"].extend([msg for msg in cs_result["messages"] if isinstance(msg, BaseMessage)])
 
@@ -168,11 +198,21 @@ def call_customer_support_executor(state: OverallAgentState) -> OverallAgentStat
     state["workflow_trace"].append({"agent_name": "CustomerSupportAgent", "tool_calls": tool_calls_dict})
     return state
 
-def call_knowledge_agent_executor(state: OverallAgentState) -> OverallAgentState:
-    print("\n--- Calling Knowledge Agent ---")
-    kg_input_state = map_to_knowledge_agent_state(state)
-    kg_result = knowledge_app.invoke(kg_input_state)
+def call_customer_support_executor(state: OverallAgentState) -> OverallAgentState:
+    print("\n--- Calling Customer Support Agent ---")
+    cs_input_state = map_to_customer_support_state(state)
+    config = {"configurable": {"thread_id": state["session_user_id"]}}
+    cs_result = customer_support_app.invoke(cs_input_state, config)
+    return _apply_customer_support_result(state, cs_result)
 
+async def acall_customer_support_executor(state: OverallAgentState) -> OverallAgentState:
+    print("\n--- Calling Customer Support Agent ---")
+    cs_input_state = map_to_customer_support_state(state)
+    config = {"configurable": {"thread_id": state["session_user_id"]}}
+    cs_result = await customer_support_app.ainvoke(cs_input_state, config)
+    return _apply_customer_support_result(state, cs_result)
+
+def _apply_knowledge_agent_result(state: OverallAgentState, kg_result: Dict[str, Any]) -> OverallAgentState:
     answer_from_kg = kg_result.get("answer", "No answer found by Knowledge Agent.")
     state["messages"].append(AIMessage(content=answer_from_kg))
     state["raw_agent_output"] = answer_from_kg
@@ -182,12 +222,19 @@ def call_knowledge_agent_executor(state: OverallAgentState) -> OverallAgentState
     state["workflow_trace"].append({"agent_name": "KnowledgeAgent", "tool_calls": actual_tool_outputs})
     return state
 
-def call_custom_agent_executor(state: OverallAgentState) -> OverallAgentState:
-    print("\n--- Calling Custom Agent ---")
-    custom_input_state = map_to_custom_agent_state(state)
-    config = {"configurable": {"thread_id": state["session_user_id"]}}
-    custom_result = custom_agent_app.invoke(custom_input_state, config)
+def call_knowledge_agent_executor(state: OverallAgentState) -> OverallAgentState:
+    print("\n--- Calling Knowledge Agent ---")
+    kg_input_state = map_to_knowledge_agent_state(state)
+    kg_result = knowledge_app.invoke(kg_input_state)
+    return _apply_knowledge_agent_result(state, kg_result)
+
+async def acall_knowledge_agent_executor(state: OverallAgentState) -> OverallAgentState:
+    print("\n--- Calling Knowledge Agent ---")
+    kg_input_state = map_to_knowledge_agent_state(state)
+    kg_result = await knowledge_app.ainvoke(kg_input_state)
+    return _apply_knowledge_agent_result(state, kg_result)
 
+def _apply_custom_agent_result(state: OverallAgentState, custom_result: Dict[str, Any]) -> OverallAgentState:
     # Append valid messages from sub-agent result to overall state messages
     state["messages"].extend([msg for msg in custom_result["messages"] if isinstance(msg, BaseMessage)])
 
@@ -200,11 +247,22 @@ def call_custom_agent_executor(state: OverallAgentState) -> OverallAgentState:
     state["workflow_trace"].append({"agent_name": "CustomAgent", "tool_calls": tool_calls_dict})
     return state
 
-def call_slack_agent_executor(state: OverallAgentState) -> OverallAgentState:
-    print("\n--- Calling Slack Agent for Suspicious Query ---")
-    slack_input_state = map_to_slack_agent_state(state)
-    slack_result = slack_agent_app.invoke(slack_input_state)
+def call_custom_agent_executor(state: OverallAgentState) -> OverallAgentState:
+    print("\n--- Calling Custom Agent ---")
+    custom_input_state = map_to_custom_agent_state(state)
+    config = {"configurable": {"thread_id": state["session_user_id"]}}
+    custom_result = custom_agent_app.invoke(custom_input_state, config)
+    return _apply_custom_agent_result(state, custom_result)
+
+async def acall_custom_agent_executor(state: OverallAgentState) -> OverallAgentState:
+    print("\n--- Calling Custom Agent ---")
+    custom_input_state = map_to_custom_agent_state(state)
+    config = {"configurable": {"thread_id": state["session_user_id"]}}
+    custom_result = await custom_agent_app.ainvoke(custom_input_state, config)
+    return _apply_custom_agent_result(state, custom_result)
 
+def _apply_slack_agent_result(state: OverallAgentState, slack_result: Dict[str, Any]) -> str:
+    """Merges the Slack agent result into the state. Returns the agent's last message."""
     # Append valid messages from sub-agent result to overall state messages
     state["messages"].extend([msg for msg in slack_result["messages"] if isinstance(msg, BaseMessage)])
 
@@ -215,6 +273,13 @@ def call_slack_agent_executor(state: OverallAgentState) -> OverallAgentState:
     # Extract tool calls and their outputs for workflow trace
     tool_calls_dict = _extract_tool_calls_from_langgraph_result(slack_result["messages"])
     state["workflow_trace"].append({"agent_name": "SlackAgent", "tool_calls": tool_calls_dict})
+    return last_slack_message
+
+def call_slack_agent_executor(state: OverallAgentState) -> OverallAgentState:
+    print("\n--- Calling Slack Agent for Suspicious Query ---")
+    slack_input_state = map_to_slack_agent_state(state)
+    slack_result = slack_agent_app.invoke(slack_input_state)
+    last_slack_message = _apply_slack_agent_result(state, slack_result)
 
     # Send notification to Slack channel if needed
     if slack_result.get("send_notification", False):
@@ -222,11 +287,19 @@ def call_slack_agent_executor(state: OverallAgentState) -> OverallAgentState:
 
     return state
 
-def call_personality_layer_executor(state: OverallAgentState) -> OverallAgentState:
-    print("\n--- Applying Personality Layer ---")
-    personality_input_state = map_to_personality_state(state)
-    personality_result = personality_app.invoke(personality_input_state)
+async def acall_slack_agent_executor(state: OverallAgentState) -> OverallAgentState:
+    print("\n--- Calling Slack Agent for Suspicious Query ---")
+    slack_input_state = map_to_slack_agent_state(state)
+    slack_result = await slack_agent_app.ainvoke(slack_input_state)
+    last_slack_message = _apply_slack_agent_result(state, slack_result)
+
+    # Send notification to Slack channel if needed
+    if slack_result.get("send_notification", False):
+        await asend_slack_notification(state["session_user_id"], last_slack_message)
 
+    return state
+
+def _apply_personality_result(state: OverallAgentState, personality_result: Dict[str, Any]) -> OverallAgentState:
     final_response_content = personality_result.get("final_response", "Error applying personality.")
     state["final_response"] = final_response_content
 
@@ -235,23 +308,39 @@ def call_personality_layer_executor(state: OverallAgentState) -> OverallAgentSta
         state["messages"].pop() # Remove raw AI response from previous agent
     state["messages"].append(AIMessage(content=final_response_content))
 
+    personality_source = personality_result.get("personality_source") or "llm"
     state["workflow_trace"].append({
         "agent_name": "PersonalityLayer",
-        "tool_calls": {"LLM": final_response_content}
+        # Responses written without the LLM report which fast path (or the cache) produced them
+        "tool_calls": {"LLM": final_response_content} if personality_source == "llm" else
+                      {"fast_path": personality_source, "response": final_response_content}
     })
     return state
 
+def call_personality_layer_executor(state: OverallAgentState) -> OverallAgentState:
+    print("\n--- Applying Personality Layer ---")
+    personality_input_state = map_to_personality_state(state)
+    personality_result = personality_app.invoke(personality_input_state)
+    return _apply_personality_result(state, personality_result)
+
+async def acall_personality_layer_executor(state: OverallAgentState) -> OverallAgentState:
+    print("\n--- Applying Personality Layer ---")
+    personality_input_state = map_to_personality_state(state)
+    personality_result = await personality_app.ainvoke(personality_input_state)
+    return _apply_personality_result(state, personality_result)
+
 def build_overall_system_graph() -> StateGraph:
     """Builds the main LangGraph for the overall system, orchestrating sub-agents."""
     workflow = StateGraph(OverallAgentState)
 
-    # Add nodes representing the router and each agent executor
-    workflow.add_node("router", route_agent_wrapper)
-    workflow.add_node("customer_support_executor", call_customer_support_executor)
-    workflow.add_node("knowledge_agent_executor", call_knowledge_agent_executor)
-    workflow.add_node("custom_agent_executor", call_custom_agent_executor)
-    workflow.add_node("slack_agent_executor", call_slack_agent_executor)  
-    workflow.add_node("personality_layer", call_personality_layer_executor)
+    # Add nodes representing the router and each agent executor.
+    # Every node has a sync and an async implementation, so the graph supports both invoke and ainvoke.
+    workflow.add_node("router", RunnableLambda(route_agent_wrapper, afunc=aroute_agent_wrapper))
+    workflow.add_node("customer_support_executor", RunnableLambda(call_customer_support_executor, afunc=acall_customer_support_executor))
+    workflow.add_node("knowledge_agent_executor", RunnableLambda(call_knowledge_agent_executor, afunc=acall_knowledge_agent_executor))
+    workflow.add_node("custom_agent_executor", RunnableLambda(call_custom_agent_executor, afunc=acall_custom_agent_executor))
+    workflow.add_node("slack_agent_executor", RunnableLambda(call_slack_agent_executor, afunc=acall_slack_agent_executor))
+    workflow.add_node("personality_layer", RunnableLambda(call_personality_layer_executor, afunc=acall_personality_layer_executor))
 
     # Set the entry point of the overall graph
     workflow.set_entry_point("router")
@@ -278,36 +367,28 @@ def build_overall_system_graph() -> StateGraph:
     # Define the final edge from the personality layer to the end of the graph
     workflow.add_edge("personality_layer", END)
 
-    # Configure memory for the graph (important for conversational history)
-    memory = MemorySaver()
+    # Configure memory for the graph (important for conversational history): bounded per thread and
+    # in total, expired after inactivity and persisted to sqlite (see utils/checkpointer.py)
+    memory = create_checkpointer()
     return workflow.compile(checkpointer=memory)
 
-@app.post("/process_query", response_model=QueryResponse)
-async def process_query_endpoint(request: QueryRequest):
-    """
-    Processes a user query through the InfinityPay Agent Swarm and returns a structured response.
-    """
-    global overall_app
-    if overall_app is None: # Check if app is initialized (should be by lifespan)
-        raise HTTPException(status_code=503, detail="Agent system not initialized yet. Please wait a moment.")
-
-    print(f"\nReceived query for user '{request.user_id}': '{request.message}'")
-
+def _build_initial_state(request: QueryRequest) -> OverallAgentState:
+    """Builds the initial OverallAgentState for a single user query."""
     session_user_id = request.user_id
     user_query = request.message
 
-    # Initialize the overall state for the LangGraph
-    initial_overall_state = OverallAgentState(
+    return OverallAgentState(
         messages=[HumanMessage(content=user_query)],
         session_user_id=session_user_id,
         current_query_user_id=None,  
-        language=detect_language(user_query),  
+        language=detect_language(user_query), # Decided once here and honoured by every agent
         tools_used=[],
         escalation_needed=False,
         user_data=None,  
         current_query=user_query,
         access_denied=False, 
         next_agent=None,  
+        route_metadata=None,
         question=user_query,  
         answer="", 
         raw_agent_output=None,  
@@ -315,42 +396,203 @@ async def process_query_endpoint(request: QueryRequest):
         workflow_trace=[] 
     )
 
+def _build_query_response(final_state: Dict[str, Any]) -> QueryResponse:
+    """Converts the final state of the overall graph into the API response model."""
+    # Extract results from the final state
+    final_response_content = final_state.get("final_response")
+    source_agent_output = final_state.get("raw_agent_output")
+
+    # Fallback for final_response_content if PersonalityLayer didn't explicitly set it
+    if not final_response_content:
+        final_response_content = next((msg.content for msg in reversed(final_state["messages"]) if isinstance(msg, AIMessage)), "No response generated.")
+
+    # Format agent workflow for the API response
+    agent_workflow_list = []
+    for step in final_state["workflow_trace"]:
+        agent_name = step["agent_name"]
+        tool_calls = step.get("tool_calls", {})
+        # Removed the special handling for KnowledgeAgent's trace format
+        # All steps will now be appended as single dictionaries for consistency
+        agent_workflow_list.append({"agent_name": agent_name, "tool_calls": tool_calls})
+
+    return QueryResponse(
+        response=final_response_content,
+        source_agent_response=source_agent_output,
+        agent_workflow=agent_workflow_list
+    )
+
+@app.post("/process_query", response_model=QueryResponse)
+async def process_query_endpoint(request: QueryRequest):
+    """
+    Processes a user query through the InfinityPay Agent Swarm and returns a structured response.
+    """
+    global overall_app
+    if overall_app is None: # Check if app is initialized (should be by lifespan)
+        raise HTTPException(status_code=503, detail="Agent system not initialized yet. Please wait a moment.")
+
+    print(f"\nReceived query for user '{request.user_id}': '{request.message}'")
+
+    # Initialize the overall state for the LangGraph
+    initial_overall_state = _build_initial_state(request)
+
     # Configuration for LangGraph (thread_id for memory)
-    config = {"configurable": {"thread_id": session_user_id}}
+    config = {"configurable": {"thread_id": request.user_id}}
 
     try:
         # Invoke the overall LangGraph with the initial state
         final_state = await overall_app.ainvoke(initial_overall_state, config) # Use ainvoke for FastAPI async
-
-        # Extract results from the final state
-        final_response_content = final_state.get("final_response")
-        source_agent_output = final_state.get("raw_agent_output")
-
-        # Fallback for final_response_content if PersonalityLayer didn't explicitly set it
-        if not final_response_content:
-            final_response_content = next((msg.content for msg in reversed(final_state["messages"]) if isinstance(msg, AIMessage)), "No response generated.")
-
-        # Format agent workflow for the API response
-        agent_workflow_list = []
-        for step in final_state["workflow_trace"]:
-            agent_name = step["agent_name"]
-            tool_calls = step.get("tool_calls", {})
-            # Removed the special handling for KnowledgeAgent's trace format
-            # All steps will now be appended as single dictionaries for consistency
-            agent_workflow_list.append({"agent_name": agent_name, "tool_calls": tool_calls})
-
-        return QueryResponse(
-            response=final_response_content,
-            source_agent_response=source_agent_output,
-            agent_workflow=agent_workflow_list
-        )
+        return _build_query_response(final_state)
 
     except Exception as e:
         print(f"An error occurred during agent processing: {e}")
         import traceback
         traceback.print_exc() # Print full traceback for debugging
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+# Top-level nodes of the overall graph whose completion is reported on the stream
+STREAMED_GRAPH_NODES = {
+    "router",
+    "customer_support_executor",
+    "knowledge_agent_executor",
+    "custom_agent_executor",
+    "slack_agent_executor",
+    "personality_layer",
+}
+
+# Node (inside the personality sub-graph) whose LLM tokens are forwarded to the client
+PERSONALITY_STREAM_NODE = "add_personality"
+
+def _sse_event(event: str, data: Any) -> str:
+    """Formats a single Server-Sent Events frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+async def _stream_query_events(initial_state: OverallAgentState, config: Dict[str, Any]) -> AsyncIterator[str]:
+    """
+    Runs the overall graph with `astream_events` and yields SSE frames:
+    `route` once the router has decided, `trace` for every new workflow_trace step,
+    `token` for each chunk produced by the personality LLM, and finally `final`
+    with the same payload as the non-streaming endpoint (or `error`).
+    """
+    # Flush something immediately so proxies and browsers see the first byte right away
+    yield ": stream opened\n\n"
+
+    emitted_trace_steps = 0
+    final_state = None
+
+    try:
+        async for event in overall_app.astream_events(initial_state, config, version="v2"):
+            kind = event["event"]
+            metadata = event.get("metadata", {})
+
+            if kind == "on_chat_model_stream" and metadata.get("langgraph_node") == PERSONALITY_STREAM_NODE:
+                chunk = event["data"].get("chunk")
+                token = getattr(chunk, "content", "")
+                if token:
+                    yield _sse_event("token", {"text": token})
+
+            elif kind == "on_chain_end" and event["name"] in STREAMED_GRAPH_NODES:
+                output = event["data"].get("output")
+                if not isinstance(output, dict):
+                    continue
+
+                if event["name"] == "router":
+                    next_agent = output.get("next_agent") or "default"
+                    yield _sse_event("route", {
+                        "next_agent": next_agent,
+                        "agent_name": ROUTING_CONFIG.get(next_agent, ROUTING_CONFIG["default"])
+                    })
+
+                trace = output.get("workflow_trace") or []
+                for step in trace[emitted_trace_steps:]:
+                    if step.get("agent_name") == "PersonalityLayer" and "fast_path" in step["tool_calls"]:
+                        # Written without the LLM, so no token was streamed: send the response as one token
+                        yield _sse_event("token", {"text": step["tool_calls"]["response"]})
+                    yield _sse_event("trace", step)
+                emitted_trace_steps = max(emitted_trace_steps, len(trace))
+
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                # Root run of the overall graph: its output is the final state
+                final_state = event["data"].get("output")
+
+        if final_state is None:
+            final_state = (await overall_app.aget_state(config)).values
+
+        yield _sse_event("final", _build_query_response(final_state).model_dump())
+
+    except Exception as e:
+        print(f"An error occurred during streamed agent processing: {e}")
+        import traceback
+        traceback.print_exc() # Print full traceback for debugging
+        yield _sse_event("error", {"detail": f"Internal server error: {str(e)}"})
+
+@app.post("/process_query/stream")
+async def process_query_stream_endpoint(request: QueryRequest):
+    """
+    Streaming variant of `/process_query` using Server-Sent Events.
+    Routing decisions and workflow steps are sent as soon as they happen,
+    followed by the personality layer's tokens and a final structured response.
+    """
+    global overall_app
+    if overall_app is None: # Check if app is initialized (should be by lifespan)
+        raise HTTPException(status_code=503, detail="Agent system not initialized yet. Please wait a moment.")
+
+    print(f"\nReceived streaming query for user '{request.user_id}': '{request.message}'")
+
+    initial_overall_state = _build_initial_state(request)
+    config = {"configurable": {"thread_id": request.user_id}}
+
+    return StreamingResponse(
+        _stream_query_events(initial_overall_state, config),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no", # Disable buffering in nginx-style reverse proxies
+        }
+    )
     
+# Token required by the /admin endpoints (as "Authorization: Bearer <token>"); unset disables them
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+
+def require_admin_token(authorization: Optional[str] = Header(None)) -> None:
+    """Rejects requests without the admin bearer token (compared in constant time)."""
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(status_code=503, detail="Admin endpoints are disabled: ADMIN_API_TOKEN is not set.")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip().encode(), ADMIN_API_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid or missing admin token.",
+                            headers={"WWW-Authenticate": "Bearer"})
+
+@app.post("/admin/knowledge_base/rebuild", status_code=202, dependencies=[Depends(require_admin_token)])
+def rebuild_knowledge_base_endpoint(request: RebuildRequest = RebuildRequest()):
+    """
+    Starts a background rebuild of the knowledge base index. The new index is written as a new
+    version and swapped in when done; queries keep being answered from the current one meanwhile.
+    """
+    if not start_knowledge_base_rebuild(full=request.full):
+        raise HTTPException(status_code=409, detail="A knowledge base rebuild is already running.")
+    return get_knowledge_base_rebuild_status()
+
+@app.get("/admin/knowledge_base/rebuild", dependencies=[Depends(require_admin_token)])
+def knowledge_base_rebuild_status_endpoint():
+    """Reports the state of the current or last rebuild and the served index version."""
+    return get_knowledge_base_rebuild_status()
+
 @app.get("/ping")
 def ping():
     return {"status": "alive"}
+
+@app.get("/stats")
+def stats():
+    """Exposes in-process cache counters for monitoring."""
+    return {
+        "prompt_cache": get_prompt_cache_stats(),
+        "suspicious_rules": get_suspicious_rule_stats(),
+        "router": get_router_stats(),
+        "knowledge_cache": get_knowledge_cache_stats(),
+        "embedding_cache": get_embedding_cache_stats(),
+        "web_search": get_web_search_stats(),
+        "personality": get_personality_stats(),
+        "personality_cache": get_personality_cache_stats(),
+        "checkpointer": get_checkpointer_stats()
+    }
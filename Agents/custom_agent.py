@@ -4,9 +4,9 @@ from typing import TypedDict, List, Dict, Any, Optional, Annotated
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, ToolMessage
 from langchain_core.tools import tool
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END, START
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode
 from dotenv import load_dotenv
 import re
 import sys
@@ -22,6 +22,9 @@ from utils.load_prompt import load_prompt_template
 from utils.lang_detect import detect_language
 from utils.extract_user_id import extract_user_id_from_query
 from utils.validate_user import validate_user_access
+from utils.keyword_matcher import KeywordMatcher
+from utils.tool_executor import ToolExecutor
+from utils.canned_responses import system_message
 from data.user_data import USER_DATABASE  
 
 load_dotenv()
@@ -95,6 +98,13 @@ def get_recent_transactions(user_id: str, limit: int = 5) -> Dict[str, Any]:
     except Exception as e:
         return {"success": False, "data": None, "message": f"Error retrieving transactions: {str(e)}"}
 
+# Keyword sets used by the validation nodes, compiled once into a single matcher
+CUSTOM_AGENT_KEYWORD_SETS = {
+    "account_access": ["balance", "saldo", "transaction", "transação", "history", "histórico", "extrato", "statement"],
+    "balance_transaction": ["balance", "saldo", "transaction", "transação", "history", "histórico", "extrato", "current balance", "últimas transações", "movimentação"],
+}
+custom_agent_keywords = KeywordMatcher(CUSTOM_AGENT_KEYWORD_SETS)
+
 # Initialize LLM and bind tools
 llm = ChatGoogleGenerativeAI(
     model="gemini-1.5-flash",
@@ -102,21 +112,21 @@ llm = ChatGoogleGenerativeAI(
 )
 tools = [get_account_balance, get_recent_transactions]
 llm_with_tools = llm.bind_tools(tools)
+tool_executor = ToolExecutor(tools)
 
 # Node: Language Detection
 def language_detector(state: CustomAgentState) -> CustomAgentState:
-    """Detect the language of the current query and update state."""
+    """Detect the language of the current query and update state (keeps a language already decided upstream)."""
     current_message = state["messages"][-1].content
-    detected_lang = detect_language(current_message)
+    detected_lang = state.get("language") or detect_language(current_message)
     return {**state, "language": detected_lang, "current_query": current_message}
 
 # Node: User Access Validation
 def user_access_validator(state: CustomAgentState) -> CustomAgentState:
     """Validate user access for account-related queries."""
-    current_query = state["current_query"].lower()
+    current_query = state["current_query"]
     extracted_user_id = extract_user_id_from_query(current_query)
-    account_access_keywords = ["balance", "saldo", "transaction", "transação", "history", "histórico", "extrato", "statement"]
-    requires_account_access = any(keyword in current_query for keyword in account_access_keywords)
+    requires_account_access = custom_agent_keywords.contains(current_query, "account_access")
     access_denied = False
     current_query_user_id = None
 
@@ -135,39 +145,18 @@ def user_access_validator(state: CustomAgentState) -> CustomAgentState:
 def topic_validator(state: CustomAgentState) -> CustomAgentState:
     """Validate if the query is related to InfinityPay/banking services and specific to balance/transactions."""
     if state.get("access_denied", False):
-        access_denied_message = AIMessage(content="""
-            Desculpe, por motivos de segurança, você só pode acessar informações da sua própria conta.
-            Se você deseja consultar dados de sua conta, certifique-se de:
-            1. Ter fornecido seu User ID no início da sessão
-            2. Estar perguntando sobre sua própria conta
-            Como posso ajudá-lo com SUA conta do InfinityPay hoje?
-            """) if state.get("language", "en") == "pt" else AIMessage(content="""
-            I'm sorry, for security reasons, you can only access information from your own account.
-            If you want to check your account data, please ensure you:
-            1. Provided your User ID at the start of the session
-            2. Are asking about your own account
-            How can I help you with YOUR InfinityPay account today?
-            """)
+        access_denied_message = AIMessage(content=system_message("access_denied", state.get("language", "en")))
         return {**state, "messages": [access_denied_message], "escalation_needed": False}
 
-    current_query = state["current_query"].lower()
-    balance_transaction_keywords = ["balance", "saldo", "transaction", "transação", "history", "histórico", "extrato", "current balance", "últimas transações", "movimentação"]
-    has_relevant_context = any(keyword in current_query for keyword in balance_transaction_keywords)
+    has_relevant_context = custom_agent_keywords.contains(state["current_query"], "balance_transaction")
 
     if not has_relevant_context:
-        rejection_message = AIMessage(content="""
-            Desculpe, sou especializado em saldo e histórico de transações.
-            Para outras questões, por favor, me diga mais ou tente perguntar de outra forma.
-            """) if state.get("language", "en") == "pt" else AIMessage(content="""
-            I'm sorry, I specialize in account balance and transaction history.
-            For other inquiries, please tell me more or try asking in a different way.
-            """)
+        rejection_message = AIMessage(content=system_message("custom_agent_off_topic", state.get("language", "en")))
         return {**state, "messages": [rejection_message], "escalation_needed": False}
     return state
 
-# Node: Main Custom Agent LLM Interaction
-def custom_agent_node(state: CustomAgentState) -> CustomAgentState:
-    """Main custom agent node with LLM and tools for balance/transactions."""
+def _build_agent_messages(state: CustomAgentState) -> List[Any]:
+    """Builds the LLM input: system prompt, conversation and the authorized user context."""
     system_prompt_content = load_prompt_template("custom_agent", state.get("language", "en"))
     system_message = SystemMessage(content=system_prompt_content)
     messages = [system_message] + state["messages"]
@@ -175,15 +164,28 @@ def custom_agent_node(state: CustomAgentState) -> CustomAgentState:
     user_id_to_use = state.get("current_query_user_id") or state.get("session_user_id")
     if user_id_to_use:
         messages.append(HumanMessage(content=f"[System Context: Authorized User ID for this query: {user_id_to_use}]"))
+    return messages
 
-    response = llm_with_tools.invoke(messages)
-
+def _record_tools_used(state: CustomAgentState, response: AIMessage) -> List[str]:
+    """Adds the tools requested by the LLM response to the state's tools_used list."""
     tools_used = state.get("tools_used", [])
     if hasattr(response, 'tool_calls') and response.tool_calls:
         for tool_call in response.tool_calls:
             if tool_call['name'] not in tools_used:
                 tools_used.append(tool_call['name'])
+    return tools_used
+
+# Node: Main Custom Agent LLM Interaction
+def custom_agent_node(state: CustomAgentState) -> CustomAgentState:
+    """Main custom agent node with LLM and tools for balance/transactions."""
+    response = llm_with_tools.invoke(_build_agent_messages(state))
+    tools_used = _record_tools_used(state, response)
+    return {**state, "messages": [response], "tools_used": tools_used}
 
+async def acustom_agent_node(state: CustomAgentState) -> CustomAgentState:
+    """Async version of `custom_agent_node`."""
+    response = await llm_with_tools.ainvoke(_build_agent_messages(state))
+    tools_used = _record_tools_used(state, response)
     return {**state, "messages": [response], "tools_used": tools_used}
 
 # Conditional Edge: Determine if agent should continue to tools or end
@@ -211,8 +213,8 @@ def build_custom_agent_graph() -> StateGraph:
     workflow.add_node("language_detector", language_detector)
     workflow.add_node("user_access_validator", user_access_validator)
     workflow.add_node("topic_validator", topic_validator)
-    workflow.add_node("custom_agent", custom_agent_node)
-    workflow.add_node("tools", ToolNode(tools)) # ToolNode automatically executes tools based on LLM output
+    workflow.add_node("custom_agent", RunnableLambda(custom_agent_node, afunc=acustom_agent_node))
+    workflow.add_node("tools", RunnableLambda(tool_executor.node, afunc=tool_executor.anode)) # Executes the requested tools concurrently
 
     # Define the entry point for the graph
     workflow.set_entry_point("language_detector")
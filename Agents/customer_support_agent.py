@@ -6,9 +6,9 @@ from typing import TypedDict, List, Dict, Any, Optional, Annotated
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, ToolMessage
 from langchain_core.tools import tool
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END, START
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode
 from dotenv import load_dotenv
 import re
 import sys
@@ -24,6 +24,9 @@ from utils.load_prompt import load_prompt_template
 from utils.lang_detect import detect_language
 from utils.extract_user_id import extract_user_id_from_query
 from utils.validate_user import validate_user_access
+from utils.keyword_matcher import KeywordMatcher
+from utils.tool_executor import ToolExecutor
+from utils.canned_responses import system_message
 from data.user_data import USER_DATABASE  
 
 load_dotenv()
@@ -157,6 +160,37 @@ def create_support_ticket(user_id: str, issue_description: str, priority: str =
     except Exception as e:
         return {"success": False, "data": None, "message": f"Error creating support ticket: {str(e)}"}
 
+# Keyword sets used by the validation and escalation nodes, matched on word boundaries and without accents.
+# Keywords of four letters or more also match longer words ("card" matches "cards"); shorter ones ("war",
+# "fee") only match whole words.
+CUSTOMER_SUPPORT_KEYWORD_SETS = {
+    "account_access": [
+        "account", "conta", "statement", "extrato", "payment", "pagamento",
+        "transfer", "transferência", "infinitypay", "infinity pay", "bill", "fee", "fees", "charge",
+        "email", "phone number", "endereço de email", "número de telefone", "change", "alterar", "update", "atualizar"
+    ],
+    "banking": [
+        "account", "transfer", "payment", "deposit", "withdrawal", "card", "bank",
+        "money", "credit", "debit", "loan", "infinitypay", "infinity pay", "statement",
+        "bill", "fee", "fees", "charge", "email", "phone number", "change", "update", "issue", "problem", "complain", "escalate",
+        "conta", "transferência", "pagamento", "depósito", "saque", "cartão", "banco",
+        "dinheiro", "crédito", "débito", "empréstimo", "extrato", "fatura", "taxa", "cobrança",
+        "endereço de email", "número de telefone", "alterar", "atualizar", "problema", "reclamação", "escalar"
+    ],
+    "off_topic": [
+        "politics", "celebrity", "news", "weather", "sports", "movie",
+        "política", "celebridade", "notícias", "tempo", "esporte", "filme",
+        "election", "covid", "vaccine", "war"
+    ],
+    "escalation": [
+        "complaint", "angry", "frustrated", "lawsuit", "legal",
+        "reclamação", "raiva", "irritado", "processo", "jurídico",
+        "need to change", "preciso alterar", "cannot update", "não consigo atualizar", "problem with"
+    ],
+}
+
+customer_support_keywords = KeywordMatcher(CUSTOMER_SUPPORT_KEYWORD_SETS, min_prefix_length=4)
+
 # Initialize LLM and bind tools
 llm = ChatGoogleGenerativeAI(
     model="gemini-1.5-flash",
@@ -164,25 +198,22 @@ llm = ChatGoogleGenerativeAI(
 )
 tools = [get_user_info, create_support_ticket]
 llm_with_tools = llm.bind_tools(tools)
+# Tool calls of one turn run concurrently; tickets are created one at a time (one SMTP login at a time)
+tool_executor = ToolExecutor(tools, concurrency={"create_support_ticket": 1})
 
 # Node: Language Detection
 def language_detector(state: CustomerSupportState) -> CustomerSupportState:
-    """Detect the language of the current query and update state."""
+    """Detect the language of the current query and update state (keeps a language already decided upstream)."""
     current_message = state["messages"][-1].content
-    detected_lang = detect_language(current_message)
+    detected_lang = state.get("language") or detect_language(current_message)
     return {**state, "language": detected_lang, "current_query": current_message}
 
 # Node: User Access Validation
 def user_access_validator(state: CustomerSupportState) -> CustomerSupportState:
     """Validate user access for account-related queries for Customer Support Agent."""
-    current_query = state["current_query"].lower()
+    current_query = state["current_query"]
     extracted_user_id = extract_user_id_from_query(current_query)
-    account_access_keywords = [
-        "account", "conta", "statement", "extrato", "payment", "pagamento",
-        "transfer", "transferência", "infinitypay", "infinity pay", "bill", "fee", "charge",
-        "email", "phone number", "endereço de email", "número de telefone", "change", "alterar", "update", "atualizar"
-    ]
-    requires_account_access = any(keyword in current_query for keyword in account_access_keywords)
+    requires_account_access = customer_support_keywords.contains(current_query, "account_access")
     access_denied = False
     current_query_user_id = None
 
@@ -201,61 +232,19 @@ def user_access_validator(state: CustomerSupportState) -> CustomerSupportState:
 def topic_validator(state: CustomerSupportState) -> CustomerSupportState:
     """Validate if the query is related to InfinityPay banking services for Customer Support Agent."""
     if state.get("access_denied", False):
-        access_denied_message = AIMessage(content="""
-            Desculpe, por motivos de segurança, você só pode acessar informações da sua própria conta.
-            Se você deseja consultar dados de sua conta, certifique-se de:
-            1. Ter fornecido seu User ID no início da sessão
-            2. Estar perguntando sobre sua própria conta
-            Como posso ajudá-lo com SUA conta do InfinityPay hoje?
-            """) if state.get("language", "en") == "pt" else AIMessage(content="""
-            I'm sorry, for security reasons, you can only access information from your own account.
-            If you want to check your account data, please ensure you:
-            1. Provided your User ID at the start of the session
-            2. Are asking about your own account
-            How can I help you with YOUR InfinityPay account today?
-            """)
+        access_denied_message = AIMessage(content=system_message("access_denied", state.get("language", "en")))
         return {**state, "messages": [access_denied_message], "escalation_needed": False}
 
-    current_query = state["current_query"].lower()
-    banking_keywords = [
-        "account", "transfer", "payment", "deposit", "withdrawal", "card", "bank",
-        "money", "credit", "debit", "loan", "infinitypay", "infinity pay", "statement",
-        "bill", "fee", "charge", "email", "phone number", "change", "update", "issue", "problem", "complain", "escalate",
-        "conta", "transferência", "pagamento", "depósito", "saque", "cartão", "banco",
-        "dinheiro", "crédito", "débito", "empréstimo", "extrato", "fatura", "taxa", "cobrança",
-        "endereço de email", "número de telefone", "alterar", "atualizar", "problema", "reclamação", "escalar"
-    ]
-    off_topic_keywords = [
-        "politics", "celebrity", "news", "weather", "sports", "movie",
-        "política", "celebridade", "notícias", "tempo", "esporte", "filme",
-        "election", "covid", "vaccine", "war"
-    ]
-
-    has_banking_context = any(keyword in current_query for keyword in banking_keywords)
-    has_off_topic = any(keyword in current_query for keyword in off_topic_keywords)
+    has_banking_context = customer_support_keywords.contains(state["current_query"], "banking")
+    has_off_topic = customer_support_keywords.contains(state["current_query"], "off_topic")
 
     if has_off_topic and not has_banking_context:
-        rejection_message = AIMessage(content="""
-            Desculpe, sou um assistente especializado apenas em questões do InfinityPay.
-            Como posso ajudá-lo com sua conta ou serviços bancários hoje?
-            Posso ajudar com:
-            • Informações da conta
-            • Suporte técnico bancário
-            • Outras consultas bancárias (não relacionadas a saldo/transações diretas)
-            """) if state.get("language", "en") == "pt" else AIMessage(content="""
-            I'm sorry, I'm a specialized assistant for InfinityPay banking services only.
-            How can I help you with your account or banking needs today?
-            I can help with:
-            • Account information
-            • Banking technical support
-            • Other banking inquiries (not direct balance/transaction queries)
-            """)
+        rejection_message = AIMessage(content=system_message("customer_support_off_topic", state.get("language", "en")))
         return {**state, "messages": [rejection_message], "escalation_needed": False}
     return state
 
-# Node: Main Customer Support Agent LLM Interaction
-def customer_support_agent_node(state: CustomerSupportState) -> CustomerSupportState:
-    """Main customer support agent node with LLM and tools."""
+def _build_agent_messages(state: CustomerSupportState) -> List[Any]:
+    """Builds the LLM input: system prompt, conversation and the authorized user context."""
     system_prompt_content = load_prompt_template("customer_support", state.get("language", "en"))
     system_message = SystemMessage(content=system_prompt_content)
     messages = [system_message] + state["messages"]
@@ -263,15 +252,28 @@ def customer_support_agent_node(state: CustomerSupportState) -> CustomerSupportS
     user_id_to_use = state.get("current_query_user_id") or state.get("session_user_id")
     if user_id_to_use:
         messages.append(HumanMessage(content=f"[System Context: Authorized User ID for this query: {user_id_to_use}]"))
+    return messages
 
-    response = llm_with_tools.invoke(messages)
-
+def _record_tools_used(state: CustomerSupportState, response: AIMessage) -> List[str]:
+    """Adds the tools requested by the LLM response to the state's tools_used list."""
     tools_used = state.get("tools_used", [])
     if hasattr(response, 'tool_calls') and response.tool_calls:
         for tool_call in response.tool_calls:
             if tool_call['name'] not in tools_used:
                 tools_used.append(tool_call['name'])
+    return tools_used
 
+# Node: Main Customer Support Agent LLM Interaction
+def customer_support_agent_node(state: CustomerSupportState) -> CustomerSupportState:
+    """Main customer support agent node with LLM and tools."""
+    response = llm_with_tools.invoke(_build_agent_messages(state))
+    tools_used = _record_tools_used(state, response)
+    return {**state, "messages": [response], "tools_used": tools_used}
+
+async def acustomer_support_agent_node(state: CustomerSupportState) -> CustomerSupportState:
+    """Async version of `customer_support_agent_node`."""
+    response = await llm_with_tools.ainvoke(_build_agent_messages(state))
+    tools_used = _record_tools_used(state, response)
     return {**state, "messages": [response], "tools_used": tools_used}
 
 def should_continue(state: CustomerSupportState) -> str:
@@ -293,12 +295,7 @@ def should_continue(state: CustomerSupportState) -> str:
 def escalation_check(state: CustomerSupportState) -> CustomerSupportState:
     """Check if escalation is needed based on conversation and keywords."""
     last_message = state["messages"][-1]
-    escalation_keywords = [
-        "complaint", "angry", "frustrated", "lawsuit", "legal",
-        "reclamação", "raiva", "irritado", "processo", "jurídico",
-        "need to change", "preciso alterar", "cannot update", "não consigo atualizar", "problem with"
-    ]
-    escalation_needed = any(keyword in last_message.content.lower() for keyword in escalation_keywords)
+    escalation_needed = customer_support_keywords.contains(last_message.content, "escalation")
     return {**state, "escalation_needed": escalation_needed}
 
 # Function to build and compile the Customer Support Agent graph
@@ -310,8 +307,8 @@ def build_customer_support_graph() -> StateGraph:
     workflow.add_node("language_detector", language_detector)
     workflow.add_node("user_access_validator", user_access_validator)
     workflow.add_node("topic_validator", topic_validator)
-    workflow.add_node("customer_support", customer_support_agent_node)
-    workflow.add_node("tools", ToolNode(tools)) # ToolNode automatically executes tools
+    workflow.add_node("customer_support", RunnableLambda(customer_support_agent_node, afunc=acustomer_support_agent_node))
+    workflow.add_node("tools", RunnableLambda(tool_executor.node, afunc=tool_executor.anode)) # Executes the requested tools concurrently
     workflow.add_node("escalation_check", escalation_check)
 
     # Define the entry point
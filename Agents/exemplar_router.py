@@ -0,0 +1,173 @@
+from typing import Dict, Any, List, Optional, Tuple
+from langchain_community.vectorstores import FAISS
+from dotenv import load_dotenv
+import asyncio
+import hashlib
+import json
+import sys
+import os
+import threading
+import time
+
+# Adjust sys.path for project root if necessary
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from utils.embeddings import get_embeddings
+from utils.vector_store import load_faiss_local, save_faiss_local
+from data.router_exemplars import ROUTER_EXEMPLARS
+
+load_dotenv()
+
+# Define path for the exemplar index persistence (next to the knowledge base index)
+EXEMPLAR_INDEX_PATH = "faiss_index_router_exemplars"
+EXEMPLAR_FINGERPRINT_FILE = "exemplars.sha256"
+
+# Number of neighbours that vote for a label
+ROUTER_KNN_K = int(os.getenv("ROUTER_KNN_K", "5"))
+
+# After a failed load or build, the index is not retried for ROUTER_KNN_RETRY_INTERVAL seconds,
+# doubling after every consecutive failure up to ROUTER_KNN_RETRY_MAX_INTERVAL; queries are routed
+# by the LLM meanwhile
+ROUTER_KNN_RETRY_INTERVAL = float(os.getenv("ROUTER_KNN_RETRY_INTERVAL", "30"))
+ROUTER_KNN_RETRY_MAX_INTERVAL = float(os.getenv("ROUTER_KNN_RETRY_MAX_INTERVAL", "600"))
+
+_exemplar_index = None
+_exemplar_index_lock = threading.Lock()
+_failed_attempts = 0
+_retry_at = 0.0
+
+def _exemplar_fingerprint() -> str:
+    """Hash of the exemplar set and embedding model; the index is rebuilt when it changes."""
+    payload = json.dumps({"model": get_embeddings().model, "exemplars": ROUTER_EXEMPLARS}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _read_fingerprint() -> Optional[str]:
+    try:
+        with open(os.path.join(EXEMPLAR_INDEX_PATH, EXEMPLAR_FINGERPRINT_FILE), 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def _build_and_save_exemplar_index(fingerprint: str) -> Optional[FAISS]:
+    """Embeds every exemplar and saves the labelled index to disk."""
+    texts = []
+    metadatas = []
+    for label, exemplars in ROUTER_EXEMPLARS.items():
+        for exemplar in exemplars:
+            texts.append(exemplar)
+            metadatas.append({"label": label})
+
+    try:
+        index = FAISS.from_texts(texts, get_embeddings(), metadatas=metadatas)
+        # Renamed into place, the index then its fingerprint: another process loading the index
+        # meanwhile reads either the previous files or the new ones
+        save_faiss_local(index, EXEMPLAR_INDEX_PATH)
+        fingerprint_path = os.path.join(EXEMPLAR_INDEX_PATH, EXEMPLAR_FINGERPRINT_FILE)
+        with open(fingerprint_path + ".tmp", 'w', encoding='utf-8') as f:
+            f.write(fingerprint)
+        os.replace(fingerprint_path + ".tmp", fingerprint_path)
+        print(f"Router exemplar index built with {len(texts)} exemplars and saved to disk.")
+        return index
+    except Exception as e:
+        print(f"Error building or saving router exemplar index: {e}")
+        return None
+
+def _load_or_build_exemplar_index() -> Optional[FAISS]:
+    try:
+        fingerprint = _exemplar_fingerprint()
+    except Exception as e:
+        print(f"Error fingerprinting the router exemplars: {e}")
+        return None
+    if os.path.exists(EXEMPLAR_INDEX_PATH) and _read_fingerprint() == fingerprint:
+        try:
+            index = load_faiss_local(EXEMPLAR_INDEX_PATH, get_embeddings())
+            print("Router exemplar index loaded from disk.")
+            return index
+        except Exception as e:
+            print(f"Error loading router exemplar index from disk: {e}. Attempting to rebuild.")
+    else:
+        print("Router exemplar index missing or outdated. Building from scratch...")
+    return _build_and_save_exemplar_index(fingerprint)
+
+def load_exemplar_index() -> Optional[FAISS]:
+    """
+    Loads the router exemplar index from disk, or (re)builds it if it is missing or
+    was built from a different exemplar set.
+    Returns None without waiting while another thread is loading it, and without retrying
+    until the retry interval has passed after a failure: the caller routes with the LLM.
+    """
+    global _exemplar_index, _failed_attempts, _retry_at
+    if _exemplar_index is not None:
+        return _exemplar_index
+    if time.monotonic() < _retry_at or not _exemplar_index_lock.acquire(blocking=False):
+        return None
+
+    try:
+        if _exemplar_index is None and time.monotonic() >= _retry_at:
+            _exemplar_index = _load_or_build_exemplar_index()
+            if _exemplar_index is None:
+                retry_interval = min(ROUTER_KNN_RETRY_MAX_INTERVAL, ROUTER_KNN_RETRY_INTERVAL * 2 ** _failed_attempts)
+                _failed_attempts += 1
+                _retry_at = time.monotonic() + retry_interval
+                print(f"Router exemplar index unavailable; routing with the LLM, retrying in {retry_interval:.0f}s.")
+            else:
+                _failed_attempts = 0
+        return _exemplar_index
+    finally:
+        _exemplar_index_lock.release()
+
+def _vote(neighbours: List[Tuple[Any, float]]) -> Optional[Dict[str, Any]]:
+    """
+    Distance-weighted vote of the nearest exemplars.
+    The margin is the difference between the two best labels' weights over the total weight:
+    1.0 when all neighbours agree, close to 0.0 when two labels are tied.
+    """
+    if not neighbours:
+        return None
+
+    weights: Dict[str, float] = {}
+    for document, distance in neighbours:
+        label = document.metadata.get("label", "default")
+        weights[label] = weights.get(label, 0.0) + 1.0 / (1.0 + float(distance))
+
+    ranked = sorted(weights.items(), key=lambda item: item[1], reverse=True)
+    best_label, best_weight = ranked[0]
+    runner_up_weight = ranked[1][1] if len(ranked) > 1 else 0.0
+    return {
+        "agent": best_label,
+        "margin": round((best_weight - runner_up_weight) / sum(weights.values()), 3),
+        "neighbours": [(document.page_content, document.metadata.get("label"), round(float(distance), 4))
+                       for document, distance in neighbours],
+    }
+
+def classify_route_knn(message: str, k: int = ROUTER_KNN_K) -> Optional[Dict[str, Any]]:
+    """
+    Embeds the message once and returns the label voted by its k nearest exemplars together with
+    the vote margin, or None if the exemplar index is unavailable.
+    """
+    index = load_exemplar_index()
+    if index is None:
+        return None
+    try:
+        query_vector = get_embeddings().embed_query(message)
+        return _vote(index.similarity_search_with_score_by_vector(query_vector, k=k))
+    except Exception as e:
+        print(f"Error during exemplar routing: {e}")
+        return None
+
+async def aclassify_route_knn(message: str, k: int = ROUTER_KNN_K) -> Optional[Dict[str, Any]]:
+    """
+    Async version of `classify_route_knn`; the embedding call is awaited and the search is in-memory.
+    Loading or building the index is blocking work, so it runs in a worker thread.
+    """
+    index = _exemplar_index or await asyncio.to_thread(load_exemplar_index)
+    if index is None:
+        return None
+    try:
+        query_vector = await get_embeddings().aembed_query(message)
+        return _vote(index.similarity_search_with_score_by_vector(query_vector, k=k))
+    except Exception as e:
+        print(f"Error during exemplar routing: {e}")
+        return None
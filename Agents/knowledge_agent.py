@@ -1,16 +1,18 @@
-import requests
-from bs4 import BeautifulSoup
-from typing import TypedDict, List, Dict, Any
+import asyncio
+from typing import TypedDict, List, Dict, Any, Iterator, Optional, Tuple
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from langchain.chains import RetrievalQA
 from langgraph.graph import StateGraph, START, END
 from langchain_core.tools import tool
+from langchain_core.runnables import RunnableLambda
 from dotenv import load_dotenv
-from langchain_community.tools import DuckDuckGoSearchRun
+from concurrent.futures import Future, ThreadPoolExecutor
 import sys
 import os
+import threading
+import time
 
 # Adjust sys.path for project root if necessary
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -19,8 +21,20 @@ if PROJECT_ROOT not in sys.path:
 
 from core.state import OverallAgentState
 from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage, AIMessage
-import uuid
 from utils.load_prompt import load_prompt_template
+from utils.keyword_matcher import KeywordMatcher
+from utils.embeddings import get_embeddings
+from utils.semantic_cache import SemanticCache
+from utils.vector_store import load_faiss_local, save_faiss_local
+from utils.knowledge_ingest import ingest_pages, load_manifest, save_manifest
+from utils.bm25 import BM25Index, load_bm25, save_bm25, update_bm25
+from utils.hybrid_retrieval import HybridRetriever
+from utils.index_versions import current_index_path, discard_version, new_version_path, pin_version, publish_version
+from utils.background_job import BackgroundJob
+from utils.web_search import web_search_client
+from utils.tool_executor import ToolExecutor
+from utils.scraper import iter_scraped_pages, scrape_pages
+from utils.streaming_build import StreamingIndexBuilder
 
 load_dotenv()
 
@@ -34,104 +48,308 @@ class KnowledgeAgentState(TypedDict):
 # Define path for FAISS index persistence
 FAISS_INDEX_PATH = "faiss_index_infinitepay"
 
+# Pages scraped into the knowledge base. KNOWLEDGE_BASE_ORIGIN can point them at a local copy of the
+# site (e.g. benchmarks/fixture_server.py)
+KNOWLEDGE_BASE_ORIGIN = os.getenv("KNOWLEDGE_BASE_ORIGIN", "https://www.infinitepay.io").rstrip("/")
+KNOWLEDGE_BASE_URLS = [KNOWLEDGE_BASE_ORIGIN + path for path in [
+    "",
+    "/maquininha",
+    "/maquininha-celular",
+    "/tap-to-pay",
+    "/pdv",
+    "/receba-na-hora",
+    "/gestao-de-cobranca-2",
+    "/gestao-de-cobranca",
+    "/link-de-pagamento",
+    "/loja-online",
+    "/boleto",
+    "/conta-digital",
+    "/conta-pj",
+    "/pix",
+    "/pix-parcelado",
+    "/emprestimo",
+    "/cartao",
+    "/rendimento"
+]]
+_text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+
+# How retrieve_knowledge answers:
+# - "qa": a RetrievalQA chain answers from the retrieved chunks (its own LLM call; the agent then synthesizes again)
+# - "chunks": the top-k chunks are returned with their scores and sources, and the agent answers in a single LLM pass
+KNOWLEDGE_RETRIEVAL_MODE = os.getenv("KNOWLEDGE_RETRIEVAL_MODE", "qa").lower()
+KNOWLEDGE_RETRIEVAL_K = int(os.getenv("KNOWLEDGE_RETRIEVAL_K", "5"))
+# Hybrid retrieval: the vector ranking is fused with a BM25 keyword ranking over the same chunks
+# (see utils/hybrid_retrieval.py), so exact product names and jargon are found
+KNOWLEDGE_HYBRID_ENABLED = os.getenv("KNOWLEDGE_HYBRID_ENABLED", "true").lower() in ("1", "true", "yes")
+# Speculative mode: the knowledge base lookup and the web search start together as soon as the question
+# arrives, skipping the LLM tool selection. A retrieval at least KNOWLEDGE_SPECULATIVE_MIN_SCORE confident
+# (cosine similarity of the query and the nearest chunk) cancels the search and is answered from the chunks
+# alone; otherwise a single LLM call answers from the chunks and the search results together. The default
+# is deliberately strict, since a low score only costs waiting for the search; pick it from the scores
+# `python -m benchmarks.speculative_knowledge --embeddings google` prints for covered and missed questions.
+KNOWLEDGE_SPECULATIVE_ENABLED = os.getenv("KNOWLEDGE_SPECULATIVE_ENABLED", "false").lower() in ("1", "true", "yes")
+KNOWLEDGE_SPECULATIVE_MIN_SCORE = float(os.getenv("KNOWLEDGE_SPECULATIVE_MIN_SCORE", "0.8"))
+# Speculative web searches of the synchronous path in flight at once. A discarded search still runs to
+# its end (up to WEB_SEARCH_TIMEOUT) in a worker thread; beyond this many, questions search only once
+# the retrieval turns out not to be confident, instead of queueing more work
+KNOWLEDGE_SPECULATIVE_MAX_SEARCHES = max(1, int(os.getenv("KNOWLEDGE_SPECULATIVE_MAX_SEARCHES", "4")))
+
+# Semantic answer cache in front of the whole agent: paraphrases of an answered question
+# ("quanto custa a maquininha?" / "preço da maquininha") are answered without any LLM call.
+KNOWLEDGE_CACHE_ENABLED = os.getenv("KNOWLEDGE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Versions published by another process (`python -m utils.refresh_knowledge_base`, another API worker) are
+# noticed by comparing the published version with the served one at most every KNOWLEDGE_INDEX_POLL_INTERVAL
+# seconds, on the request path; the new index is then loaded in the background and swapped in (0 disables)
+KNOWLEDGE_INDEX_POLL_INTERVAL = float(os.getenv("KNOWLEDGE_INDEX_POLL_INTERVAL", "30"))
+knowledge_answer_cache = SemanticCache(
+    threshold=float(os.getenv("KNOWLEDGE_CACHE_THRESHOLD", "0.93")),
+    ttl=float(os.getenv("KNOWLEDGE_CACHE_TTL", "3600")),
+    max_entries=int(os.getenv("KNOWLEDGE_CACHE_MAX_ENTRIES", "1000"))
+)
+
 # Web Scraping function
+def scrape_website_pages(urls: list) -> Dict[str, str]:
+    """
+    Scrapes content from a list of URLs and returns the text of every page that has any, by URL.
+    Pages are fetched concurrently and revalidated with conditional GETs (see utils/scraper.py).
+    """
+    return scrape_pages(urls)
+
+def iter_website_pages(urls: list) -> Iterator[Tuple[str, str]]:
+    """Yields (url, text) for every page with content as soon as it is scraped, while the others download."""
+    return iter_scraped_pages(urls)
+
 def scrape_websites(urls: list) -> str:
     """Scrapes content from a list of URLs."""
-    all_content = ""
-    for url in urls:
-        print(f"Scraping: {url}") 
-        try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            for script in soup(["script", "style"]):
-                script.decompose()
-            content = soup.get_text(separator=' ', strip=True)
-            if content:
-                all_content += content + "\n\n"
-        except requests.RequestException as e:
-            print(f"Error scraping website {url}: {e}")
-        except Exception as e:
-            print(f"Unexpected error while parsing {url}: {e}")
-    return all_content
+    return "".join(content + "\n\n" for content in scrape_website_pages(urls).values())
 
 # Create and/or load vector store
-def create_or_load_vectorstore() -> FAISS:
+def create_or_load_vectorstore() -> Optional[FAISS]:
     """
-    Loads FAISS vector store from disk if it exists, otherwise creates it
-    by scraping websites and then saves it to disk.
+    Loads the served version of the FAISS vector store from disk (see utils/index_versions.py).
+    Returns None if there is none or it cannot be loaded; the index is then built in the
+    background (see `start_knowledge_base_rebuild`), never inline.
     """
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-
-    if os.path.exists(FAISS_INDEX_PATH):
-        print(f"Loading knowledge base from disk: {FAISS_INDEX_PATH}")
-        try:
-            vectorstore = FAISS.load_local(FAISS_INDEX_PATH, embeddings, allow_dangerous_deserialization=True)
-            print("Knowledge base loaded successfully from disk!")
-            return vectorstore
-        except Exception as e:
-            print(f"Error loading FAISS index from disk: {e}. Attempting to rebuild.")
-            # Fallback to rebuild if loading fails
-            return _build_and_save_vectorstore(embeddings)
-    else:
-        print("Knowledge base not found on disk. Building from scratch...")
-        return _build_and_save_vectorstore(embeddings)
-
-def _build_and_save_vectorstore(embeddings: GoogleGenerativeAIEmbeddings) -> FAISS:
-    """Helper to build vectorstore from scratch and save it."""
-    urls = [
-        "https://www.infinitepay.io",
-        "https://www.infinitepay.io/maquininha",
-        "https://www.infinitepay.io/maquininha-celular",
-        "https://www.infinitepay.io/tap-to-pay",
-        "https://www.infinitepay.io/pdv",
-        "https://www.infinitepay.io/receba-na-hora",
-        "https://www.infinitepay.io/gestao-de-cobranca-2",
-        "https://www.infinitepay.io/gestao-de-cobranca",
-        "https://www.infinitepay.io/link-de-pagamento",
-        "https://www.infinitepay.io/loja-online",
-        "https://www.infinitepay.io/boleto",
-        "https://www.infinitepay.io/conta-digital",
-        "https://www.infinitepay.io/conta-pj",
-        "https://www.infinitepay.io/pix",
-        "https://www.infinitepay.io/pix-parcelado",
-        "https://www.infinitepay.io/emprestimo",
-        "https://www.infinitepay.io/cartao",
-        "https://www.infinitepay.io/rendimento"
-    ]
-    scraped_content = scrape_websites(urls)
-
-    if not scraped_content:
-        print("Warning: No content scraped. Vector store will not be created.")
+    index_path = current_index_path(FAISS_INDEX_PATH)
+    if index_path is None:
+        print("Knowledge base not found on disk.")
         return None
-
-    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    docs = splitter.create_documents([scraped_content])
-    print(f"Created {len(docs)} document chunks for embedding.")
-
+    print(f"Loading knowledge base from disk: {index_path}")
     try:
-        vectorstore = FAISS.from_documents(docs, embeddings)
-        vectorstore.save_local(FAISS_INDEX_PATH)
-        print("Knowledge base built and saved successfully to disk!")
+        vectorstore = load_faiss_local(index_path, get_embeddings())
+        print("Knowledge base loaded successfully from disk!")
         return vectorstore
     except Exception as e:
-        print(f"Error building or saving vector store: {e}")
+        print(f"Error loading FAISS index from disk: {e}.")
         return None
 
+def _ingest_and_save(embeddings: GoogleGenerativeAIEmbeddings, target_path: str, vectorstore: Optional[FAISS] = None,
+                     manifest: Optional[Dict[str, Any]] = None,
+                     source_path: Optional[str] = None) -> Tuple[Optional[FAISS], Optional[Dict[str, Any]]]:
+    """
+    Scrapes the knowledge base pages and applies the changes since `manifest` to `vectorstore`,
+    loaded from `source_path` (or builds it from scratch without them). If any chunk changed, the
+    whole index is saved to the new version directory `target_path`. Returns the vector store and
+    the ingest report.
+    """
+    if vectorstore is None or manifest is None:
+        return _stream_build_and_save(embeddings, target_path)
+
+    scraped_pages = scrape_website_pages(KNOWLEDGE_BASE_URLS)
+    if not scraped_pages:
+        print("Warning: No content scraped. Vector store will not be created or updated.")
+        return vectorstore, None
+
+    # Pages are split separately so every chunk keeps the URL it came from
+    vectorstore, new_manifest, report = ingest_pages(
+        vectorstore, manifest, scraped_pages, KNOWLEDGE_BASE_URLS, _text_splitter.split_text, embeddings
+    )
+    print(f"Knowledge base ingest: pages {report['pages']}, chunks {report['chunks']} in {report['seconds']}s")
+    if vectorstore is None:
+        return None, report
+    if report["full_build"] or report["chunks"]["added"] or report["chunks"]["removed"]:
+        save_faiss_local(vectorstore, target_path)
+        lexical_index = None if report["full_build"] else load_bm25(source_path)
+        save_bm25(target_path, update_bm25(lexical_index, vectorstore, manifest, new_manifest))
+        save_manifest(target_path, new_manifest)
+    elif new_manifest != manifest:
+        # Same chunks (e.g. a page whose text changed only outside of them): the served index stays
+        save_manifest(source_path, new_manifest)
+    return vectorstore, report
+
+def _stream_build_and_save(embeddings: GoogleGenerativeAIEmbeddings,
+                           target_path: str) -> Tuple[Optional[FAISS], Optional[Dict[str, Any]]]:
+    """
+    Builds the index from scratch while the pages are scraped: every page is split as soon as it
+    arrives and its chunks are embedded in batches, checkpointed next to the index (see
+    utils/streaming_build.py). An interrupted build resumes from its checkpoint on the next run.
+    Saves the index to `target_path` and returns it with the build report.
+    """
+    builder = StreamingIndexBuilder(FAISS_INDEX_PATH, embeddings)
+    for url, text in iter_website_pages(KNOWLEDGE_BASE_URLS):
+        builder.add_page(url, text, _text_splitter.split_text)
+    vectorstore, manifest, report = builder.finish(KNOWLEDGE_BASE_URLS)
+    print(f"Knowledge base build: pages {report['pages']}, chunks {report['chunks']} "
+          f"in {report['batches']} batches, {report['seconds']}s")
+    if vectorstore is None:
+        print("Warning: No content scraped. Vector store will not be created or updated.")
+        builder.discard()
+        return None, None
+    save_faiss_local(vectorstore, target_path)
+    save_bm25(target_path, BM25Index.from_vectorstore(vectorstore))
+    save_manifest(target_path, manifest)
+    builder.discard()
+    # The built store reads its chunks from the checkpoint, which is gone; serve the saved copy
+    return load_faiss_local(target_path, embeddings), report
+
 # Global vectorstore instance  
 _vectorstore = None
+# BM25 index over the same chunks, for hybrid retrieval
+_lexical_index = None
+# Directory of the served index version
+_index_path = None
+_setup_lock = threading.Lock()
+
+def _knowledge_index_version(index_path: str) -> Optional[float]:
+    """Identifies an index on disk (its modification time); it changes whenever the index is rebuilt."""
+    try:
+        return os.path.getmtime(os.path.join(index_path, "index.faiss"))
+    except OSError:
+        return None
+
+def _activate_vectorstore(vectorstore: FAISS, index_path: str) -> None:
+    """
+    Makes `vectorstore`, loaded from `index_path`, the served one. Its retrieval pipeline is built
+    first, then swapped in: queries read `_retriever` or `_qa_chain` once, so those in flight
+    finish on the previous index and none waits for the swap.
+    """
+    global _vectorstore, _lexical_index, _retriever, _qa_chain, _index_path
+    lexical_index = _load_lexical_index(vectorstore, index_path) if KNOWLEDGE_HYBRID_ENABLED else None
+    retriever, qa_chain = _retrieval_pipeline(vectorstore, lexical_index)
+    _vectorstore, _lexical_index, _retriever, _qa_chain, _index_path = (
+        vectorstore, lexical_index, retriever, qa_chain, index_path)
+    # The version stays on disk while this process serves it, whoever prunes
+    try:
+        pin_version(FAISS_INDEX_PATH, index_path)
+    except OSError as e:
+        print(f"Failed to pin knowledge base version {index_path}: {e}")
+    # Cached answers generated from a previous index are dropped
+    knowledge_answer_cache.set_version(_knowledge_index_version(index_path))
+
+def _load_lexical_index(vectorstore: FAISS, index_path: str) -> Optional[BM25Index]:
+    """Loads the BM25 index saved with the vector store, or builds it from the docstore (indexes saved without one)."""
+    lexical_index = load_bm25(index_path)
+    if lexical_index is not None and len(lexical_index) == vectorstore.index.ntotal:
+        return lexical_index
+    print("Building the BM25 index of the knowledge base from its docstore")
+    try:
+        return BM25Index.from_vectorstore(vectorstore)
+    except Exception as e:
+        print(f"Error building the BM25 index: {e}. Retrieving by vector similarity only.")
+        return None
 
 def setup_knowledge_base():
-    """Sets up the global knowledge base vectorstore (loads from disk or builds)."""
-    global _vectorstore
-    if _vectorstore is None:
-        _vectorstore = create_or_load_vectorstore()
-        if _vectorstore:
-            print("Global vectorstore ready.")
-        else:
-            print("Failed to initialize global vectorstore.")
+    """
+    Sets up the global knowledge base vectorstore from disk. If there is none, a full build is
+    started in the background (once per process; later builds are started from the admin API),
+    and None is returned: knowledge questions fall back to web search until it is published.
+    """
+    with _setup_lock:
+        if _vectorstore is None:
+            vectorstore = create_or_load_vectorstore()
+            if vectorstore:
+                _activate_vectorstore(vectorstore, current_index_path(FAISS_INDEX_PATH))
+                print("Global vectorstore ready.")
+            elif knowledge_base_rebuild.status()["state"] == "idle" and start_knowledge_base_rebuild(full=True):
+                print("Building the knowledge base in the background.")
     return _vectorstore
 
+def refresh_knowledge_base(full: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Re-scrapes the knowledge base pages and updates the served index incrementally: only new or
+    changed chunks are embedded and removed ones are deleted (see utils/knowledge_ingest.py).
+    Without a manifest, or with `full`, the index is rebuilt from scratch. If anything changed, the
+    updated index is saved as a new version, published, and becomes the global one. The served
+    index is never modified. Returns the ingest report (None if nothing was scraped).
+    """
+    embeddings = get_embeddings()
+    source_path = current_index_path(FAISS_INDEX_PATH)
+    manifest = None if full or source_path is None else load_manifest(source_path)
+    vectorstore = None
+    if manifest is not None:
+        try:
+            # Loaded without mmap so it can be modified; the served index is left untouched
+            vectorstore = load_faiss_local(source_path, embeddings, mmap=False)
+        except Exception as e:
+            print(f"Error loading FAISS index for an incremental update: {e}. Rebuilding it from scratch.")
+            manifest = None
+
+    target_path = new_version_path(FAISS_INDEX_PATH)
+    try:
+        vectorstore, report = _ingest_and_save(embeddings, target_path, vectorstore, manifest, source_path)
+    except BaseException:
+        discard_version(target_path)
+        raise
+    if report is None or vectorstore is None or not (
+            report["full_build"] or report["chunks"]["added"] or report["chunks"]["removed"]):
+        discard_version(target_path)
+        return report
+    publish_version(FAISS_INDEX_PATH, target_path)
+    print(f"Published knowledge base version {os.path.basename(target_path)}")
+    # A full build already returns the saved copy; an updated one was modified in memory
+    _activate_vectorstore(vectorstore if report["full_build"] else load_faiss_local(target_path, embeddings), target_path)
+    return report
+
+# Rebuilds started from the API run in this background job, one at a time
+knowledge_base_rebuild = BackgroundJob("knowledge_base_rebuild", refresh_knowledge_base)
+
+def start_knowledge_base_rebuild(full: bool = False) -> bool:
+    """Starts `refresh_knowledge_base` in the background; returns False if a rebuild is already running."""
+    return knowledge_base_rebuild.start(full=full)
+
+def reload_published_version() -> Optional[str]:
+    """
+    Loads the published version of the index and swaps it in, if it is not the served one (e.g.
+    published by `python -m utils.refresh_knowledge_base`). Returns its path, or None if nothing changed.
+    """
+    index_path = current_index_path(FAISS_INDEX_PATH)
+    if index_path is None or index_path == _index_path:
+        return None
+    vectorstore = load_faiss_local(index_path, get_embeddings())
+    if current_index_path(FAISS_INDEX_PATH) != index_path:
+        # A newer version was published meanwhile: the next check loads that one
+        return None
+    _activate_vectorstore(vectorstore, index_path)
+    print(f"Switched to knowledge base version {os.path.basename(index_path)}")
+    return index_path
+
+# Loads of versions published by other processes run in this background job, one at a time
+knowledge_base_reload = BackgroundJob("knowledge_base_reload", reload_published_version)
+_next_version_check = 0.0
+
+def check_published_version() -> None:
+    """
+    Starts loading the published version in the background if it is not the served one. Checked at
+    most every KNOWLEDGE_INDEX_POLL_INTERVAL seconds (one small file read), so it can run per query.
+    """
+    global _next_version_check
+    now = time.monotonic()
+    if KNOWLEDGE_INDEX_POLL_INTERVAL <= 0 or now < _next_version_check:
+        return
+    _next_version_check = now + KNOWLEDGE_INDEX_POLL_INTERVAL
+    # A rebuild in this process swaps in what it publishes itself
+    if knowledge_base_rebuild.status()["state"] == "running":
+        return
+    if current_index_path(FAISS_INDEX_PATH) != _index_path:
+        knowledge_base_reload.start()
+
+def get_knowledge_base_rebuild_status() -> Dict[str, Any]:
+    """Returns the status of the current or last background rebuild, and the served index version."""
+    status = knowledge_base_rebuild.status()
+    status["served_version"] = os.path.basename(_index_path) if _index_path else None
+    status["served_chunks"] = _vectorstore.index.ntotal if _vectorstore is not None else None
+    return status
+
 # Helper function to map OverallAgentState to KnowledgeAgentState
 def map_to_knowledge_agent_state(state: OverallAgentState) -> KnowledgeAgentState:
     """Maps the overall agent state to the KnowledgeAgent's specific state."""
@@ -145,6 +363,35 @@ def map_to_knowledge_agent_state(state: OverallAgentState) -> KnowledgeAgentStat
 # Initialize LLM for RAG and tool binding
 llm_rag = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0.2)
 
+# Retrieval pipeline, built once when the knowledge base is set up
+_retriever = None
+_qa_chain = None
+
+def _retrieval_pipeline(vectorstore: FAISS, lexical_index: Optional[BM25Index]) -> Tuple[HybridRetriever, RetrievalQA]:
+    """Builds the hybrid retriever and the RetrievalQA chain over a vectorstore."""
+    retriever = HybridRetriever(vectorstore=vectorstore, lexical_index=lexical_index, k=KNOWLEDGE_RETRIEVAL_K)
+    qa_chain = RetrievalQA.from_chain_type(
+        llm=llm_rag,
+        chain_type="stuff",
+        retriever=retriever,
+        return_source_documents=True
+    )
+    return retriever, qa_chain
+
+def _format_chunks(chunks_with_score: List[Tuple[Any, float]]) -> str:
+    """
+    Formats retrieved chunks with their source and a relevance score for the LLM.
+    The score is the fused rank score of HybridRetriever, relative to a chunk ranked first by
+    both the vector and the keyword search (1.0).
+    """
+    if not chunks_with_score:
+        return "No relevant information found in the knowledge base."
+    return "\n\n".join(
+        f"[{position}] (score: {float(score):.2f}, source: {document.metadata.get('source', 'unknown')})\n"
+        f"{document.page_content}"
+        for position, (document, score) in enumerate(chunks_with_score, start=1)
+    )
+
 @tool
 def retrieve_knowledge(question: str) -> str:
     """
@@ -152,20 +399,16 @@ def retrieve_knowledge(question: str) -> str:
     Use this tool for general information about InfinityPay products, services, policies, and FAQs.
     Do NOT use this for specific user account information like balance or transactions.
     """
-    global _vectorstore
     if _vectorstore is None:
-        setup_knowledge_base() # Attempt to initialize if not already
+        setup_knowledge_base() # Loads the index from disk; a missing one is built in the background
         if _vectorstore is None:
             return "Knowledge base not initialized. Cannot retrieve information."
+    # Read once: a rebuild may swap in a new pipeline meanwhile (see _activate_vectorstore)
+    retriever, qa_chain = _retriever, _qa_chain
     try:
-         
-        retriever = _vectorstore.as_retriever(search_kwargs={"k": 5})
-        qa_chain = RetrievalQA.from_chain_type(
-            llm=llm_rag,
-            chain_type="stuff",
-            retriever=retriever,
-            return_source_documents=True
-        )
+        if KNOWLEDGE_RETRIEVAL_MODE == "chunks":
+            return _format_chunks(retriever.search_with_scores(question))
+
         response = qa_chain.invoke({"query": question})
         result = response.get("result", "No relevant information found in the knowledge base.")
          
@@ -174,6 +417,26 @@ def retrieve_knowledge(question: str) -> str:
         print(f"retrieve_knowledge: Error retrieving from knowledge base: {str(e)}")
         return f"Error retrieving from knowledge base: {str(e)}"
 
+async def _aretrieve_knowledge(question: str) -> str:
+    """Async implementation of `retrieve_knowledge` (awaits the retrieval or the RetrievalQA chain)."""
+    if _vectorstore is None:
+        # Loading the index is blocking disk work; keep it off the event loop
+        await asyncio.to_thread(setup_knowledge_base)
+        if _vectorstore is None:
+            return "Knowledge base not initialized. Cannot retrieve information."
+    retriever, qa_chain = _retriever, _qa_chain
+    try:
+        if KNOWLEDGE_RETRIEVAL_MODE == "chunks":
+            return _format_chunks(await retriever.asearch_with_scores(question))
+
+        response = await qa_chain.ainvoke({"query": question})
+        return response.get("result", "No relevant information found in the knowledge base.")
+    except Exception as e:
+        print(f"retrieve_knowledge: Error retrieving from knowledge base: {str(e)}")
+        return f"Error retrieving from knowledge base: {str(e)}"
+
+retrieve_knowledge.coroutine = _aretrieve_knowledge
+
 @tool
 def web_search(query: str) -> str:
     """
@@ -185,26 +448,41 @@ def web_search(query: str) -> str:
     Returns:
         A string containing relevant snippets from the web search results.
     """
-    try:
-        search_tool = DuckDuckGoSearchRun()
-        result = search_tool.run(query)
-        return result
-    except Exception as e:
-        print(f"web_search: Search tool error: {str(e)}")
-        return f"Search error: {str(e)}"
+    # Cached, time-boxed and behind a circuit breaker (see utils/web_search.py); never raises
+    return web_search_client.search(query)
+
+async def _aweb_search(query: str) -> str:
+    """Async implementation of `web_search`."""
+    return await web_search_client.asearch(query)
+
+web_search.coroutine = _aweb_search
 
 # Define tools for the Knowledge Agent
 knowledge_tools = [retrieve_knowledge, web_search]
+knowledge_tools_by_name = {knowledge_tool.name: knowledge_tool for knowledge_tool in knowledge_tools}
 llm_rag_with_tools = llm_rag.bind_tools(knowledge_tools)
-
-def knowledge_agent_node(state: KnowledgeAgentState) -> KnowledgeAgentState:
-    """
-    The main node for the Knowledge Agent, processing questions and retrieving answers.
-    It decides whether to use the internal knowledge base or perform a web search.
-    """
-    current_question = state["question"]
-    current_language = state.get("language", "en")
-
+# Runs the tool calls of one LLM turn concurrently, each with a deadline (see utils/tool_executor.py)
+knowledge_tool_executor = ToolExecutor(knowledge_tools)
+
+# Keywords that force a knowledge base lookup when the LLM did not request any tool
+INFINITYPAY_KEYWORDS = ['phone', 'card machine', 'maquininha', 'celular', 'tap to pay', 'infinitypay',
+                        'payment', 'pagamento', 'pos', 'terminal', 'mobile', 'app']
+
+# Phrases indicating that an answer is insufficient and the web search fallback should run
+INSUFFICIENT_INDICATORS = [
+    "I don't know", "I cannot find", "not provided", "não sei", "não posso encontrar",
+    "não fornecido", "based on the provided context, I cannot",
+    "com base no contexto fornecido, não posso", "no answer found",
+    "cannot retrieve information", "search error"
+]
+
+knowledge_keywords = KeywordMatcher({
+    "infinitypay": INFINITYPAY_KEYWORDS,
+    "insufficient": INSUFFICIENT_INDICATORS,
+})
+
+def _build_decision_messages(current_question: str, current_language: str) -> List[Any]:
+    """Builds the messages for the LLM tool-selection step."""
     # Load system prompt for the LLM
     try:
         system_prompt_content = load_prompt_template("knowledge_agent", current_language)
@@ -215,63 +493,283 @@ def knowledge_agent_node(state: KnowledgeAgentState) -> KnowledgeAgentState:
                                  "Always try to use the retrieve_knowledge tool first for questions related to InfinityPay products." if current_language == 'en' else
                                  "Você é um assistente especializado em InfinityPay. Use as ferramentas disponíveis para responder perguntas sobre produtos e serviços da InfinityPay. Sempre tente usar a ferramenta retrieve_knowledge primeiro para perguntas relacionadas aos produtos da InfinityPay.")
 
-    messages_for_llm_decision = [
+    return [
         SystemMessage(content=system_prompt_content),
         HumanMessage(content=current_question)
     ]
 
-    response_from_llm_with_tools = llm_rag_with_tools.invoke(messages_for_llm_decision)
+def _record_tool_outputs(tool_messages: List[ToolMessage], actual_tool_outputs: Dict[str, Any]) -> None:
+    """Records the outputs of the tools that succeeded for the workflow trace."""
+    for tool_message in tool_messages:
+        if tool_message.status != "error" and tool_message.name in knowledge_tools_by_name:
+            actual_tool_outputs[tool_message.name] = tool_message.content
+
+def _is_infinitypay_related(current_question: str) -> bool:
+    """Checks if the question mentions InfinityPay products, forcing a knowledge base lookup."""
+    return knowledge_keywords.contains(current_question, "infinitypay")
+
+def _build_synthesis_prompt(current_question: str, knowledge_output: str) -> str:
+    """Builds the prompt used to synthesize an answer from knowledge base output."""
+    return (f"Based on the following information from the knowledge base, answer the user's question:\n\n"
+            f"Question: {current_question}\n\n"
+            f"Knowledge base information:\n{knowledge_output}\n\n"
+            f"Please provide a helpful and informative answer:")
+
+def _is_insufficient_answer(final_answer: str) -> bool:
+    """Checks if the answer is insufficient and the web search fallback should run."""
+    return (
+        not final_answer or
+        len(final_answer.strip()) < 20 or
+        knowledge_keywords.contains(final_answer, "insufficient")
+    )
+
+def _is_usable_search_result(search_result: str) -> bool:
+    """Checks if a fallback web search returned something worth synthesizing."""
+    return bool(search_result) and len(search_result.strip()) > 10 and "search error" not in search_result.lower()
+
+def _build_search_prompt(current_question: str, search_result: str, current_language: str) -> str:
+    """Builds the prompt used to answer from fallback web search results."""
+    if current_language == 'pt':
+        return (f"Com base nas seguintes informações de pesquisa, responda a pergunta em português de forma clara e útil:\n\n"
+                f"Pergunta: {current_question}\n\n"
+                f"Informações da pesquisa:\n{search_result}\n\n"
+                f"Resposta em português:")
+    return (f"Based on the following search information, answer the question clearly and helpfully:\n\n"
+            f"Question: {current_question}\n\n"
+            f"Search information:\n{search_result}\n\n"
+            f"Answer:")
+
+def _build_combined_prompt(current_question: str, knowledge_output: str, search_result: str,
+                           current_language: str) -> str:
+    """Builds the prompt used to answer from knowledge base output and web search results together."""
+    if current_language == 'pt':
+        return (f"Com base nas informações abaixo, responda a pergunta em português de forma clara e útil. "
+                f"Prefira a base de conhecimento da InfinityPay; use a pesquisa na web para o que ela não cobrir:\n\n"
+                f"Pergunta: {current_question}\n\n"
+                f"Base de conhecimento:\n{knowledge_output}\n\n"
+                f"Informações da pesquisa:\n{search_result}\n\n"
+                f"Resposta em português:")
+    return (f"Based on the following information, answer the question clearly and helpfully. "
+            f"Prefer the InfinityPay knowledge base; use the web search results for what it does not cover:\n\n"
+            f"Question: {current_question}\n\n"
+            f"Knowledge base information:\n{knowledge_output}\n\n"
+            f"Search information:\n{search_result}\n\n"
+            f"Answer:")
+
+def _embed_question(current_question: str) -> Optional[List[float]]:
+    try:
+        return get_embeddings().embed_query(current_question)
+    except Exception as e:
+        print(f"Knowledge Agent: Error embedding question for the answer cache: {e}")
+        return None
 
-    final_answer = ""
-    actual_tool_outputs = {}
+async def _aembed_question(current_question: str) -> Optional[List[float]]:
+    try:
+        return await get_embeddings().aembed_query(current_question)
+    except Exception as e:
+        print(f"Knowledge Agent: Error embedding question for the answer cache: {e}")
+        return None
+
+def _cache_trace(cached: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Cache outcome reported with the tool outputs in the workflow trace."""
+    stats = knowledge_answer_cache.stats()
+    trace = {"hit": cached is not None, "hit_rate": stats["hit_rate"], "size": stats["size"]}
+    if cached is not None:
+        trace.update({"similarity": cached["similarity"], "cached_query": cached["cached_query"]})
+    return trace
+
+def _cached_answer_result(current_question: str, current_language: str, cached: Dict[str, Any]) -> KnowledgeAgentState:
+    """Builds the agent output from a cached answer."""
+    actual_tool_outputs = dict(cached["value"]["tool_outputs"])
+    actual_tool_outputs["semantic_cache"] = _cache_trace(cached)
+    return {
+        "question": current_question,
+        "answer": cached["value"]["answer"],
+        "language": current_language,
+        "actual_tool_outputs": actual_tool_outputs
+    }
 
-    if hasattr(response_from_llm_with_tools, 'tool_calls') and response_from_llm_with_tools.tool_calls:
-        messages_with_tool_call = list(messages_for_llm_decision)
-        messages_with_tool_call.append(response_from_llm_with_tools)
+def _store_answer(current_question: str, current_language: str, query_vector: Optional[List[float]],
+                  final_answer: str, actual_tool_outputs: Dict[str, Any], cacheable: bool) -> None:
+    """Caches a generated answer; fallback and error answers are not cached."""
+    if query_vector is not None and cacheable and not _is_insufficient_answer(final_answer):
+        knowledge_answer_cache.store(current_question, query_vector, current_language,
+                                     {"answer": final_answer, "tool_outputs": dict(actual_tool_outputs)})
+    actual_tool_outputs["semantic_cache"] = _cache_trace()
+
+def get_knowledge_cache_stats() -> Dict[str, Any]:
+    """Returns the knowledge answer cache counters."""
+    return knowledge_answer_cache.stats()
+
+# Runs the web search of the synchronous speculative path while the knowledge base is searched; a search
+# is only submitted when a worker is free, so discarded searches never pile up in its queue
+_speculative_executor = ThreadPoolExecutor(max_workers=KNOWLEDGE_SPECULATIVE_MAX_SEARCHES,
+                                           thread_name_prefix="speculative_search")
+_speculative_slots = threading.BoundedSemaphore(KNOWLEDGE_SPECULATIVE_MAX_SEARCHES)
+
+def _submit_speculative_search(current_question: str) -> Optional[Future]:
+    """Starts the web search in the background, or returns None when every worker is busy."""
+    if not _speculative_slots.acquire(blocking=False):
+        return None
+    try:
+        search_future = _speculative_executor.submit(web_search_client.search, current_question)
+    except BaseException:
+        _speculative_slots.release()
+        raise
+    search_future.add_done_callback(lambda _: _speculative_slots.release())
+    return search_future
+
+def _speculative_trace(confidence: float, web_search_outcome: str) -> Dict[str, Any]:
+    return {"confidence": round(confidence, 4), "min_score": KNOWLEDGE_SPECULATIVE_MIN_SCORE,
+            "web_search": web_search_outcome}
+
+def _search_knowledge_with_confidence(current_question: str) -> Tuple[str, float]:
+    """The formatted chunks for the question and the retrieval confidence (0 when the lookup failed)."""
+    # Read once: a rebuild may swap in a new pipeline meanwhile (see _activate_vectorstore)
+    retriever = _retriever
+    if retriever is None:
+        setup_knowledge_base()
+        retriever = _retriever
+        if retriever is None:
+            return "Knowledge base not initialized. Cannot retrieve information.", 0.0
+    try:
+        chunks_with_score, confidence = retriever.search_with_confidence(current_question)
+        return _format_chunks(chunks_with_score), (confidence if chunks_with_score else 0.0)
+    except Exception as e:
+        print(f"retrieve_knowledge: Error retrieving from knowledge base: {str(e)}")
+        return f"Error retrieving from knowledge base: {str(e)}", 0.0
+
+async def _asearch_knowledge_with_confidence(current_question: str) -> Tuple[str, float]:
+    """Async version of `_search_knowledge_with_confidence`."""
+    retriever = _retriever
+    if retriever is None:
+        await asyncio.to_thread(setup_knowledge_base)
+        retriever = _retriever
+        if retriever is None:
+            return "Knowledge base not initialized. Cannot retrieve information.", 0.0
+    try:
+        chunks_with_score, confidence = await retriever.asearch_with_confidence(current_question)
+        return _format_chunks(chunks_with_score), (confidence if chunks_with_score else 0.0)
+    except Exception as e:
+        print(f"retrieve_knowledge: Error retrieving from knowledge base: {str(e)}")
+        return f"Error retrieving from knowledge base: {str(e)}", 0.0
 
-        for tool_call in response_from_llm_with_tools.tool_calls:
-            tool_call_id = tool_call.get('id') or str(uuid.uuid4())
-            tool_name = tool_call.get('name')
-            tool_args = tool_call.get('args', {})
+def _speculative_prompt(current_question: str, current_language: str, knowledge_output: str, search_result: str,
+                        confidence: float, actual_tool_outputs: Dict[str, Any]) -> str:
+    """
+    Records the tool outputs and builds the single synthesis prompt once the search has finished.
+    The search is recorded even when it failed, so the node does not run it again as a fallback.
+    """
+    actual_tool_outputs['retrieve_knowledge'] = knowledge_output
+    actual_tool_outputs['web_search'] = search_result
+    if _is_usable_search_result(search_result):
+        actual_tool_outputs['speculative'] = _speculative_trace(confidence, "used")
+        return _build_combined_prompt(current_question, knowledge_output, search_result, current_language)
+    actual_tool_outputs['speculative'] = _speculative_trace(confidence, "failed")
+    return _build_synthesis_prompt(current_question, knowledge_output)
+
+def _speculative_result(final_answer: str, current_language: str, actual_tool_outputs: Dict[str, Any]) -> Tuple[str, bool]:
+    """An insufficient answer without usable search results becomes the apology of the web search fallback."""
+    if _is_insufficient_answer(final_answer) and actual_tool_outputs['speculative']['web_search'] == "failed":
+        return ("Desculpe, não consegui encontrar informações relevantes." if current_language == 'pt'
+                else "Sorry, I couldn't find relevant information."), False
+    return final_answer, True
+
+def _speculative_answer(current_question: str, current_language: str,
+                        actual_tool_outputs: Dict[str, Any]) -> Tuple[str, bool]:
+    """
+    Answers with the knowledge base lookup and the web search run concurrently (speculative mode).
+    Returns the answer and whether it may be cached. A confident retrieval discards the search
+    and leaves 'web_search' out of the tool outputs, so an insufficient answer still gets the
+    web search fallback. A search cannot be stopped once it runs in a thread: a discarded one ends
+    in the background and its result is dropped.
+    """
+    search_future = _submit_speculative_search(current_question)
+    knowledge_output, confidence = _search_knowledge_with_confidence(current_question)
+
+    if confidence >= KNOWLEDGE_SPECULATIVE_MIN_SCORE:
+        actual_tool_outputs['retrieve_knowledge'] = knowledge_output
+        actual_tool_outputs['speculative'] = _speculative_trace(confidence, "cancelled")
+        synthesis_prompt = _build_synthesis_prompt(current_question, knowledge_output)
+        return llm_rag.invoke([HumanMessage(content=synthesis_prompt)]).content, True
+
+    search_result = search_future.result() if search_future is not None else web_search_client.search(current_question)
+    prompt = _speculative_prompt(current_question, current_language, knowledge_output, search_result, confidence,
+                                 actual_tool_outputs)
+    final_answer = llm_rag.invoke([HumanMessage(content=prompt)]).content
+    return _speculative_result(final_answer, current_language, actual_tool_outputs)
+
+async def _aspeculative_answer(current_question: str, current_language: str,
+                               actual_tool_outputs: Dict[str, Any]) -> Tuple[str, bool]:
+    """Async version of `_speculative_answer`; a discarded search is cancelled."""
+    search_task = asyncio.create_task(web_search_client.asearch(current_question))
+    try:
+        knowledge_output, confidence = await _asearch_knowledge_with_confidence(current_question)
+    except BaseException:
+        search_task.cancel()
+        raise
+
+    if confidence >= KNOWLEDGE_SPECULATIVE_MIN_SCORE:
+        search_task.cancel()
+        actual_tool_outputs['retrieve_knowledge'] = knowledge_output
+        actual_tool_outputs['speculative'] = _speculative_trace(confidence, "cancelled")
+        synthesis_prompt = _build_synthesis_prompt(current_question, knowledge_output)
+        return (await llm_rag.ainvoke([HumanMessage(content=synthesis_prompt)])).content, True
+
+    search_result = await search_task
+    prompt = _speculative_prompt(current_question, current_language, knowledge_output, search_result, confidence,
+                                 actual_tool_outputs)
+    final_answer = (await llm_rag.ainvoke([HumanMessage(content=prompt)])).content
+    return _speculative_result(final_answer, current_language, actual_tool_outputs)
 
-            try:
-                output = None
-                if tool_name == 'retrieve_knowledge':
-                    output = retrieve_knowledge.invoke(tool_args)
-                    actual_tool_outputs['retrieve_knowledge'] = output
-                elif tool_name == 'web_search':
-                    output = web_search.invoke(tool_args)
-                    actual_tool_outputs['web_search'] = output
-                else:
-                    output = f"Unknown tool: {tool_name}"
-                    print(f"Knowledge Agent: Encountered unknown tool '{tool_name}'")
-
-                messages_with_tool_call.append(ToolMessage(content=output, tool_call_id=tool_call_id, name=tool_name))
+def knowledge_agent_node(state: KnowledgeAgentState) -> KnowledgeAgentState:
+    """
+    The main node for the Knowledge Agent, processing questions and retrieving answers.
+    It decides whether to use the internal knowledge base or perform a web search.
+    """
+    check_published_version()
+    current_question = state["question"]
+    current_language = state.get("language", "en")
 
-            except Exception as e:
-                error_output = f"Error executing tool {tool_name}: {str(e)}"
-                messages_with_tool_call.append(ToolMessage(content=error_output, tool_call_id=tool_call_id, name=tool_name))
-                print(f"Knowledge Agent: Error executing tool '{tool_name}': {e}")
+    query_vector = None
+    if KNOWLEDGE_CACHE_ENABLED:
+        cached = knowledge_answer_cache.lookup_text(current_question, current_language)
+        if cached is None:
+            # Exact repeats are found without an embedding; paraphrases need one
+            query_vector = _embed_question(current_question)
+            if query_vector is not None:
+                cached = knowledge_answer_cache.lookup(query_vector, current_language)
+        if cached is not None:
+            return _cached_answer_result(current_question, current_language, cached)
 
-        # Invoke LLM again with the full history including tool outputs to get a refined answer
-        final_answer_response = llm_rag.invoke(messages_with_tool_call)
-        final_answer = final_answer_response.content
+    final_answer = ""
+    actual_tool_outputs = {}
+    cacheable = True
 
+    if KNOWLEDGE_SPECULATIVE_ENABLED:
+        final_answer, cacheable = _speculative_answer(current_question, current_language, actual_tool_outputs)
     else:
-        # If no tool calls, first try retrieve_knowledge for InfinityPay related questions
-        infinitypay_keywords = ['phone', 'card machine', 'maquininha', 'celular', 'tap to pay', 'infinitypay',
-                                'payment', 'pagamento', 'pos', 'terminal', 'mobile', 'app']
-        is_infinitypay_related = any(keyword.lower() in current_question.lower() for keyword in infinitypay_keywords)
-
-        if is_infinitypay_related:
+        messages_for_llm_decision = _build_decision_messages(current_question, current_language)
+        response_from_llm_with_tools = llm_rag_with_tools.invoke(messages_for_llm_decision)
+        if hasattr(response_from_llm_with_tools, 'tool_calls') and response_from_llm_with_tools.tool_calls:
+            messages_with_tool_call = list(messages_for_llm_decision)
+            messages_with_tool_call.append(response_from_llm_with_tools)
+
+            tool_messages = knowledge_tool_executor.run(response_from_llm_with_tools.tool_calls)
+            _record_tool_outputs(tool_messages, actual_tool_outputs)
+            messages_with_tool_call.extend(tool_messages)
+
+            # Invoke LLM again with the full history including tool outputs to get a refined answer
+            final_answer_response = llm_rag.invoke(messages_with_tool_call)
+            final_answer = final_answer_response.content
+
+        elif _is_infinitypay_related(current_question):
+            # If no tool calls, first try retrieve_knowledge for InfinityPay related questions
             try:
                 knowledge_output = retrieve_knowledge.invoke({"question": current_question})
                 actual_tool_outputs['retrieve_knowledge'] = knowledge_output
                 # Synthesize answer from knowledge base output
-                synthesis_prompt = (f"Based on the following information from the knowledge base, answer the user's question:\n\n"
-                                    f"Question: {current_question}\n\n"
-                                    f"Knowledge base information:\n{knowledge_output}\n\n"
-                                    f"Please provide a helpful and informative answer:")
+                synthesis_prompt = _build_synthesis_prompt(current_question, knowledge_output)
                 final_answer_response = llm_rag.invoke([HumanMessage(content=synthesis_prompt)])
                 final_answer = final_answer_response.content
             except Exception as e:
@@ -281,42 +779,102 @@ def knowledge_agent_node(state: KnowledgeAgentState) -> KnowledgeAgentState:
             final_answer = response_from_llm_with_tools.content
 
     # Check if answer is insufficient and try web search fallback if not already used
-    insufficient_indicators = [
-        "I don't know", "I cannot find", "not provided", "não sei", "não posso encontrar",
-        "não fornecido", "based on the provided context, I cannot",
-        "com base no contexto fornecido, não posso", "no answer found",
-        "cannot retrieve information", "search error"
-    ]
-
-    is_insufficient = (
-        not final_answer or
-        len(final_answer.strip()) < 20 or
-        any(indicator.lower() in final_answer.lower() for indicator in insufficient_indicators)
-    )
-
-    if is_insufficient and 'web_search' not in actual_tool_outputs:
+    if _is_insufficient_answer(final_answer) and 'web_search' not in actual_tool_outputs:
         try:
             fallback_search_result = web_search.invoke({"query": current_question})
 
-            if fallback_search_result and len(fallback_search_result.strip()) > 10 and "Search error" not in fallback_search_result.lower():
-                search_prompt = (f"Com base nas seguintes informações de pesquisa, responda a pergunta em português de forma clara e útil:\n\n"
-                                 f"Pergunta: {current_question}\n\n"
-                                 f"Informações da pesquisa:\n{fallback_search_result}\n\n"
-                                 f"Resposta em português:") if current_language == 'pt' else (
-                                 f"Based on the following search information, answer the question clearly and helpfully:\n\n"
-                                 f"Question: {current_question}\n\n"
-                                 f"Search information:\n{fallback_search_result}\n\n"
-                                 f"Answer:")
-
+            if _is_usable_search_result(fallback_search_result):
+                search_prompt = _build_search_prompt(current_question, fallback_search_result, current_language)
                 processed_answer = llm_rag.invoke([HumanMessage(content=search_prompt)])
                 final_answer = processed_answer.content
                 actual_tool_outputs['web_search'] = fallback_search_result
             else:
                 final_answer = "Desculpe, não consegui encontrar informações relevantes." if current_language == 'pt' else "Sorry, I couldn't find relevant information."
+                cacheable = False
 
         except Exception as search_error:
             print(f"Knowledge Agent: Error during fallback web search: {search_error}")
             final_answer = "Erro ao buscar informações adicionais." if current_language == 'pt' else "Error searching for additional information."
+            cacheable = False
+
+    _store_answer(current_question, current_language, query_vector, final_answer, actual_tool_outputs, cacheable)
+
+    return {
+        "question": current_question,
+        "answer": final_answer,
+        "language": current_language,
+        "actual_tool_outputs": actual_tool_outputs
+    }
+
+async def aknowledge_agent_node(state: KnowledgeAgentState) -> KnowledgeAgentState:
+    """Async version of `knowledge_agent_node`; LLM calls and tools are awaited."""
+    check_published_version()
+    current_question = state["question"]
+    current_language = state.get("language", "en")
+
+    query_vector = None
+    if KNOWLEDGE_CACHE_ENABLED:
+        cached = knowledge_answer_cache.lookup_text(current_question, current_language)
+        if cached is None:
+            # Exact repeats are found without an embedding; paraphrases need one
+            query_vector = await _aembed_question(current_question)
+            if query_vector is not None:
+                cached = knowledge_answer_cache.lookup(query_vector, current_language)
+        if cached is not None:
+            return _cached_answer_result(current_question, current_language, cached)
+
+    final_answer = ""
+    actual_tool_outputs = {}
+    cacheable = True
+
+    if KNOWLEDGE_SPECULATIVE_ENABLED:
+        final_answer, cacheable = await _aspeculative_answer(current_question, current_language, actual_tool_outputs)
+    else:
+        messages_for_llm_decision = _build_decision_messages(current_question, current_language)
+        response_from_llm_with_tools = await llm_rag_with_tools.ainvoke(messages_for_llm_decision)
+        if hasattr(response_from_llm_with_tools, 'tool_calls') and response_from_llm_with_tools.tool_calls:
+            messages_with_tool_call = list(messages_for_llm_decision)
+            messages_with_tool_call.append(response_from_llm_with_tools)
+
+            tool_messages = await knowledge_tool_executor.arun(response_from_llm_with_tools.tool_calls)
+            _record_tool_outputs(tool_messages, actual_tool_outputs)
+            messages_with_tool_call.extend(tool_messages)
+
+            final_answer_response = await llm_rag.ainvoke(messages_with_tool_call)
+            final_answer = final_answer_response.content
+
+        elif _is_infinitypay_related(current_question):
+            try:
+                knowledge_output = await retrieve_knowledge.ainvoke({"question": current_question})
+                actual_tool_outputs['retrieve_knowledge'] = knowledge_output
+                synthesis_prompt = _build_synthesis_prompt(current_question, knowledge_output)
+                final_answer_response = await llm_rag.ainvoke([HumanMessage(content=synthesis_prompt)])
+                final_answer = final_answer_response.content
+            except Exception as e:
+                print(f"Knowledge Agent: Error in forced retrieve_knowledge: {e}")
+                final_answer = response_from_llm_with_tools.content
+        else:
+            final_answer = response_from_llm_with_tools.content
+
+    if _is_insufficient_answer(final_answer) and 'web_search' not in actual_tool_outputs:
+        try:
+            fallback_search_result = await web_search.ainvoke({"query": current_question})
+
+            if _is_usable_search_result(fallback_search_result):
+                search_prompt = _build_search_prompt(current_question, fallback_search_result, current_language)
+                processed_answer = await llm_rag.ainvoke([HumanMessage(content=search_prompt)])
+                final_answer = processed_answer.content
+                actual_tool_outputs['web_search'] = fallback_search_result
+            else:
+                final_answer = "Desculpe, não consegui encontrar informações relevantes." if current_language == 'pt' else "Sorry, I couldn't find relevant information."
+                cacheable = False
+
+        except Exception as search_error:
+            print(f"Knowledge Agent: Error during fallback web search: {search_error}")
+            final_answer = "Erro ao buscar informações adicionais." if current_language == 'pt' else "Error searching for additional information."
+            cacheable = False
+
+    _store_answer(current_question, current_language, query_vector, final_answer, actual_tool_outputs, cacheable)
 
     return {
         "question": current_question,
@@ -332,7 +890,7 @@ def build_rag_agent(vectorstore=None) -> StateGraph:
     function as the global _vectorstore handles the state.
     """
     workflow = StateGraph(KnowledgeAgentState)
-    workflow.add_node("RAG_QA", knowledge_agent_node)
+    workflow.add_node("RAG_QA", RunnableLambda(knowledge_agent_node, afunc=aknowledge_agent_node))
     workflow.set_entry_point("RAG_QA")
     workflow.add_edge("RAG_QA", END)
     return workflow.compile()
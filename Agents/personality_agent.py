@@ -1,11 +1,15 @@
-from typing import TypedDict, List, Dict, Any, Optional, Annotated
+from typing import TypedDict, List, Dict, Any, Optional, Annotated, Tuple
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
 from dotenv import load_dotenv
+from collections import Counter
+import hashlib
 import sys
 import os
+import threading
 
 # Adjust sys.path for project root if necessary
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -14,6 +18,8 @@ if PROJECT_ROOT not in sys.path:
 
 from core.state import OverallAgentState
 from utils.load_prompt import load_prompt_template
+from utils.canned_responses import classify_small_talk, match_system_message, small_talk_reply, system_message
+from utils.ttl_cache import TTLCache
 
 load_dotenv()
 
@@ -23,6 +29,9 @@ class PersonalityState(TypedDict):
     raw_agent_output: Optional[str]
     final_response: Optional[str]
     language: str
+    current_query: str
+    source_agent: Optional[str] # The router decision that produced raw_agent_output ("default": none)
+    personality_source: Optional[str] # "llm", "cache", or the fast path that answered without the LLM
 
 # Helper function to map OverallAgentState to PersonalityState
 def map_to_personality_state(state: OverallAgentState) -> PersonalityState:
@@ -31,7 +40,10 @@ def map_to_personality_state(state: OverallAgentState) -> PersonalityState:
         messages=state["messages"],
         raw_agent_output=state.get("raw_agent_output"),
         final_response=None,
-        language=state["language"]
+        language=state["language"],
+        current_query=state.get("current_query", ""),
+        source_agent=state.get("next_agent"),
+        personality_source=None
     )
 
 # Initialize LLM for personality application
@@ -40,44 +52,146 @@ llm_personality = ChatGoogleGenerativeAI(
     temperature=0.5
 )
 
+# Fast path: outputs that need no restyling are returned without calling the LLM: the fixed
+# rejection/escalation messages of the agents (utils/canned_responses.py), small talk on the
+# default route, and the outputs of the agents listed in PERSONALITY_SKIP_AGENTS (router names,
+# e.g. "knowledge_agent,slack_agent"), which are returned as the agents wrote them.
+PERSONALITY_FAST_PATH_ENABLED = os.getenv("PERSONALITY_FAST_PATH_ENABLED", "true").lower() in ("1", "true", "yes")
+PERSONALITY_SKIP_AGENTS = {name.strip() for name in os.getenv("PERSONALITY_SKIP_AGENTS", "").split(",") if name.strip()}
+
+# Response cache in front of the LLM: the layer only sees the raw agent output and the language, so
+# the same output (e.g. the knowledge agent's answer to a popular question) is restyled once per TTL.
+# Keys include the prompt text, so editing prompts/personality_agent_<lang>.txt starts over.
+PERSONALITY_CACHE_ENABLED = os.getenv("PERSONALITY_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+personality_response_cache = TTLCache(
+    ttl=float(os.getenv("PERSONALITY_CACHE_TTL", "3600")),
+    max_entries=int(os.getenv("PERSONALITY_CACHE_MAX_ENTRIES", "1000"))
+)
+
+_personality_stats: Counter = Counter()
+_personality_stats_lock = threading.Lock()
+
+def _is_meta_question_output(raw_output: Optional[str]) -> bool:
+    """Checks if the user is asking about a previous message/question (answered verbatim)."""
+    if not raw_output:
+        return False
+    lowered_output = raw_output.lower()
+    return "last question was:" in lowered_output or "sua última pergunta foi:" in lowered_output
+
+def _fast_path_response(state: PersonalityState) -> Optional[Tuple[str, str]]:
+    """The final response and the fast path that produced it, when no LLM call is needed."""
+    raw_output = state.get("raw_agent_output")
+    detected_lang = state.get("language", "en")
+
+    if _is_meta_question_output(raw_output):
+        return raw_output, "meta_question"
+    if not PERSONALITY_FAST_PATH_ENABLED:
+        return None
+    template_key = match_system_message(raw_output)
+    if template_key is not None:
+        # The template in the user's language, whatever language the agent wrote it in
+        return system_message(template_key, detected_lang), f"template:{template_key}"
+    if not raw_output:
+        small_talk = classify_small_talk(state.get("current_query"))
+        if small_talk is not None:
+            return small_talk_reply(small_talk, detected_lang), f"small_talk:{small_talk}"
+    elif state.get("source_agent") in PERSONALITY_SKIP_AGENTS:
+        return raw_output, "skip_agent"
+    return None
+
+def _build_personality_messages(state: PersonalityState) -> List[Any]:
+    """
+    Builds the personality LLM input from the raw agent output only. On the default route no
+    agent ran, so the user's message is answered directly instead.
+    """
+    raw_output = state.get("raw_agent_output")
+    system_prompt_content = load_prompt_template("personality_agent", state.get("language", "en"))
+    system_prompt_message = SystemMessage(content=system_prompt_content)
+    if raw_output:
+        user_input_content = f"Raw agent output: {raw_output}"
+    else:
+        user_input_content = f"No agent handled this message; reply to the user directly. User message: {state.get('current_query', '')}"
+
+    # We only pass the raw output to the personality LLM, not the full message history
+    return [
+        system_prompt_message,
+        HumanMessage(content=user_input_content)
+    ]
+
+def _personality_cache_key(messages: List[Any]) -> str:
+    """Hash of the LLM input (prompt version, language and raw output all live in it) and the model settings."""
+    model_settings = f"{getattr(llm_personality, 'model', '')}\0{getattr(llm_personality, 'temperature', '')}"
+    payload = "\0".join([model_settings] + [message.content for message in messages])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _cached_response(messages: List[Any]) -> Tuple[Optional[str], Optional[str]]:
+    """The cached response to `messages` (None on a miss) and its cache key (None when caching is off)."""
+    if not PERSONALITY_CACHE_ENABLED:
+        return None, None
+    cache_key = _personality_cache_key(messages)
+    return personality_response_cache.get(cache_key), cache_key
+
+def _cache_response(cache_key: Optional[str], final_response_content: str) -> None:
+    if cache_key is not None and final_response_content:
+        personality_response_cache.set(cache_key, final_response_content)
+
+def _personality_result(state: PersonalityState, final_response_content: str, personality_source: str) -> PersonalityState:
+    with _personality_stats_lock:
+        _personality_stats["llm" if personality_source == "llm" else personality_source.split(":")[0]] += 1
+    return {
+        **state,
+        "final_response": final_response_content,
+        "personality_source": personality_source
+    }
+
+def get_personality_stats() -> Dict[str, int]:
+    """Returns how many responses were written by the LLM, by each fast path and from the cache."""
+    with _personality_stats_lock:
+        return dict(_personality_stats)
+
+def get_personality_cache_stats() -> Dict[str, Any]:
+    """Returns the personality response cache counters."""
+    return personality_response_cache.stats()
+
 # Node: Add Personality
 def add_personality(state: PersonalityState) -> PersonalityState:
     """
     Applies a friendly and helpful personality to the raw agent output.
     Ensures responses are in the detected language.
-    Handles initial greeting and direct replies for meta-questions (like "last question").
+    Handles initial greeting and direct replies for meta-questions (like "last question"),
+    and answers fixed messages, small talk and already restyled outputs without calling the LLM.
     """
-    raw_output = state.get("raw_agent_output", "")
-    current_messages = state["messages"]
-    detected_lang = state.get("language", "en")
-    final_response_content = ""
+    fast_path = _fast_path_response(state)
+    if fast_path is not None:
+        return _personality_result(state, *fast_path)
 
-    # Check if the user is asking about a previous message/question
-    if "last question was:" in raw_output.lower() or "sua última pergunta foi:" in raw_output.lower():
-        final_response_content = raw_output
-    else:
-        system_prompt_content = load_prompt_template("personality_agent", detected_lang)
-        system_message = SystemMessage(content=system_prompt_content)
-        user_input_content = f"Raw agent output: {raw_output}"
+    messages = _build_personality_messages(state)
+    cached_response, cache_key = _cached_response(messages)
+    if cached_response is not None:
+        return _personality_result(state, cached_response, "cache")
+    response = llm_personality.invoke(messages)
+    _cache_response(cache_key, response.content)
+    return _personality_result(state, response.content, "llm")
 
-        # We only pass the raw output to the personality LLM, not the full message history
-        messages_for_llm = [
-            system_message,
-            HumanMessage(content=user_input_content)
-        ]
-        response = llm_personality.invoke(messages_for_llm)
-        final_response_content = response.content
+async def aadd_personality(state: PersonalityState) -> PersonalityState:
+    """Async version of `add_personality`."""
+    fast_path = _fast_path_response(state)
+    if fast_path is not None:
+        return _personality_result(state, *fast_path)
 
-    return {
-        **state,
-        "final_response": final_response_content
-    }
+    messages = _build_personality_messages(state)
+    cached_response, cache_key = _cached_response(messages)
+    if cached_response is not None:
+        return _personality_result(state, cached_response, "cache")
+    response = await llm_personality.ainvoke(messages)
+    _cache_response(cache_key, response.content)
+    return _personality_result(state, response.content, "llm")
 
 # Function to build and compile the Personality Agent graph
 def build_personality_graph() -> StateGraph:
     """Builds the personality graph using LangGraph."""
     workflow = StateGraph(PersonalityState)
-    workflow.add_node("add_personality", add_personality)
+    workflow.add_node("add_personality", RunnableLambda(add_personality, afunc=aadd_personality))
     workflow.set_entry_point("add_personality")
     workflow.add_edge("add_personality", END)
     return workflow.compile()
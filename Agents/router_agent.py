@@ -1,12 +1,15 @@
-from typing import TypedDict, List, Dict, Any, Annotated, Optional
+from typing import TypedDict, List, Dict, Any, Annotated, Optional, Tuple
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END, START
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.graph.message import add_messages
 from dotenv import load_dotenv
+import re
 import sys
 import os
-import re
+import threading
+from collections import Counter
 
 # Adjust sys.path for project root if necessary
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -16,67 +19,190 @@ if PROJECT_ROOT not in sys.path:
 from core.state import OverallAgentState
 from utils.load_prompt import load_prompt_template
 from utils.lang_detect import detect_language
+from utils.text_matching import SequenceRuleMatcher
+from utils.keyword_matcher import KeywordMatcher
+from utils.extract_user_id import USER_ID_PATTERN
+from Agents.custom_agent import CUSTOM_AGENT_KEYWORD_SETS
+from Agents.customer_support_agent import CUSTOMER_SUPPORT_KEYWORD_SETS
+from Agents.knowledge_agent import INFINITYPAY_KEYWORDS
+from Agents.exemplar_router import classify_route_knn, aclassify_route_knn
 
 load_dotenv()
 
+# Fast path: obvious intents are routed by keyword/regex signals without calling the router LLM.
+# The classifier only decides when its confidence (best score minus runner-up) reaches the threshold
+# and at least ROUTER_FAST_PATH_MIN_SIGNALS signals point at the chosen agent: a single keyword is
+# too weak ("saldo" in "qual o saldo mínimo para abrir conta PJ?" is not a balance request).
+ROUTER_FAST_PATH_ENABLED = os.getenv("ROUTER_FAST_PATH_ENABLED", "true").lower() in ("1", "true", "yes")
+ROUTER_FAST_PATH_THRESHOLD = float(os.getenv("ROUTER_FAST_PATH_THRESHOLD", "0.6"))
+ROUTER_FAST_PATH_MIN_SIGNALS = int(os.getenv("ROUTER_FAST_PATH_MIN_SIGNALS", "2"))
+
+# Routing after the rule-based steps: "llm" asks the router LLM; "knn" votes with the nearest labelled
+# exemplars (Agents/exemplar_router.py) and only asks the LLM when the vote margin is below the minimum.
+ROUTER_MODE = os.getenv("ROUTER_MODE", "llm").lower()
+ROUTER_KNN_MIN_MARGIN = float(os.getenv("ROUTER_KNN_MIN_MARGIN", "0.3"))
+
 # Initialize the LLM for routing decisions
 llm_router = ChatGoogleGenerativeAI(
     model="gemini-1.5-flash",
     temperature=0.1
 )
 
-# Suspicious patterns that should trigger Slack agent
-SUSPICIOUS_PATTERNS = [
-    r'(give|grant|provide).*access.*account',
-    r'bypass.*security',
-    r'override.*system',
-    r'disable.*authentication',
-    r'skip.*verification',
-    r'access.*without.*permission',
-    r'hack.*account',
-    r'steal.*data',
-    r'unauthorized.*access',
-    r'break.*into.*system',
-    r'exploit.*vulnerability',
-    r'password.*for.*account',
-    r'login.*credentials',
-    r'administrative.*privileges',
-    r'root.*access',
-    r'backdoor.*access'
+# Suspicious rules that should trigger Slack agent.
+# Each rule is an ordered list of term groups: every group must match a word starting with one of
+# its terms, in order (like the regex "give.*access.*account"). Terms of fewer than 4 letters ("me",
+# "de", "for") only match whole words. A third element limits the words allowed between groups, for
+# phrases whose words are only suspicious together. Matching ignores case and accents and undoes
+# common leetspeak ("h4ck", "p@ssword").
+SUSPICIOUS_RULES = [
+    ("grant_account_access", [("give", "grant", "provide"), ("access",), ("account",)]),
+    ("bypass_security", [("bypass",), ("security",)]),
+    ("override_system", [("override",), ("system",)]),
+    ("disable_authentication", [("disable",), ("authentication",)]),
+    ("skip_verification", [("skip",), ("verification",)]),
+    ("access_without_permission", [("access",), ("without",), ("permission",)]),
+    ("hack_account", [("hack",), ("account",)]),
+    ("steal_data", [("steal",), ("data",)]),
+    ("unauthorized_access", [("unauthorized", "unauthorised"), ("access",)]),
+    ("break_into_system", [("break",), ("into",), ("system",)]),
+    ("exploit_vulnerability", [("exploit",), ("vulnerability",)]),
+    ("password_for_account", [("password",), ("for",), ("account",)]),
+    ("login_credentials", [("login",), ("credentials",)]),
+    ("administrative_privileges", [("administrative",), ("privileges",)]),
+    ("root_access", [("root",), ("access",)]),
+    ("backdoor_access", [("backdoor",), ("access",)]),
+
+    # Portuguese
+    ("pt_grant_account_access", [("dar", "conced", "liber", "fornec"), ("acesso",), ("conta",)]),
+    ("pt_give_me_account_access", [("me",), ("de", "da"), ("acesso",), ("conta",)], 2),
+    ("pt_bypass_security", [("burlar", "contornar", "driblar", "ignorar"), ("seguranca",)]),
+    ("pt_override_system", [("sobrepor", "sobrescrever", "anular"), ("sistema",)]),
+    ("pt_disable_authentication", [("desativ", "desabilit", "deslig"), ("autentica",)]),
+    ("pt_skip_verification", [("pular", "ignorar", "evitar", "dispensar"), ("verificacao", "validacao")]),
+    ("pt_access_without_permission", [("acess",), ("sem",), ("permissao", "autorizacao")]),
+    ("pt_hack_account", [("hack", "invadir", "invasao"), ("conta",)]),
+    ("pt_steal_data", [("roubar", "roubo", "furtar"), ("dados",)]),
+    ("pt_unauthorized_access", [("acesso",), ("nao",), ("autorizado",)]),
+    ("pt_break_into_system", [("invadir", "arrombar"), ("sistema",)]),
+    ("pt_exploit_vulnerability", [("explorar",), ("vulnerabilidade", "brecha", "falha")]),
+    ("pt_password_for_account", [("senha",), ("de", "da", "do"), ("outra", "outro", "terceiros")], 0),
+    ("pt_someone_elses_password", [("senha",), ("alheia",)], 0),
+    ("pt_login_credentials", [("credenciais",), ("login", "acesso")]),
+    ("pt_administrative_privileges", [("privilegio", "permissao", "acesso"), ("administra", "admin")], 0),
+    ("pt_admin_privileges", [("privilegio", "permissao", "acesso"), ("de",), ("administra", "admin")], 0),
+    ("pt_root_access", [("acesso",), ("root",)]),
+    ("pt_backdoor_access", [("porta",), ("fundos",)]),
 ]
 
+# Compiled once; a single pass over the message checks every rule
+suspicious_query_matcher = SequenceRuleMatcher(SUSPICIOUS_RULES)
+
+def match_suspicious_query(message: str) -> Optional[str]:
+    """Returns the name of the suspicious rule matched by the message, or None."""
+    return suspicious_query_matcher.match(message)
+
 def is_suspicious_query(message: str) -> bool:
     """Check if the message contains suspicious patterns."""
-    message_lower = message.lower()
-    
-    for pattern in SUSPICIOUS_PATTERNS:
-        if re.search(pattern, message_lower):
-            return True
-    
-    return False
+    return match_suspicious_query(message) is not None
 
-def route_agent(state: OverallAgentState) -> OverallAgentState:
+def get_suspicious_rule_stats() -> Dict[str, Any]:
+    """Returns how many messages were checked and how often each suspicious rule fired."""
+    return suspicious_query_matcher.stats()
+
+# Keyword signals: name -> (agent it points to, weight, keywords).
+# They reuse the keyword sets the agents validate their own topics with.
+FAST_PATH_KEYWORD_SIGNALS = {
+    "balance_transaction": ("custom_agent", 0.9, CUSTOM_AGENT_KEYWORD_SETS["balance_transaction"] + [
+        "transacoes", "movimentacoes", "how much money do i have", "quanto dinheiro tenho",
+    ]),
+    "account_information": ("customer_support", 0.9, [
+        "account status", "account information", "account info", "my email", "my name", "created date",
+        "status da conta", "informações da conta", "dados da conta", "meu email", "meu nome", "data de criação",
+        "email address", "endereço de email",
+        "support ticket", "ticket de suporte", "chamado",
+    ]),
+    "support_issue": ("customer_support", 0.7, CUSTOMER_SUPPORT_KEYWORD_SETS["escalation"] + [
+        "not able", "unable", "can't", "cannot", "not working", "doesn't work", "login", "log in", "locked",
+        "não consigo", "não funciona", "bloqueada", "bloqueado", "problema", "erro",
+    ]),
+    "product_information": ("knowledge_agent", 0.7, INFINITYPAY_KEYWORDS + [
+        "fees", "rates", "pix", "how does", "how do i", "taxas", "como funciona",
+    ]),
+}
+# Keywords of up to 4 letters ("pos", "app", "pix") match whole words only, not "posso" or "apply"
+fast_path_keywords = KeywordMatcher({name: keywords for name, (_, _, keywords) in FAST_PATH_KEYWORD_SIGNALS.items()},
+                                    min_prefix_length=5)
+
+# Regex signals: name -> (agents they point to, weight, pattern matched against the lowercased message).
+# References to the user's own account make account-specific agents more likely.
+FAST_PATH_REGEX_SIGNALS = {
+    "own_account": (("custom_agent", "customer_support"), 0.2, re.compile(r"\b(my|mine|meu|minha|meus|minhas)\b")),
+    "user_id": (("custom_agent", "customer_support"), 0.2, USER_ID_PATTERN),
+}
+
+_router_stats_lock = threading.Lock()
+_router_stats: Counter = Counter()
+
+def classify_route_fast(message: str) -> Dict[str, Any]:
     """
-    Analyzes the incoming message and decides which specialized agent
-    (Custom, CustomerSupport, Knowledge, or Slack) is best suited to handle it.
+    Scores every agent from the keyword and regex signals found in the message.
+    Returns the best agent, its confidence (best score minus runner-up, scores capped at 1.0),
+    how many signals point at it (agreeing_signals) and the signals that fired.
+    The agent is None when no signal fired.
     """
-    current_message = state["messages"][-1].content
-    detected_lang = detect_language(current_message)
+    scores: Dict[str, float] = {}
+    signal_counts: Dict[str, int] = {}
+    signals: List[str] = []
 
-    state["language"] = detected_lang
+    for signal_name in fast_path_keywords.match(message):
+        agent_name, weight, _ = FAST_PATH_KEYWORD_SIGNALS[signal_name]
+        scores[agent_name] = scores.get(agent_name, 0.0) + weight
+        signal_counts[agent_name] = signal_counts.get(agent_name, 0) + 1
+        signals.append(signal_name)
+
+    lowered_message = message.lower()
+    for signal_name, (agent_names, weight, pattern) in FAST_PATH_REGEX_SIGNALS.items():
+        if pattern.search(lowered_message):
+            for agent_name in agent_names:
+                scores[agent_name] = scores.get(agent_name, 0.0) + weight
+                signal_counts[agent_name] = signal_counts.get(agent_name, 0) + 1
+            signals.append(signal_name)
 
-    # First check for suspicious content
-    if is_suspicious_query(current_message):
-        print(f"🚨 Suspicious query detected: {current_message[:100]}...")
-        state["next_agent"] = "slack_agent"
-        state["language"] = detected_lang
-        return state
+    if not scores:
+        return {"agent": None, "confidence": 0.0, "agreeing_signals": 0, "signals": signals}
 
+    ranked = sorted(((min(score, 1.0), agent_name) for agent_name, score in scores.items()), reverse=True)
+    best_score, best_agent = ranked[0]
+    runner_up_score = ranked[1][0] if len(ranked) > 1 else 0.0
+    return {"agent": best_agent, "confidence": round(best_score - runner_up_score, 2),
+            "agreeing_signals": signal_counts[best_agent], "signals": signals}
+
+def _fast_path_decision(current_message: str) -> Optional[Dict[str, Any]]:
+    """Returns the fast-path classification if it is confident enough to skip the router LLM."""
+    if not ROUTER_FAST_PATH_ENABLED:
+        return None
+    classification = classify_route_fast(current_message)
+    if (classification["agent"] is None or classification["confidence"] < ROUTER_FAST_PATH_THRESHOLD
+            or classification["agreeing_signals"] < ROUTER_FAST_PATH_MIN_SIGNALS):
+        return None
+    return classification
+
+def _record_route_source(route_source: str) -> None:
+    with _router_stats_lock:
+        _router_stats[route_source] += 1
+
+def get_router_stats() -> Dict[str, int]:
+    """Returns how many messages were routed by each decision source (suspicious_rule, fast_path, knn, llm)."""
+    with _router_stats_lock:
+        return dict(_router_stats)
+
+def _build_routing_prompt(current_message: str, detected_lang: str) -> str:
+    """Builds the full routing prompt sent to the LLM router."""
     # Load routing prompt from file for normal routing
     routing_prompt_template = load_prompt_template("router_agent", detected_lang)
     
     # Enhanced routing prompt that includes Slack agent option
-    enhanced_routing_prompt = f"""
+    return f"""
     {routing_prompt_template.format(current_message=current_message)}
     
     Additionally, if the message contains any suspicious content that could be:
@@ -97,23 +223,99 @@ def route_agent(state: OverallAgentState) -> OverallAgentState:
     Respond with only the agent name in lowercase.
     """
 
-    response = llm_router.invoke(enhanced_routing_prompt)
-    chosen_agent = response.content.strip().lower()
+def _parse_routing_response(response_content: str) -> str:
+    """Normalizes the router LLM answer into one of the valid agent names."""
+    chosen_agent = response_content.strip().lower()
 
     # Validate the chosen agent
     valid_agents = ["customer_support", "knowledge_agent", "custom_agent", "slack_agent", "default"]
     if chosen_agent not in valid_agents:
         chosen_agent = "default"
+    return chosen_agent
+
+def _apply_route(state: OverallAgentState, next_agent: str, route_metadata: Dict[str, Any]) -> OverallAgentState:
+    """Stores the routing decision and how it was made."""
+    state["next_agent"] = next_agent
+    state["route_metadata"] = route_metadata
+    _record_route_source(route_metadata["route_source"])
+    return state
+
+def _rule_based_route(current_message: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Decisions that need no model call: suspicious content first, then the fast path."""
+    suspicious_rule = match_suspicious_query(current_message)
+    if suspicious_rule:
+        print(f"🚨 Suspicious query detected (rule '{suspicious_rule}'): {current_message[:100]}...")
+        return "slack_agent", {"route_source": "suspicious_rule", "suspicious_rule": suspicious_rule}
+
+    # Obvious intents skip the LLM round-trip
+    fast_path = _fast_path_decision(current_message)
+    if fast_path:
+        return fast_path["agent"], {"route_source": "fast_path", "fast_path_confidence": fast_path["confidence"],
+                                    "fast_path_signals": fast_path["signals"]}
+    return None
+
+def _knn_route(knn_result: Optional[Dict[str, Any]]) -> Tuple[Optional[str], Dict[str, Any]]:
+    """
+    Accepts the exemplar router's label if its margin is high enough.
+    Otherwise returns no agent and the k-NN result to record next to the LLM decision.
+    """
+    if knn_result is None:
+        return None, {}
+    if knn_result["margin"] >= ROUTER_KNN_MIN_MARGIN:
+        return knn_result["agent"], {"route_source": "knn", "knn_margin": knn_result["margin"]}
+    return None, {"knn_label": knn_result["agent"], "knn_margin": knn_result["margin"]}
+
+def route_agent(state: OverallAgentState) -> OverallAgentState:
+    """
+    Analyzes the incoming message and decides which specialized agent
+    (Custom, CustomerSupport, Knowledge, or Slack) is best suited to handle it.
+    """
+    current_message = state["messages"][-1].content
+    # The language is decided once per request by the API; only detect it if it is missing
+    detected_lang = state.get("language") or detect_language(current_message)
 
-    state["next_agent"] = chosen_agent
     state["language"] = detected_lang
 
-    return state
+    rule_based_route = _rule_based_route(current_message)
+    if rule_based_route:
+        return _apply_route(state, *rule_based_route)
+
+    knn_metadata = {}
+    if ROUTER_MODE == "knn":
+        knn_agent, knn_metadata = _knn_route(classify_route_knn(current_message))
+        if knn_agent:
+            return _apply_route(state, knn_agent, knn_metadata)
+
+    response = llm_router.invoke(_build_routing_prompt(current_message, detected_lang))
+
+    return _apply_route(state, _parse_routing_response(response.content), {"route_source": "llm", **knn_metadata})
+
+async def aroute_agent(state: OverallAgentState) -> OverallAgentState:
+    """Async version of `route_agent`; awaits the embedding and router LLM calls instead of blocking a thread."""
+    current_message = state["messages"][-1].content
+    # The language is decided once per request by the API; only detect it if it is missing
+    detected_lang = state.get("language") or detect_language(current_message)
+
+    state["language"] = detected_lang
+
+    rule_based_route = _rule_based_route(current_message)
+    if rule_based_route:
+        return _apply_route(state, *rule_based_route)
+
+    knn_metadata = {}
+    if ROUTER_MODE == "knn":
+        knn_agent, knn_metadata = _knn_route(await aclassify_route_knn(current_message))
+        if knn_agent:
+            return _apply_route(state, knn_agent, knn_metadata)
+
+    response = await llm_router.ainvoke(_build_routing_prompt(current_message, detected_lang))
+
+    return _apply_route(state, _parse_routing_response(response.content), {"route_source": "llm", **knn_metadata})
 
 def build_router_graph() -> StateGraph:
     """Builds the router graph using LangGraph."""
     workflow = StateGraph(OverallAgentState)
-    workflow.add_node("route", route_agent)
+    workflow.add_node("route", RunnableLambda(route_agent, afunc=aroute_agent))
     workflow.set_entry_point("route")
     workflow.add_edge("route", END)
     return workflow.compile()
\ No newline at end of file
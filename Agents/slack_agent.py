@@ -1,7 +1,9 @@
 import os
 import requests
+import httpx
 from typing import TypedDict, List, Dict, Any, Optional
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END, START
 from langchain_google_genai import ChatGoogleGenerativeAI
 from dotenv import load_dotenv
@@ -13,6 +15,7 @@ if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
 from core.state import OverallAgentState
+from utils.canned_responses import system_message
 
 load_dotenv()
 
@@ -50,6 +53,22 @@ def send_slack_notification(user_id: str, message: str) -> str:
     except Exception as e:
         return f"Slack notification failed: {str(e)}"
 
+async def asend_slack_notification(user_id: str, message: str) -> str:
+    """Async version of `send_slack_notification` using a non-blocking HTTP client."""
+    if not SLACK_WEBHOOK_URL:
+        return "Slack webhook URL not configured"
+    
+    payload = {
+        "text": f"🚨 *Suspicious Activity Detected* 🚨\n\n*User:* {user_id}\n*Message:* {message}"
+    }
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.post(SLACK_WEBHOOK_URL, json=payload)
+            response.raise_for_status()
+        return "✅ Slack alert sent successfully"
+    except Exception as e:
+        return f"Slack notification failed: {str(e)}"
+
 def validate_with_guardrails(user_input: str, llm_response: str) -> Dict[str, Any]:
     """Validate LLM response using custom validation logic (replaces Guardrails)."""
     try:
@@ -72,43 +91,28 @@ def validate_with_guardrails(user_input: str, llm_response: str) -> Dict[str, An
             "validated_output": llm_response
         }
 
-def slack_agent_node(state: SlackAgentState) -> SlackAgentState:
-    """Main node that processes suspicious queries and handles escalation."""
-    current_query = state["current_query"]
-    user_id = state["session_user_id"]
-    language = state.get("language", "en")
-    
-
-    system_prompt = """You are a helpful AI assistant for InfinityPay. 
+SLACK_AGENT_SYSTEM_PROMPT = """You are a helpful AI assistant for InfinityPay. 
     Respond to the user's query professionally and helpfully. 
     Do not provide any sensitive information or access to accounts without proper verification."""
-    
-    messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=current_query)
-    ]
-    
-    llm_response = llm_slack_agent.invoke(messages)
-    generated_response = llm_response.content
-    
-    # Validate the response with custom validation (replacing Guardrails)
-    validation_result = validate_with_guardrails(current_query, generated_response)
-    
+
+def _apply_validation_result(state: SlackAgentState, generated_response: str, validation_result: Dict[str, Any]) -> bool:
+    """Records the validation outcome in the state. Returns True if the query must be escalated."""
     state["validation_passed"] = validation_result["validation_passed"]
     state["actual_tool_outputs"] = {
         "llm_generation": generated_response,
         "guardrails_validation": "Passed" if validation_result["validation_passed"] else "Failed"
     }
-    
-    # If validation fails, send Slack notification
-    if not validation_result["validation_passed"]:
-        slack_result = send_slack_notification(user_id, current_query)
+    return not validation_result["validation_passed"]
+
+def _finalize_slack_response(state: SlackAgentState, validation_result: Dict[str, Any], slack_result: Optional[str]) -> SlackAgentState:
+    """Adds the escalation notice (or the validated LLM answer) to the state messages."""
+    if slack_result is not None:
         state["slack_notification_sent"] = True
         state["actual_tool_outputs"]["slack_notification"] = slack_result
         state["actual_tool_outputs"]["guardrails_violations"] = validation_result["error_details"]
         
         # Use escalation response instead of original
-        final_response = "⚠️ Your request has been flagged for review and escalated to our security team. A human agent will contact you shortly."
+        final_response = system_message("escalated", state.get("language", "en"))
     else:
         state["slack_notification_sent"] = False
         final_response = validation_result["validated_output"]
@@ -118,6 +122,50 @@ def slack_agent_node(state: SlackAgentState) -> SlackAgentState:
     
     return state
 
+def slack_agent_node(state: SlackAgentState) -> SlackAgentState:
+    """Main node that processes suspicious queries and handles escalation."""
+    current_query = state["current_query"]
+    user_id = state["session_user_id"]
+    
+    messages = [
+        SystemMessage(content=SLACK_AGENT_SYSTEM_PROMPT),
+        HumanMessage(content=current_query)
+    ]
+    
+    llm_response = llm_slack_agent.invoke(messages)
+    generated_response = llm_response.content
+    
+    # Validate the response with custom validation (replacing Guardrails)
+    validation_result = validate_with_guardrails(current_query, generated_response)
+    
+    # If validation fails, send Slack notification
+    slack_result = None
+    if _apply_validation_result(state, generated_response, validation_result):
+        slack_result = send_slack_notification(user_id, current_query)
+    
+    return _finalize_slack_response(state, validation_result, slack_result)
+
+async def aslack_agent_node(state: SlackAgentState) -> SlackAgentState:
+    """Async version of `slack_agent_node`."""
+    current_query = state["current_query"]
+    user_id = state["session_user_id"]
+    
+    messages = [
+        SystemMessage(content=SLACK_AGENT_SYSTEM_PROMPT),
+        HumanMessage(content=current_query)
+    ]
+    
+    llm_response = await llm_slack_agent.ainvoke(messages)
+    generated_response = llm_response.content
+    
+    validation_result = validate_with_guardrails(current_query, generated_response)
+    
+    slack_result = None
+    if _apply_validation_result(state, generated_response, validation_result):
+        slack_result = await asend_slack_notification(user_id, current_query)
+    
+    return _finalize_slack_response(state, validation_result, slack_result)
+
 def map_to_slack_agent_state(overall_state: OverallAgentState) -> SlackAgentState:
     """Map overall state to Slack agent specific state."""
     return SlackAgentState(
@@ -133,7 +181,7 @@ def map_to_slack_agent_state(overall_state: OverallAgentState) -> SlackAgentStat
 def build_slack_agent_graph() -> StateGraph:
     """Build the Slack escalation agent graph."""
     workflow = StateGraph(SlackAgentState)
-    workflow.add_node("slack_agent", slack_agent_node)
+    workflow.add_node("slack_agent", RunnableLambda(slack_agent_node, afunc=aslack_agent_node))
     workflow.set_entry_point("slack_agent")
     workflow.add_edge("slack_agent", END)
     return workflow.compile()
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""
+Compares the FAISS index types of FAISS_INDEX_TYPE (flat, ivf_flat, ivf_pq, hnsw) on one corpus.
+
+For every index type and search setting (nprobe for IVF, efSearch for HNSW) it reports the build
+time, the index memory (size of the serialized index), recall@k against the exact flat index, and
+p50/p99 latency of single-query searches, which is how the Knowledge Agent queries the index.
+
+Corpora:
+- synthetic (default): `--size` vectors of dimension `--dim` drawn around random cluster centers,
+  like embeddings of chunks on a limited set of topics; queries are drawn the same way.
+- a saved vector store (e.g. `--corpus faiss_index_infinitepay`): its vectors are read back from the
+  index and `--queries` of them are held out as queries (and not indexed).
+
+Usage:
+    python -m benchmarks.ann_indexes --size 100000 --dim 768 --nprobe 1 4 16 64 --ef-search 16 64 256
+    python -m benchmarks.ann_indexes --corpus faiss_index_infinitepay --queries 50
+"""
+import argparse
+import os
+import time
+
+from benchmarks.stubs import percentile
+
+import faiss
+import numpy as np
+
+from utils.vector_store import configure_search, create_faiss_index, index_factory_string, read_faiss_index
+
+
+def synthetic_corpus(size: int, queries: int, dim: int, clusters: int, seed: int = 0):
+    """Returns (vectors, queries) drawn from a mixture of Gaussians around random centers."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+
+    def draw(count: int) -> np.ndarray:
+        points = np.empty((count, dim), dtype=np.float32)
+        for start in range(0, count, 50000):
+            end = min(count, start + 50000)
+            assignments = rng.integers(0, clusters, end - start)
+            points[start:end] = centers[assignments] + 0.5 * rng.normal(size=(end - start, dim)).astype(np.float32)
+        return points
+
+    return draw(size), draw(queries)
+
+
+def saved_corpus(folder_path: str, queries: int, seed: int = 0):
+    """Returns (vectors, queries) from the index of a saved vector store, holding `queries` vectors out."""
+    index = read_faiss_index(os.path.join(folder_path, "index.faiss"), mmap=False)
+    vectors = index.reconstruct_n(0, index.ntotal)
+    held_out = np.random.default_rng(seed).permutation(len(vectors))
+    return vectors[held_out[queries:]], vectors[held_out[:queries]]
+
+
+def search_latencies(index: faiss.Index, queries: np.ndarray, k: int):
+    """Searches the queries one by one; returns the result ids and the per-query latencies."""
+    results = np.empty((len(queries), k), dtype=np.int64)
+    latencies = []
+    for position in range(len(queries)):
+        started = time.perf_counter()
+        _, ids = index.search(queries[position:position + 1], k)
+        latencies.append(time.perf_counter() - started)
+        results[position] = ids[0]
+    return results, latencies
+
+
+def recall_at_k(results: np.ndarray, ground_truth: np.ndarray) -> float:
+    k = ground_truth.shape[1]
+    return float(np.mean([len(set(found) & set(expected)) / k for found, expected in zip(results, ground_truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default="synthetic", help='"synthetic" or the directory of a saved vector store')
+    parser.add_argument("--size", type=int, default=100000, help="synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=768, help="synthetic vector dimension")
+    parser.add_argument("--clusters", type=int, default=1000, help="synthetic topic clusters")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=5, help="recall@k (the Knowledge Agent retrieves 5 chunks)")
+    parser.add_argument("--types", nargs="+", default=["flat", "ivf_flat", "ivf_pq", "hnsw"])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists (0: about 4 * sqrt(size))")
+    parser.add_argument("--pq-m", type=int, default=0, help="PQ sub-quantizers (0: dimension / 8)")
+    parser.add_argument("--threads", type=int, default=1, help="faiss threads (the API searches one query at a time)")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(args.threads)
+    if args.corpus == "synthetic":
+        vectors, queries = synthetic_corpus(args.size, args.queries, args.dim, args.clusters)
+    else:
+        vectors, queries = saved_corpus(args.corpus, args.queries)
+    print(f"Corpus {args.corpus}: {len(vectors)} vectors of dimension {vectors.shape[1]}, "
+          f"{len(queries)} queries, k={args.k}, {args.threads} thread(s)\n")
+
+    flat = faiss.IndexFlatL2(vectors.shape[1])
+    flat.add(vectors)
+    ground_truth, _ = search_latencies(flat, queries, args.k)
+
+    print(f"{'index':>22} | {'search param':>12} | {'build (s)':>9} | {'memory (MB)':>11} | "
+          f"{f'recall@{args.k}':>9} | {'p50 (ms)':>8} | {'p99 (ms)':>8}")
+    print("-" * 98)
+    for index_type in args.types:
+        description = index_factory_string(index_type, len(vectors), vectors.shape[1], args.nlist, args.pq_m)
+        started = time.perf_counter()
+        index = create_faiss_index(vectors, index_type, nlist=args.nlist, pq_m=args.pq_m)
+        build_seconds = time.perf_counter() - started
+        memory_mb = faiss.serialize_index(index).nbytes / 2 ** 20
+
+        if index_type.startswith("ivf"):
+            settings = [(f"nprobe={nprobe}", {"nprobe": nprobe}) for nprobe in args.nprobe]
+        elif index_type == "hnsw":
+            settings = [(f"efSearch={ef_search}", {"ef_search": ef_search}) for ef_search in args.ef_search]
+        else:
+            settings = [("-", {})]
+
+        for label, parameters in settings:
+            configure_search(index, **parameters)
+            results, latencies = search_latencies(index, queries, args.k)
+            print(f"{description:>22} | {label:>12} | {build_seconds:>9.2f} | {memory_mb:>11.1f} | "
+                  f"{recall_at_k(results, ground_truth):>9.3f} | {percentile(latencies, 50) * 1000:>8.3f} | "
+                  f"{percentile(latencies, 99) * 1000:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
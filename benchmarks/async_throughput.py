@@ -0,0 +1,97 @@
+"""
+Compares concurrent throughput of the sync and async execution paths of the overall graph.
+
+The sync path runs `overall_app.invoke` on the event loop's default thread pool, which is how
+sync nodes are executed under `ainvoke`; the async path awaits `overall_app.ainvoke` directly.
+All LLMs are replaced by stubs with a fixed latency, so the numbers isolate the execution model.
+
+Usage:
+    python -m benchmarks.async_throughput --concurrency 1 10 50 100 200 --latency 0.2
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+from benchmarks.stubs import StubChatModel, constant_responder, percentile
+
+import API.app as api
+from Agents import router_agent, custom_agent, personality_agent
+from Agents.customer_support_agent import build_customer_support_graph
+from Agents.knowledge_agent import build_rag_agent
+from Agents.custom_agent import build_custom_agent_graph
+from Agents.slack_agent import build_slack_agent_graph
+from Agents.personality_agent import build_personality_graph
+
+BENCHMARK_QUERY = "What is my current balance?"
+
+
+def setup_stubbed_system(latency: float):
+    """Builds the overall graph with every LLM on the custom-agent path replaced by a stub."""
+    router_agent.llm_router = StubChatModel(constant_responder("custom_agent"), latency)
+    # The benchmark query is an obvious intent; keep the router LLM call in the measured path
+    router_agent.ROUTER_FAST_PATH_ENABLED = False
+    custom_agent.llm_with_tools = StubChatModel(constant_responder("Your current balance is R$ 500,75."), latency)
+    personality_agent.llm_personality = StubChatModel(constant_responder("Hi! Your balance is R$ 500,75."), latency)
+
+    api.customer_support_app = build_customer_support_graph()
+    api.knowledge_app = build_rag_agent()
+    api.custom_agent_app = build_custom_agent_graph()
+    api.slack_agent_app = build_slack_agent_graph()
+    api.personality_app = build_personality_graph()
+    return api.build_overall_system_graph()
+
+
+async def run_requests(overall_app, concurrency: int, use_async: bool) -> dict:
+    """Fires `concurrency` requests at once and measures wall time and per-request latency."""
+    loop = asyncio.get_running_loop()
+    latencies = []
+
+    async def one_request(index: int):
+        user_id = f"bench-{'async' if use_async else 'sync'}-{concurrency}-{index}"
+        state = api._build_initial_state(api.QueryRequest(message=BENCHMARK_QUERY, user_id=user_id))
+        config = {"configurable": {"thread_id": user_id}}
+        started = time.perf_counter()
+        if use_async:
+            await overall_app.ainvoke(state, config)
+        else:
+            await loop.run_in_executor(None, overall_app.invoke, state, config)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_request(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "throughput": concurrency / elapsed,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+    }
+
+
+async def main_async(concurrency_levels, latency: float):
+    overall_app = setup_stubbed_system(latency)
+
+    print(f"Stub LLM latency: {latency * 1000:.0f} ms per call (3 calls per request)")
+    print(f"{'concurrency':>11} | {'path':>5} | {'req/s':>8} | {'p50 (s)':>8} | {'p99 (s)':>8}")
+    print("-" * 55)
+    for concurrency in concurrency_levels:
+        for use_async in (False, True):
+            # The agents log every step; keep the benchmark output readable
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = await run_requests(overall_app, concurrency, use_async)
+            print(f"{concurrency:>11} | {'async' if use_async else 'sync':>5} | "
+                  f"{result['throughput']:>8.1f} | {result['p50']:>8.2f} | {result['p99']:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub LLM latency in seconds")
+    args = parser.parse_args()
+    asyncio.run(main_async(args.concurrency, args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Compares the unbounded MemorySaver with utils/checkpointer.py on a conversation graph shaped like
+the overall graph's state (messages accumulate, a few nodes per turn, the agent is a subgraph that
+checkpoints under its own namespace): --users users each hold
+--turns turns. It reports the Python heap held by the checkpointer after the run (tracemalloc),
+the turn latency, the checkpoints pruned and the threads evicted from memory (lost without the
+sqlite store, read back from it otherwise) and, for the sqlite store, how long a restarted
+process takes to restore.
+
+Usage:
+    python -m benchmarks.checkpointer --users 200 --turns 10 --max-memory-mb 2
+"""
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Annotated, List, TypedDict
+
+from benchmarks.stubs import percentile
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, StateGraph
+from langgraph.graph.message import add_messages
+
+from utils.checkpointer import BoundedCheckpointSaver
+
+
+class ConversationState(TypedDict):
+    messages: Annotated[List, add_messages]
+    next_agent: str
+    raw_agent_output: str
+
+
+def _build_agent():
+    def answer(state):
+        return {"raw_agent_output": "The Maquininha Smart costs 12x R$ 16.58 with no monthly fee. " * 4}
+
+    agent = StateGraph(ConversationState)
+    agent.add_node("answer", answer)
+    agent.set_entry_point("answer")
+    agent.add_edge("answer", END)
+    return agent.compile()
+
+
+def _build(checkpointer):
+    # Invoked inside a node, like the agents: it inherits the checkpointer under a new namespace every turn
+    agent_graph = _build_agent()
+
+    def router(state):
+        return {"next_agent": "knowledge_agent"}
+
+    def agent(state):
+        return {"raw_agent_output": agent_graph.invoke({"messages": []})["raw_agent_output"]}
+
+    def personality(state):
+        return {"messages": [AIMessage(content=state["raw_agent_output"] + " Anything else I can help with?")]}
+
+    workflow = StateGraph(ConversationState)
+    for name, node in (("router", router), ("agent", agent), ("personality", personality)):
+        workflow.add_node(name, node)
+    workflow.set_entry_point("router")
+    workflow.add_edge("router", "agent")
+    workflow.add_edge("agent", "personality")
+    workflow.add_edge("personality", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def run(label, make_checkpointer, users: int, turns: int) -> None:
+    gc.collect()
+    tracemalloc.start()
+    checkpointer = make_checkpointer()
+    app = _build(checkpointer)
+    latencies = []
+    for turn in range(turns):
+        for user in range(users):
+            started = time.perf_counter()
+            app.invoke({"messages": [HumanMessage(content=f"question {turn} about fees")]},
+                       {"configurable": {"thread_id": f"user{user}"}})
+            latencies.append(time.perf_counter() - started)
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    stats = checkpointer.stats() if isinstance(checkpointer, BoundedCheckpointSaver) else {}
+    print(f"{label:>22} | {held / 1024 / 1024:>9.1f} | {percentile(latencies, 50) * 1000:>8.2f} | "
+          f"{percentile(latencies, 99) * 1000:>8.2f} | {stats.get('threads_in_memory', users):>9} | "
+          f"{stats.get('pruned', 0):>7} | {stats.get('evictions', 0):>9}")
+    if isinstance(checkpointer, BoundedCheckpointSaver):
+        checkpointer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=10, help="turns per user")
+    parser.add_argument("--max-checkpoints", type=int, default=5)
+    parser.add_argument("--max-memory-mb", type=float, default=2.0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "checkpoints.sqlite3")
+    max_memory_bytes = int(args.max_memory_mb * 1024 * 1024)
+    print(f"{args.users} users x {args.turns} turns, latest {args.max_checkpoints} checkpoints per thread, "
+          f"memory cap {args.max_memory_mb} MB")
+    print(f"{'checkpointer':>22} | {'heap (MB)':>9} | {'p50 (ms)':>8} | {'p99 (ms)':>8} | {'in memory':>9} | "
+          f"{'pruned':>7} | {'evictions':>9}")
+    print("-" * 92)
+    run("MemorySaver", MemorySaver, args.users, args.turns)
+    run("bounded, memory only", lambda: BoundedCheckpointSaver(
+        None, args.max_checkpoints, max_memory_bytes=max_memory_bytes), args.users, args.turns)
+    run("bounded + sqlite", lambda: BoundedCheckpointSaver(
+        path, args.max_checkpoints, max_memory_bytes=max_memory_bytes), args.users, args.turns)
+
+    started = time.perf_counter()
+    restored = BoundedCheckpointSaver(path, args.max_checkpoints, max_memory_bytes=max_memory_bytes)
+    restore_seconds = time.perf_counter() - started
+    state = _build(restored).get_state({"configurable": {"thread_id": "user0"}}).values
+    print(f"\nRestart: {restored.stats()['threads_in_memory']} threads restored in {restore_seconds:.2f} s "
+          f"({os.path.getsize(path) / 1024 / 1024:.1f} MB on disk); user0 resumes with {len(state['messages'])} messages")
+    restored.close()
+
+
+if __name__ == "__main__":
+    main()
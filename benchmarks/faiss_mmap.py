@@ -0,0 +1,137 @@
+"""
+Measures loading the knowledge base FAISS index into memory vs memory-mapping it (FAISS_MMAP_ENABLED),
+with the pickled docstore or the sqlite docstore (FAISS_DOCSTORE_FORMAT).
+
+For every index size, a flat L2 index of random vectors and a docstore of short documents are saved
+in the `save_local` layout, and the docstore is also migrated to sqlite. Fresh worker processes then
+load the store with `load_faiss_local`, run a few searches, and report the load time and their
+resident memory, split into:
+- private (RssAnon): memory owned by the process, paid again by every worker;
+- shared (RssFile): file pages mapped from the page cache, paid once however many workers map them.
+
+Usage:
+    python -m benchmarks.faiss_mmap --sizes 10000 100000 1000000 --dim 768 --workers 4
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+from benchmarks.stubs import StubEmbeddings, percentile
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+from utils.migrate_docstore import migrate_docstore
+
+BATCH_SIZE = 50000
+
+
+def _rss_mb() -> dict:
+    """Returns the private and file-backed resident memory of the current process, in MB."""
+    rss = {}
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            if line.startswith(("RssAnon:", "RssFile:")):
+                name, value, _ = line.split()
+                rss[name.rstrip(":")] = int(value) / 1024
+    return rss
+
+
+def build_index(folder_path: str, size: int, dim: int) -> None:
+    """Saves a flat index of `size` random vectors and its docstore like `FAISS.save_local` does."""
+    rng = np.random.default_rng(0)
+    index = faiss.IndexFlatL2(dim)
+    for start in range(0, size, BATCH_SIZE):
+        index.add(rng.random((min(BATCH_SIZE, size - start), dim), dtype=np.float32))
+    faiss.write_index(index, os.path.join(folder_path, "index.faiss"))
+    del index
+
+    docstore = InMemoryDocstore({
+        str(i): Document(page_content=f"Chunk {i} of the InfinitePay knowledge base.", metadata={"source": "benchmark"})
+        for i in range(size)
+    })
+    with open(os.path.join(folder_path, "index.pkl"), "wb") as f:
+        pickle.dump((docstore, {i: str(i) for i in range(size)}), f)
+
+
+def _worker(folder_path: str, mmap: bool, dim: int, queries: int, results) -> None:
+    from utils.vector_store import load_faiss_local
+
+    baseline = _rss_mb()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        vectorstore = load_faiss_local(folder_path, StubEmbeddings(latency=0.0), mmap=mmap)
+    load_seconds = time.perf_counter() - started
+
+    rng = np.random.default_rng(os.getpid())
+    search_latencies = []
+    for _ in range(queries):
+        vector = rng.random(dim, dtype=np.float32).tolist()
+        started = time.perf_counter()
+        vectorstore.similarity_search_with_score_by_vector(vector, k=5)
+        search_latencies.append(time.perf_counter() - started)
+
+    rss = _rss_mb()
+    results.put({
+        "load_s": load_seconds,
+        "search_ms": percentile(search_latencies, 50) * 1000,
+        "private_mb": rss["RssAnon"] - baseline["RssAnon"],
+        "shared_mb": rss["RssFile"] - baseline["RssFile"],
+    })
+
+
+def measure(folder_path: str, mmap: bool, dim: int, queries: int) -> dict:
+    """Loads the index in a fresh process (so nothing is already in its memory) and returns its measures."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_worker, args=(folder_path, mmap, dim, queries, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--dim", type=int, default=768, help="vector dimension (768 for models/embedding-001)")
+    parser.add_argument("--workers", type=int, default=4, help="number of workers for the total memory estimate")
+    parser.add_argument("--queries", type=int, default=20, help="searches run by each worker after loading")
+    args = parser.parse_args()
+
+    print(f"dim {args.dim}; total = memory of {args.workers} workers (private x workers + shared once)")
+    print(f"{'vectors':>9} | {'mode':>11} | {'load (s)':>8} | {'search (ms)':>11} | "
+          f"{'private (MB)':>12} | {'shared (MB)':>11} | {'total (MB)':>10}")
+    print("-" * 93)
+    for size in args.sizes:
+        folder_path = tempfile.mkdtemp(prefix="faiss_mmap_benchmark_")
+        try:
+            build_index(folder_path, size, args.dim)
+            sqlite_folder_path = os.path.join(folder_path, "sqlite")
+            os.makedirs(sqlite_folder_path)
+            for file_name in ("index.faiss", "index.pkl"):
+                os.link(os.path.join(folder_path, file_name), os.path.join(sqlite_folder_path, file_name))
+            with contextlib.redirect_stdout(io.StringIO()):
+                migrate_docstore(sqlite_folder_path, remove_pickle=True)
+
+            for mode, path, mmap in (("memory", folder_path, False), ("mmap", folder_path, True),
+                                     ("mmap+sqlite", sqlite_folder_path, True)):
+                result = measure(path, mmap, args.dim, args.queries)
+                total = result["private_mb"] * args.workers + result["shared_mb"]
+                print(f"{size:>9} | {mode:>11} | {result['load_s']:>8.3f} | "
+                      f"{result['search_ms']:>11.2f} | {result['private_mb']:>12.1f} | "
+                      f"{result['shared_mb']:>11.1f} | {total:>10.1f}")
+        finally:
+            shutil.rmtree(folder_path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
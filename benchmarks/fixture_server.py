@@ -0,0 +1,123 @@
+"""
+Local HTTP stand-in for the InfinitePay site, so the scraping and ingest pipeline runs without network.
+
+Serves synthetic HTML pages (text, navigation, inline scripts and styles) at the paths of the
+knowledge base URLs, with a fixed latency per request, and supports conditional GETs (ETag and
+Last-Modified, answered with 304 Not Modified).
+
+Standalone, point the knowledge base at it with KNOWLEDGE_BASE_ORIGIN:
+    python -m benchmarks.fixture_server --port 8765 --latency 0.2
+    KNOWLEDGE_BASE_ORIGIN=http://127.0.0.1:8765 python -m utils.refresh_knowledge_base
+"""
+import argparse
+import hashlib
+import random
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+from benchmarks.stubs import PROJECT_ROOT  # noqa: F401 (puts the project root on sys.path)
+
+WORDS = ("maquininha taxa pix parcelado cartao credito debito conta digital boleto link pagamento loja online "
+         "rendimento emprestimo vendas cliente recebimento antecipacao tarifa mensal app celular").split()
+
+
+def synthetic_page(title: str, size_kb: int, seed: int) -> str:
+    """Returns an HTML page of about `size_kb` KB, with the markup noise of a real marketing page."""
+    rng = random.Random(seed)
+    parts = [f"<html><head><title>{title}</title><style>.hero{{color:#0a0}} .nav a{{margin:4px}}</style>"
+             f"<script>window.dataLayer=[{{'page':'{title}'}}];</script></head><body>",
+             "<nav class='nav'>" + "".join(f"<a href='/{word}'>{word}</a>" for word in WORDS) + "</nav>"]
+    while sum(len(part) for part in parts) < size_kb * 1024:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(12, 30)))
+        parts.append(f"<section><h2>{rng.choice(WORDS).title()}</h2><div><p><span>{sentence}.</span></p>"
+                     f"<ul><li>{rng.choice(WORDS)}</li><li>{rng.choice(WORDS)}</li></ul></div></section>")
+    parts.append("<script>console.log('analytics')</script></body></html>")
+    return "".join(parts)
+
+
+class FixtureServer:
+    """Serves `pages` (HTML by path) on 127.0.0.1 in a background thread."""
+
+    def __init__(self, pages: Dict[str, str], port: int = 0, latency: float = 0.2):
+        self.pages = pages
+        self.latency = latency
+        self.requests = 0
+        self.not_modified = 0
+        self.last_modified = formatdate(time.time(), usegmt=True)
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                fixture.requests += 1
+                time.sleep(fixture.latency)
+                body = fixture.pages.get(self.path.rstrip("/") or "/")
+                if body is None:
+                    self.send_error(404)
+                    return
+                encoded = body.encode("utf-8")
+                etag = '"' + hashlib.sha256(encoded).hexdigest()[:16] + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    fixture.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(encoded)))
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", fixture.last_modified)
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def origin(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self) -> "FixtureServer":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def knowledge_base_fixtures(size_kb: int = 150) -> Dict[str, str]:
+    """Synthetic pages at the paths of the knowledge base URLs."""
+    from urllib.parse import urlsplit
+    from Agents.knowledge_agent import KNOWLEDGE_BASE_URLS
+    paths = [urlsplit(url).path or "/" for url in KNOWLEDGE_BASE_URLS]
+    return {path: synthetic_page(path, size_kb, seed) for seed, path in enumerate(paths)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="delay before every response (s)")
+    parser.add_argument("--page-kb", type=int, default=150, help="size of every page (KB)")
+    args = parser.parse_args()
+
+    server = FixtureServer(knowledge_base_fixtures(args.page_kb), args.port, args.latency).start()
+    print(f"Serving {len(server.pages)} fixture pages on {server.origin} (Ctrl+C to stop)")
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
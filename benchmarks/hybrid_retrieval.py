@@ -0,0 +1,155 @@
+"""
+Compares vector-only, BM25-only and hybrid (reciprocal rank fusion) retrieval over the committed
+knowledge base (faiss_index_infinitepay), on questions about InfinitePay products phrased the way
+users ask them, in English and Portuguese, with the product names and jargon kept.
+
+A question's relevant chunks are the FAQ chunks that contain the question it paraphrases. A miss
+(no relevant chunk in the top k) leaves the agent without an answer, so the knowledge agent falls
+back to a web search: the miss rate is the fallback rate due to retrieval. Latency is the time of
+one retrieval, query embedding included.
+
+Embeddings:
+  - stub (default, offline): the chunks are re-embedded with the bag-of-words stub of
+    benchmarks/stubs.py, a stand-in without term weighting, not a model
+  - google: the saved Google vectors of the index, with queries embedded by the Google model
+    (needs GOOGLE_API_KEY); the figures that matter for production
+
+Usage:
+    python -m benchmarks.hybrid_retrieval --k 5
+    python -m benchmarks.hybrid_retrieval --embeddings google
+"""
+import argparse
+import contextlib
+import io
+import re
+import time
+from typing import Callable, List
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from benchmarks.stubs import PROJECT_ROOT, StubEmbeddings, percentile
+
+from utils.bm25 import BM25Index, iter_documents
+from utils.hybrid_retrieval import HYBRID_CANDIDATES, RRF_K, HybridRetriever
+from utils.vector_store import load_faiss_local
+
+INDEX_PATH = f"{PROJECT_ROOT}/faiss_index_infinitepay"
+
+# (question, text of the FAQ entry that answers it)
+QUESTIONS = [
+    ("quanto custa a maquininha?", "Quanto custa uma maquininha da InfinitePay?"),
+    ("Can I have more than one Pix Parcelado payment?", "Posso ter mais de um pagamento com Pix Parcelado?"),
+    ("How does the PDV work?", "Como funciona o PDV?"),
+    ("Which payment methods are available on InfiniteTap?", "Quais as modalidades de pagamento disponíveis no InfiniteTap?"),
+    ("how much does it cost to issue a boleto", "Quanto custa para emitir um boleto?"),
+    ("What is Tap to Pay on iPhone?", "O que é o Tap to Pay no iPhone com InfinitePay?"),
+    ("Which bandeiras does InfinitePay accept?", "A InfinitePay aceita quais bandeiras?"),
+    ("does the maquininha generate a Pix QR Code", "A maquininha da InfinitePay gera QR Code Pix?"),
+    ("Is there a conta PJ for MEI?", "A InfinitePay oferece Conta PJ para MEI?"),
+    ("aceita vale-alimentação?", "A InfinitePay aceita vale-alimentação?"),
+    ("how do I create a link de pagamento", "Como gerar um link de pagamento?"),
+    ("cashback do cartão", "Como funciona o cashback do cartão da InfinitePay?"),
+    ("Can I use InfiniteTap on more than one phone?", "Como uso o InfiniteTap em mais de um celular?"),
+    ("What are the InfiniteTap fees?", "Quais são as taxas do InfiniteTap?"),
+    ("When do I get the money from a boleto?", "Em quanto tempo eu recebo o pagamento do boleto?"),
+    ("Is there a limit on free boletos?", "Existe limite máximo para emissão de boletos gratuitos?"),
+    ("How does Gestão de Cobrança reduce inadimplência?", "Como a Gestão de Cobrança ajuda a diminuir a inadimplência?"),
+    ("Does simulating an empréstimo hurt my credit score?",
+     "A solicitação de um empréstimo, sem a contratação do mesmo, afeta minha pontuação de crédito?"),
+    ("How do I pay the empréstimo parcelas?", "Como realizo o pagamento das parcelas?"),
+    ("Is Pix free for CNPJ and MEI?", "O Pix da InfinitePay é grátis para CNPJ e MEI?"),
+    ("como vender pela loja online", "Como eu faço uma venda pela Loja Online da InfinitePay?"),
+    ("Does InfinitePay have a physical card?", "A InfinitePay tem cartão físico?"),
+    ("receber por aproximação no celular", "Como receber pagamentos por aproximação no celular?"),
+    ("Do I need a CNPJ to open the conta PJ?", "Preciso ter CNPJ para abrir a Conta PJ da InfinitePay?"),
+]
+
+
+def _fix_character(match: "re.Match") -> str:
+    try:
+        return match.group().encode("latin-1").decode("utf-8")
+    except UnicodeError:
+        return match.group()
+
+
+def _fix_encoding(text: str) -> str:
+    """The committed chunks are UTF-8 text that was decoded as Latin-1 when scraped ("cartÃ£o")."""
+    return re.sub("[\xc2-\xf4][\x80-\xbf]{1,3}", _fix_character, text)
+
+
+def _load_corpus(embeddings_name: str) -> FAISS:
+    """The committed index with its chunk text repaired, and stub or saved Google vectors."""
+    if embeddings_name == "google":
+        from utils.embeddings import get_embeddings
+        embeddings = get_embeddings()
+    else:
+        embeddings = StubEmbeddings(dimension=768, latency=0.0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        saved = load_faiss_local(INDEX_PATH, embeddings, mmap=False)
+    documents = [Document(id=document_id, page_content=_fix_encoding(document.page_content), metadata=document.metadata)
+                 for document_id, document in iter_documents(saved)]
+    if embeddings_name == "google":
+        index = faiss.IndexFlatL2(saved.index.d)
+        index.add(saved.index.reconstruct_n(0, saved.index.ntotal))
+    else:
+        vectors = np.asarray(embeddings.embed_documents([document.page_content for document in documents]), dtype=np.float32)
+        # Normalized like the Google vectors, so long chunks are not pushed away by their word counts
+        faiss.normalize_L2(vectors)
+        index = faiss.IndexFlatL2(vectors.shape[1])
+        index.add(vectors)
+    docstore = InMemoryDocstore({document.id: document for document in documents})
+    return FAISS(embeddings, index, docstore, dict(enumerate(document.id for document in documents)),
+                 normalize_L2=embeddings_name != "google")
+
+
+def _evaluate(name: str, retrieve: Callable[[str], List[Document]], relevant: List[set], k: int) -> None:
+    hits, reciprocal_ranks, latencies = 0, 0.0, []
+    for (question, _), relevant_ids in zip(QUESTIONS, relevant):
+        started = time.perf_counter()
+        documents = retrieve(question)[:k]
+        latencies.append((time.perf_counter() - started) * 1000)
+        ranks = [rank for rank, document in enumerate(documents, start=1) if document.id in relevant_ids]
+        if ranks:
+            hits += 1
+            reciprocal_ranks += 1.0 / ranks[0]
+    count = len(QUESTIONS)
+    print(f"{name:>14} | {hits / count:>7.0%} | {reciprocal_ranks / count:>5.2f} | {(count - hits) / count:>13.0%} | "
+          f"{percentile(latencies, 50):>8.2f} | {percentile(latencies, 95):>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=5, help="chunks retrieved per question")
+    parser.add_argument("--embeddings", choices=["stub", "google"], default="stub")
+    args = parser.parse_args()
+
+    vectorstore = _load_corpus(args.embeddings)
+    documents = dict(iter_documents(vectorstore))
+    relevant = [{document_id for document_id, document in documents.items() if answer in document.page_content}
+                for _, answer in QUESTIONS]
+    unanswerable = [question for (question, _), relevant_ids in zip(QUESTIONS, relevant) if not relevant_ids]
+    if unanswerable:
+        print(f"Warning: no chunk answers {unanswerable}")
+
+    started = time.perf_counter()
+    lexical_index = BM25Index.from_vectorstore(vectorstore)
+    build_ms = (time.perf_counter() - started) * 1000
+    hybrid = HybridRetriever(vectorstore=vectorstore, lexical_index=lexical_index, k=args.k)
+    vector_only = HybridRetriever(vectorstore=vectorstore, k=args.k)
+
+    print(f"{len(documents)} chunks, {len(QUESTIONS)} questions, {args.embeddings} embeddings, top {args.k}, "
+          f"{HYBRID_CANDIDATES} candidates per ranking, RRF k={RRF_K}; BM25 index built in {build_ms:.0f} ms")
+    print(f"{'retrieval':>14} | {'hit@' + str(args.k):>7} | {'MRR':>5} | {'fallback rate':>13} | "
+          f"{'p50 (ms)':>8} | {'p95 (ms)':>8}")
+    print("-" * 72)
+    _evaluate("vector only", vector_only.invoke, relevant, args.k)
+    _evaluate("BM25 only", lambda question: hybrid._lexical_ranking(question), relevant, args.k)
+    _evaluate("hybrid (RRF)", hybrid.invoke, relevant, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Measures the cost of refreshing the knowledge base with `refresh_knowledge_base` as the site changes.
+
+A synthetic site of `--pages` pages is ingested from scratch, then refreshed after a series of edits:
+no change, a few edited paragraphs, an added and a removed page, and finally a forced full rebuild.
+Scraping is replaced by the synthetic pages and the embedding model by a stub behind the persistent
+embedding cache; each step reports the pages and chunks that changed, the number of texts sent to
+the embedding model and the wall time.
+
+Usage:
+    python -m benchmarks.incremental_ingest --pages 200 --edited-pages 2
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from benchmarks.stubs import StubEmbeddings
+
+from Agents import knowledge_agent
+from utils.embeddings import CachedEmbeddings
+from utils.vector_store import FAISS_INDEX_TYPE
+
+WORDS = ("maquininha taxa pix parcelado cartao credito debito conta digital boleto link pagamento loja online "
+         "rendimento emprestimo vendas cliente recebimento antecipacao tarifa mensal app celular").split()
+
+
+def _paragraph(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 90))) + "."
+
+
+def synthetic_site(pages: int, paragraphs: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    return {f"https://www.infinitepay.io/page-{i}": [_paragraph(rng) for _ in range(paragraphs)] for i in range(pages)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--paragraphs", type=int, default=20, help="paragraphs per page")
+    parser.add_argument("--edited-pages", type=int, default=2, help="pages with one paragraph rewritten")
+    args = parser.parse_args()
+
+    site = synthetic_site(args.pages, args.paragraphs)
+    rng = random.Random(1)
+    model = StubEmbeddings(latency=0.0)
+    folder_path = tempfile.mkdtemp(prefix="incremental_ingest_benchmark_")
+    embeddings = CachedEmbeddings(model, os.path.join(folder_path, "embedding_cache.sqlite3"))
+
+    knowledge_agent.FAISS_INDEX_PATH = os.path.join(folder_path, "index")
+    knowledge_agent.get_embeddings = lambda: embeddings
+    knowledge_agent.scrape_website_pages = lambda urls: {url: "\n\n".join(site[url]) for url in urls if url in site}
+    knowledge_agent.iter_website_pages = lambda urls: iter(knowledge_agent.scrape_website_pages(urls).items())
+
+    def edit_pages():
+        for url in rng.sample(sorted(site), args.edited_pages):
+            site[url][rng.randrange(args.paragraphs)] = _paragraph(rng)
+
+    def add_and_remove_page():
+        del site[sorted(site)[0]]
+        new_url = f"https://www.infinitepay.io/page-new-{len(site)}"
+        site[new_url] = [_paragraph(rng) for _ in range(args.paragraphs)]
+        knowledge_agent.KNOWLEDGE_BASE_URLS = sorted(site)
+
+    steps = [
+        ("initial build", None, False),
+        ("no change", None, False),
+        (f"{args.edited_pages} pages edited", edit_pages, False),
+        ("1 page added, 1 removed", add_and_remove_page, False),
+        ("forced full rebuild", None, True),
+    ]
+    knowledge_agent.KNOWLEDGE_BASE_URLS = sorted(site)
+
+    print(f"{args.pages} pages of {args.paragraphs} paragraphs, index type {FAISS_INDEX_TYPE}")
+    print(f"{'step':>24} | {'pages changed':>13} | {'chunks +/-':>11} | {'texts embedded':>14} | {'time (s)':>8}")
+    print("-" * 84)
+    try:
+        for label, change, full in steps:
+            if change:
+                change()
+            texts_before = model.texts_embedded
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                report = knowledge_agent.refresh_knowledge_base(full=full)
+            elapsed = time.perf_counter() - started
+            pages = report["pages"]
+            pages_changed = len(pages["added"]) + len(pages["changed"]) + len(pages["removed"])
+            chunks = f"+{report['chunks']['added']}/-{report['chunks']['removed']}"
+            print(f"{label:>24} | {pages_changed:>13} | {chunks:>11} | "
+                  f"{model.texts_embedded - texts_before:>14} | {elapsed:>8.2f}")
+    finally:
+        shutil.rmtree(folder_path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Measures the Knowledge Agent with and without its semantic answer cache.
+
+Each question group is asked several times, reworded; the first question of a group is a miss that
+runs the whole agent (tool selection, retrieval, synthesis), the following ones should be answered
+from the cache. LLMs, retrieval and embeddings are replaced by stubs with fixed latencies. The stub
+embeddings are lexical (shared words), so rewordings here keep most of their words; real paraphrase
+recall depends on the embedding model and KNOWLEDGE_CACHE_THRESHOLD.
+
+Usage:
+    python -m benchmarks.knowledge_cache --latency 0.3 --embedding-latency 0.05
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from benchmarks.stubs import StubChatModel, StubEmbeddings, constant_responder, percentile
+
+from Agents import knowledge_agent
+from utils.semantic_cache import SemanticCache
+
+QUESTION_GROUPS = [
+    ("pt", ["quanto custa a maquininha smart?", "Quanto custa a Maquininha Smart", "quanto custa a maquininha smart hoje?"]),
+    ("en", ["What are the fees of the Maquininha Smart?", "what are the fees of the maquininha smart", "What are the Maquininha Smart fees?"]),
+    ("en", ["How does tap to pay work?", "How does Tap to Pay work on my phone?", "how does tap to pay work"]),
+    ("pt", ["como funciona o pix parcelado?", "Como funciona o Pix Parcelado", "como funciona pix parcelado?"]),
+]
+ANSWER = "The Maquininha Smart has no monthly fee; rates start at 0.75% for debit and 2.69% for credit."
+
+
+class StubRetrievalTool:
+    """Stand-in for the `retrieve_knowledge` tool with a fixed latency (the RetrievalQA LLM call)."""
+
+    def __init__(self, chat_model: StubChatModel):
+        self.chat_model = chat_model
+
+    def invoke(self, args):
+        return self.chat_model.invoke(args).content
+
+
+def run(latency: float, embedding_latency: float, threshold: float, cache_enabled: bool) -> dict:
+    decision_llm = StubChatModel(constant_responder(ANSWER), latency)
+    synthesis_llm = StubChatModel(constant_responder(ANSWER), latency)
+    retrieval_llm = StubChatModel(constant_responder(ANSWER), latency)
+    embeddings = StubEmbeddings(latency=embedding_latency)
+
+    knowledge_agent.llm_rag_with_tools = decision_llm
+    knowledge_agent.llm_rag = synthesis_llm
+    knowledge_agent.retrieve_knowledge = StubRetrievalTool(retrieval_llm)
+    knowledge_agent.get_embeddings = lambda: embeddings
+    knowledge_agent.KNOWLEDGE_CACHE_ENABLED = cache_enabled
+    knowledge_agent.knowledge_answer_cache = SemanticCache(threshold=threshold)
+
+    hit_latencies, miss_latencies = [], []
+    for language, questions in QUESTION_GROUPS:
+        for question in questions:
+            state = {"question": question, "answer": "", "language": language, "actual_tool_outputs": {}}
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = knowledge_agent.knowledge_agent_node(state)
+            elapsed = time.perf_counter() - started
+            cache_trace = result["actual_tool_outputs"].get("semantic_cache", {})
+            (hit_latencies if cache_trace.get("hit") else miss_latencies).append(elapsed)
+
+    return {
+        "hits": len(hit_latencies),
+        "misses": len(miss_latencies),
+        "hit_ms": percentile(hit_latencies, 50) * 1000,
+        "miss_ms": percentile(miss_latencies, 50) * 1000,
+        "total_s": sum(hit_latencies) + sum(miss_latencies),
+        "llm_calls": decision_llm.calls + synthesis_llm.calls + retrieval_llm.calls,
+        "embedding_calls": embeddings.calls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.3, help="stub LLM latency per call (s)")
+    parser.add_argument("--embedding-latency", type=float, default=0.05, help="stub embedding latency per call (s)")
+    parser.add_argument("--threshold", type=float, default=0.8, help="similarity threshold (tuned for the stub embeddings)")
+    args = parser.parse_args()
+
+    total_questions = sum(len(questions) for _, questions in QUESTION_GROUPS)
+    print(f"{total_questions} questions in {len(QUESTION_GROUPS)} groups, stub LLM latency {args.latency * 1000:.0f} ms")
+    print(f"{'cache':>5} | {'hits':>4} | {'misses':>6} | {'p50 hit (ms)':>12} | {'p50 miss (ms)':>13} | {'LLM calls':>9} | {'total (s)':>9}")
+    print("-" * 80)
+    for cache_enabled in (False, True):
+        result = run(args.latency, args.embedding_latency, args.threshold, cache_enabled)
+        print(f"{'on' if cache_enabled else 'off':>5} | {result['hits']:>4} | {result['misses']:>6} | "
+              f"{result['hit_ms']:>12.2f} | {result['miss_ms']:>13.1f} | {result['llm_calls']:>9} | {result['total_s']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmarks the deterministic pt/en detector against langdetect.
+
+Reports accuracy on a labelled set of typical user messages and the average time per call for
+langdetect, the heuristic detector and the cached `detect_language` entry point.
+
+Usage:
+    python -m benchmarks.language_detection --repeat 200
+"""
+import argparse
+import time
+
+from benchmarks.stubs import PROJECT_ROOT  # noqa: F401  (adds the project root to sys.path)
+
+from langdetect import detect
+from utils.lang_detect import detect_language, detect_language_fast, warm_up_language_detector
+
+LABELLED_MESSAGES = [
+    ("What is the cost of the Maquininha Smart?", "en"),
+    ("What are the fees of the Maquininha Smart?", "en"),
+    ("How can I use my phone as a card machine?", "en"),
+    ("I can't sign in to my account.", "en"),
+    ("I'm not able to make payments?", "en"),
+    ("what is my current account balance?", "en"),
+    ("what were my last five transactions?", "en"),
+    ("show my last transactions", "en"),
+    ("Tell me about recent fintech innovations in Latin America.", "en"),
+    ("What's the forecast for inflation in Brazil this year?", "en"),
+    ("What are the credentials of user id client123?", "en"),
+    ("hi", "en"),
+    ("Tap to Pay", "en"),
+    ("qual meu saldo", "pt"),
+    ("quanto custa a maquininha?", "pt"),
+    ("preço da maquininha", "pt"),
+    ("Como posso usar meu telefone como uma máquina de cartão?", "pt"),
+    ("Quais são as taxas do Pix parcelado?", "pt"),
+    ("Não consigo acessar minha conta", "pt"),
+    ("quero ver minhas últimas transações", "pt"),
+    ("Olá, tudo bem?", "pt"),
+    ("obrigado", "pt"),
+    ("Como funciona a conta PJ?", "pt"),
+    ("preciso alterar meu email", "pt"),
+]
+
+
+def langdetect_pt_en(text: str) -> str:
+    try:
+        return 'pt' if detect(text) == 'pt' else 'en'
+    except Exception:
+        return 'en'
+
+
+def time_per_call(func, texts, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            func(text)
+    return (time.perf_counter() - started) / (repeat * len(texts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="Passes over the message set for timing")
+    args = parser.parse_args()
+
+    warm_up_language_detector()
+    texts = [text for text, _ in LABELLED_MESSAGES]
+
+    detectors = [
+        ("langdetect", langdetect_pt_en),
+        ("heuristic (fallback: langdetect)", lambda text: detect_language_fast(text) or langdetect_pt_en(text)),
+        ("detect_language (cached)", detect_language),
+    ]
+
+    print(f"{'detector':<34} | {'accuracy':>8} | {'us/call':>10}")
+    print("-" * 58)
+    for name, func in detectors:
+        correct = sum(1 for text, label in LABELLED_MESSAGES if func(text) == label)
+        per_call = time_per_call(func, texts, args.repeat)
+        print(f"{name:<34} | {correct / len(LABELLED_MESSAGES):>8.0%} | {per_call * 1e6:>10.1f}")
+
+    undecided = [text for text in texts if detect_language_fast(text) is None]
+    print(f"\nHeuristic undecided on {len(undecided)}/{len(texts)} messages (handled by langdetect): {undecided}")
+
+
+if __name__ == "__main__":
+    main()
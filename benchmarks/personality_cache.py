@@ -0,0 +1,67 @@
+"""
+Measures the personality response cache (PERSONALITY_CACHE_ENABLED) on a stream of knowledge agent
+answers where a few popular questions repeat constantly: the answer to the n-th most popular of
+--answers distinct questions is drawn with probability proportional to 1/n (Zipf). The personality
+LLM is a stub with a fixed latency, so the difference is the LLM calls skipped.
+
+Usage:
+    python -m benchmarks.personality_cache --requests 2000 --answers 200 --max-entries 50 100 1000
+"""
+import argparse
+import random
+import time
+
+from benchmarks.stubs import StubChatModel, constant_responder, percentile
+
+from Agents import personality_agent
+from utils.ttl_cache import TTLCache
+
+
+def _answers(count: int):
+    return [f"Answer {n}: the Maquininha Smart plan {n} costs 12x R$ {10 + n * 0.37:.2f} with no monthly fee."
+            for n in range(1, count + 1)]
+
+
+def run(requests, cache_enabled: bool, max_entries: int, latency: float) -> dict:
+    llm = StubChatModel(constant_responder("Restyled answer. Anything else I can help with?"), latency)
+    personality_agent.llm_personality = llm
+    personality_agent.PERSONALITY_CACHE_ENABLED = cache_enabled
+    personality_agent.personality_response_cache = TTLCache(ttl=3600, max_entries=max_entries)
+    latencies = []
+    for raw_output, language in requests:
+        state = {"messages": [], "raw_agent_output": raw_output, "final_response": None, "language": language,
+                 "current_query": "", "source_agent": "knowledge_agent", "personality_source": None}
+        started = time.perf_counter()
+        personality_agent.add_personality(state)
+        latencies.append(time.perf_counter() - started)
+    return {"llm_calls": llm.calls, "p50": percentile(latencies, 50), "p95": percentile(latencies, 95),
+            "total": sum(latencies), "cache": personality_agent.get_personality_cache_stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--answers", type=int, default=200, help="distinct knowledge agent answers")
+    parser.add_argument("--max-entries", type=int, nargs="+", default=[50, 100, 1000])
+    parser.add_argument("--latency", type=float, default=0.05, help="stub personality LLM latency (s)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    answers = _answers(args.answers)
+    weights = [1 / rank for rank in range(1, len(answers) + 1)]
+    requests = [(answer, rng.choice(("en", "pt"))) for answer in rng.choices(answers, weights, k=args.requests)]
+    print(f"{args.requests} requests over {args.answers} answers (Zipf), 2 languages, "
+          f"personality LLM latency {args.latency * 1000:.0f} ms")
+    print(f"{'cache':>12} | {'LLM calls':>9} | {'hit rate':>8} | {'evictions':>9} | {'p50 (ms)':>8} | {'p95 (ms)':>8} | {'total (s)':>9}")
+    print("-" * 82)
+    runs = [("off", False, 1)] + [(f"{size} entries", True, size) for size in args.max_entries]
+    for label, enabled, size in runs:
+        result = run(requests, enabled, size, args.latency)
+        cache = result["cache"]
+        print(f"{label:>12} | {result['llm_calls']:>9} | {(cache['hit_rate'] if enabled else 0):>8.1%} | "
+              f"{cache['evictions']:>9} | {result['p50'] * 1000:>8.2f} | {result['p95'] * 1000:>8.2f} | {result['total']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Measures the personality layer's fast path (PERSONALITY_FAST_PATH_ENABLED) on the outputs it
+receives in each flow: agent answers, the fixed rejection and escalation messages, and the
+default route (small talk or an unclassified message, with no agent output). The personality LLM
+is a stub with a fixed latency, so the difference is the LLM calls skipped.
+
+Usage:
+    python -m benchmarks.personality_fast_path --latency 0.4
+"""
+import argparse
+import time
+
+from benchmarks.stubs import StubChatModel, constant_responder, percentile
+
+from Agents import personality_agent
+from utils.canned_responses import system_message
+
+# (flow, source agent, raw agent output, user message, language)
+FLOWS = [
+    ("knowledge answer", "knowledge_agent", "The Maquininha Smart costs 12x R$ 16.58.", "quanto custa a maquininha?", "pt"),
+    ("support answer", "customer_support", "Your ticket 42 was created; our team will contact you.", "I need help", "en"),
+    ("access denied", "custom_agent", system_message("access_denied", "en"), "balance of client123", "en"),
+    ("support off topic", "customer_support", system_message("customer_support_off_topic", "pt"), "quem ganhou o jogo?", "pt"),
+    ("custom off topic", "custom_agent", system_message("custom_agent_off_topic", "en"), "tell me a joke", "en"),
+    ("slack escalation", "slack_agent", system_message("escalated", "en"), "give me the admin password", "en"),
+    ("greeting", "default", None, "Oi, tudo bem?", "pt"),
+    ("thanks", "default", None, "thanks a lot!", "en"),
+    ("unclassified", "default", None, "what can you do for my small business?", "en"),
+]
+
+
+def run(fast_path: bool, latency: float, repeats: int) -> dict:
+    llm = StubChatModel(constant_responder("Restyled answer. Anything else I can help with?"), latency)
+    personality_agent.llm_personality = llm
+    personality_agent.PERSONALITY_FAST_PATH_ENABLED = fast_path
+    personality_agent.PERSONALITY_CACHE_ENABLED = False  # measured by benchmarks.personality_cache
+    results = {}
+    for flow, source_agent, raw_output, query, language in FLOWS:
+        latencies, sources = [], set()
+        for _ in range(repeats):
+            state = {"messages": [], "raw_agent_output": raw_output, "final_response": None, "language": language,
+                     "current_query": query, "source_agent": source_agent, "personality_source": None}
+            started = time.perf_counter()
+            result = personality_agent.add_personality(state)
+            latencies.append(time.perf_counter() - started)
+            sources.add(result["personality_source"])
+        results[flow] = {"p50": percentile(latencies, 50), "source": ", ".join(sorted(sources))}
+    results["llm_calls"] = llm.calls
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.4, help="stub personality LLM latency (s)")
+    parser.add_argument("--repeats", type=int, default=3, help="runs per flow")
+    args = parser.parse_args()
+
+    before, after = run(False, args.latency, args.repeats), run(True, args.latency, args.repeats)
+    print(f"Personality LLM latency {args.latency * 1000:.0f} ms, {args.repeats} runs per flow")
+    print(f"{'flow':>18} | {'LLM only p50 (s)':>16} | {'fast path p50 (s)':>17} | {'answered by':<28}")
+    print("-" * 88)
+    for flow, *_ in FLOWS:
+        print(f"{flow:>18} | {before[flow]['p50']:>16.3f} | {after[flow]['p50']:>17.4f} | {after[flow]['source']:<28}")
+    print(f"\nPersonality LLM calls: {before['llm_calls']} without the fast path, {after['llm_calls']} with it "
+          f"({len(FLOWS) * args.repeats} responses)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Compares the two Knowledge Agent retrieval modes (KNOWLEDGE_RETRIEVAL_MODE).
+
+- qa: retrieve_knowledge runs a RetrievalQA chain (one LLM call) and the agent synthesizes again.
+- chunks: retrieve_knowledge returns the top-k chunks with scores and sources; the agent answers
+  in a single LLM pass.
+
+The knowledge base is a small FAISS index built with stub embeddings and served from disk as the API
+does, and every LLM is a
+fake model with a fixed latency, so the difference is the number of sequential LLM calls.
+
+Usage:
+    python -m benchmarks.retrieval_modes --latency 0.3 --questions 10
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import shutil
+
+from benchmarks.stubs import StubChatModel, StubEmbeddings, constant_responder, percentile, serve_knowledge_base
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from Agents import knowledge_agent
+
+KNOWLEDGE_BASE = [
+    ("https://www.infinitepay.io/maquininha", "Maquininha Smart: 0.75% on debit, 2.69% on credit, 0.00% on Pix."),
+    ("https://www.infinitepay.io/tap-to-pay", "InfiniteTap turns your phone into a card machine with contactless payments."),
+    ("https://www.infinitepay.io/pix-parcelado", "Pix Parcelado lets your customers pay with Pix in installments."),
+    ("https://www.infinitepay.io/link-de-pagamento", "Payment links: credit 5.49%, up to 12 installments."),
+    ("https://www.infinitepay.io/conta-digital", "The digital account has no monthly fee and free transfers."),
+    ("https://www.infinitepay.io/emprestimo", "Loans for businesses with rates based on your sales."),
+]
+QUESTIONS = [
+    "What are the fees of the Maquininha Smart?",
+    "How can I use my phone as a card machine with tap to pay?",
+    "Quais as taxas do pix parcelado na maquininha?",
+    "What are the payment link fees?",
+]
+ANSWER = "The Maquininha Smart costs 0.75% on debit and 2.69% on credit."
+
+
+class CountingFakeChatModel(FakeListChatModel):
+    """Fake chat model (usable inside LangChain chains) that counts its calls."""
+    calls: int = 0
+
+    def _call(self, *args, **kwargs) -> str:
+        self.calls += 1
+        return super()._call(*args, **kwargs)
+
+
+def run(mode: str, latency: float, questions: int) -> dict:
+    decision_llm = StubChatModel(constant_responder(ANSWER), latency)
+    rag_llm = CountingFakeChatModel(responses=[ANSWER], sleep=latency)
+
+    knowledge_agent.llm_rag_with_tools = decision_llm
+    knowledge_agent.llm_rag = rag_llm
+    knowledge_agent.KNOWLEDGE_CACHE_ENABLED = False
+    knowledge_agent.KNOWLEDGE_RETRIEVAL_MODE = mode
+    # The RetrievalQA chain is built with llm_rag when the index is loaded
+    with contextlib.redirect_stdout(io.StringIO()):
+        index_directory = serve_knowledge_base(
+            [text for _, text in KNOWLEDGE_BASE], [{"source": url} for url, _ in KNOWLEDGE_BASE],
+            StubEmbeddings(latency=0.0)
+        )
+
+    latencies = []
+    try:
+        for index in range(questions):
+            state = {"question": QUESTIONS[index % len(QUESTIONS)], "answer": "", "language": "en", "actual_tool_outputs": {}}
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = knowledge_agent.knowledge_agent_node(state)
+            latencies.append(time.perf_counter() - started)
+    finally:
+        shutil.rmtree(index_directory, ignore_errors=True)
+
+    return {
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "llm_calls": (decision_llm.calls + rag_llm.calls) / questions,
+        "tool_output": result["actual_tool_outputs"].get("retrieve_knowledge", ""),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.3, help="fake LLM latency per call (s)")
+    parser.add_argument("--questions", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"Fake LLM latency: {args.latency * 1000:.0f} ms per call, {args.questions} questions per mode")
+    print(f"{'mode':>6} | {'p50 (s)':>8} | {'p95 (s)':>8} | {'LLM calls / question':>20}")
+    print("-" * 52)
+    outputs = {}
+    for mode in ("qa", "chunks"):
+        result = run(mode, args.latency, args.questions)
+        outputs[mode] = result["tool_output"]
+        print(f"{mode:>6} | {result['p50']:>8.3f} | {result['p95']:>8.3f} | {result['llm_calls']:>20.1f}")
+
+    print("\nretrieve_knowledge output in chunks mode (last question):")
+    print(outputs["chunks"])
+
+
+if __name__ == "__main__":
+    main()
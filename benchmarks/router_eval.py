@@ -0,0 +1,161 @@
+"""
+Offline accuracy/latency evaluation of the nearest-exemplar router (ROUTER_MODE=knn).
+
+Runs every scenario of `test-cases.md` through `classify_route_knn` and reports the predicted label,
+the vote margin, whether the router would escalate to the LLM, accuracy and latency (embedding +
+search). The expected label is the router decision recorded in the scenario's response, or else the
+agent its section tests. With `--leave-one-out`, every exemplar is also classified against all the
+others, which measures how well the exemplar set separates the labels.
+
+Unlike the other benchmarks this one calls the real embedding model, so GOOGLE_API_KEY must be set.
+
+Usage:
+    python -m benchmarks.router_eval --min-margin 0.3 --leave-one-out
+"""
+import argparse
+import json
+import os
+import re
+import time
+from typing import List, Optional, Tuple
+
+from benchmarks.stubs import PROJECT_ROOT, percentile
+
+import numpy as np
+from langchain_core.documents import Document
+
+from Agents.exemplar_router import ROUTER_KNN_K, classify_route_knn, load_exemplar_index, _vote
+from data.router_exemplars import ROUTER_EXEMPLARS
+from utils.embeddings import get_embeddings
+
+TEST_CASES_PATH = os.path.join(PROJECT_ROOT, "test-cases.md")
+
+# Agent names used in the documented workflows -> router labels
+AGENT_NAME_TO_LABEL = {
+    "CustomerSupportAgent": "customer_support",
+    "KnowledgeAgent": "knowledge_agent",
+    "CustomAgent": "custom_agent",
+    "SlackAgent": "slack_agent",
+    "PersonalityLayer": "default",
+}
+# Section headings of test-cases.md -> label of the agent the section tests
+SECTION_TO_LABEL = [
+    ("customer support", "customer_support"),
+    ("custom-agent", "custom_agent"),
+    ("custom agent", "custom_agent"),
+    ("knowledge agent", "knowledge_agent"),
+]
+
+MESSAGE_PATTERN = re.compile(r'"message"\s*:\s*("(?:[^"\\]|\\.)*")')
+DECISION_PATTERN = re.compile(r'"LLM_decision"\s*:\s*"(\w+)"')
+
+
+def _section_label(heading: str) -> Optional[str]:
+    heading = heading.lower()
+    for fragment, label in SECTION_TO_LABEL:
+        if fragment in heading:
+            return label
+    return None
+
+
+def load_scenarios(path: str = TEST_CASES_PATH) -> List[Tuple[str, str]]:
+    """Returns (message, expected label) for every scenario of test-cases.md with a known label."""
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+
+    scenarios = []
+    section_label = None
+    current = None  # [message, label]
+    for line in lines:
+        if line.startswith("### "):
+            section_label = _section_label(line)
+
+        message_match = MESSAGE_PATTERN.search(line)
+        if message_match:
+            current = [json.loads(message_match.group(1)), section_label]
+            scenarios.append(current)
+            continue
+
+        decision_match = DECISION_PATTERN.search(line)
+        if decision_match and current is not None:
+            current[1] = AGENT_NAME_TO_LABEL.get(decision_match.group(1), current[1])
+
+    return [(message, label) for message, label in scenarios if label]
+
+
+def evaluate_scenarios(scenarios: List[Tuple[str, str]], min_margin: float, k: int) -> None:
+    print(f"{'expected':>16} | {'predicted':>16} | {'margin':>6} | {'ms':>7} | message")
+    print("-" * 100)
+    latencies = []
+    correct = accepted = accepted_correct = 0
+    for message, expected in scenarios:
+        started = time.perf_counter()
+        result = classify_route_knn(message, k=k)
+        latencies.append(time.perf_counter() - started)
+        if result is None:
+            print(f"{expected:>16} | {'(unavailable)':>16} | {'':>6} | {latencies[-1] * 1000:>7.1f} | {message}")
+            continue
+
+        is_correct = result["agent"] == expected
+        is_accepted = result["margin"] >= min_margin
+        correct += is_correct
+        accepted += is_accepted
+        accepted_correct += is_correct and is_accepted
+        flag = "" if is_accepted else "  -> LLM"
+        print(f"{expected:>16} | {result['agent']:>16} | {result['margin']:>6.2f} | {latencies[-1] * 1000:>7.1f} | {message}{flag}")
+
+    total = len(scenarios)
+    print(f"\nScenarios: {total}")
+    print(f"  k-NN accuracy           : {correct}/{total}")
+    print(f"  decided without the LLM : {accepted}/{total} (margin >= {min_margin})")
+    print(f"  accuracy when decided   : {accepted_correct}/{accepted}" if accepted else "  accuracy when decided   : n/a")
+    print(f"  latency p50 / p95       : {percentile(latencies, 50) * 1000:.1f} / {percentile(latencies, 95) * 1000:.1f} ms")
+
+
+def evaluate_leave_one_out(min_margin: float, k: int) -> None:
+    """Classifies every exemplar against all the other exemplars (embeddings computed once)."""
+    texts = [text for exemplars in ROUTER_EXEMPLARS.values() for text in exemplars]
+    labels = [label for label, exemplars in ROUTER_EXEMPLARS.items() for _ in exemplars]
+    vectors = np.asarray(get_embeddings().embed_documents(texts), dtype="float32")
+    documents = [Document(page_content=text, metadata={"label": label}) for text, label in zip(texts, labels)]
+
+    correct = accepted = accepted_correct = 0
+    for index in range(len(texts)):
+        # L2 distances, like the FAISS flat index used by the router
+        distances = np.linalg.norm(vectors - vectors[index], axis=1)
+        distances[index] = np.inf
+        nearest = np.argsort(distances)[:k]
+        result = _vote([(documents[i], float(distances[i])) for i in nearest])
+        is_correct = result["agent"] == labels[index]
+        is_accepted = result["margin"] >= min_margin
+        correct += is_correct
+        accepted += is_accepted
+        accepted_correct += is_correct and is_accepted
+        if not is_correct:
+            print(f"  miss: {texts[index]!r} ({labels[index]}) -> {result['agent']} (margin {result['margin']:.2f})")
+
+    print(f"\nLeave-one-out over {len(texts)} exemplars:")
+    print(f"  k-NN accuracy           : {correct}/{len(texts)}")
+    print(f"  decided without the LLM : {accepted}/{len(texts)}")
+    print(f"  accuracy when decided   : {accepted_correct}/{accepted}" if accepted else "  accuracy when decided   : n/a")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-margin", type=float, default=float(os.getenv("ROUTER_KNN_MIN_MARGIN", "0.3")))
+    parser.add_argument("-k", type=int, default=ROUTER_KNN_K)
+    parser.add_argument("--leave-one-out", action="store_true", help="also cross-validate the exemplar set")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if load_exemplar_index() is None:
+        raise SystemExit("Router exemplar index unavailable (is GOOGLE_API_KEY set?)")
+    print(f"Exemplar index ready in {time.perf_counter() - started:.2f}s\n")
+
+    evaluate_scenarios(load_scenarios(), args.min_margin, args.k)
+    if args.leave_one_out:
+        evaluate_leave_one_out(args.min_margin, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Compares the old sequential scraper with the concurrent one in utils/scraper.py, offline.
+
+The knowledge base pages are served by the local fixture server (benchmarks/fixture_server.py)
+with a fixed latency per request. Rows:
+  - sequential: the previous implementation (requests + BeautifulSoup, one page after the other)
+  - concurrent, cold: utils.scraper with an empty revalidation cache, with and without the per-host rate limit
+  - concurrent, revalidated: the same pages again, answered with 304 Not Modified and not re-extracted
+
+Usage:
+    python -m benchmarks.scraper --latency 0.2 --page-kb 150
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+
+import requests
+from bs4 import BeautifulSoup
+
+from benchmarks.fixture_server import FixtureServer, knowledge_base_fixtures
+
+from utils.scraper import SCRAPER_CONCURRENCY, SCRAPER_EXTRACT_WORKERS, SCRAPER_HOST_RATE, PageCache, scrape_pages
+
+
+def scrape_sequential(urls):
+    """The scraper before utils/scraper.py."""
+    pages = {}
+    for url in urls:
+        try:
+            response = requests.get(url, timeout=10)
+            response.raise_for_status()
+            soup = BeautifulSoup(response.text, 'html.parser')
+            for script in soup(["script", "style"]):
+                script.decompose()
+            content = soup.get_text(separator=' ', strip=True)
+            if content:
+                pages[url] = content
+        except requests.RequestException as e:
+            print(f"Error scraping website {url}: {e}")
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2, help="server delay per request (s)")
+    parser.add_argument("--page-kb", type=int, default=150, help="size of every page (KB)")
+    args = parser.parse_args()
+
+    server = FixtureServer(knowledge_base_fixtures(args.page_kb), latency=args.latency).start()
+    urls = [server.origin + path for path in server.pages]
+    folder_path = tempfile.mkdtemp(prefix="scraper_benchmark_")
+    cache_path = os.path.join(folder_path, "scraper_cache.sqlite3")
+    cache = None
+
+    print(f"{len(urls)} pages of {args.page_kb} KB, {args.latency}s server latency, "
+          f"concurrency {SCRAPER_CONCURRENCY}, {SCRAPER_EXTRACT_WORKERS} extraction workers")
+    print(f"{'scraper':>40} | {'time (s)':>8} | {'pages':>5} | {'fetched':>7} | {'304':>4} | {'same text':>9}")
+    print("-" * 89)
+    # (label, per-host rate or None for the sequential scraper, start from an empty cache)
+    rows = [
+        ("sequential (requests, bs4)", None, False),
+        (f"concurrent, cold, {SCRAPER_HOST_RATE:g} req/s per host", SCRAPER_HOST_RATE, True),
+        ("concurrent, revalidated (304)", SCRAPER_HOST_RATE, False),
+        ("concurrent, cold, no rate limit", 0, True),
+        ("concurrent, revalidated, no rate limit", 0, False),
+    ]
+    baseline = None
+    try:
+        for label, host_rate, empty_cache in rows:
+            if empty_cache:
+                if cache is not None:
+                    cache.close()
+                    os.remove(cache_path)
+                cache = PageCache(cache_path)
+            stats = Counter()
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                if host_rate is None:
+                    pages = scrape_sequential(urls)
+                    stats["fetched"] = len(pages)
+                else:
+                    pages = scrape_pages(urls, cache=cache, stats=stats, host_rate=host_rate)
+            elapsed = time.perf_counter() - started
+            baseline = baseline or pages
+            print(f"{label:>40} | {elapsed:>8.2f} | {len(pages):>5} | {stats['fetched']:>7} | "
+                  f"{stats['not_modified']:>4} | {str(pages == baseline):>9}")
+    finally:
+        if cache is not None:
+            cache.close()
+        server.stop()
+        shutil.rmtree(folder_path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Compares the Knowledge Agent's sequential flow with speculative mode (KNOWLEDGE_SPECULATIVE_ENABLED).
+
+- sequential: the LLM selects retrieve_knowledge, the answer is synthesized from the chunks, and
+  when it is insufficient a web search and another LLM call follow (up to five round-trips).
+- speculative: the knowledge base lookup and the web search start together; a confident
+  retrieval cancels the search, otherwise one LLM call answers from both.
+
+The knowledge base is a small FAISS index over stub embeddings, served from disk as the API does, the LLMs and the search
+backend are stubs with fixed latencies, and the answer cache is off. Questions the knowledge base
+covers get an answer from the chunks; the others ("miss") only from the web search results.
+
+The retrieval confidence of every question is printed at the end. With `--embeddings google` the
+index is built with the real embedding model (GOOGLE_API_KEY must be set), which is how to choose
+KNOWLEDGE_SPECULATIVE_MIN_SCORE: above the scores of the missed questions, below the covered ones.
+
+Usage:
+    python -m benchmarks.speculative_knowledge --llm-latency 0.3 --search-latency 0.5 --questions 40
+    python -m benchmarks.speculative_knowledge --embeddings google --min-score 0.8
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import shutil
+import time
+import uuid
+from typing import Any, List
+
+from benchmarks.stubs import StubChatModel, StubEmbeddings, StubSearchBackend, percentile, serve_knowledge_base
+
+from langchain_core.messages import AIMessage
+
+from Agents import knowledge_agent
+from utils.embeddings import get_embeddings
+from utils.ttl_cache import TTLCache
+from utils.web_search import CircuitBreaker, WebSearchClient
+
+KNOWLEDGE_BASE = [
+    ("https://www.infinitepay.io/maquininha", "The Maquininha Smart fees are 0.75% on debit, 2.69% on credit and 0% on Pix."),
+    ("https://www.infinitepay.io/tap-to-pay", "With tap to pay you use your phone as a card machine for contactless payments."),
+    ("https://www.infinitepay.io/pix-parcelado", "With Pix parcelado customers can pay with Pix in installments."),
+    ("https://www.infinitepay.io/link-de-pagamento", "The payment link fees are 5.49% on credit, in up to 12 installments."),
+    ("https://www.infinitepay.io/conta-digital", "The digital account does not have a monthly fee and transfers are free."),
+    ("https://www.infinitepay.io/emprestimo", "Business loans have rates based on your sales."),
+]
+# (question, covered by the knowledge base)
+QUESTIONS = [
+    ("What are the Maquininha Smart fees?", True),
+    ("How do I use my phone as a card machine with tap to pay?", True),
+    ("Can customers pay with Pix in installments?", True),
+    ("What are the payment link fees?", True),
+    ("Does the digital account have a monthly fee?", True),
+    ("What is the current Selic rate set by the central bank?", False),
+    ("Which Brazilian banks had the largest profits last year?", False),
+]
+ANSWER = "Here is what InfinitePay offers for this, with the fees and conditions that apply."
+NO_ANSWER = "I don't know based on the provided context."
+
+
+def _text(messages: Any) -> str:
+    return " ".join(str(getattr(message, "content", message)) for message in messages)
+
+
+def _responder(messages: Any) -> str:
+    """Answers when the prompt holds web search results or the question is one the knowledge base covers."""
+    text = _text(messages)
+    if "Search information" in text:
+        return ANSWER
+    covered = [question for question, in_knowledge_base in QUESTIONS if in_knowledge_base]
+    return ANSWER if any(question in text for question in covered) else NO_ANSWER
+
+
+class ToolSelectingStubChatModel(StubChatModel):
+    """Tool-selection LLM stand-in: always asks for retrieve_knowledge with the user's question."""
+
+    def _tool_call(self, messages: Any) -> AIMessage:
+        question = str(messages[-1].content)
+        return AIMessage(content="", tool_calls=[
+            {"name": "retrieve_knowledge", "args": {"question": question}, "id": str(uuid.uuid4())}
+        ])
+
+    def invoke(self, messages: Any, config=None, **kwargs) -> AIMessage:
+        super().invoke(messages, config, **kwargs)
+        return self._tool_call(messages)
+
+    async def ainvoke(self, messages: Any, config=None, **kwargs) -> AIMessage:
+        await super().ainvoke(messages, config, **kwargs)
+        return self._tool_call(messages)
+
+
+def _setup(args: argparse.Namespace, speculative: bool):
+    decision_llm = ToolSelectingStubChatModel(lambda messages: "", args.llm_latency)
+    synthesis_llm = StubChatModel(_responder, args.llm_latency)
+    backend = StubSearchBackend(latency=args.search_latency)
+
+    knowledge_agent.KNOWLEDGE_CACHE_ENABLED = False
+    knowledge_agent.KNOWLEDGE_RETRIEVAL_MODE = "chunks"
+    knowledge_agent.KNOWLEDGE_SPECULATIVE_ENABLED = speculative
+    knowledge_agent.KNOWLEDGE_SPECULATIVE_MIN_SCORE = args.min_score
+    knowledge_agent.llm_rag_with_tools = decision_llm
+    knowledge_agent.llm_rag = synthesis_llm
+    knowledge_agent.web_search_client = WebSearchClient(
+        backend, timeout=args.search_timeout, cache=TTLCache(ttl=900) if args.search_cache else None,
+        breaker=CircuitBreaker(failure_threshold=1000)
+    )
+    return decision_llm, synthesis_llm, backend
+
+
+async def _run(args: argparse.Namespace, speculative: bool) -> dict:
+    decision_llm, synthesis_llm, backend = _setup(args, speculative)
+    latencies = {True: [], False: []}
+    outcomes: List[str] = []
+    answered = 0
+    for index in range(args.questions):
+        question, covered = QUESTIONS[index % len(QUESTIONS)]
+        state = {"question": question, "answer": "", "language": "en", "actual_tool_outputs": {}}
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = await knowledge_agent.aknowledge_agent_node(state)
+        latencies[covered].append(time.perf_counter() - started)
+        answered += result["answer"] == ANSWER
+        outcomes.append(result["actual_tool_outputs"].get("speculative", {}).get("web_search", "-"))
+    # Let cancelled searches settle before the next run swaps the client
+    await asyncio.sleep(args.search_latency)
+    everything = latencies[True] + latencies[False]
+    return {
+        "p50": percentile(everything, 50), "p95": percentile(everything, 95), "p99": percentile(everything, 99),
+        "hit_p50": percentile(latencies[True], 50), "miss_p50": percentile(latencies[False], 50),
+        "llm_calls": (decision_llm.calls + synthesis_llm.calls) / args.questions,
+        "searches": backend.calls, "cancelled": outcomes.count("cancelled"),
+        "answered": answered,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="stub LLM latency per call (s)")
+    parser.add_argument("--search-latency", type=float, default=0.5, help="stub web search latency (s)")
+    parser.add_argument("--embedding-latency", type=float, default=0.05, help="stub embedding latency per call (s)")
+    parser.add_argument("--search-timeout", type=float, default=5.0, help="web search deadline (s)")
+    parser.add_argument("--embeddings", choices=("stub", "google"), default="stub",
+                        help="stub hashed word counts, or the real embedding model")
+    # Hashed word counts are far cruder than real embeddings: covered questions score 0.41-0.91 and
+    # missed ones 0.09-0.15 here
+    parser.add_argument("--min-score", type=float, default=0.3,
+                        help="retrieval confidence (cosine similarity) that cancels the speculative search")
+    parser.add_argument("--search-cache", action="store_true", help="cache web search results (off: every search is a miss)")
+    parser.add_argument("--questions", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"LLM {args.llm_latency * 1000:.0f} ms, search {args.search_latency * 1000:.0f} ms, "
+          f"embeddings {args.embedding_latency * 1000:.0f} ms per call; {args.questions} questions, "
+          f"{sum(1 for _, covered in QUESTIONS if not covered)}/{len(QUESTIONS)} not covered by the knowledge base; "
+          f"min score {args.min_score}")
+    print(f"{'mode':>11} | {'p50 (s)':>7} | {'p95 (s)':>7} | {'p99 (s)':>7} | {'covered p50':>11} | "
+          f"{'miss p50':>8} | {'LLM calls/q':>11} | {'searches':>8} | {'cancelled':>9} | {'answered':>8}")
+    print("-" * 112)
+    # Unit vectors, like the embedding model's: the ranking depends on the words shared, not on text
+    # length. The RetrievalQA chain built on load (unused in chunks mode) keeps the real llm_rag.
+    embeddings = get_embeddings() if args.embeddings == "google" else StubEmbeddings(
+        latency=args.embedding_latency, normalize=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        index_directory = serve_knowledge_base(
+            [text for _, text in KNOWLEDGE_BASE], [{"source": url} for url, _ in KNOWLEDGE_BASE], embeddings
+        )
+    try:
+        for label, speculative in (("sequential", False), ("speculative", True)):
+            result = asyncio.run(_run(args, speculative))
+            print(f"{label:>11} | {result['p50']:>7.3f} | {result['p95']:>7.3f} | {result['p99']:>7.3f} | "
+                  f"{result['hit_p50']:>11.3f} | {result['miss_p50']:>8.3f} | {result['llm_calls']:>11.2f} | "
+                  f"{result['searches']:>8} | {result['cancelled']:>9} | {result['answered']:>8}")
+
+        print("\nRetrieval confidence per question (speculative search cancelled at >= min score):")
+        retriever = knowledge_agent._retriever
+        for question, covered in QUESTIONS:
+            _, confidence = retriever.search_with_confidence(question)
+            print(f"  {confidence:.3f}  {'covered' if covered else 'miss   '}  {question}")
+    finally:
+        shutil.rmtree(index_directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
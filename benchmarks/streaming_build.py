@@ -0,0 +1,193 @@
+"""
+Measures building the knowledge base index in one shot vs with the streaming builder
+(utils/streaming_build.py), and resuming an interrupted streaming build.
+
+For every corpus size, a fresh worker process builds a flat index over a synthetic site and reports
+the wall time and its peak private memory (RssAnon, sampled) above the baseline after imports,
+also net of the size of the index itself (which any build must hold):
+- one shot: every page is split, then all chunks are embedded and indexed at once (`ingest_pages`
+  without an existing index, the build used before the streaming builder);
+- streaming: pages are generated one at a time and fed to StreamingIndexBuilder, which embeds
+  EMBEDDING_BATCH_SIZE chunks at a time into its on-disk checkpoint.
+
+Then a streaming build is interrupted after a few batches and resumed, with some calls to the
+embedding model failing with a (retried) rate-limit error, to count the texts embedded twice.
+
+Usage:
+    python -m benchmarks.streaming_build --pages 200 1000 4000 --dim 768
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Iterator, List, Tuple
+
+# Retries of the simulated rate limits should not slow the benchmark down
+os.environ.setdefault("EMBEDDING_RETRY_BASE_DELAY", "0.01")
+
+from benchmarks.incremental_ingest import synthetic_site
+from benchmarks.stubs import StubEmbeddings
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from utils.embeddings import EMBEDDING_BATCH_SIZE
+
+PARAGRAPHS = 20
+
+
+def _private_memory_mb() -> float:
+    """Returns the private resident memory (RssAnon) of this process, in MB."""
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+class PeakMemory:
+    """
+    Samples the private resident memory of this process in a background thread and keeps the
+    peak. File pages of the memory-mapped vectors are not private memory (the OS can drop them at
+    any time), so VmHWM would overstate the streaming build.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.baseline = _private_memory_mb()
+        self.peak = self.baseline
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.peak = max(self.peak, _private_memory_mb())
+
+    def __enter__(self) -> "PeakMemory":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stopped.set()
+        self._thread.join()
+        self.peak = max(self.peak, _private_memory_mb())
+
+
+def _pages(pages: int) -> Iterator[Tuple[str, str]]:
+    """Yields the synthetic site one page at a time, so the whole corpus is never in memory."""
+    for i in range(pages):
+        url, paragraphs = next(iter(synthetic_site(1, PARAGRAPHS, seed=i).items()))
+        yield f"{url}-{i}", "\n\n".join(paragraphs)
+
+
+class FlakyEmbeddings(StubEmbeddings):
+    """Stub embeddings whose every `fail_every`-th call fails with a rate-limit error, and which
+    fail for good (like a killed process) after `crash_after` calls."""
+
+    def __init__(self, dimension: int, fail_every: int = 0, crash_after: int = 0):
+        super().__init__(dimension, latency=0.0)
+        self.fail_every = fail_every
+        self.crash_after = crash_after
+        self.attempts = 0
+        self.rate_limited = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.attempts += 1
+        if self.crash_after and self.calls >= self.crash_after:
+            raise KeyboardInterrupt("build interrupted")
+        if self.fail_every and self.attempts % self.fail_every == 0:
+            self.rate_limited += 1
+            raise RuntimeError("429 ResourceExhausted: quota exceeded")
+        return super().embed_documents(texts)
+
+
+def _worker(mode: str, pages: int, dim: int, results) -> None:
+    from utils.knowledge_ingest import ingest_pages
+    from utils.streaming_build import StreamingIndexBuilder
+
+    split_text = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50).split_text
+    embeddings = StubEmbeddings(dimension=dim, latency=0.0)
+    folder_path = tempfile.mkdtemp(prefix="streaming_build_benchmark_")
+    started = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), PeakMemory() as memory:
+            if mode == "one shot":
+                site = dict(_pages(pages))
+                vectorstore, _, _ = ingest_pages(None, None, site, list(site), split_text, embeddings)
+            else:
+                builder = StreamingIndexBuilder(os.path.join(folder_path, "index"), embeddings)
+                for url, text in _pages(pages):
+                    builder.add_page(url, text, split_text)
+                vectorstore, _, _ = builder.finish()
+        results.put({"seconds": time.perf_counter() - started, "chunks": vectorstore.index.ntotal,
+                     "peak_mb": memory.peak - memory.baseline,
+                     "index_mb": vectorstore.index.ntotal * dim * 4 / 2 ** 20})
+    finally:
+        shutil.rmtree(folder_path, ignore_errors=True)
+
+
+def _measure(mode: str, pages: int, dim: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_worker, args=(mode, pages, dim, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def _resume(pages: int, dim: int) -> None:
+    from utils.streaming_build import StreamingIndexBuilder
+
+    split_text = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50).split_text
+    folder_path = tempfile.mkdtemp(prefix="streaming_build_benchmark_")
+    index_path = os.path.join(folder_path, "index")
+    try:
+        interrupted = FlakyEmbeddings(dim, fail_every=7, crash_after=10)
+        with contextlib.redirect_stdout(io.StringIO()):
+            builder = StreamingIndexBuilder(index_path, interrupted)
+            try:
+                for url, text in _pages(pages):
+                    builder.add_page(url, text, split_text)
+            except KeyboardInterrupt:
+                pass
+            builder.close()
+
+            resumed = FlakyEmbeddings(dim, fail_every=7)
+            builder = StreamingIndexBuilder(index_path, resumed)
+            for url, text in _pages(pages):
+                builder.add_page(url, text, split_text)
+            vectorstore, _, report = builder.finish()
+        embedded = interrupted.texts_embedded + resumed.texts_embedded
+        print(f"\nInterrupted after {interrupted.calls} batches ({interrupted.texts_embedded} texts), "
+              f"resumed with {builder.resumed_pages}/{pages} pages done: {resumed.texts_embedded} more texts embedded, "
+              f"{embedded - vectorstore.index.ntotal} embedded twice, {vectorstore.index.ntotal} chunks indexed. "
+              f"{interrupted.rate_limited + resumed.rate_limited} rate-limited calls were retried.")
+    finally:
+        shutil.rmtree(folder_path, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[200, 1000, 4000])
+    parser.add_argument("--dim", type=int, default=768)
+    args = parser.parse_args()
+
+    print(f"{PARAGRAPHS} paragraphs per page, dimension {args.dim}, batches of {EMBEDDING_BATCH_SIZE}")
+    print(f"{'pages':>6} | {'chunks':>7} | {'build':>9} | {'time (s)':>8} | {'peak private (MB)':>17} | "
+          f"{'index (MB)':>10} | {'peak - index':>12}")
+    print("-" * 92)
+    for pages in args.pages:
+        for mode in ("one shot", "streaming"):
+            result = _measure(mode, pages, args.dim)
+            print(f"{pages:>6} | {result['chunks']:>7} | {mode:>9} | {result['seconds']:>8.2f} | "
+                  f"{result['peak_mb']:>17.1f} | {result['index_mb']:>10.1f} | {result['peak_mb'] - result['index_mb']:>12.1f}")
+    _resume(args.pages[0], args.dim)
+
+
+if __name__ == "__main__":
+    main()
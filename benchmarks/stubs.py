@@ -0,0 +1,158 @@
+"""
+Offline stand-ins used by the benchmarks so they run without API keys or network.
+The stubs mimic only the parts of the LangChain interfaces that the agents call.
+"""
+import asyncio
+import math
+import os
+import re
+import sys
+import tempfile
+import time
+import zlib
+from typing import Any, Callable, List, Optional
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# The agents instantiate ChatGoogleGenerativeAI at import time, which requires an API key.
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder-key")
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage
+
+
+class StubChatModel:
+    """
+    Chat model stand-in with a fixed latency per call.
+    `invoke` blocks the calling thread (like a sync HTTP client), `ainvoke` yields to the event loop.
+    """
+
+    def __init__(self, responder: Callable[[Any], str], latency: float = 0.2):
+        self.responder = responder
+        self.latency = latency
+        self.calls = 0
+
+    def bind_tools(self, tools: List[Any], **kwargs) -> "StubChatModel":
+        return self
+
+    def invoke(self, messages: Any, config: Optional[dict] = None, **kwargs) -> AIMessage:
+        self.calls += 1
+        time.sleep(self.latency)
+        return AIMessage(content=self.responder(messages))
+
+    async def ainvoke(self, messages: Any, config: Optional[dict] = None, **kwargs) -> AIMessage:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return AIMessage(content=self.responder(messages))
+
+
+class StubEmbeddings(Embeddings):
+    """
+    Embeddings stand-in: deterministic bag-of-words vectors (hashed word counts) with a fixed latency
+    per call. Texts sharing words are similar, so it exercises similarity lookups without a model.
+    With `normalize` the vectors have unit length, like the embedding model's.
+    """
+
+    def __init__(self, dimension: int = 256, latency: float = 0.05, normalize: bool = False):
+        self.dimension = dimension
+        self.latency = latency
+        self.normalize = normalize
+        self.calls = 0
+        self.texts_embedded = 0
+        self.model = "stub-embeddings"
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimension
+        for word in re.findall(r"\w+", text.lower()):
+            vector[zlib.crc32(word.encode("utf-8")) % self.dimension] += 1.0
+        norm = math.sqrt(sum(value * value for value in vector))
+        if self.normalize and norm:
+            vector = [value / norm for value in vector]
+        return vector
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        self.texts_embedded += 1
+        time.sleep(self.latency)
+        return self._embed(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        self.texts_embedded += 1
+        await asyncio.sleep(self.latency)
+        return self._embed(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        self.texts_embedded += len(texts)
+        time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+
+class StubSearchBackend:
+    """
+    Web search backend stand-in for utils.web_search: answers after `latency` seconds, or raises
+    a connection error when `failing`. Both can be changed between calls to simulate an outage.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency: float = 0.3, failing: bool = False):
+        self.latency = latency
+        self.failing = failing
+        self.calls = 0
+
+    def _result(self, query: str) -> str:
+        if self.failing:
+            raise ConnectionError("search backend unavailable")
+        return f"Stub search results for {query!r}: InfinitePay offers card machines, Pix and a digital account."
+
+    def search(self, query: str) -> str:
+        self.calls += 1
+        time.sleep(self.latency)
+        return self._result(query)
+
+    async def asearch(self, query: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return self._result(query)
+
+
+def serve_knowledge_base(texts: List[str], metadatas: List[dict], embeddings: Embeddings) -> str:
+    """
+    Makes the Knowledge Agent serve an index of `texts` the way the API does: the index is saved as
+    a published version in a temporary FAISS_INDEX_PATH and loaded by `setup_knowledge_base`, with
+    `embeddings` in place of the embedding model. Returns the directory of the versions.
+    """
+    from langchain_community.vectorstores import FAISS
+
+    from Agents import knowledge_agent
+    from utils.index_versions import new_version_path, publish_version
+    from utils.vector_store import save_faiss_local
+
+    base_path = os.path.join(tempfile.mkdtemp(prefix="benchmark-knowledge-"), "index")
+    version_path = new_version_path(base_path)
+    save_faiss_local(FAISS.from_texts(texts, embeddings, metadatas=metadatas), version_path)
+    publish_version(base_path, version_path)
+
+    knowledge_agent.FAISS_INDEX_PATH = base_path
+    knowledge_agent.get_embeddings = lambda: embeddings
+    knowledge_agent._vectorstore = None
+    knowledge_agent.setup_knowledge_base()
+    return os.path.dirname(base_path)
+
+
+def constant_responder(text: str) -> Callable[[Any], str]:
+    """Returns a responder that always answers with `text`."""
+    return lambda messages: text
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[rank]
@@ -0,0 +1,98 @@
+"""
+Compares running the tool calls of one LLM turn one after another (the previous loop of the
+knowledge agent) with utils/tool_executor.py, on stub tools with fixed latencies:
+  - lookup: a read-only lookup (--lookup-latency)
+  - ticket: creates a ticket and sends an email (--ticket-latency), limited to one call at a time
+  - hung: a call that never answers in time (--hung-latency), cut at the deadline
+
+Usage:
+    python -m benchmarks.tool_executor --lookup-latency 0.2 --ticket-latency 0.5 --timeout 2
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List
+
+from benchmarks.stubs import percentile
+
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import StructuredTool
+
+from utils.tool_executor import ToolExecutor
+
+TURNS = {
+    "3 lookups": ["lookup", "lookup", "lookup"],
+    "lookup + ticket": ["lookup", "ticket"],
+    "2 tickets + lookup": ["ticket", "ticket", "lookup"],
+    "lookup + hung": ["lookup", "hung"],
+}
+
+
+def _stub_tool(name: str, latency: float, in_flight: Dict[str, int], lock: threading.Lock) -> StructuredTool:
+    def run(query: str) -> str:
+        with lock:
+            in_flight[name] = in_flight.get(name, 0) + 1
+            in_flight[f"{name}_max"] = max(in_flight.get(f"{name}_max", 0), in_flight[name])
+        try:
+            time.sleep(latency)
+            return f"{name} result for {query!r}"
+        finally:
+            with lock:
+                in_flight[name] -= 1
+    return StructuredTool.from_function(run, name=name, description=f"Stub {name} tool.")
+
+
+def _previous_loop(tools: Dict[str, StructuredTool]) -> Callable[[List[Dict[str, Any]]], List[ToolMessage]]:
+    """The loop before utils/tool_executor.py: one call after the other, no deadline."""
+    def run(tool_calls: List[Dict[str, Any]]) -> List[ToolMessage]:
+        return [ToolMessage(content=tools[tool_call["name"]].invoke(tool_call["args"]), tool_call_id=tool_call["id"],
+                            name=tool_call["name"]) for tool_call in tool_calls]
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookup-latency", type=float, default=0.2)
+    parser.add_argument("--ticket-latency", type=float, default=0.5)
+    parser.add_argument("--hung-latency", type=float, default=10.0)
+    parser.add_argument("--timeout", type=float, default=2.0, help="deadline per tool call (s)")
+    parser.add_argument("--turns", type=int, default=5, help="turns per scenario")
+    args = parser.parse_args()
+
+    in_flight: Dict[str, int] = {}
+    lock = threading.Lock()
+    latencies = {"lookup": args.lookup_latency, "ticket": args.ticket_latency, "hung": args.hung_latency}
+    tools = {name: _stub_tool(name, latency, in_flight, lock) for name, latency in latencies.items()}
+    executor = ToolExecutor(list(tools.values()), timeout=args.timeout, concurrency={"ticket": 1})
+
+    print(f"lookup {args.lookup_latency}s, ticket {args.ticket_latency}s (one at a time), hung {args.hung_latency}s, "
+          f"deadline {args.timeout}s; {args.turns} turns per scenario")
+    print(f"{'scenario':>20} | {'runner':>13} | {'p50 (s)':>7} | {'max (s)':>7} | {'errors':>6} | {'tickets in flight':>17}")
+    print("-" * 86)
+    runners = {"sequential": _previous_loop(tools), "executor": executor.run,
+               "executor async": lambda tool_calls: asyncio.run(executor.arun(tool_calls))}
+    for scenario, names in TURNS.items():
+        for label, run in runners.items():
+            if label == "sequential" and "hung" in names:
+                print(f"{scenario:>20} | {label:>13} | {'blocks for the hung call':>46}")
+                continue
+            in_flight.clear()
+            turn_latencies, errors = [], 0
+            for _ in range(args.turns):
+                tool_calls = [{"name": name, "args": {"query": "taxas"}, "id": str(uuid.uuid4())} for name in names]
+                started = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    messages = run(tool_calls)
+                turn_latencies.append(time.perf_counter() - started)
+                assert [message.tool_call_id for message in messages] == [call["id"] for call in tool_calls]
+                errors += sum(message.status == "error" for message in messages)
+            print(f"{scenario:>20} | {label:>13} | {percentile(turn_latencies, 50):>7.3f} | {max(turn_latencies):>7.3f} | "
+                  f"{errors:>6} | {in_flight.get('ticket_max', 0):>17}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Compares the previous web search (a new DuckDuckGoSearchRun per call, no timeout, no cache) with
+the search layer of utils/web_search.py, on a stub backend that goes through an outage.
+
+Every question searches twice for the same query, as the knowledge agent does when it calls the
+web_search tool and its answer is then judged insufficient. Phases:
+  - healthy: the backend answers in --latency seconds; questions repeat
+  - slow: the backend takes --slow-latency seconds (a hung search engine)
+  - recovered: the backend is healthy again, after the circuit breaker's reset time
+
+Usage:
+    python -m benchmarks.web_search --latency 0.3 --slow-latency 2 --timeout 0.5
+"""
+import argparse
+import contextlib
+import io
+import time
+from typing import Callable, List
+
+from benchmarks.stubs import StubSearchBackend, percentile
+
+from utils.ttl_cache import TTLCache
+from utils.web_search import CircuitBreaker, WebSearchClient
+
+QUERIES = [
+    "taxas da maquininha InfinitePay",
+    "what is Pix parcelado",
+    "InfinitePay tap to pay iPhone",
+    "conta PJ InfinitePay é gratuita",
+    "boleto InfinitePay prazo",
+]
+
+
+def _previous_search(backend: StubSearchBackend) -> Callable[[str], str]:
+    """The search before utils/web_search.py: no deadline, no cache, errors returned as text."""
+    def search(query: str) -> str:
+        try:
+            return backend.search(query)
+        except Exception as e:
+            return f"Search error: {str(e)}"
+    return search
+
+
+def _run_phase(search: Callable[[str], str], questions: List[str]) -> dict:
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for question in questions:
+        for _ in range(2):  # the web_search tool, then the insufficient-answer fallback
+            call_started = time.perf_counter()
+            result = search(question)
+            latencies.append(time.perf_counter() - call_started)
+            errors += "search error" in result.lower()
+    return {"searches": len(latencies), "errors": errors, "p50": percentile(latencies, 50),
+            "max": max(latencies), "total": time.perf_counter() - started}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.3, help="healthy backend latency (s)")
+    parser.add_argument("--slow-latency", type=float, default=2.0, help="backend latency during the outage (s)")
+    parser.add_argument("--timeout", type=float, default=0.5, help="search deadline (s)")
+    parser.add_argument("--failures", type=int, default=3, help="consecutive failures that open the circuit")
+    parser.add_argument("--reset", type=float, default=1.0, help="seconds before the open circuit lets a probe through")
+    parser.add_argument("--questions", type=int, default=10, help="questions per phase")
+    args = parser.parse_args()
+
+    print(f"Healthy latency {args.latency}s, outage latency {args.slow_latency}s, deadline {args.timeout}s, "
+          f"circuit opens after {args.failures} failures for {args.reset}s; 2 searches per question")
+    print(f"{'phase':>10} | {'client':>14} | {'searches':>8} | {'backend calls':>13} | {'errors':>6} | "
+          f"{'p50 (s)':>7} | {'max (s)':>7} | {'total (s)':>9}")
+    print("-" * 96)
+    for label in ("previous", "search layer"):
+        backend = StubSearchBackend(latency=args.latency)
+        if label == "previous":
+            search = _previous_search(backend)
+        else:
+            client = WebSearchClient(backend, timeout=args.timeout, cache=TTLCache(ttl=900),
+                                     breaker=CircuitBreaker(args.failures, args.reset))
+            search = client.search
+        phases = [
+            ("healthy", args.latency, [QUERIES[i % len(QUERIES)] for i in range(args.questions)]),
+            ("slow", args.slow_latency, [f"{QUERIES[i % len(QUERIES)]} {i}" for i in range(args.questions)]),
+            ("recovered", args.latency, [f"{QUERIES[i % len(QUERIES)]} novo {i}" for i in range(args.questions)]),
+        ]
+        for phase, latency, questions in phases:
+            if phase == "recovered":
+                time.sleep(args.reset)
+            backend.latency = latency
+            calls_before = backend.calls
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = _run_phase(search, questions)
+            print(f"{phase:>10} | {label:>14} | {result['searches']:>8} | {backend.calls - calls_before:>13} | "
+                  f"{result['errors']:>6} | {result['p50']:>7.3f} | {result['max']:>7.3f} | {result['total']:>9.2f}")
+        if label != "previous":
+            print(f"\nCircuit breaker: {client.stats()['circuit_breaker']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,7 @@ class OverallAgentState(TypedDict):
 
     # State specific to Router Agent
     next_agent: Optional[str] # The name of the next agent to route to
+    route_metadata: Optional[Dict[str, Any]] # How the routing decision was made (reported in workflow_trace)
 
     # State specific to Knowledge Agent
     question: str # Maps to current_query for the knowledge agent's internal state
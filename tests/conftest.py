@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The agents create their Gemini clients at import time; the tests never call them
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
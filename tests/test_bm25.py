@@ -0,0 +1,33 @@
+import json
+import os
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from Agents import knowledge_agent
+from utils.bm25 import BM25_FILE_NAME, BM25Index, load_bm25, save_bm25
+
+TEXTS = ["Taxas da maquininha Smart", "Cartão de crédito InfinitePay", "Pix parcelado em até 12x"]
+
+
+def test_saved_index_is_loaded_back(tmp_path):
+    index = BM25Index()
+    index.add((str(position), text) for position, text in enumerate(TEXTS))
+    save_bm25(str(tmp_path), index)
+
+    loaded = load_bm25(str(tmp_path))
+    assert len(loaded) == 3 and loaded.total_length == index.total_length
+    assert loaded.search("cartao credito") == index.search("cartao credito")
+    assert loaded.search("cartao credito")[0][0] == "1"
+
+
+def test_index_saved_with_another_tokenization_is_rebuilt_from_the_docstore(tmp_path):
+    vectorstore = FAISS.from_texts(TEXTS, DeterministicFakeEmbedding(size=8))
+    # Saved before the tokenization changed: its terms may not match the queries any more
+    with open(os.path.join(tmp_path, BM25_FILE_NAME), "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "documents": {"stale": {"cartão": 1}}}, f)
+    assert load_bm25(str(tmp_path)) is None
+
+    lexical_index = knowledge_agent._load_lexical_index(vectorstore, str(tmp_path))
+    assert len(lexical_index) == 3
+    assert vectorstore.docstore.search(lexical_index.search("Cartão")[0][0]).page_content == TEXTS[1]
@@ -0,0 +1,89 @@
+import asyncio
+import operator
+import threading
+from typing import Annotated, List, TypedDict
+
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import Command, interrupt
+
+from utils.checkpointer import BoundedCheckpointSaver
+
+
+class State(TypedDict):
+    messages: Annotated[List[str], operator.add]
+
+
+def _single_node_graph(node):
+    graph = StateGraph(State)
+    graph.add_node("node", node)
+    graph.add_edge(START, "node")
+    graph.add_edge("node", END)
+    return graph
+
+
+def _parent_graph(checkpointer, subgraph_node=lambda state: {"messages": ["answer"]}):
+    # Like the agents: the subgraph is invoked inside a node and inherits the parent's checkpointer
+    subgraph = _single_node_graph(subgraph_node).compile()
+    return _single_node_graph(lambda state: {"messages": subgraph.invoke({"messages": []})["messages"]}).compile(
+        checkpointer=checkpointer)
+
+
+def _namespaces(saver, thread_id):
+    memory = {checkpoint_ns: len(checkpoints) for checkpoint_ns, checkpoints in saver.storage[thread_id].items()}
+    disk = dict(saver._connection.execute(
+        "SELECT checkpoint_ns, COUNT(*) FROM checkpoints WHERE thread_id = ? GROUP BY checkpoint_ns", (thread_id,)))
+    return memory, disk
+
+
+def test_subgraph_namespaces_are_pruned_with_their_parent(tmp_path):
+    saver = BoundedCheckpointSaver(str(tmp_path / "checkpoints.sqlite3"), max_checkpoints=2)
+    graph = _parent_graph(saver)
+    config = {"configurable": {"thread_id": "user"}}
+    for turn in range(20):
+        graph.invoke({"messages": [f"question {turn}"]}, config)
+
+    memory, disk = _namespaces(saver, "user")
+    assert memory == disk
+    assert len(memory) == 2 and sum(memory.values()) <= 4
+    assert len(graph.get_state(config).values["messages"]) == 40
+    saver.close()
+
+    restored = _parent_graph(BoundedCheckpointSaver(str(tmp_path / "checkpoints.sqlite3"), max_checkpoints=2))
+    assert len(restored.get_state(config).values["messages"]) == 40
+
+
+def test_interrupted_subgraph_survives_pruning():
+    graph = _parent_graph(BoundedCheckpointSaver(None, max_checkpoints=1),
+                          lambda state: {"messages": [interrupt("confirm?")]})
+    config = {"configurable": {"thread_id": "user"}}
+    graph.invoke({"messages": ["question"]}, config)
+    assert graph.invoke(Command(resume="yes"), config)["messages"] == ["question", "yes"]
+
+
+def test_a_thread_over_the_memory_cap_alone_is_read_back_from_sqlite(tmp_path):
+    saver = BoundedCheckpointSaver(str(tmp_path / "checkpoints.sqlite3"), max_memory_bytes=1)
+    graph = _parent_graph(saver)
+    config = {"configurable": {"thread_id": "user"}}
+    graph.invoke({"messages": ["first"]}, config)
+    assert saver.stats()["threads_in_memory"] == 0
+    graph.invoke({"messages": ["second"]}, config)
+    assert graph.get_state(config).values["messages"] == ["first", "answer", "second", "answer"]
+
+
+def test_async_writes_run_off_the_event_loop(tmp_path):
+    saver = BoundedCheckpointSaver(str(tmp_path / "checkpoints.sqlite3"))
+    threads = set()
+    put, put_writes = saver.put, saver.put_writes
+    saver.put = lambda *args: threads.add(threading.current_thread()) or put(*args)
+    saver.put_writes = lambda *args: threads.add(threading.current_thread()) or put_writes(*args)
+    graph = _single_node_graph(lambda state: {"messages": ["answer"]}).compile(checkpointer=saver)
+
+    async def run():
+        loop_thread = threading.current_thread()
+        await graph.ainvoke({"messages": ["question"]}, {"configurable": {"thread_id": "user"}})
+        await saver.adelete_thread("user")
+        return loop_thread
+
+    loop_thread = asyncio.run(run())
+    assert threads and loop_thread not in threads
+    assert saver._connection.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0] == 0
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from utils.embeddings import CachedEmbeddings, embed_documents_with_retry
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    model: str = "fake-embeddings"
+    texts_embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.texts_embedded += len(texts)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.texts_embedded += 1
+        return super().embed_query(text)
+
+
+def test_cached_vectors_are_reused_across_restarts(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    model = CountingEmbeddings(size=8)
+    cache = CachedEmbeddings(model, path)
+    vectors = cache.embed_documents(["fees", "pix", "fees"])
+    # Duplicates are embedded once
+    assert model.texts_embedded == 2
+    assert cache.stats()["misses"] == 3 and cache.stats()["size"] == 2
+
+    reopened = CachedEmbeddings(model, path)
+    assert np.allclose(reopened.embed_documents(["pix", "fees"]), [vectors[1], vectors[0]], atol=1e-6)
+    assert model.texts_embedded == 2 and reopened.stats()["hits"] == 2
+    # Queries are cached apart from documents
+    reopened.embed_query("fees")
+    assert model.texts_embedded == 3 and reopened.stats()["misses"] == 1
+
+
+def test_sqlite_errors_fall_back_to_the_model(tmp_path):
+    model = CountingEmbeddings(size=8)
+    cache = CachedEmbeddings(model, str(tmp_path / "cache.sqlite3"))
+    cache._connection.close()
+    assert np.allclose(cache.embed_documents(["fees"]), model.embed_documents(["fees"]))
+    assert cache.stats()["errors"] == 2
+
+
+def test_transient_errors_are_retried_with_backoff():
+    class FlakyEmbeddings(CountingEmbeddings):
+        failures: int = 2
+
+        def embed_documents(self, texts):
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError("429 Resource has been exhausted")
+            return super().embed_documents(texts)
+
+    delays = []
+    vectors = embed_documents_with_retry(FlakyEmbeddings(size=8), ["fees"], base_delay=1, max_delay=60,
+                                         sleep=delays.append)
+    assert len(vectors) == 1 and len(delays) == 2
+    assert 0 <= delays[0] <= 1 and 0 <= delays[1] <= 2
+
+    with pytest.raises(RuntimeError):
+        embed_documents_with_retry(FlakyEmbeddings(size=8), ["fees"], max_retries=1, sleep=delays.append)
+
+
+def test_other_errors_are_not_retried():
+    class BrokenEmbeddings(CountingEmbeddings):
+        def embed_documents(self, texts):
+            raise ValueError("invalid model name")
+
+    delays = []
+    with pytest.raises(ValueError):
+        embed_documents_with_retry(BrokenEmbeddings(size=8), ["fees"], sleep=delays.append)
+    assert delays == []
@@ -0,0 +1,24 @@
+import os
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from Agents import exemplar_router
+
+
+class FakeEmbeddings(DeterministicFakeEmbedding):
+    model: str = "fake-embeddings"
+
+
+def test_exemplar_index_is_saved_and_loaded_back(tmp_path, monkeypatch):
+    embeddings = FakeEmbeddings(size=8)
+    index_path = str(tmp_path / "exemplars")
+    monkeypatch.setattr(exemplar_router, "EXEMPLAR_INDEX_PATH", index_path)
+    monkeypatch.setattr(exemplar_router, "get_embeddings", lambda: embeddings)
+
+    built = exemplar_router._load_or_build_exemplar_index()
+    # Only the renamed files are left behind, no temporary ones
+    assert sorted(os.listdir(index_path)) == ["exemplars.sha256", "index.faiss", "index.sqlite3"]
+
+    loaded = exemplar_router._load_or_build_exemplar_index()
+    assert loaded.index.ntotal == built.index.ntotal
+    assert loaded.similarity_search("qual meu saldo", k=1)[0].metadata["label"] in exemplar_router.ROUTER_EXEMPLARS
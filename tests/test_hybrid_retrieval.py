@@ -0,0 +1,42 @@
+import asyncio
+
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+
+from utils.hybrid_retrieval import HybridRetriever
+
+TEXTS = ["Maquininha Smart fees", "Pix in installments", "Tap to pay on the phone"]
+
+
+class UnitEmbeddings(Embeddings):
+    """Deterministic unit vectors, like the embedding model's."""
+
+    def __init__(self):
+        self.fake = DeterministicFakeEmbedding(size=16)
+
+    def _unit(self, vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._unit(vector) for vector in self.fake.embed_documents(texts)]
+
+    def embed_query(self, text):
+        return self._unit(self.fake.embed_query(text))
+
+
+@pytest.mark.parametrize("distance_strategy", [DistanceStrategy.EUCLIDEAN_DISTANCE, DistanceStrategy.MAX_INNER_PRODUCT])
+def test_confidence_is_the_cosine_with_the_nearest_chunk(distance_strategy):
+    embeddings = UnitEmbeddings()
+    retriever = HybridRetriever(vectorstore=FAISS.from_texts(TEXTS, embeddings, distance_strategy=distance_strategy), k=2)
+    query = "Pix installments"
+    query_vector = np.asarray(embeddings.embed_query(query))
+    expected = max(float(np.dot(query_vector, embeddings.embed_query(text))) for text in TEXTS)
+
+    chunks, confidence = retriever.search_with_confidence(query)
+    assert len(chunks) == 2
+    assert confidence == pytest.approx(expected, abs=1e-5)
+    assert asyncio.run(retriever.asearch_with_confidence(query))[1] == pytest.approx(expected, abs=1e-5)
@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from Agents import knowledge_agent
+from utils.index_versions import (current_index_path, list_versions, new_version_path, pin_version, pinned_versions,
+                                  publish_version)
+from utils.vector_store import save_faiss_local
+
+
+def _exited_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_versions_served_by_a_running_process_are_not_pruned(tmp_path):
+    base_path = str(tmp_path / "index")
+    served = new_version_path(base_path)
+    publish_version(base_path, served)
+    pin_version(base_path, served)
+    for _ in range(3):
+        publish_version(base_path, new_version_path(base_path))
+
+    # Only one older version is kept, but the pinned one survives every prune
+    versions = list_versions(base_path)
+    assert os.path.basename(served) in versions and len(versions) == 3
+
+
+def test_pins_of_exited_processes_are_released(tmp_path):
+    base_path = str(tmp_path / "index")
+    served = new_version_path(base_path)
+    publish_version(base_path, served)
+    pins_path = os.path.join(base_path + ".versions", ".pins")
+    os.makedirs(pins_path)
+    open(os.path.join(pins_path, f"{os.path.basename(served)}.{_exited_pid()}"), "w").close()
+    assert pinned_versions(base_path) == set()
+    assert os.listdir(pins_path) == []
+
+    publish_version(base_path, new_version_path(base_path))
+    publish_version(base_path, new_version_path(base_path))
+    assert os.path.basename(served) not in list_versions(base_path)
+
+
+def test_a_process_pins_only_the_version_it_serves(tmp_path):
+    base_path = str(tmp_path / "index")
+    first, second = new_version_path(base_path), new_version_path(base_path)
+    pin_version(base_path, first)
+    pin_version(base_path, second)
+    assert pinned_versions(base_path) == {os.path.basename(second)}
+
+
+def _publish_index(base_path, embeddings, texts):
+    version_path = new_version_path(base_path)
+    save_faiss_local(FAISS.from_texts(texts, embeddings), version_path)
+    publish_version(base_path, version_path)
+    return version_path
+
+
+def test_api_switches_to_a_version_published_by_another_process(tmp_path, monkeypatch):
+    base_path = str(tmp_path / "index")
+    embeddings = DeterministicFakeEmbedding(size=8)
+    monkeypatch.setattr(knowledge_agent, "FAISS_INDEX_PATH", base_path)
+    monkeypatch.setattr(knowledge_agent, "get_embeddings", lambda: embeddings)
+    monkeypatch.setattr(knowledge_agent, "_next_version_check", 0.0)
+    for name in ("_vectorstore", "_lexical_index", "_retriever", "_qa_chain", "_index_path"):
+        monkeypatch.setattr(knowledge_agent, name, None)
+
+    first = _publish_index(base_path, embeddings, ["Maquininha Smart fees"])
+    assert knowledge_agent.reload_published_version() == first
+
+    # Published by the refresh CLI: the next check loads it in the background and swaps it in
+    second = _publish_index(base_path, embeddings, ["Maquininha Smart fees", "Pix installments"])
+    knowledge_agent.check_published_version()
+    assert knowledge_agent.knowledge_base_reload.wait(30)
+    assert current_index_path(base_path) == second == knowledge_agent._index_path
+    assert knowledge_agent._retriever.vectorstore.index.ntotal == 2
+    assert pinned_versions(base_path) == {os.path.basename(second)}
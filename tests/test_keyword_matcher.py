@@ -0,0 +1,33 @@
+import pytest
+
+from Agents.customer_support_agent import customer_support_keywords
+from utils.keyword_matcher import KeywordMatcher
+
+
+@pytest.mark.parametrize("text, set_name", [
+    ("My software keeps crashing", "off_topic"),
+    ("Please forward the receipt to me", "off_topic"),
+    ("How do I discard an old draft?", "banking"),
+    ("What's the warranty on the Smart?", "off_topic"),
+])
+def test_keywords_do_not_match_inside_other_words(text, set_name):
+    assert not customer_support_keywords.contains(text, set_name)
+
+
+@pytest.mark.parametrize("text, set_name", [
+    ("Preciso de ajuda com uma transferencia", "account_access"),
+    ("Meu cartao foi bloqueado", "banking"),
+    ("Meu CARTÃO foi bloqueado", "banking"),
+    ("Quero alterar meu endereco de email", "account_access"),
+    ("I lost both of my cards", "banking"),
+    ("What are the fees?", "account_access"),
+    ("Who won the war?", "off_topic"),
+])
+def test_keywords_match_without_accents_and_across_case(text, set_name):
+    assert customer_support_keywords.contains(text, set_name)
+
+
+def test_phrases_match_across_punctuation_and_prefixes_respect_min_length():
+    matcher = KeywordMatcher({"contact": ["phone number"], "apps": ["app", "transfer"]}, min_prefix_length=4)
+    assert matcher.match("Phone, number: 555") == {"contact": ("phone number",)}
+    assert matcher.match("I want to apply for transfers") == {"apps": ("transfer",)}
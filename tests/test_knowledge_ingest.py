@@ -0,0 +1,76 @@
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from utils import vector_store
+from utils.knowledge_ingest import ingest_pages
+
+URLS = ["https://www.infinitepay.io/maquininha", "https://www.infinitepay.io/pix", "https://www.infinitepay.io/conta"]
+PAGES = {
+    URLS[0]: "Maquininha Smart fees\nDebit 0.75%",
+    URLS[1]: "Pix in installments\nUp to 12 installments",
+    URLS[2]: "Digital account\nNo monthly fee",
+}
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    texts_embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.texts_embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+def split_lines(text):
+    return text.split("\n")
+
+
+def _stored_texts(vectorstore):
+    return sorted(vectorstore.docstore.search(document_id).page_content
+                  for document_id in vectorstore.index_to_docstore_id.values())
+
+
+def test_only_changed_chunks_are_embedded_and_removed_pages_are_deleted():
+    embeddings = CountingEmbeddings(size=8)
+    vectorstore, manifest, report = ingest_pages(None, None, PAGES, URLS, split_lines, embeddings)
+    assert report["full_build"] and vectorstore.index.ntotal == 6
+
+    embeddings.texts_embedded = 0
+    pages = {
+        URLS[0]: PAGES[URLS[0]],                            # unchanged
+        URLS[1]: "Pix in installments\nUp to 18 installments",  # one chunk changed
+    }
+    # The third page was dropped from the site; a fourth failed to scrape and is unknown
+    urls = URLS[:2] + ["https://www.infinitepay.io/emprestimo"]
+    vectorstore, manifest, report = ingest_pages(vectorstore, manifest, pages, urls, split_lines, embeddings)
+
+    assert embeddings.texts_embedded == 1
+    assert report["pages"] == {"added": [], "changed": [URLS[1]], "removed": [URLS[2]], "unavailable": [],
+                               "unchanged": 1}
+    assert report["chunks"] == {"added": 1, "removed": 3, "unchanged": 3}
+    assert _stored_texts(vectorstore) == sorted(["Maquininha Smart fees", "Debit 0.75%", "Pix in installments",
+                                                 "Up to 18 installments"])
+    assert set(manifest["pages"]) == set(URLS[:2])
+
+
+def test_pages_that_failed_to_scrape_are_kept():
+    embeddings = CountingEmbeddings(size=8)
+    vectorstore, manifest, _ = ingest_pages(None, None, PAGES, URLS, split_lines, embeddings)
+
+    pages = {url: text for url, text in PAGES.items() if url != URLS[2]}
+    vectorstore, new_manifest, report = ingest_pages(vectorstore, manifest, pages, URLS, split_lines, embeddings)
+    assert report["pages"]["unavailable"] == [URLS[2]] and report["pages"]["removed"] == []
+    assert report["chunks"] == {"added": 0, "removed": 0, "unchanged": 4}
+    assert new_manifest == manifest and vectorstore.index.ntotal == 6
+
+
+def test_indexes_that_cannot_delete_vectors_are_rebuilt(monkeypatch):
+    monkeypatch.setattr(vector_store, "FAISS_INDEX_TYPE", "hnsw")
+    embeddings = CountingEmbeddings(size=8)
+    vectorstore, manifest, _ = ingest_pages(None, None, PAGES, URLS, split_lines, embeddings)
+    assert "HNSW" in type(vectorstore.index).__name__
+
+    pages = dict(PAGES, **{URLS[2]: "Digital account\nFree transfers"})
+    vectorstore, _, report = ingest_pages(vectorstore, manifest, pages, URLS, split_lines, embeddings)
+    assert report["rebuilt"] and report["chunks"] == {"added": 1, "removed": 1, "unchanged": 5}
+    assert _stored_texts(vectorstore) == sorted(["Maquininha Smart fees", "Debit 0.75%", "Pix in installments",
+                                                 "Up to 12 installments", "Digital account", "Free transfers"])
+    assert vectorstore.similarity_search("Free transfers", k=1)[0].metadata["source"] == URLS[2]
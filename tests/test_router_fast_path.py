@@ -0,0 +1,34 @@
+import pytest
+
+from Agents import router_agent
+from Agents.router_agent import classify_route_fast
+
+
+@pytest.fixture(autouse=True)
+def fast_path_enabled(monkeypatch):
+    monkeypatch.setattr(router_agent, "ROUTER_FAST_PATH_ENABLED", True)
+
+
+@pytest.mark.parametrize("message", [
+    "Posso falar com um atendente?",
+    "Is it possible to talk to a human?",
+    "I want to apply for a loan",
+    "What is the history of InfinitePay?",
+    "qual o saldo mínimo para abrir conta PJ?",
+])
+def test_ambiguous_messages_go_to_the_llm(message):
+    assert router_agent._fast_path_decision(message) is None
+
+
+@pytest.mark.parametrize("message, agent", [
+    ("qual meu saldo", "custom_agent"),
+    ("show my last transactions", "custom_agent"),
+])
+def test_obvious_intents_skip_the_llm(message, agent):
+    decision = router_agent._fast_path_decision(message)
+    assert decision is not None and decision["agent"] == agent
+
+
+def test_short_keywords_match_whole_words_only():
+    assert "product_information" not in classify_route_fast("Posso pagar depois?")["signals"]
+    assert "product_information" in classify_route_fast("Posso pagar com pix?")["signals"]
@@ -0,0 +1,28 @@
+from utils.semantic_cache import SemanticCache
+
+VECTOR = [1.0, 0.0, 0.0]
+
+
+def test_a_new_index_version_drops_every_answer():
+    cache = SemanticCache(threshold=0.9)
+    cache.set_version("v1")
+    cache.store("What are the fees?", VECTOR, "en", "0.75% on debit")
+    assert cache.lookup_text("what are the FEES", "en")["value"] == "0.75% on debit"
+
+    # The same version keeps the answers; a different one drops them, by text and by vector
+    cache.set_version("v1")
+    assert cache.lookup([0.99, 0.1, 0.0], "en")["value"] == "0.75% on debit"
+    cache.set_version("v2")
+    assert cache.lookup_text("What are the fees?", "en") is None
+    assert cache.lookup(VECTOR, "en") is None
+    assert cache.stats()["invalidations"] == 1 and cache.stats()["size"] == 0
+
+    cache.store("What are the fees?", VECTOR, "en", "0.69% on debit")
+    assert cache.lookup(VECTOR, "en")["value"] == "0.69% on debit"
+
+
+def test_the_first_version_keeps_answers_stored_before_it():
+    cache = SemanticCache()
+    cache.store("What are the fees?", VECTOR, "en", "0.75% on debit")
+    cache.set_version("v1")
+    assert cache.lookup_text("What are the fees?", "en")["value"] == "0.75% on debit"
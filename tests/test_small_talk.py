@@ -0,0 +1,30 @@
+import pytest
+
+from utils.canned_responses import classify_small_talk
+
+
+@pytest.mark.parametrize("message", [
+    "how much?",
+    "mais?",
+    "muito bem",
+    "you",
+    "bom",
+    "what are the fees?",
+])
+def test_ambiguous_messages_are_not_small_talk(message):
+    assert classify_small_talk(message) is None
+
+
+@pytest.mark.parametrize("message, kind", [
+    ("hi there!", "greeting"),
+    ("Bom dia", "greeting"),
+    ("how are you?", "how_are_you"),
+    ("Tudo bem?", "how_are_you"),
+    ("thank you so much", "thanks"),
+    ("muito obrigado", "thanks"),
+    ("hi, thanks!", "thanks"),
+    ("see you later", "goodbye"),
+    ("até mais", "goodbye"),
+])
+def test_small_talk_kinds(message, kind):
+    assert classify_small_talk(message) == kind
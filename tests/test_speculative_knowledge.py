@@ -0,0 +1,40 @@
+import threading
+
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage
+
+from Agents import knowledge_agent
+
+
+class ConfidentRetriever:
+    def search_with_confidence(self, question):
+        return [(Document(page_content="The Maquininha Smart has no monthly fee."), 1.0)], 0.95
+
+
+class StubLLM:
+    def invoke(self, messages):
+        return AIMessage(content="No monthly fee.")
+
+
+def test_discarded_searches_never_queue_beyond_the_bound(monkeypatch):
+    release = threading.Event()
+    searches = []
+
+    def slow_search(query):
+        searches.append(query)
+        release.wait(10)
+        return "search results"
+
+    monkeypatch.setattr(knowledge_agent, "_retriever", ConfidentRetriever())
+    monkeypatch.setattr(knowledge_agent, "llm_rag", StubLLM())
+    monkeypatch.setattr(knowledge_agent.web_search_client, "search", slow_search)
+    try:
+        for turn in range(knowledge_agent.KNOWLEDGE_SPECULATIVE_MAX_SEARCHES + 3):
+            outputs = {}
+            answer, cacheable = knowledge_agent._speculative_answer(f"fees? {turn}", "en", outputs)
+            assert answer == "No monthly fee." and outputs["speculative"]["web_search"] == "cancelled"
+        # Searches were started only while a worker was free; none is waiting in the queue
+        assert knowledge_agent._speculative_executor._work_queue.qsize() == 0
+        assert len(searches) <= knowledge_agent.KNOWLEDGE_SPECULATIVE_MAX_SEARCHES
+    finally:
+        release.set()
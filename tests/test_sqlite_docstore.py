@@ -0,0 +1,44 @@
+import os
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from utils.migrate_docstore import migrate_docstore
+from utils.vector_store import load_faiss_local, save_faiss_local
+
+TEXTS = ["Maquininha Smart fees", "Pix in installments", "Tap to pay on the phone"]
+METADATAS = [{"source": "maquininha"}, {"source": "pix-parcelado", "page": 2}, {"source": "tap-to-pay"}]
+
+
+def test_migrated_docstore_serves_the_same_documents(tmp_path):
+    embeddings = DeterministicFakeEmbedding(size=8)
+    folder_path = str(tmp_path / "index")
+    original = FAISS.from_texts(TEXTS, embeddings, metadatas=METADATAS)
+    original.save_local(folder_path)
+
+    migrate_docstore(folder_path, remove_pickle=True)
+    assert sorted(os.listdir(folder_path)) == ["index.faiss", "index.sqlite3"]
+
+    for mmap in (True, False):
+        migrated = load_faiss_local(folder_path, embeddings, mmap=mmap)
+        assert dict(migrated.index_to_docstore_id.items()) == original.index_to_docstore_id
+        for position, document_id in original.index_to_docstore_id.items():
+            document = migrated.docstore.search(document_id)
+            assert (document.page_content, document.metadata) == (TEXTS[position], METADATAS[position])
+        found = migrated.similarity_search(TEXTS[1], k=1)[0]
+        assert found.page_content == TEXTS[1] and found.metadata == METADATAS[1]
+
+
+def test_store_loaded_into_memory_can_be_updated_and_saved_again(tmp_path):
+    embeddings = DeterministicFakeEmbedding(size=8)
+    folder_path = str(tmp_path / "index")
+    save_faiss_local(FAISS.from_texts(TEXTS, embeddings, metadatas=METADATAS), folder_path, docstore_format="sqlite")
+
+    vectorstore = load_faiss_local(folder_path, embeddings, mmap=False)
+    vectorstore.delete([vectorstore.index_to_docstore_id[0]])
+    vectorstore.add_texts(["Business loans"], metadatas=[{"source": "emprestimo"}])
+    save_faiss_local(vectorstore, folder_path, docstore_format="sqlite")
+
+    reloaded = load_faiss_local(folder_path, embeddings)
+    assert sorted(document.page_content for document in reloaded.similarity_search("fees", k=10)) == sorted(
+        TEXTS[1:] + ["Business loans"])
@@ -0,0 +1,98 @@
+import os
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from utils.streaming_build import VECTORS_FILE_NAME, StreamingIndexBuilder
+
+PAGES = {
+    "https://www.infinitepay.io/maquininha": "Maquininha Smart fees\nDebit 0.75%",
+    "https://www.infinitepay.io/pix": "Pix in installments\nUp to 12 installments\nPix on the Smart",
+}
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    texts_embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.texts_embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+def split_lines(text):
+    return text.split("\n")
+
+
+def _assert_vectors_match_chunks(vectorstore):
+    # Every chunk is found by its own text: its vector is at the position of its docstore id
+    for document_id in vectorstore.index_to_docstore_id.values():
+        text = vectorstore.docstore.search(document_id).page_content
+        assert vectorstore.similarity_search(text, k=1)[0].page_content == text
+
+
+def _interrupted_build(folder_path, embeddings):
+    """Feeds both pages with batches of 2, then stops as if the process died: the second page is half written."""
+    builder = StreamingIndexBuilder(folder_path, embeddings, batch_size=2)
+    for url, text in PAGES.items():
+        builder.add_page(url, text, split_lines)
+    assert builder.count == 2 and builder.written == 4
+    builder.close()
+
+
+def test_resumed_build_drops_unfinished_pages_and_skips_done_ones(tmp_path):
+    folder_path = str(tmp_path / "index")
+    embeddings = CountingEmbeddings(size=8)
+    _interrupted_build(folder_path, embeddings)
+
+    embeddings.texts_embedded = 0
+    builder = StreamingIndexBuilder(folder_path, embeddings, batch_size=2)
+    # The vectors and chunks of the unfinished page were truncated away
+    assert builder.resumed_pages == 1 and builder.written == 2
+    assert os.path.getsize(os.path.join(builder.checkpoint_path, VECTORS_FILE_NAME)) == 2 * 8 * 4
+    for url, text in PAGES.items():
+        builder.add_page(url, text, split_lines)
+    vectorstore, manifest, report = builder.finish(list(PAGES))
+
+    assert embeddings.texts_embedded == 3
+    assert report["resumed"] and report["pages"]["unchanged"] == 1
+    assert vectorstore.index.ntotal == 5 and set(manifest["pages"]) == set(PAGES)
+    _assert_vectors_match_chunks(vectorstore)
+    builder.discard()
+    assert not os.path.exists(builder.checkpoint_path)
+
+
+def test_vectors_of_replaced_and_removed_pages_are_compacted_away(tmp_path):
+    folder_path = str(tmp_path / "index")
+    embeddings = CountingEmbeddings(size=8)
+    _interrupted_build(folder_path, embeddings)
+
+    builder = StreamingIndexBuilder(folder_path, embeddings, batch_size=2)
+    url = "https://www.infinitepay.io/maquininha"
+    builder.add_page(url, "Maquininha Smart fees\nDebit 0.69%", split_lines)
+    builder.add_page("https://www.infinitepay.io/conta", "Digital account", split_lines)
+    vectorstore, manifest, report = builder.finish([url, "https://www.infinitepay.io/conta"])
+
+    # The first version of the page is still in the checkpoint, but not in the index
+    assert report["pages"]["changed"] == [url]
+    assert builder.count == 5 and vectorstore.index.ntotal == 3
+    assert sorted(vectorstore.docstore.search(document_id).page_content
+                  for document_id in vectorstore.index_to_docstore_id.values()) == [
+        "Debit 0.69%", "Digital account", "Maquininha Smart fees"]
+    _assert_vectors_match_chunks(vectorstore)
+    builder.discard()
+
+
+def test_checkpoint_missing_vectors_is_started_over(tmp_path):
+    folder_path = str(tmp_path / "index")
+    embeddings = CountingEmbeddings(size=8)
+    _interrupted_build(folder_path, embeddings)
+    with open(os.path.join(folder_path + ".building", VECTORS_FILE_NAME), "r+b") as f:
+        f.truncate(8 * 4)
+
+    builder = StreamingIndexBuilder(folder_path, embeddings, batch_size=2)
+    assert builder.resumed_pages == 0 and builder.count == 0
+    for url, text in PAGES.items():
+        builder.add_page(url, text, split_lines)
+    vectorstore, _, report = builder.finish(list(PAGES))
+    assert not report["resumed"] and vectorstore.index.ntotal == 5
+    _assert_vectors_match_chunks(vectorstore)
+    builder.discard()
@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+from langchain_core.tools import StructuredTool
+
+from utils.tool_executor import ToolExecutor
+
+
+def _executor(timeout: float, max_workers: int = 8) -> ToolExecutor:
+    def ticket(query: str) -> str:
+        time.sleep(0.1)
+        return "ticket"
+
+    def lookup(query: str) -> str:
+        return "lookup"
+
+    tools = [StructuredTool.from_function(ticket, name="ticket", description="Serialized tool."),
+             StructuredTool.from_function(lookup, name="lookup", description="Unlimited tool.")]
+    return ToolExecutor(tools, timeout=timeout, concurrency={"ticket": 1}, max_workers=max_workers)
+
+
+def _calls(*names):
+    return [{"name": name, "args": {"query": "q"}, "id": str(index)} for index, name in enumerate(names)]
+
+
+def test_waiting_for_a_slot_does_not_count_against_the_deadline():
+    # Three serialized calls take ~0.3s in total, longer than the 0.25s deadline of each one
+    executor = _executor(timeout=0.25, max_workers=2)
+    for messages in (executor.run(_calls("ticket", "ticket", "ticket", "lookup")),
+                     asyncio.run(executor.arun(_calls("ticket", "ticket", "ticket", "lookup")))):
+        assert [message.status for message in messages] == ["success"] * 4
+
+
+def test_a_call_without_a_free_slot_within_its_deadline_fails_without_running():
+    executor = _executor(timeout=0.15)
+    for messages in (executor.run(_calls("ticket", "ticket", "ticket")),
+                     asyncio.run(executor.arun(_calls("ticket", "ticket", "ticket")))):
+        assert [message.status for message in messages] == ["success", "success", "error"]
+        assert "no free slot" in messages[2].content
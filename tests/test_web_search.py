@@ -0,0 +1,63 @@
+import pytest
+
+from utils import web_search
+from utils.web_search import CircuitBreaker, WebSearchClient
+
+
+class FlakyBackend:
+    name = "flaky"
+
+    def __init__(self):
+        self.failing = True
+        self.calls = 0
+
+    def search(self, query):
+        self.calls += 1
+        if self.failing:
+            raise ConnectionError("search backend unavailable")
+        return f"results for {query}"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(web_search.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_circuit_opens_probes_once_and_closes(clock):
+    backend = FlakyBackend()
+    client = WebSearchClient(backend, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=30))
+
+    # Two consecutive failures open the circuit; then the backend is not called
+    for _ in range(2):
+        assert client.search("pix fees").startswith("Search error: search backend unavailable")
+    assert client.breaker.state == "open"
+    assert client.search("pix fees") == "Search error: web search is temporarily unavailable."
+    assert backend.calls == 2
+
+    # After the reset timeout one probe goes through; its failure opens the circuit again
+    clock[0] += 30
+    assert client.breaker.allow() and not client.breaker.allow()
+    client.breaker.record_failure()
+    assert client.breaker.state == "open"
+    assert client.search("pix fees") == "Search error: web search is temporarily unavailable."
+
+    # A successful probe closes it
+    clock[0] += 30
+    backend.failing = False
+    assert client.search("pix fees") == "results for pix fees"
+    assert client.breaker.state == "closed"
+    assert client.search("maquininha") == "results for maquininha"
+    stats = client.stats()
+    assert stats["short_circuited"] == 2 and stats["circuit_breaker"]["opened"] == 2
+    assert stats["circuit_breaker"]["probes"] == 2 and stats["circuit_breaker"]["closed"] == 1
+
+
+def test_cancelled_probe_lets_the_next_call_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_cancelled()
+    assert breaker.state == "half_open" and breaker.allow()
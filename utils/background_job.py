@@ -0,0 +1,67 @@
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+class BackgroundJob:
+    """
+    Runs `target` in a daemon thread, one run at a time, and keeps the status of the current or
+    last run for monitoring (e.g. an admin endpoint). Callers never wait for a run unless they
+    `wait` for it.
+    """
+
+    def __init__(self, name: str, target: Callable[..., Any]):
+        self.name = name
+        self.target = target
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._finished.set()
+        self._status: Dict[str, Any] = {"state": "idle", "runs": 0}
+
+    def start(self, **kwargs) -> bool:
+        """Starts a run with `kwargs` unless one is in progress; returns whether it started."""
+        with self._lock:
+            if self._status["state"] == "running":
+                return False
+            self._finished.clear()
+            self._status = {
+                "state": "running",
+                "runs": self._status["runs"] + 1,
+                "arguments": kwargs,
+                "started_at": datetime.now(timezone.utc).isoformat(),
+                "finished_at": None,
+                "seconds": None,
+                "result": None,
+                "error": None,
+            }
+        threading.Thread(target=self._run, args=(kwargs,), name=self.name, daemon=True).start()
+        return True
+
+    def _run(self, kwargs: Dict[str, Any]) -> None:
+        started = time.perf_counter()
+        state, result, error = "succeeded", None, None
+        try:
+            result = self.target(**kwargs)
+        except Exception as e:
+            print(f"{self.name}: run failed: {e}")
+            traceback.print_exc()
+            state, error = "failed", str(e)
+        with self._lock:
+            self._status.update({
+                "state": state,
+                "finished_at": datetime.now(timezone.utc).isoformat(),
+                "seconds": round(time.perf_counter() - started, 3),
+                "result": result,
+                "error": error,
+            })
+        self._finished.set()
+
+    def status(self) -> Dict[str, Any]:
+        """Returns the state ("idle", "running", "succeeded" or "failed") and details of the current or last run."""
+        with self._lock:
+            return dict(self._status)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until no run is in progress; returns False if `timeout` expired first."""
+        return self._finished.wait(timeout)
@@ -0,0 +1,160 @@
+import heapq
+import json
+import math
+import os
+import tempfile
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from utils.text_matching import TOKEN_PATTERN, normalize_text
+
+# BM25 keyword index saved next to the FAISS index, keyed by the same docstore ids. Product names and
+# Portuguese jargon ("maquininha", "Pix parcelado", "conta PJ") are matched exactly, where dense
+# retrieval may miss them.
+BM25_FILE_NAME = "bm25.json"
+# Bumped when the tokenization changes: older files are ignored and rebuilt from the docstore
+BM25_VERSION = 2
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))  # term frequency saturation
+BM25_B = float(os.getenv("BM25_B", "0.75"))  # document length normalization
+
+# Documents are read from the docstore this many at a time when the index is built from a vector store
+_DOCUMENT_BATCH_SIZE = 500
+
+def tokenize(text: str) -> List[str]:
+    """
+    The words of utils.text_matching ("Cartão" and "cartao" match), single characters dropped. Not the
+    cached `text_matching.tokenize`: indexing every chunk would evict the queries checked per request.
+    """
+    return [token for token in TOKEN_PATTERN.findall(normalize_text(text)) if len(token) > 1]
+
+class BM25Index:
+    """
+    In-process BM25 inverted index over chunks, by docstore id.
+
+    The term frequencies of every document are what is saved (and what lets documents be deleted);
+    the inverted postings used by `search` are derived from them in memory.
+    """
+
+    def __init__(self, k1: Optional[float] = None, b: Optional[float] = None):
+        self.k1 = BM25_K1 if k1 is None else k1
+        self.b = BM25_B if b is None else b
+        self.documents: Dict[str, Dict[str, int]] = {}  # document id -> term -> frequency
+        self.postings: Dict[str, Dict[str, int]] = {}  # term -> document id -> frequency
+        self.lengths: Dict[str, int] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _index(self, document_id: str, frequencies: Dict[str, int]) -> None:
+        self.documents[document_id] = frequencies
+        length = sum(frequencies.values())
+        self.lengths[document_id] = length
+        self.total_length += length
+        for term, frequency in frequencies.items():
+            self.postings.setdefault(term, {})[document_id] = frequency
+
+    def add(self, documents: Iterable[Tuple[str, str]]) -> None:
+        """Indexes (document id, text) pairs; an id already indexed is replaced."""
+        for document_id, text in documents:
+            if document_id in self.documents:
+                self.delete([document_id])
+            self._index(document_id, dict(Counter(tokenize(text))))
+
+    def delete(self, document_ids: Iterable[str]) -> None:
+        """Removes documents from the index; unknown ids are ignored."""
+        for document_id in document_ids:
+            frequencies = self.documents.pop(document_id, None)
+            if frequencies is None:
+                continue
+            self.total_length -= self.lengths.pop(document_id)
+            for term in frequencies:
+                posting = self.postings[term]
+                del posting[document_id]
+                if not posting:
+                    del self.postings[term]
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        """Returns the ids and BM25 scores of the `k` best matching documents, best first."""
+        if not self.documents:
+            return []
+        count = len(self.documents)
+        average_length = self.total_length / count or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1.0 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for document_id, frequency in posting.items():
+                normalization = self.k1 * (1.0 - self.b + self.b * self.lengths[document_id] / average_length)
+                scores[document_id] = scores.get(document_id, 0.0) + idf * frequency * (self.k1 + 1.0) / (frequency + normalization)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore: FAISS) -> "BM25Index":
+        """Indexes every chunk of a vector store, reading its docstore in batches."""
+        index = cls()
+        index.add((document_id, document.page_content) for document_id, document in iter_documents(vectorstore))
+        return index
+
+def iter_documents(vectorstore: FAISS, document_ids: Optional[List[str]] = None) -> Iterator[Tuple[str, Document]]:
+    """Yields (docstore id, document) for `document_ids` (default: every vector of the store), in batches."""
+    if document_ids is None:
+        document_ids = list(vectorstore.index_to_docstore_id.values())
+    get_many = getattr(vectorstore.docstore, "get_many", None)
+    for start in range(0, len(document_ids), _DOCUMENT_BATCH_SIZE):
+        batch = document_ids[start:start + _DOCUMENT_BATCH_SIZE]
+        documents = get_many(batch) if get_many else [vectorstore.docstore.search(document_id) for document_id in batch]
+        for document_id, document in zip(batch, documents):
+            if isinstance(document, Document):
+                yield document_id, document
+
+def load_bm25(folder_path: str) -> Optional[BM25Index]:
+    """Returns the BM25 index saved in `folder_path`, or None if it has none (or an unreadable one)."""
+    try:
+        with open(os.path.join(folder_path, BM25_FILE_NAME), "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable BM25 index in {folder_path}: {e}")
+        return None
+    if saved.get("version") != BM25_VERSION:
+        print(f"Ignoring BM25 index version {saved.get('version')} (expected {BM25_VERSION})")
+        return None
+    index = BM25Index()
+    for document_id, frequencies in saved["documents"].items():
+        index._index(document_id, frequencies)
+    return index
+
+def save_bm25(folder_path: str, index: BM25Index) -> None:
+    """Writes the BM25 index to a temporary file and renames it into place."""
+    descriptor, temporary_file = tempfile.mkstemp(prefix=".bm25-", suffix=".json", dir=folder_path)
+    try:
+        with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+            json.dump({"version": BM25_VERSION, "documents": index.documents}, f, separators=(",", ":"))
+        os.chmod(temporary_file, 0o644)
+        os.replace(temporary_file, os.path.join(folder_path, BM25_FILE_NAME))
+    finally:
+        if os.path.exists(temporary_file):
+            os.remove(temporary_file)
+
+def update_bm25(index: Optional[BM25Index], vectorstore: FAISS, old_manifest: Optional[Dict[str, Any]],
+                new_manifest: Dict[str, Any]) -> BM25Index:
+    """
+    Brings a BM25 index up to date with an ingest (see utils/knowledge_ingest.py): chunks that left
+    the manifest are deleted and new ones are read from the docstore and indexed. Without an index
+    or an old manifest, the index is built from the whole vector store.
+    """
+    if index is None or old_manifest is None:
+        return BM25Index.from_vectorstore(vectorstore)
+    old_ids = {document_id for page in old_manifest["pages"].values() for document_id in page["chunk_ids"]}
+    new_ids = [document_id for page in new_manifest["pages"].values() for document_id in page["chunk_ids"]]
+    index.delete(old_ids.difference(new_ids))
+    added = [document_id for document_id in new_ids if document_id not in old_ids]
+    index.add((document_id, document.page_content) for document_id, document in iter_documents(vectorstore, added))
+    return index
@@ -0,0 +1,137 @@
+from typing import Dict, Optional, Set, Tuple
+
+from utils.text_matching import normalize_text, tokenize
+
+# Fixed messages produced by the agents without an LLM (rejections, escalations). They are written for
+# the user already, so the personality layer returns them as they are instead of restyling them.
+SYSTEM_MESSAGES: Dict[str, Dict[str, str]] = {
+    "access_denied": {
+        "en": ("I'm sorry, for security reasons, you can only access information from your own account.\n"
+               "If you want to check your account data, please ensure you:\n"
+               "1. Provided your User ID at the start of the session\n"
+               "2. Are asking about your own account\n"
+               "How can I help you with YOUR InfinityPay account today?"),
+        "pt": ("Desculpe, por motivos de segurança, você só pode acessar informações da sua própria conta.\n"
+               "Se você deseja consultar dados de sua conta, certifique-se de:\n"
+               "1. Ter fornecido seu User ID no início da sessão\n"
+               "2. Estar perguntando sobre sua própria conta\n"
+               "Como posso ajudá-lo com SUA conta do InfinityPay hoje?"),
+    },
+    "customer_support_off_topic": {
+        "en": ("I'm sorry, I'm a specialized assistant for InfinityPay banking services only.\n"
+               "How can I help you with your account or banking needs today?\n"
+               "I can help with:\n"
+               "• Account information\n"
+               "• Banking technical support\n"
+               "• Other banking inquiries (not direct balance/transaction queries)"),
+        "pt": ("Desculpe, sou um assistente especializado apenas em questões do InfinityPay.\n"
+               "Como posso ajudá-lo com sua conta ou serviços bancários hoje?\n"
+               "Posso ajudar com:\n"
+               "• Informações da conta\n"
+               "• Suporte técnico bancário\n"
+               "• Outras consultas bancárias (não relacionadas a saldo/transações diretas)"),
+    },
+    "custom_agent_off_topic": {
+        "en": ("I'm sorry, I specialize in account balance and transaction history.\n"
+               "For other inquiries, please tell me more or try asking in a different way."),
+        "pt": ("Desculpe, sou especializado em saldo e histórico de transações.\n"
+               "Para outras questões, por favor, me diga mais ou tente perguntar de outra forma."),
+    },
+    "escalated": {
+        "en": ("⚠️ Your request has been flagged for review and escalated to our security team. "
+               "A human agent will contact you shortly."),
+        "pt": ("⚠️ Sua solicitação foi sinalizada para análise e encaminhada à nossa equipe de segurança. "
+               "Um atendente humano entrará em contato em breve."),
+    },
+}
+
+# Replies to small talk, which needs no agent and no LLM
+SMALL_TALK_REPLIES: Dict[str, Dict[str, str]] = {
+    "greeting": {
+        "en": "Hi! I'm the InfinityPay assistant. How can I help you today?",
+        "pt": "Olá! Sou o assistente da InfinityPay. Como posso ajudar você hoje?",
+    },
+    "how_are_you": {
+        "en": "I'm doing great, thanks for asking! How can I help you with InfinityPay today?",
+        "pt": "Estou ótimo, obrigado por perguntar! Como posso ajudar você com a InfinityPay hoje?",
+    },
+    "thanks": {
+        "en": "You're welcome! Is there anything else I can help you with?",
+        "pt": "Por nada! Posso ajudar em mais alguma coisa?",
+    },
+    "goodbye": {
+        "en": "Goodbye! If you need anything else, I'm here to help.",
+        "pt": "Até logo! Se precisar de algo, estou por aqui.",
+    },
+}
+
+# Words of each kind of small talk (normalized: lowercase, no accents). A message is small talk when it
+# is short, made only of these words and fillers, and has an anchor word of a kind every other word
+# belongs to: "thanks so much" is thanks, while "how much?", "muito bem" or "you" are not small talk.
+SMALL_TALK_ANCHORS: Dict[str, Tuple[str, ...]] = {
+    "greeting": ("hi", "hello", "hey", "hiya", "oi", "ola", "eai", "morning", "afternoon", "evening",
+                 "dia", "tarde", "noite"),
+    "how_are_you": ("are", "doing", "going", "tudo", "vai", "esta", "beleza", "blz"),
+    "thanks": ("thanks", "thank", "thx", "ty", "obrigado", "obrigada", "valeu"),
+    "goodbye": ("bye", "goodbye", "later", "tchau", "ate", "adeus", "cya"),
+}
+SMALL_TALK_WORDS: Dict[str, Tuple[str, ...]] = {
+    "greeting": ("good", "bom", "boa", "there", "everyone", "pessoal"),
+    "how_are_you": ("how", "you", "bem", "como", "voce", "vc"),
+    "thanks": ("you", "much", "lot", "muito", "so"),
+    "goodbye": ("see", "you", "logo", "mais"),
+}
+SMALL_TALK_FILLER = ("a", "e", "and", "ok", "okay", "oh", "well", "again", "entao", "ai")
+SMALL_TALK_MAX_WORDS = 6
+
+_KIND_BY_ANCHOR: Dict[str, str] = {
+    _word: _kind for _kind, _words in SMALL_TALK_ANCHORS.items() for _word in _words
+}
+_KINDS_BY_WORD: Dict[str, Set[str]] = {}
+for _kind, _words in SMALL_TALK_WORDS.items():
+    for _word in _words:
+        _KINDS_BY_WORD.setdefault(_word, set()).add(_kind)
+
+def _canonical(text: str) -> str:
+    # Indentation and line breaks differ between the places a message is written; the words do not
+    return normalize_text(text)
+
+_SYSTEM_MESSAGE_KEYS: Dict[str, str] = {
+    _canonical(text): key for key, texts in SYSTEM_MESSAGES.items() for text in texts.values()
+}
+
+def system_message(key: str, language: str) -> str:
+    """The fixed message `key` in `language` (English when there is no translation)."""
+    texts = SYSTEM_MESSAGES[key]
+    return texts.get(language, texts["en"])
+
+def match_system_message(text: Optional[str]) -> Optional[str]:
+    """The key of the fixed message `text` is (in any language and layout), if it is one."""
+    if not text:
+        return None
+    return _SYSTEM_MESSAGE_KEYS.get(_canonical(text))
+
+def classify_small_talk(text: Optional[str]) -> Optional[str]:
+    """The kind of small talk of a message ("greeting", "how_are_you", "thanks", "goodbye"), or None."""
+    if not text:
+        return None
+    words = tokenize(text)
+    if not words or len(words) > SMALL_TALK_MAX_WORDS:
+        return None
+    kinds = {_KIND_BY_ANCHOR[word] for word in words if word in _KIND_BY_ANCHOR}
+    for word in words:
+        if word in _KIND_BY_ANCHOR or word in SMALL_TALK_FILLER:
+            continue
+        # Any other word must belong to a kind the message has an anchor of
+        if not kinds & _KINDS_BY_WORD.get(word, set()):
+            return None
+    # The most specific kind wins: "hi, thanks!" is thanks
+    for kind in ("goodbye", "thanks", "how_are_you", "greeting"):
+        if kind in kinds:
+            return kind
+    return None
+
+def small_talk_reply(kind: str, language: str) -> str:
+    """The reply to small talk of `kind` in `language` (English when there is no translation)."""
+    replies = SMALL_TALK_REPLIES[kind]
+    return replies.get(language, replies["en"])
@@ -0,0 +1,420 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import InMemorySaver, MemorySaver
+
+# Conversation checkpointer of the overall graph (one thread per user_id). "bounded" keeps the latest
+# CHECKPOINT_MAX_PER_THREAD checkpoints of every thread, expires threads idle for CHECKPOINT_TTL seconds,
+# caps the in-memory tier at CHECKPOINT_MAX_MEMORY_MB and writes through to CHECKPOINT_DB_PATH, so
+# sessions survive a restart (empty path: memory only). "memory" is the unbounded MemorySaver.
+CHECKPOINTER = os.getenv("CHECKPOINTER", "bounded").lower()
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "checkpoints.sqlite3")
+CHECKPOINT_MAX_PER_THREAD = int(os.getenv("CHECKPOINT_MAX_PER_THREAD", "5"))
+CHECKPOINT_TTL = float(os.getenv("CHECKPOINT_TTL", "86400"))  # seconds of inactivity
+CHECKPOINT_MAX_MEMORY_MB = float(os.getenv("CHECKPOINT_MAX_MEMORY_MB", "256"))
+CHECKPOINT_SWEEP_INTERVAL = float(os.getenv("CHECKPOINT_SWEEP_INTERVAL", "60"))  # seconds between expiry sweeps
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS threads (thread_id TEXT PRIMARY KEY, last_used REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS threads_last_used ON threads (last_used)",
+    "CREATE TABLE IF NOT EXISTS checkpoints ("
+    "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, "
+    "checkpoint_type TEXT NOT NULL, checkpoint BLOB NOT NULL, metadata_type TEXT NOT NULL, metadata BLOB NOT NULL, "
+    "parent_checkpoint_id TEXT, PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id))",
+    # version has no declared type, so int and str versions come back as they were stored
+    "CREATE TABLE IF NOT EXISTS blobs ("
+    "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, channel TEXT NOT NULL, version NOT NULL, "
+    "value_type TEXT NOT NULL, value BLOB NOT NULL, PRIMARY KEY (thread_id, checkpoint_ns, channel, version))",
+    "CREATE TABLE IF NOT EXISTS writes ("
+    "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, task_id TEXT NOT NULL, "
+    "idx INTEGER NOT NULL, channel TEXT NOT NULL, value_type TEXT NOT NULL, value BLOB NOT NULL, task_path TEXT NOT NULL, "
+    "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx))",
+)
+
+class BoundedCheckpointSaver(InMemorySaver):
+    """
+    LangGraph checkpointer with bounded memory and an optional local sqlite store.
+
+    Only the latest `max_checkpoints` checkpoints of every thread and namespace are kept (with their
+    pending writes and the channel values they reference); older ones are pruned on every put, along
+    with the namespaces of subgraphs that ran in pruned steps. Threads not used for `ttl` seconds are
+    deleted. The in-memory tier holds at most `max_memory_bytes` of serialized state: beyond it, the
+    least recently used threads are dropped from memory. With a `path`, every put is written through
+    to sqlite, so dropped threads (even the only one, if it exceeds the cap alone) are read back on
+    their next request, and the most recently used threads are loaded again when the process starts.
+    Without one, threads dropped from memory are lost, and the thread in use is never dropped.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_checkpoints: int = 5, ttl: float = 86400.0,
+                 max_memory_bytes: int = 256 * 1024 * 1024, sweep_interval: float = 60.0, serde: Any = None):
+        super().__init__(serde=serde)
+        self.path = path
+        self.max_checkpoints = max(1, max_checkpoints)
+        self.ttl = ttl
+        self.max_memory_bytes = max_memory_bytes
+        self.sweep_interval = sweep_interval
+        self._lock = threading.RLock()
+        self._last_used: "OrderedDict[str, float]" = OrderedDict()  # threads in memory, least recently used first
+        self._sizes: Dict[str, int] = {}
+        self._memory_bytes = 0
+        self._write_keys: Dict[str, Set[Tuple[str, str, str]]] = {}
+        self._blob_keys: Dict[str, Set[Tuple[str, str, str, Any]]] = {}
+        self._versions: Dict[str, Dict[Tuple[str, str], Dict[str, Any]]] = {}  # thread -> (ns, checkpoint id) -> channel versions
+        self._next_sweep = 0.0
+        self._stats: Counter = Counter()
+        self._connection: Optional[sqlite3.Connection] = None
+        if path:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SCHEMA:
+                self._connection.execute(statement)
+            self._connection.commit()
+            self._warm_restore()
+
+    # --- in-memory bookkeeping ---
+
+    def _expired(self, last_used: Optional[float], now: float) -> bool:
+        return last_used is not None and self.ttl > 0 and now - last_used > self.ttl
+
+    def _thread_size(self, thread_id: str) -> int:
+        size = 0
+        for checkpoints in self.storage.get(thread_id, {}).values():
+            for checkpoint, metadata, _ in checkpoints.values():
+                size += len(checkpoint[1]) + len(metadata[1])
+        for outer_key in self._write_keys.get(thread_id, ()):
+            size += sum(len(write[2][1]) for write in self.writes.get(outer_key, {}).values())
+        for blob_key in self._blob_keys.get(thread_id, ()):
+            blob = self.blobs.get(blob_key)
+            size += len(blob[1]) if blob is not None else 0
+        return size
+
+    def _touch(self, thread_id: str) -> None:
+        """Marks the thread as just used, updates its size and enforces the memory cap on the other threads."""
+        self._last_used[thread_id] = time.time()
+        self._last_used.move_to_end(thread_id)
+        size = self._thread_size(thread_id)
+        self._memory_bytes += size - self._sizes.get(thread_id, 0)
+        self._sizes[thread_id] = size
+        while self._memory_bytes > self.max_memory_bytes and len(self._last_used) > 1:
+            evicted_thread = next(iter(self._last_used))
+            self._drop_from_memory(evicted_thread)
+            self._stats["evictions"] += 1
+
+    def _release_if_oversized(self, thread_id: str) -> None:
+        """
+        Drops a thread that exceeds the memory cap on its own once it is saved to sqlite; it is read
+        back on its next request. Without sqlite it stays, as dropping it would lose the conversation.
+        """
+        if self._memory_bytes > self.max_memory_bytes and self._connection is not None and thread_id in self._last_used:
+            self._drop_from_memory(thread_id)
+            self._stats["evictions"] += 1
+
+    def _drop_from_memory(self, thread_id: str) -> None:
+        self.storage.pop(thread_id, None)
+        for outer_key in self._write_keys.pop(thread_id, ()):
+            self.writes.pop(outer_key, None)
+        for blob_key in self._blob_keys.pop(thread_id, ()):
+            self.blobs.pop(blob_key, None)
+        self._versions.pop(thread_id, None)
+        self._last_used.pop(thread_id, None)
+        self._memory_bytes -= self._sizes.pop(thread_id, 0)
+
+    def _prune(self, thread_id: str) -> None:
+        """
+        Keeps the latest `max_checkpoints` checkpoints of every namespace of the thread, drops the
+        subgraph namespaces of pruned parent checkpoints and the blobs no kept checkpoint references.
+        """
+        namespaces = self.storage[thread_id]
+        pruned = {checkpoint_ns: sorted(checkpoints)[:-self.max_checkpoints]
+                  for checkpoint_ns, checkpoints in namespaces.items() if len(checkpoints) > self.max_checkpoints}
+        # Subgraphs called inside a node checkpoint under a new "node:<task_id>" namespace on every run.
+        # Checkpoint ids are time-ordered, so a namespace whose checkpoints are all older than the oldest
+        # kept parent checkpoint ran in a step that is pruned (an interrupted subgraph is newer than it).
+        if namespaces.get(""):
+            oldest_kept = sorted(namespaces[""])[-self.max_checkpoints:][0]
+            for checkpoint_ns, checkpoints in namespaces.items():
+                if checkpoint_ns and checkpoints and max(checkpoints) < oldest_kept:
+                    pruned[checkpoint_ns] = list(checkpoints)
+        if not pruned:
+            return
+        versions = self._versions.get(thread_id, {})
+        write_keys = self._write_keys.get(thread_id, set())
+        pruned_checkpoints = []
+        for checkpoint_ns, checkpoint_ids in pruned.items():
+            checkpoints = namespaces[checkpoint_ns]
+            for checkpoint_id in checkpoint_ids:
+                del checkpoints[checkpoint_id]
+                versions.pop((checkpoint_ns, checkpoint_id), None)
+                outer_key = (thread_id, checkpoint_ns, checkpoint_id)
+                self.writes.pop(outer_key, None)
+                write_keys.discard(outer_key)
+                pruned_checkpoints.append(outer_key)
+            if not checkpoints:
+                del namespaces[checkpoint_ns]
+        referenced = {
+            (thread_id, checkpoint_ns, channel, version)
+            for (checkpoint_ns, _), channel_versions in versions.items()
+            if checkpoint_ns in pruned
+            for channel, version in channel_versions.items()
+        }
+        blob_keys = self._blob_keys.get(thread_id, set())
+        pruned_blobs = [key for key in blob_keys if key[1] in pruned and key not in referenced]
+        for blob_key in pruned_blobs:
+            blob_keys.discard(blob_key)
+            self.blobs.pop(blob_key, None)
+        self._stats["pruned"] += len(pruned_checkpoints)
+        if self._connection is not None:
+            self._connection.executemany(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", pruned_checkpoints)
+            self._connection.executemany(
+                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", pruned_checkpoints)
+            self._connection.executemany(
+                "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?", pruned_blobs)
+
+    def _sweep(self, now: float) -> None:
+        """Deletes the threads not used for `ttl` seconds, in memory and on disk."""
+        if self.ttl <= 0 or now < self._next_sweep:
+            return
+        self._next_sweep = now + self.sweep_interval
+        for thread_id in [thread_id for thread_id, last_used in self._last_used.items() if self._expired(last_used, now)]:
+            self._delete(thread_id)
+            self._stats["expired"] += 1
+        if self._connection is not None:
+            expired = self._connection.execute("SELECT thread_id FROM threads WHERE last_used < ?", (now - self.ttl,)).fetchall()
+            for (thread_id,) in expired:
+                self._delete(thread_id)
+                self._stats["expired"] += 1
+            self._connection.commit()
+
+    # --- sqlite tier ---
+
+    def _thread_last_used(self, thread_id: str) -> Optional[float]:
+        if thread_id in self._last_used:
+            return self._last_used[thread_id]
+        if self._connection is None:
+            return None
+        row = self._connection.execute("SELECT last_used FROM threads WHERE thread_id = ?", (thread_id,)).fetchone()
+        return row[0] if row else None
+
+    def _load_thread(self, thread_id: str) -> bool:
+        """Reads a thread that is not in memory back from sqlite. Returns whether it was found."""
+        if self._connection is None:
+            return False
+        checkpoints = self._connection.execute(
+            "SELECT checkpoint_ns, checkpoint_id, checkpoint_type, checkpoint, metadata_type, metadata, parent_checkpoint_id "
+            "FROM checkpoints WHERE thread_id = ?", (thread_id,)).fetchall()
+        if not checkpoints:
+            return False
+        for checkpoint_ns, checkpoint_id, checkpoint_type, checkpoint, metadata_type, metadata, parent_id in checkpoints:
+            serialized = (checkpoint_type, bytes(checkpoint))
+            self.storage[thread_id][checkpoint_ns][checkpoint_id] = (serialized, (metadata_type, bytes(metadata)), parent_id)
+            self._versions.setdefault(thread_id, {})[(checkpoint_ns, checkpoint_id)] = dict(
+                self.serde.loads_typed(serialized)["channel_versions"])
+        blob_keys = self._blob_keys.setdefault(thread_id, set())
+        for checkpoint_ns, channel, version, value_type, value in self._connection.execute(
+                "SELECT checkpoint_ns, channel, version, value_type, value FROM blobs WHERE thread_id = ?", (thread_id,)):
+            blob_key = (thread_id, checkpoint_ns, channel, version)
+            self.blobs[blob_key] = (value_type, bytes(value))
+            blob_keys.add(blob_key)
+        write_keys = self._write_keys.setdefault(thread_id, set())
+        for checkpoint_ns, checkpoint_id, task_id, idx, channel, value_type, value, task_path in self._connection.execute(
+                "SELECT checkpoint_ns, checkpoint_id, task_id, idx, channel, value_type, value, task_path "
+                "FROM writes WHERE thread_id = ?", (thread_id,)):
+            outer_key = (thread_id, checkpoint_ns, checkpoint_id)
+            self.writes[outer_key][(task_id, idx)] = (task_id, channel, (value_type, bytes(value)), task_path)
+            write_keys.add(outer_key)
+        self._stats["restored"] += 1
+        return True
+
+    def _ensure_loaded(self, thread_id: str) -> bool:
+        """Makes the thread's live checkpoints available in memory. Returns False if it has none."""
+        now = time.time()
+        if self._expired(self._thread_last_used(thread_id), now):
+            self._delete(thread_id)
+            self._stats["expired"] += 1
+            if self._connection is not None:
+                self._connection.commit()
+            return False
+        if thread_id in self._last_used:
+            return True
+        if self._load_thread(thread_id):
+            self._touch(thread_id)
+            return True
+        return False
+
+    def _warm_restore(self) -> None:
+        """Loads the most recently used live threads from sqlite, as long as they fit in the memory cap."""
+        now = time.time()
+        self._sweep(now)
+        rows = self._connection.execute("SELECT thread_id, last_used FROM threads ORDER BY last_used DESC").fetchall()
+        for thread_id, last_used in rows:
+            if not self._load_thread(thread_id):
+                continue
+            size = self._thread_size(thread_id)
+            if self._memory_bytes + size > self.max_memory_bytes:
+                self._drop_from_memory(thread_id)
+                self._stats["restored"] -= 1
+                break
+            self._last_used[thread_id] = last_used
+            self._last_used.move_to_end(thread_id, last=False)  # older threads go first in LRU order
+            self._sizes[thread_id] = size
+            self._memory_bytes += size
+        if self._last_used:
+            print(f"Restored {len(self._last_used)} conversation threads from {self.path}")
+
+    def _delete(self, thread_id: str) -> None:
+        self._drop_from_memory(thread_id)
+        if self._connection is not None:
+            for table in ("threads", "checkpoints", "blobs", "writes"):
+                self._connection.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    # --- BaseCheckpointSaver API (the async methods of InMemorySaver call these) ---
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            if not self._ensure_loaded(thread_id):
+                return None
+            checkpoint_tuple = super().get_tuple(config)
+            self._last_used.move_to_end(thread_id)
+            self._release_if_oversized(thread_id)
+            return checkpoint_tuple
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        """Lists the checkpoints of a thread, or of every thread in memory when `config` is None."""
+        with self._lock:
+            if config is not None and not self._ensure_loaded(config["configurable"]["thread_id"]):
+                return iter(())
+            return iter(list(super().list(config, filter=filter, before=before, limit=limit)))
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            now = time.time()
+            self._sweep(now)
+            self._ensure_loaded(thread_id)
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            checkpoint_id = checkpoint["id"]
+            self._versions.setdefault(thread_id, {})[(checkpoint_ns, checkpoint_id)] = dict(checkpoint["channel_versions"])
+            blob_keys = [(thread_id, checkpoint_ns, channel, version) for channel, version in new_versions.items()]
+            self._blob_keys.setdefault(thread_id, set()).update(blob_keys)
+            if self._connection is not None:
+                serialized, serialized_metadata, parent_id = self.storage[thread_id][checkpoint_ns][checkpoint_id]
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint_id, serialized[0], serialized[1],
+                     serialized_metadata[0], serialized_metadata[1], parent_id))
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)",
+                    [key + self.blobs[key] for key in blob_keys])
+            self._prune(thread_id)
+            if self._connection is not None:
+                self._connection.execute("INSERT OR REPLACE INTO threads VALUES (?, ?)", (thread_id, now))
+                self._connection.commit()
+            self._touch(thread_id)
+            self._release_if_oversized(thread_id)
+            return next_config
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        outer_key = (thread_id, checkpoint_ns, config["configurable"]["checkpoint_id"])
+        with self._lock:
+            self._ensure_loaded(thread_id)
+            super().put_writes(config, writes, task_id, task_path)
+            self._write_keys.setdefault(thread_id, set()).add(outer_key)
+            if self._connection is not None:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [outer_key + (write_task_id, idx, channel, value[0], value[1], write_task_path)
+                     for (write_task_id, idx), (_, channel, value, write_task_path) in self.writes[outer_key].items()
+                     if write_task_id == task_id])
+                self._connection.commit()
+            self._touch(thread_id)
+            self._release_if_oversized(thread_id)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._delete(thread_id)
+            if self._connection is not None:
+                self._connection.commit()
+
+    # The inherited async methods call the sync ones on the event loop; sqlite reads, writes and
+    # commits run in a worker thread instead
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        checkpoint_tuples = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for checkpoint_tuple in checkpoint_tuples:
+            yield checkpoint_tuple
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the threads and bytes held in memory and the pruning/expiry/eviction/restore counters."""
+        with self._lock:
+            return {
+                "threads_in_memory": len(self._last_used),
+                "memory_bytes": self._memory_bytes,
+                "pruned": self._stats["pruned"],
+                "expired": self._stats["expired"],
+                "evictions": self._stats["evictions"],
+                "restored": self._stats["restored"],
+                "persistent": self._connection is not None,
+            }
+
+_checkpointer: Optional[BaseCheckpointSaver] = None
+
+def create_checkpointer() -> BaseCheckpointSaver:
+    """Creates the conversation checkpointer selected by CHECKPOINTER (see above)."""
+    global _checkpointer
+    if CHECKPOINTER == "memory":
+        _checkpointer = MemorySaver()
+        return _checkpointer
+    settings = dict(max_checkpoints=CHECKPOINT_MAX_PER_THREAD, ttl=CHECKPOINT_TTL,
+                    max_memory_bytes=int(CHECKPOINT_MAX_MEMORY_MB * 1024 * 1024), sweep_interval=CHECKPOINT_SWEEP_INTERVAL)
+    try:
+        _checkpointer = BoundedCheckpointSaver(CHECKPOINT_DB_PATH or None, **settings)
+    except sqlite3.Error as e:
+        print(f"Failed to open checkpoint store {CHECKPOINT_DB_PATH}: {e}. Conversations will be kept in memory only.")
+        _checkpointer = BoundedCheckpointSaver(None, **settings)
+    return _checkpointer
+
+def get_checkpointer_stats() -> Dict[str, Any]:
+    """Returns the bounded checkpointer counters, or an empty dict for the unbounded MemorySaver."""
+    if isinstance(_checkpointer, BoundedCheckpointSaver):
+        return _checkpointer.stats()
+    return {}
@@ -0,0 +1,259 @@
+import asyncio
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "models/embedding-001")
+
+# Persistent embedding cache: repeated queries and unchanged chunks are never embedded twice
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+# Cache hits only update last_used (for LRU eviction) in memory; they are written in batches of this
+# size, or with the next store, so a hit costs no sqlite write
+EMBEDDING_CACHE_TOUCH_BATCH = 256
+
+# Index builds embed texts EMBEDDING_BATCH_SIZE at a time; a batch that fails with a transient error
+# (rate limit, timeout, server error) is retried up to EMBEDDING_MAX_RETRIES times with exponential
+# backoff (EMBEDDING_RETRY_BASE_DELAY doubling up to EMBEDDING_RETRY_MAX_DELAY seconds, with jitter)
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "6"))
+EMBEDDING_RETRY_BASE_DELAY = float(os.getenv("EMBEDDING_RETRY_BASE_DELAY", "1"))
+EMBEDDING_RETRY_MAX_DELAY = float(os.getenv("EMBEDDING_RETRY_MAX_DELAY", "60"))
+
+# Markers of transient errors in the exception type or message. The embedding clients (google-genai,
+# grpc, httpx) raise unrelated exception types, so they are recognised by name.
+_TRANSIENT_ERROR_MARKERS = ("429", "500", "502", "503", "504", "resourceexhausted", "resource exhausted", "quota",
+                            "rate limit", "ratelimit", "unavailable", "deadline", "timeout", "timed out",
+                            "internalservererror", "connection")
+
+_embeddings = None
+_embeddings_lock = threading.Lock()
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings model with a persistent cache stored in a local sqlite file.
+
+    Vectors are stored as float32 blobs keyed by a SHA-256 hash of the model name, the kind of
+    embedding (query or document, which some models embed differently) and the text. Only texts
+    missing from the cache are sent to the model, once each and in one batch. When the cache holds
+    more than `max_entries` vectors, the least recently used ones are evicted.
+
+    The cache never fails an embedding: if sqlite raises, the texts are sent to the model as if
+    they were missing. The async methods do the sqlite work in a worker thread.
+    """
+
+    def __init__(self, underlying: Embeddings, path: str, max_entries: int = 100000, namespace: Optional[str] = None):
+        self.underlying = underlying
+        self.path = path
+        self.max_entries = max_entries
+        self.namespace = namespace or getattr(underlying, "model", type(underlying).__name__)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._connection.commit()
+        self._lock = threading.Lock()
+        self._stats: Counter = Counter()
+        # Row count kept in memory, and last_used of the hits not written yet (key -> time)
+        self._size = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self._pending_touches: Dict[str, float] = {}
+
+    @property
+    def model(self) -> str:
+        """Name of the wrapped model (used to fingerprint indexes built with it)."""
+        return self.namespace
+
+    def _key(self, kind: str, text: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, kind: str, texts: List[str]) -> Tuple[List[Optional[List[float]]], List[int]]:
+        """Returns the cached vectors (None where missing) and the indexes of the texts to embed."""
+        keys = [self._key(kind, text) for text in texts]
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            try:
+                # sqlite limits the number of bound parameters; look keys up in chunks
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    rows = self._connection.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                    ).fetchall()
+                    found.update(rows)
+                now = time.time()
+                self._pending_touches.update((key, now) for key in found)
+                if len(self._pending_touches) >= EMBEDDING_CACHE_TOUCH_BATCH:
+                    self._flush_touches()
+                    self._connection.commit()
+            except sqlite3.Error as e:
+                print(f"Embedding cache lookup failed ({e}); embedding the texts instead")
+                self._stats["errors"] += 1
+            self._stats["hits"] += sum(1 for key in keys if key in found)
+            self._stats["misses"] += sum(1 for key in keys if key not in found)
+
+        vectors = [np.frombuffer(found[key], dtype=np.float32).tolist() if key in found else None for key in keys]
+        missing = [index for index, vector in enumerate(vectors) if vector is None]
+        return vectors, missing
+
+    def _store(self, kind: str, texts: List[str], vectors: List[List[float]]) -> None:
+        now = time.time()
+        rows = [(self._key(kind, text), np.asarray(vector, dtype=np.float32).tobytes(), now)
+                for text, vector in zip(texts, vectors)]
+        with self._lock:
+            try:
+                # Rows already present hold the same vector; they only need their last_used refreshed
+                self._pending_touches.update((key, now) for key, _, _ in rows)
+                inserted = self._connection.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+                ).rowcount
+                size = self._size + max(inserted, 0)
+                # Written before evicting, so eviction sees the real last_used of every row
+                self._flush_touches()
+                evicted = 0
+                if size > self.max_entries:
+                    evicted = self._connection.execute(
+                        "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                        (size - self.max_entries,)
+                    ).rowcount
+                self._connection.commit()
+                self._size = size - evicted
+                self._stats["evictions"] += evicted
+            except sqlite3.Error as e:
+                print(f"Embedding cache store failed ({e}); the vectors will not be cached")
+                self._stats["errors"] += 1
+                try:
+                    self._connection.rollback()
+                except sqlite3.Error:
+                    pass
+
+    def _flush_touches(self) -> None:
+        """Writes the pending last_used updates (the caller holds the lock and commits)."""
+        if self._pending_touches:
+            self._connection.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                         [(used, key) for key, used in self._pending_touches.items()])
+            self._pending_touches.clear()
+
+    def _merge(self, kind: str, texts: List[str], vectors: List[Optional[List[float]]],
+               missing: List[int], new_vectors_by_text: Dict[str, List[float]]) -> List[List[float]]:
+        self._store(kind, list(new_vectors_by_text), list(new_vectors_by_text.values()))
+        for index in missing:
+            vectors[index] = list(new_vectors_by_text[texts[index]])
+        return vectors
+
+    @staticmethod
+    def _unique_missing_texts(texts: List[str], missing: List[int]) -> List[str]:
+        return list(dict.fromkeys(texts[index] for index in missing))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors, missing = self._lookup("document", texts)
+        if not missing:
+            return vectors
+        texts_to_embed = self._unique_missing_texts(texts, missing)
+        new_vectors = self.underlying.embed_documents(texts_to_embed)
+        return self._merge("document", texts, vectors, missing, dict(zip(texts_to_embed, new_vectors)))
+
+    def embed_query(self, text: str) -> List[float]:
+        vectors, missing = self._lookup("query", [text])
+        if not missing:
+            return vectors[0]
+        return self._merge("query", [text], vectors, missing, {text: self.underlying.embed_query(text)})[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # sqlite reads and writes run in a worker thread so they never block the event loop
+        vectors, missing = await asyncio.to_thread(self._lookup, "document", texts)
+        if not missing:
+            return vectors
+        texts_to_embed = self._unique_missing_texts(texts, missing)
+        new_vectors = await self.underlying.aembed_documents(texts_to_embed)
+        return await asyncio.to_thread(self._merge, "document", texts, vectors, missing,
+                                       dict(zip(texts_to_embed, new_vectors)))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vectors, missing = await asyncio.to_thread(self._lookup, "query", [text])
+        if not missing:
+            return vectors[0]
+        new_vector = await self.underlying.aembed_query(text)
+        return (await asyncio.to_thread(self._merge, "query", [text], vectors, missing, {text: new_vector}))[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the hit/miss/eviction/error counters and the number of cached vectors."""
+        with self._lock:
+            return {
+                "hits": self._stats["hits"],
+                "misses": self._stats["misses"],
+                "evictions": self._stats["evictions"],
+                "errors": self._stats["errors"],
+                "size": self._size,
+                "max_entries": self.max_entries,
+            }
+
+def get_embeddings() -> Embeddings:
+    """
+    Returns the process-wide embeddings client.
+    Every vector index of the project (knowledge base, router exemplars) must be built and queried
+    with the same model, so they all get it from here.
+    """
+    global _embeddings
+    if _embeddings is None:
+        with _embeddings_lock:
+            if _embeddings is None:
+                embeddings = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL)
+                if EMBEDDING_CACHE_ENABLED:
+                    try:
+                        embeddings = CachedEmbeddings(embeddings, EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES,
+                                                      namespace=EMBEDDING_MODEL)
+                    except sqlite3.Error as e:
+                        print(f"Failed to open embedding cache {EMBEDDING_CACHE_PATH}: {e}. Embeddings will not be cached.")
+                _embeddings = embeddings
+    return _embeddings
+
+def get_embedding_cache_stats() -> Dict[str, Any]:
+    """Returns the embedding cache counters, or an empty dict if the cache is disabled or not created yet."""
+    if isinstance(_embeddings, CachedEmbeddings):
+        return _embeddings.stats()
+    return {}
+
+def is_transient_embedding_error(error: Exception) -> bool:
+    """Whether an embedding call that raised `error` is worth retrying (rate limit, timeout, server error)."""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    description = f"{type(error).__name__} {error}".lower()
+    return any(marker in description for marker in _TRANSIENT_ERROR_MARKERS)
+
+def embed_documents_with_retry(embeddings: Embeddings, texts: List[str], max_retries: Optional[int] = None,
+                               base_delay: Optional[float] = None, max_delay: Optional[float] = None,
+                               sleep: Callable[[float], None] = time.sleep) -> List[List[float]]:
+    """
+    Embeds one batch of `texts`, retrying transient errors with exponential backoff and full jitter.
+    Other errors, and the last transient one, are raised.
+    """
+    max_retries = EMBEDDING_MAX_RETRIES if max_retries is None else max_retries
+    base_delay = EMBEDDING_RETRY_BASE_DELAY if base_delay is None else base_delay
+    max_delay = EMBEDDING_RETRY_MAX_DELAY if max_delay is None else max_delay
+    attempt = 0
+    while True:
+        try:
+            return embeddings.embed_documents(texts)
+        except Exception as e:
+            if attempt >= max_retries or not is_transient_embedding_error(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            attempt += 1
+            print(f"Embedding batch of {len(texts)} texts failed ({type(e).__name__}: {e}); "
+                  f"retry {attempt}/{max_retries} in {delay:.1f}s")
+            sleep(delay)
@@ -1,9 +1,11 @@
 from typing import Optional
 import re
 
+USER_ID_PATTERN = re.compile(r'\buser\d+\b')
+
 def extract_user_id_from_query(query: str) -> Optional[str]:
     """Extract user ID from the query if mentioned"""
-    match = re.search(r'\buser\d+\b', query.lower())
+    match = USER_ID_PATTERN.search(query.lower())
     if match:
         return match.group(0)
-    return None
\ No newline at end of file
+    return None
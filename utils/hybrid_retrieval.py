@@ -0,0 +1,119 @@
+import asyncio
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from utils.bm25 import BM25Index, iter_documents
+
+# Candidates taken from each ranking before fusion, and the RRF constant (60 in the original paper:
+# larger values flatten the difference between the first ranks)
+HYBRID_CANDIDATES = int(os.getenv("KNOWLEDGE_HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.getenv("KNOWLEDGE_RRF_K", "60"))
+
+def _key(document: Document) -> str:
+    # Documents of indexes saved before chunk ids existed have no id; their text identifies them
+    return document.id or document.page_content
+
+def reciprocal_rank_fusion(rankings: Sequence[List[Document]], k: int = RRF_K) -> List[Tuple[Document, float]]:
+    """
+    Fuses rankings of documents (best first) by reciprocal rank: every document scores the sum of
+    1 / (k + rank) over the rankings it appears in. Returns the documents with their score, best first.
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            key = _key(document)
+            documents.setdefault(key, document)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(((documents[key], score) for key, score in scores.items()), key=lambda item: item[1], reverse=True)
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retrieves chunks by fusing the FAISS similarity ranking with the BM25 keyword ranking
+    (see utils/bm25.py): a chunk naming the product asked about ranks well even when its
+    embedding is not among the nearest. Without a lexical index it is a plain vector retriever.
+    """
+
+    vectorstore: FAISS
+    lexical_index: Optional[BM25Index] = None
+    k: int = 5
+    candidates: int = HYBRID_CANDIDATES
+    rrf_k: int = RRF_K
+
+    def _vector_ranking(self, query: str) -> List[Tuple[Document, float]]:
+        return self.vectorstore.similarity_search_with_score(query, k=self.candidates)
+
+    def _confidence(self, vector_ranking: List[Tuple[Document, float]]) -> float:
+        """
+        Cosine similarity between the query and the nearest chunk by vector similarity (0 when there
+        is none), from the distance FAISS returned for it. The embeddings are unit vectors, so the
+        squared L2 distance d² of a Euclidean index gives cos = 1 - d² / 2, and the inner product of
+        an inner-product index is the cosine itself.
+        """
+        if not vector_ranking:
+            return 0.0
+        distance = float(vector_ranking[0][1])
+        if self.vectorstore.distance_strategy == DistanceStrategy.EUCLIDEAN_DISTANCE:
+            return 1.0 - distance / 2.0
+        return distance
+
+    def _lexical_ranking(self, query: str) -> List[Document]:
+        if self.lexical_index is None:
+            return []
+        ids = [document_id for document_id, _ in self.lexical_index.search(query, k=self.candidates)]
+        found = dict(iter_documents(self.vectorstore, ids))
+        return [found[document_id] for document_id in ids if document_id in found]
+
+    def _fuse(self, rankings: List[List[Document]]) -> List[Tuple[Document, float]]:
+        """The `k` best fused chunks, scored relative to a chunk ranked first by every ranking (1.0)."""
+        rankings = [ranking for ranking in rankings if ranking]
+        if not rankings:
+            return []
+        best_possible = len(rankings) / (self.rrf_k + 1)
+        return [(document, score / best_possible)
+                for document, score in reciprocal_rank_fusion(rankings, self.rrf_k)[:self.k]]
+
+    def search_with_confidence(self, query: str) -> Tuple[List[Tuple[Document, float]], float]:
+        """
+        Returns the `k` best chunks for `query` with a relevance score between 0 and 1, best first,
+        and the confidence that the knowledge base answers it: the cosine similarity between the
+        query and the nearest chunk by vector similarity. Fused scores are relative ranks, so they
+        cannot tell whether any chunk is relevant.
+        """
+        vector_ranking = self._vector_ranking(query)
+        chunks = self._fuse([[document for document, _ in vector_ranking], self._lexical_ranking(query)])
+        return chunks, self._confidence(vector_ranking)
+
+    async def asearch_with_confidence(self, query: str) -> Tuple[List[Tuple[Document, float]], float]:
+        """Async version of `search_with_confidence`; both rankings are computed concurrently."""
+        vector_ranking, lexical_ranking = await asyncio.gather(
+            self.vectorstore.asimilarity_search_with_score(query, k=self.candidates),
+            asyncio.to_thread(self._lexical_ranking, query)
+        )
+        chunks = self._fuse([[document for document, _ in vector_ranking], lexical_ranking])
+        return chunks, self._confidence(vector_ranking)
+
+    def search_with_scores(self, query: str) -> List[Tuple[Document, float]]:
+        """Returns the `k` best chunks for `query` with a relevance score between 0 and 1, best first."""
+        return self._fuse([[document for document, _ in self._vector_ranking(query)], self._lexical_ranking(query)])
+
+    async def asearch_with_scores(self, query: str) -> List[Tuple[Document, float]]:
+        """Async version of `search_with_scores`; both rankings are computed concurrently."""
+        vector_ranking, lexical_ranking = await asyncio.gather(
+            self.vectorstore.asimilarity_search_with_score(query, k=self.candidates),
+            asyncio.to_thread(self._lexical_ranking, query)
+        )
+        return self._fuse([[document for document, _ in vector_ranking], lexical_ranking])
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return [document for document, _ in self.search_with_scores(query)]
+
+    async def _aget_relevant_documents(self, query: str, *,
+                                       run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        return [document for document, _ in await self.asearch_with_scores(query)]
@@ -0,0 +1,149 @@
+import os
+import shutil
+import tempfile
+import time
+from typing import List, Optional, Set
+
+# Versioned index directories: every rebuild writes a complete index (vectors, docstore, manifest,
+# BM25) into a new directory under `<index path>.versions/`, then publishes it by replacing the
+# `<index path>.current` file, which names the served version. Readers therefore see either the
+# previous index or the new one, never a mix of files from both. Every process serving a version pins
+# it with a file `<index path>.versions/.pins/<version>.<pid>`, so other processes never prune it.
+VERSIONS_SUFFIX = ".versions"
+CURRENT_SUFFIX = ".current"
+PINS_DIRECTORY = ".pins"
+# Published versions kept on disk (the served one included), e.g. to roll back by editing `.current`
+KEEP_VERSIONS = max(1, int(os.getenv("KNOWLEDGE_INDEX_KEEP_VERSIONS", "2")))
+
+def _versions_path(base_path: str) -> str:
+    return base_path.rstrip(os.sep) + VERSIONS_SUFFIX
+
+def _current_file(base_path: str) -> str:
+    return base_path.rstrip(os.sep) + CURRENT_SUFFIX
+
+def current_version(base_path: str) -> Optional[str]:
+    """Name of the published version of the index at `base_path`, or None if none was published."""
+    try:
+        with open(_current_file(base_path), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def current_index_path(base_path: str) -> Optional[str]:
+    """
+    Directory of the index to serve: the published version, else `base_path` itself (an index saved
+    before versioning). None if there is neither.
+    """
+    version = current_version(base_path)
+    if version is not None:
+        path = os.path.join(_versions_path(base_path), version)
+        if os.path.isdir(path):
+            return path
+        print(f"Published knowledge base version {version} is missing from {_versions_path(base_path)}")
+    return base_path if os.path.isdir(base_path) else None
+
+def new_version_path(base_path: str) -> str:
+    """Creates an empty directory for a new version of the index; names sort by creation time."""
+    versions_path = _versions_path(base_path)
+    os.makedirs(versions_path, exist_ok=True)
+    now = time.time()
+    # Microseconds keep versions created within the same second in creation order
+    prefix = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now)) + f".{int(now % 1 * 1000000):06d}Z-"
+    path = tempfile.mkdtemp(prefix=prefix, dir=versions_path)
+    os.chmod(path, 0o755)
+    return path
+
+def publish_version(base_path: str, version_path: str) -> None:
+    """Makes `version_path` the served version (one atomic rename), then prunes older versions."""
+    descriptor, temporary_file = tempfile.mkstemp(prefix=".current-", dir=os.path.dirname(os.path.abspath(base_path)))
+    try:
+        with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+            f.write(os.path.basename(version_path.rstrip(os.sep)))
+        os.chmod(temporary_file, 0o644)
+        os.replace(temporary_file, _current_file(base_path))
+    finally:
+        if os.path.exists(temporary_file):
+            os.remove(temporary_file)
+    prune_versions(base_path)
+
+def list_versions(base_path: str) -> List[str]:
+    """Names of the version directories of the index, oldest first."""
+    try:
+        return sorted(name for name in os.listdir(_versions_path(base_path))
+                      if not name.startswith(".") and os.path.isdir(os.path.join(_versions_path(base_path), name)))
+    except FileNotFoundError:
+        return []
+
+def _process_alive(pid: int) -> bool:
+    if os.name == "nt":
+        # Signal 0 is not a probe on Windows; pins are then only released by their process
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def pin_version(base_path: str, version_path: str) -> None:
+    """
+    Records that this process serves `version_path`, so it is never pruned while the process runs,
+    and releases the version this process pinned before. An index outside `.versions/` needs no pin.
+    """
+    versions_path = _versions_path(base_path)
+    if os.path.dirname(os.path.abspath(version_path.rstrip(os.sep))) != os.path.abspath(versions_path):
+        return
+    pins_path = os.path.join(versions_path, PINS_DIRECTORY)
+    os.makedirs(pins_path, exist_ok=True)
+    pin_name = f"{os.path.basename(version_path.rstrip(os.sep))}.{os.getpid()}"
+    with open(os.path.join(pins_path, pin_name), "w", encoding="utf-8"):
+        pass
+    for name in os.listdir(pins_path):
+        if name != pin_name and name.endswith(f".{os.getpid()}"):
+            _remove_pin(os.path.join(pins_path, name))
+
+def _remove_pin(pin_path: str) -> None:
+    try:
+        os.remove(pin_path)
+    except FileNotFoundError:
+        pass
+
+def pinned_versions(base_path: str) -> Set[str]:
+    """Names of the versions served by a running process; pins left by processes that exited are removed."""
+    pins_path = os.path.join(_versions_path(base_path), PINS_DIRECTORY)
+    try:
+        names = os.listdir(pins_path)
+    except FileNotFoundError:
+        return set()
+    pinned = set()
+    for name in names:
+        version, _, pid = name.rpartition(".")
+        if version and pid.isdigit() and _process_alive(int(pid)):
+            pinned.add(version)
+        else:
+            _remove_pin(os.path.join(pins_path, name))
+    return pinned
+
+def prune_versions(base_path: str, keep: Optional[int] = None) -> None:
+    """
+    Deletes the versions older than the published one, except the `keep` - 1 newest of them. The
+    published version, newer ones (builds in progress) and versions pinned by a running process
+    (one that has not switched to the published version yet) are never deleted.
+    """
+    keep = keep or KEEP_VERSIONS
+    served = current_version(base_path)
+    versions = list_versions(base_path)
+    if served not in versions:
+        return
+    older = versions[:versions.index(served)]
+    pinned = pinned_versions(base_path)
+    for name in older[:max(0, len(older) - (keep - 1))]:
+        if name in pinned:
+            print(f"Keeping knowledge base version {name}: a running process still serves it")
+            continue
+        discard_version(os.path.join(_versions_path(base_path), name))
+
+def discard_version(version_path: str) -> None:
+    """Deletes an unpublished (or pruned) version directory."""
+    shutil.rmtree(version_path, ignore_errors=True)
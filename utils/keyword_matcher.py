@@ -0,0 +1,81 @@
+import unicodedata
+from typing import Dict, Iterable, Tuple
+
+from utils.text_matching import tokenize
+
+# Lowercases ASCII bytes and turns every byte that cannot be part of a token into a word separator
+_WORD_BYTES = bytes(code + 32 if 65 <= code <= 90 else code if code < 128 and chr(code).isalnum() else 32
+                    for code in range(256))
+
+def _padded_words(text: str) -> str:
+    """The tokens of the text separated and surrounded by spaces (" tap to pay ")."""
+    # bytes.translate is several times faster than str.translate, while searching is faster on str.
+    # Decomposing drops accents and zero-width characters; _WORD_BYTES lowercases what is left.
+    data = text.encode("ascii") if text.isascii() else unicodedata.normalize("NFKD", text).encode("ascii", "ignore")
+    words = data.translate(_WORD_BYTES)
+    while b"  " in words:
+        words = words.replace(b"  ", b" ")
+    return " " + words.decode("ascii") + " "
+
+class KeywordMatcher:
+    """
+    Matches named keyword sets against a text on word boundaries, ignoring case, accents and
+    punctuation.
+
+    Every keyword is compiled once into a needle over normalized words (" tap to pay"). The text
+    is normalized once into space-separated words, and a set is checked only when asked for, by
+    looking for its needles in it with C-level substring search. Keywords always start on a word
+    boundary. With `prefix=True` the last word of a keyword may be the beginning of a longer word,
+    so "transfer" also matches "transfers"; with `prefix=False` it must be whole. Last words shorter
+    than `min_prefix_length` are always whole, so "app" does not match "apply".
+
+    The cost is linear in the number of keywords checked, which suits the tens of keywords per set
+    the agents use (see benchmarks/keyword_matching.py). The normalized text and the keywords found
+    are cached per text, so several checks on the same query cost a single normalization.
+    """
+
+    def __init__(self, keyword_sets: Dict[str, Iterable[str]], prefix: bool = True, cache_size: int = 1024,
+                 min_prefix_length: int = 0):
+        self.prefix = prefix
+        self.min_prefix_length = min_prefix_length
+        self.set_names = tuple(keyword_sets)
+        self.cache_size = cache_size
+        self._needles: Dict[str, Tuple[Tuple[str, str], ...]] = {
+            set_name: tuple((self._needle(keyword), keyword) for keyword in keywords if tokenize(keyword))
+            for set_name, keywords in keyword_sets.items()
+        }
+        # text -> (its padded words, keywords found so far by set name)
+        self._scanned: Dict[str, Tuple[str, Dict[str, Tuple[str, ...]]]] = {}
+
+    def _needle(self, keyword: str) -> str:
+        keyword_tokens = tokenize(keyword)
+        needle = " " + " ".join(keyword_tokens)
+        is_prefix = self.prefix and len(keyword_tokens[-1]) >= self.min_prefix_length
+        return needle if is_prefix else needle + " "
+
+    def _words_of(self, text: str) -> Tuple[str, Dict[str, Tuple[str, ...]]]:
+        """The padded words of the text and the keywords found in it so far by set name."""
+        scanned = self._scanned.get(text)
+        if scanned is None:
+            if len(self._scanned) >= self.cache_size:
+                self._scanned.clear()
+            scanned = self._scanned[text] = (_padded_words(text), {})
+        return scanned
+
+    def match(self, text: str) -> Dict[str, Tuple[str, ...]]:
+        """Returns, for every keyword set with at least one hit, the keywords found in the text."""
+        words, found = self._words_of(text)
+        for set_name, needles in self._needles.items():
+            if set_name not in found:
+                found[set_name] = tuple(keyword for needle, keyword in needles if needle in words)
+        return {set_name: keywords for set_name, keywords in found.items() if keywords}
+
+    def contains(self, text: str, set_name: str) -> bool:
+        """Checks if the text contains any keyword of the given set."""
+        words, found = self._words_of(text)
+        if set_name in found:
+            return bool(found[set_name])
+        for needle, _ in self._needles.get(set_name, ()):
+            if needle in words:
+                return True
+        return False
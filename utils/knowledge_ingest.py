@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from utils.embeddings import EMBEDDING_BATCH_SIZE, embed_documents_with_retry
+from utils.vector_store import build_faiss_vectorstore
+
+# Manifest saved next to the index: for every source page, the hash of its text and the ids of its chunks
+MANIFEST_FILE_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def chunk_id(url: str, text: str) -> str:
+    """Docstore id of a chunk: the hash of its page URL and text, so an unchanged chunk keeps its id."""
+    return hashlib.sha256(f"{url}\0{text}".encode("utf-8")).hexdigest()
+
+def load_manifest(folder_path: str) -> Optional[Dict[str, Any]]:
+    """Returns the manifest of the vector store in `folder_path`, or None if it has none (or an unreadable one)."""
+    try:
+        with open(os.path.join(folder_path, MANIFEST_FILE_NAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable knowledge base manifest in {folder_path}: {e}")
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        print(f"Ignoring knowledge base manifest version {manifest.get('version')} (expected {MANIFEST_VERSION})")
+        return None
+    return manifest
+
+def save_manifest(folder_path: str, manifest: Dict[str, Any]) -> None:
+    """Writes the manifest to a temporary file and renames it into place."""
+    descriptor, temporary_file = tempfile.mkstemp(prefix=".manifest-", suffix=".json", dir=folder_path)
+    try:
+        with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.chmod(temporary_file, 0o644)
+        os.replace(temporary_file, os.path.join(folder_path, MANIFEST_FILE_NAME))
+    finally:
+        if os.path.exists(temporary_file):
+            os.remove(temporary_file)
+
+def ingest_pages(vectorstore: Optional[FAISS], manifest: Optional[Dict[str, Any]], pages: Dict[str, str],
+                 urls: List[str], split_text, embeddings: Embeddings) -> Tuple[Optional[FAISS], Dict[str, Any], Dict[str, Any]]:
+    """
+    Brings a vector store up to date with freshly scraped `pages` (text by URL) and returns the
+    updated vector store, the new manifest and a report of what changed.
+
+    Pages whose text hash is unchanged are skipped without being split. Changed pages are split with
+    `split_text`, and only chunks whose id is new are embedded; chunks that disappeared, and all the
+    chunks of pages no longer in `urls`, are deleted from the index. Pages of `urls` missing from
+    `pages` (failed to scrape) are kept as they are. Without a vector store or a manifest, everything
+    is built from scratch. Indexes that cannot delete vectors (HNSW) are rebuilt from the kept
+    chunks, whose embeddings come from the embedding cache.
+
+    `vectorstore` must be writable (loaded without mmap); it is modified in place.
+    """
+    started = time.perf_counter()
+    full_build = vectorstore is None or manifest is None
+    old_pages = {} if full_build else manifest["pages"]
+    report = {
+        "full_build": full_build,
+        "rebuilt": False,
+        "pages": {"added": [], "changed": [], "removed": [], "unavailable": [], "unchanged": 0},
+        "chunks": {"added": 0, "removed": 0, "unchanged": 0},
+    }
+
+    new_pages: Dict[str, Dict[str, Any]] = {}
+    documents_by_id: Dict[str, Document] = {}
+    removed_ids: List[str] = []
+    for url in urls:
+        old_page = old_pages.get(url)
+        text = pages.get(url)
+        if text is None:
+            if old_page is not None:
+                new_pages[url] = old_page
+                report["pages"]["unavailable"].append(url)
+            continue
+
+        page_hash = content_hash(text)
+        if old_page is not None and old_page["hash"] == page_hash:
+            new_pages[url] = old_page
+            report["pages"]["unchanged"] += 1
+            report["chunks"]["unchanged"] += len(old_page["chunk_ids"])
+            continue
+
+        chunks = {chunk_id(url, chunk): chunk for chunk in split_text(text)}
+        old_ids = set(old_page["chunk_ids"]) if old_page else set()
+        for document_id, chunk in chunks.items():
+            if document_id not in old_ids:
+                documents_by_id[document_id] = Document(id=document_id, page_content=chunk, metadata={"source": url})
+        removed_ids.extend(document_id for document_id in old_ids if document_id not in chunks)
+        report["chunks"]["unchanged"] += len(old_ids & chunks.keys())
+        report["pages"]["changed" if old_page else "added"].append(url)
+        new_pages[url] = {"hash": page_hash, "chunk_ids": list(chunks)}
+
+    for url, old_page in old_pages.items():
+        if url not in new_pages:
+            removed_ids.extend(old_page["chunk_ids"])
+            report["pages"]["removed"].append(url)
+
+    report["chunks"]["added"] = len(documents_by_id)
+    report["chunks"]["removed"] = len(removed_ids)
+    new_manifest = {"version": MANIFEST_VERSION, "pages": new_pages}
+
+    if full_build:
+        vectorstore = build_faiss_vectorstore(list(documents_by_id.values()), embeddings) if documents_by_id else None
+    elif removed_ids or documents_by_id:
+        vectorstore = _apply_changes(vectorstore, removed_ids, documents_by_id, new_pages, embeddings, report)
+
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return vectorstore, new_manifest, report
+
+def _apply_changes(vectorstore: FAISS, removed_ids: List[str], documents_by_id: Dict[str, Document],
+                   new_pages: Dict[str, Dict[str, Any]], embeddings: Embeddings, report: Dict[str, Any]) -> FAISS:
+    """Deletes and adds chunks in place, or rebuilds the index if it does not support deleting vectors."""
+    stored_ids = set(vectorstore.index_to_docstore_id.values())
+    removed_ids = [document_id for document_id in removed_ids if document_id in stored_ids]
+    documents_by_id = {document_id: document for document_id, document in documents_by_id.items()
+                       if document_id not in stored_ids}
+    try:
+        if removed_ids:
+            vectorstore.delete(removed_ids)
+    except RuntimeError as e:
+        # faiss raises RuntimeError for index types without remove_ids
+        print(f"Index does not support deleting vectors ({e}); rebuilding it from the kept chunks.")
+        kept_ids = [document_id for page in new_pages.values() for document_id in page["chunk_ids"]
+                    if document_id not in documents_by_id]
+        documents = []
+        for document_id in kept_ids:
+            document = vectorstore.docstore.search(document_id)
+            documents.append(Document(id=document_id, page_content=document.page_content, metadata=document.metadata))
+        documents += list(documents_by_id.values())
+        report["rebuilt"] = True
+        return build_faiss_vectorstore(documents, embeddings)
+
+    documents = list(documents_by_id.values())
+    for start in range(0, len(documents), EMBEDDING_BATCH_SIZE):
+        batch = documents[start:start + EMBEDDING_BATCH_SIZE]
+        vectors = embed_documents_with_retry(embeddings, [document.page_content for document in batch])
+        vectorstore.add_embeddings([(document.page_content, vector) for document, vector in zip(batch, vectors)],
+                                   metadatas=[document.metadata for document in batch],
+                                   ids=[document.id for document in batch])
+    return vectorstore
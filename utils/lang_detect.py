@@ -1,10 +1,79 @@
-from langdetect import detect
+import re
+from functools import lru_cache
+from typing import Optional
 
+from langdetect import detect, DetectorFactory
 
+# langdetect is probabilistic; a fixed seed makes its fallback answers reproducible
+DetectorFactory.seed = 0
+
+# Frequent words that are (almost) exclusive to one of the two supported languages.
+# Words shared by both languages ("a", "as", "do", "no", "me", ...) are deliberately left out.
+PORTUGUESE_MARKERS = frozenset({
+    "o", "os", "de", "da", "das", "dos", "em", "na", "nas", "nos", "um", "uma", "para", "pelo", "pela",
+    "com", "nao", "que", "qual", "quais", "quanto", "quanta", "como", "onde", "quando", "porque",
+    "meu", "minha", "meus", "minhas", "seu", "sua", "voce", "eu", "ele", "ela", "esta", "estou",
+    "sao", "ser", "tem", "tenho", "posso", "pode", "preciso", "quero", "gostaria", "sobre", "mais",
+    "muito", "isso", "esse", "essa", "ola", "oi", "obrigado", "obrigada", "bom", "dia", "tarde",
+    "noite", "saldo", "conta", "ultimas", "ultima", "transacoes", "cartao", "maquininha", "taxa",
+    "taxas", "custa", "preco", "ajuda", "fazer", "ver", "ou", "mas", "tambem",
+})
+ENGLISH_MARKERS = frozenset({
+    "the", "an", "is", "are", "was", "were", "be", "been", "what", "which", "who", "how", "why",
+    "where", "when", "my", "your", "i", "you", "it", "this", "that", "these", "those", "to", "of",
+    "in", "on", "at", "for", "with", "from", "and", "or", "but", "can", "could", "would", "should",
+    "does", "did", "have", "has", "please", "hello", "hi", "thanks", "thank", "want", "need",
+    "about", "last", "balance", "account", "card", "machine", "fees", "fee", "cost", "price", "help",
+    "show", "check", "much", "many", "there", "any", "some", "not", "get",
+})
+
+# Characters that only appear in Portuguese among the two supported languages
+PORTUGUESE_CHARACTERS = re.compile(r"[ãõçáéíóúâêôà]")
+WORD_PATTERN = re.compile(r"[a-zãõçáéíóúâêôàü]+")
+ACCENT_TABLE = str.maketrans("ãõçáéíóúâêôàü", "aocaeiouaeoau")
+
+def detect_language_fast(text: str) -> Optional[str]:
+    """
+    Deterministic pt/en detection based on marker words and Portuguese-only characters.
+    Returns 'pt' or 'en', or None when the text carries no usable signal or the evidence is tied.
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    if not words:
+        return None
+
+    portuguese_score = 0
+    english_score = 0
+    for word in words:
+        if PORTUGUESE_CHARACTERS.search(word):
+            # Diacritics are the strongest signal we have for short texts
+            portuguese_score += 2
+            word = word.translate(ACCENT_TABLE)
+        if word in PORTUGUESE_MARKERS:
+            portuguese_score += 1
+        if word in ENGLISH_MARKERS:
+            english_score += 1
+
+    if portuguese_score > english_score:
+        return 'pt'
+    if english_score > portuguese_score:
+        return 'en'
+    return None
+
+@lru_cache(maxsize=4096)
 def detect_language(text: str) -> str:
     """Detect if the text is in Portuguese or English"""
+    fast_result = detect_language_fast(text)
+    if fast_result is not None:
+        return fast_result
     try:
         detected_lang = detect(text)
         return 'pt' if detected_lang == 'pt' else 'en'
     except:
-        return 'en'
\ No newline at end of file
+        return 'en'
+
+def warm_up_language_detector() -> None:
+    """Forces langdetect to load its language profiles now instead of on the first request."""
+    try:
+        detect("warm up the language detector")
+    except Exception as e:
+        print(f"Failed to warm up language detector: {e}")
@@ -1,8 +1,37 @@
 import os
+import threading
+import time
+from typing import Any, Dict, Tuple
+
+current_dir = os.path.dirname(__file__)
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+
+PROMPTS_FOLDER = os.path.join(project_root, "prompts")
+
+# Minimum number of seconds between two mtime checks of the same cached template.
+# Set to 0 to check the file on every call.
+PROMPT_RELOAD_CHECK_INTERVAL = float(os.getenv("PROMPT_RELOAD_CHECK_INTERVAL", "1.0"))
+
+# Process-wide cache: (prompt_name, language) -> {"content", "mtime", "checked_at"}
+_prompt_cache: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_prompt_cache_lock = threading.Lock()
+_prompt_cache_stats = {"hits": 0, "misses": 0, "reloads": 0}
+
+def _prompt_file_path(prompt_name: str, language: str) -> str:
+    # Construct the full file path
+    file_name = f"{prompt_name}_{language}.txt"
+    return os.path.join(PROMPTS_FOLDER, file_name)
+
+def _read_prompt_file(file_path: str) -> Tuple[str, float]:
+    """Reads a prompt file and returns its content together with the mtime it was read at."""
+    mtime = os.stat(file_path).st_mtime
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read(), mtime
 
 def load_prompt_template(prompt_name: str, language: str = "en") -> str:
     """
     Loads a prompt template from the 'prompts' directory.
+    Templates are cached in memory and only re-read from disk when the file's mtime changes.
 
     Args:
         prompt_name (str): The base name of the prompt (e.g., 'customer_support', 'router').
@@ -11,22 +40,75 @@ def load_prompt_template(prompt_name: str, language: str = "en") -> str:
     Returns:
         str: The content of the prompt file, or an empty string if not found/error.
     """
+    key = (prompt_name, language)
+    now = time.monotonic()
 
-    current_dir = os.path.dirname(__file__)
-    project_root = os.path.abspath(os.path.join(current_dir, ".."))
-    
-    prompts_folder = os.path.join(project_root, "prompts")
-    
-    # Construct the full file path
-    file_name = f"{prompt_name}_{language}.txt"
-    file_path = os.path.join(prompts_folder, file_name)
+    cached = _prompt_cache.get(key)
+    if cached is not None and now - cached["checked_at"] < PROMPT_RELOAD_CHECK_INTERVAL:
+        with _prompt_cache_lock:
+            _prompt_cache_stats["hits"] += 1
+        return cached["content"]
+
+    file_path = _prompt_file_path(prompt_name, language)
 
     try:
+        if cached is not None:
+            # Only stat the file; re-read it if it was modified (or removed) since it was cached
+            if os.path.exists(file_path) and os.stat(file_path).st_mtime == cached["mtime"]:
+                with _prompt_cache_lock:
+                    cached["checked_at"] = now
+                    _prompt_cache_stats["hits"] += 1
+                return cached["content"]
+
         if not os.path.exists(file_path):
             print(f"Warning: Prompt file not found: {file_path}")
+            with _prompt_cache_lock:
+                _prompt_cache.pop(key, None)
+                _prompt_cache_stats["misses"] += 1
             return ""
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
+
+        content, mtime = _read_prompt_file(file_path)
+        with _prompt_cache_lock:
+            _prompt_cache[key] = {"content": content, "mtime": mtime, "checked_at": now}
+            _prompt_cache_stats["misses"] += 1
+            if cached is not None:
+                _prompt_cache_stats["reloads"] += 1
+        return content
     except Exception as e:
         print(f"Failed to load prompt template from {file_path}: {e}")
-        return ""
\ No newline at end of file
+        return ""
+
+def preload_prompt_templates() -> int:
+    """
+    Loads every `<prompt_name>_<language>.txt` file from the 'prompts' directory into the cache.
+
+    Returns:
+        int: The number of templates loaded.
+    """
+    loaded = 0
+    try:
+        file_names = sorted(os.listdir(PROMPTS_FOLDER))
+    except OSError as e:
+        print(f"Failed to list prompt templates in {PROMPTS_FOLDER}: {e}")
+        return 0
+
+    now = time.monotonic()
+    for file_name in file_names:
+        base_name, extension = os.path.splitext(file_name)
+        if extension != ".txt" or "_" not in base_name:
+            continue
+        prompt_name, language = base_name.rsplit("_", 1)
+        try:
+            content, mtime = _read_prompt_file(os.path.join(PROMPTS_FOLDER, file_name))
+        except Exception as e:
+            print(f"Failed to preload prompt template {file_name}: {e}")
+            continue
+        with _prompt_cache_lock:
+            _prompt_cache[(prompt_name, language)] = {"content": content, "mtime": mtime, "checked_at": now}
+        loaded += 1
+    return loaded
+
+def get_prompt_cache_stats() -> Dict[str, int]:
+    """Returns the prompt cache hit/miss/reload counters and the number of cached templates."""
+    with _prompt_cache_lock:
+        return {**_prompt_cache_stats, "size": len(_prompt_cache)}
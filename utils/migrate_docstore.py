@@ -0,0 +1,67 @@
+"""
+Converts the pickled docstore (index.pkl) of a saved FAISS vector store into a sqlite docstore
+(index.sqlite3) that is read on demand. The index itself is not modified.
+
+Usage:
+    python -m utils.migrate_docstore faiss_index_infinitepay [--remove-pickle]
+
+index.sqlite3 takes precedence over index.pkl when the vector store is loaded, so the pickle is
+only kept as a backup; `--remove-pickle` deletes it once the conversion is verified.
+"""
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.sqlite_docstore import SqliteDocstore, write_sqlite_docstore
+
+def migrate_docstore(folder_path: str, index_name: str = "index", remove_pickle: bool = False) -> str:
+    """Writes `index_name.sqlite3` from `index_name.pkl` in `folder_path`, checks it and returns its path."""
+    pickle_file = os.path.join(folder_path, f"{index_name}.pkl")
+    sqlite_file = os.path.join(folder_path, f"{index_name}.sqlite3")
+    # The pickle is written by this application's own save_local
+    with open(pickle_file, "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+
+    descriptor, temporary_file = tempfile.mkstemp(prefix=f".{index_name}-", suffix=".sqlite3", dir=folder_path)
+    os.close(descriptor)
+    try:
+        write_sqlite_docstore(temporary_file, docstore, index_to_docstore_id).close()
+
+        # Every vector position must resolve to the same document as in the pickle
+        migrated = SqliteDocstore.open_read_only(temporary_file)
+        try:
+            if dict(migrated.index_to_docstore_id.items()) != dict(index_to_docstore_id):
+                raise ValueError("index -> docstore id mappings differ")
+            ids = list(index_to_docstore_id.values())
+            for document_id, document in zip(ids, migrated.get_many(ids)):
+                original = docstore.search(document_id)
+                if document is None or (document.page_content, document.metadata) != (original.page_content, original.metadata):
+                    raise ValueError(f"document {document_id} differs")
+        finally:
+            migrated.close()
+        os.chmod(temporary_file, 0o644)
+        os.replace(temporary_file, sqlite_file)
+    finally:
+        if os.path.exists(temporary_file):
+            os.remove(temporary_file)
+
+    print(f"Migrated {len(index_to_docstore_id)} documents from {pickle_file} to {sqlite_file}")
+    if remove_pickle:
+        os.remove(pickle_file)
+        print(f"Removed {pickle_file}")
+    return sqlite_file
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder_path", help="directory of the saved vector store, e.g. faiss_index_infinitepay")
+    parser.add_argument("--index-name", default="index")
+    parser.add_argument("--remove-pickle", action="store_true", help="delete index.pkl after a successful migration")
+    args = parser.parse_args()
+    migrate_docstore(args.folder_path, args.index_name, args.remove_pickle)
+
+if __name__ == "__main__":
+    main()
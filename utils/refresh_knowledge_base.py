@@ -0,0 +1,33 @@
+"""
+Refreshes the knowledge base index from the InfinitePay pages (e.g. from a nightly cron job).
+
+Only new or changed chunks are embedded and the chunks of changed or removed pages are deleted, so
+the cost is proportional to what changed on the site. The first run on an index without a manifest
+(or with --full) rebuilds it from scratch. A changed index is written and published as a new
+version (see utils/index_versions.py); the served one is never modified, and a running API switches
+to the new version within KNOWLEDGE_INDEX_POLL_INTERVAL seconds. Prints the ingest report as JSON.
+
+Usage:
+    python -m utils.refresh_knowledge_base [--full]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Agents.knowledge_agent import refresh_knowledge_base
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--full", action="store_true", help="rebuild the index from scratch")
+    args = parser.parse_args()
+
+    report = refresh_knowledge_base(full=args.full)
+    if report is None:
+        raise SystemExit("Nothing was scraped; the knowledge base was not updated.")
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
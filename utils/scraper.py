@@ -0,0 +1,245 @@
+import asyncio
+import concurrent.futures
+import multiprocessing
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from bs4 import BeautifulSoup
+
+# Concurrent scraper: pages are fetched concurrently over pooled (HTTP/2 when the server supports it)
+# connections, and the HTML-to-text extraction, which is CPU bound, runs in a process pool.
+SCRAPER_CONCURRENCY = int(os.getenv("SCRAPER_CONCURRENCY", "8"))
+SCRAPER_HOST_RATE = float(os.getenv("SCRAPER_HOST_RATE", "5"))  # max requests started per second per host (0: no limit)
+SCRAPER_TIMEOUT = float(os.getenv("SCRAPER_TIMEOUT", "10"))
+SCRAPER_HTTP2 = os.getenv("SCRAPER_HTTP2", "true").lower() in ("1", "true", "yes")
+# Extraction processes (0: extract in a thread). A pool only pays off with more than one CPU
+_cpus = os.cpu_count() or 1
+SCRAPER_EXTRACT_WORKERS = int(os.getenv("SCRAPER_EXTRACT_WORKERS", str(min(4, _cpus) if _cpus > 1 else 0)))
+SCRAPER_HTML_PARSER = os.getenv("SCRAPER_HTML_PARSER", "html.parser")
+SCRAPER_USER_AGENT = os.getenv("SCRAPER_USER_AGENT", "InfinityPayAssistant-KnowledgeBase/1.0")
+
+# Revalidation cache: the ETag/Last-Modified validators and the extracted text of every page, so an
+# unchanged page costs a 304 response and no extraction
+SCRAPER_CACHE_ENABLED = os.getenv("SCRAPER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SCRAPER_CACHE_PATH = os.getenv("SCRAPER_CACHE_PATH", "scraper_cache.sqlite3")
+
+def extract_text(html: str, parser: str = "html.parser") -> str:
+    """Returns the visible text of an HTML page (scripts and styles removed). Runs in the extraction pool."""
+    soup = BeautifulSoup(html, parser)
+    for script in soup(["script", "style"]):
+        script.decompose()
+    return soup.get_text(separator=' ', strip=True)
+
+class PageCache:
+    """Validators and extracted text of scraped pages, in a local sqlite file."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, text TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection.execute("SELECT etag, last_modified, text FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        return {"etag": row[0], "last_modified": row[1], "text": row[2]}
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str], text: str) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, text, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (url, etag, last_modified, text, time.time())
+            )
+            self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+class HostRateLimiter:
+    """Spaces the start of requests to the same host by at least 1 / `rate` seconds."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_start: Dict[str, float] = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, host: str) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+async def ascrape_pages(urls: List[str], concurrency: Optional[int] = None, host_rate: Optional[float] = None,
+                        extract_workers: Optional[int] = None, cache: Optional[PageCache] = None,
+                        stats: Optional[Counter] = None,
+                        on_page: Optional[Callable[[str, str], Awaitable[None]]] = None) -> Dict[str, str]:
+    """
+    Fetches `urls` concurrently and returns the text of every page that has any, by URL. With
+    `on_page`, every page is instead awaited into it as soon as it is scraped, and nothing is returned.
+
+    At most `concurrency` requests are in flight, and requests to the same host start at most
+    `host_rate` times per second. With a `cache`, requests carry If-None-Match / If-Modified-Since,
+    and a 304 response reuses the cached text. Pages that fail are reported and left out. Counters
+    (fetched, not_modified, errors, bytes) are added to `stats` if given.
+    """
+    concurrency = concurrency or SCRAPER_CONCURRENCY
+    extract_workers = SCRAPER_EXTRACT_WORKERS if extract_workers is None else extract_workers
+    stats = stats if stats is not None else Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+    rate_limiter = HostRateLimiter(SCRAPER_HOST_RATE if host_rate is None else host_rate)
+    loop = asyncio.get_running_loop()
+    # spawn: forking a process that runs an event loop and other threads is not safe
+    pool = concurrent.futures.ProcessPoolExecutor(
+        extract_workers, mp_context=multiprocessing.get_context("spawn")
+    ) if extract_workers > 0 else None
+
+    async def extract(html: str) -> str:
+        if pool is None:
+            return await asyncio.to_thread(extract_text, html, SCRAPER_HTML_PARSER)
+        return await loop.run_in_executor(pool, extract_text, html, SCRAPER_HTML_PARSER)
+
+    async def scrape(client: httpx.AsyncClient, url: str) -> Optional[str]:
+        cached = cache.get(url) if cache else None
+        headers = {}
+        if cached and cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+        async with semaphore:
+            await rate_limiter.wait(urlsplit(url).netloc)
+            print(f"Scraping: {url}")
+            try:
+                response = await client.get(url, headers=headers)
+                if response.status_code == 304 and cached:
+                    stats["not_modified"] += 1
+                    return cached["text"]
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                print(f"Error scraping website {url}: {e}")
+                stats["errors"] += 1
+                return None
+        stats["fetched"] += 1
+        stats["bytes"] += len(response.content)
+        try:
+            content = await extract(response.text)
+        except Exception as e:
+            print(f"Unexpected error while parsing {url}: {e}")
+            stats["errors"] += 1
+            return None
+        if cache and content:
+            cache.put(url, response.headers.get("etag"), response.headers.get("last-modified"), content)
+        return content
+
+    async def scrape_and_hand_over(client: httpx.AsyncClient, url: str) -> Optional[str]:
+        content = await scrape(client, url)
+        if content and on_page is not None:
+            await on_page(url, content)
+            return None
+        return content
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    try:
+        async with httpx.AsyncClient(http2=SCRAPER_HTTP2, limits=limits, timeout=SCRAPER_TIMEOUT,
+                                     follow_redirects=True, headers={"User-Agent": SCRAPER_USER_AGENT}) as client:
+            contents = await asyncio.gather(*(scrape_and_hand_over(client, url) for url in urls))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return {url: content for url, content in zip(urls, contents) if content}
+
+def scrape_pages(urls: List[str], cache: Optional[PageCache] = None, stats: Optional[Counter] = None,
+                 **kwargs) -> Dict[str, str]:
+    """
+    Synchronous `ascrape_pages`. Without a `cache`, the revalidation cache at SCRAPER_CACHE_PATH is
+    used unless SCRAPER_CACHE_ENABLED is off. Safe to call from a thread that runs an event loop
+    (the scrape then runs in a helper thread).
+    """
+    stats = stats if stats is not None else Counter()
+
+    def run() -> Dict[str, str]:
+        page_cache = cache
+        if page_cache is None and SCRAPER_CACHE_ENABLED:
+            try:
+                page_cache = PageCache(SCRAPER_CACHE_PATH)
+            except sqlite3.Error as e:
+                print(f"Failed to open scraper cache {SCRAPER_CACHE_PATH}: {e}. Pages will not be revalidated.")
+        started = time.perf_counter()
+        try:
+            pages = asyncio.run(ascrape_pages(urls, cache=page_cache, stats=stats, **kwargs))
+        finally:
+            if page_cache is not None and cache is None:
+                page_cache.close()
+        print(f"Scraped {stats['fetched'] + stats['not_modified']}/{len(urls)} pages in {time.perf_counter() - started:.2f}s "
+              f"({stats['fetched']} fetched, {stats['not_modified']} not modified, {stats['errors']} errors)")
+        return pages
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return run()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(run).result()
+
+def iter_scraped_pages(urls: List[str], max_pending: Optional[int] = None, **kwargs) -> Iterator[Tuple[str, str]]:
+    """
+    Yields (url, text) for every page of `urls` as soon as it is scraped, in completion order, while
+    the other pages keep downloading in a helper thread. At most `max_pending` scraped pages
+    (default SCRAPER_CONCURRENCY) wait to be consumed; beyond that, scraping pauses. Takes the
+    arguments of `scrape_pages`.
+    """
+    pages: queue.Queue = queue.Queue(maxsize=max_pending or SCRAPER_CONCURRENCY)
+    done = object()
+    stopped = threading.Event()
+
+    def hand_over(item: Any) -> None:
+        while not stopped.is_set():
+            try:
+                pages.put(item, timeout=1.0)
+                return
+            except queue.Full:
+                continue
+
+    async def on_page(url: str, text: str) -> None:
+        # Waits in a worker thread, so a full queue pauses this page without blocking the event loop
+        await asyncio.to_thread(hand_over, (url, text))
+
+    def run() -> None:
+        try:
+            scrape_pages(urls, on_page=on_page, **kwargs)
+            hand_over(done)
+        except BaseException as e:
+            hand_over(e)
+
+    thread = threading.Thread(target=run, name="scraper", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = pages.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # The consumer stopped early (or failed): let the scrape drain instead of waiting forever
+        stopped.set()
+        thread.join()
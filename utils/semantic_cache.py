@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from utils.text_matching import tokenize
+
+class SemanticCache:
+    """
+    Answer cache keyed by query embedding plus language.
+
+    A lookup returns the stored value of the most similar cached query in the same language if its
+    cosine similarity reaches `threshold`. Identical queries (ignoring case, accents and punctuation)
+    are found by a plain dict lookup first, without needing an embedding. Entries expire after `ttl`
+    seconds and the least recently used one is evicted when `max_entries` is reached.
+
+    All entries are dropped when `set_version` is called with a different version, e.g. when the
+    index the answers were generated from is rebuilt.
+    """
+
+    def __init__(self, threshold: float = 0.93, ttl: float = 3600.0, max_entries: int = 1000):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version: Any = None
+
+        # Slot-based storage: row i of the matrix belongs to the entry in slot i.
+        # The matrix is allocated on the first store, once the embedding dimension is known.
+        self._vectors: Optional[np.ndarray] = None
+        self._occupied = np.zeros(max_entries, dtype=bool)
+        self._language_codes = np.full(max_entries, -1, dtype=np.int32)
+        self._languages: Dict[str, int] = {}
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()  # slot -> entry, in LRU order
+        self._slots_by_text: Dict[tuple, int] = {}
+        self._free_slots: List[int] = list(range(max_entries - 1, -1, -1))
+
+        self._lock = threading.Lock()
+        self._stats: Counter = Counter()
+
+    @staticmethod
+    def _text_key(text: str, language: str) -> tuple:
+        return " ".join(tokenize(text)), language
+
+    @staticmethod
+    def _normalize_vector(vector: Sequence[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def _remove_slot(self, slot: int) -> None:
+        entry = self._entries.pop(slot)
+        self._slots_by_text.pop(entry["text_key"], None)
+        self._occupied[slot] = False
+        self._language_codes[slot] = -1
+        self._free_slots.append(slot)
+
+    def _hit(self, slot: int, similarity: float, now: float) -> Optional[Dict[str, Any]]:
+        entry = self._entries[slot]
+        if entry["expires_at"] <= now:
+            self._remove_slot(slot)
+            self._stats["expirations"] += 1
+            return None
+        self._entries.move_to_end(slot)
+        self._stats["hits"] += 1
+        return {"value": entry["value"], "similarity": round(similarity, 4), "cached_query": entry["text"]}
+
+    def lookup_text(self, text: str, language: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the cached value for exactly this query (after normalization), or None.
+        A None result is not counted as a miss, since `lookup` is expected to follow.
+        """
+        with self._lock:
+            slot = self._slots_by_text.get(self._text_key(text, language))
+            if slot is None:
+                return None
+            result = self._hit(slot, 1.0, time.monotonic())
+            if result is not None:
+                self._stats["exact_hits"] += 1
+            return result
+
+    def lookup(self, vector: Sequence[float], language: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns {"value", "similarity", "cached_query"} for the most similar cached query in the same
+        language, or None if no cached query is similar enough.
+        """
+        query = self._normalize_vector(vector)
+        with self._lock:
+            language_code = self._languages.get(language)
+            if self._vectors is None or language_code is None or query.shape[0] != self._vectors.shape[1]:
+                self._stats["misses"] += 1
+                return None
+
+            candidates = self._occupied & (self._language_codes == language_code)
+            if not candidates.any():
+                self._stats["misses"] += 1
+                return None
+
+            similarities = self._vectors @ query
+            similarities[~candidates] = -np.inf
+            slot = int(np.argmax(similarities))
+            similarity = float(similarities[slot])
+            if similarity < self.threshold:
+                self._stats["misses"] += 1
+                return None
+
+            result = self._hit(slot, similarity, time.monotonic())
+            if result is None:
+                self._stats["misses"] += 1
+            return result
+
+    def store(self, text: str, vector: Sequence[float], language: str, value: Any) -> None:
+        """Caches a value for a query, evicting expired entries, then the least recently used one, when full."""
+        vector = self._normalize_vector(vector)
+        now = time.monotonic()
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            elif vector.shape[0] != self._vectors.shape[1]:
+                print(f"Semantic cache: ignoring vector of dimension {vector.shape[0]} (expected {self._vectors.shape[1]})")
+                return
+
+            text_key = self._text_key(text, language)
+            if text_key in self._slots_by_text:
+                self._remove_slot(self._slots_by_text[text_key])
+
+            if not self._free_slots:
+                for slot in [slot for slot, entry in self._entries.items() if entry["expires_at"] <= now]:
+                    self._remove_slot(slot)
+                    self._stats["expirations"] += 1
+            if not self._free_slots:
+                self._remove_slot(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+            slot = self._free_slots.pop()
+            self._vectors[slot] = vector
+            self._occupied[slot] = True
+            self._language_codes[slot] = self._languages.setdefault(language, len(self._languages))
+            self._entries[slot] = {"text": text, "text_key": text_key, "value": value, "expires_at": now + self.ttl}
+            self._slots_by_text[text_key] = slot
+            self._stats["stores"] += 1
+
+    def clear(self) -> None:
+        """Drops every cached entry."""
+        with self._lock:
+            for slot in list(self._entries):
+                self._remove_slot(slot)
+            self._stats["invalidations"] += 1
+
+    def set_version(self, version: Any) -> None:
+        """Records the version of the data the answers come from; a different version clears the cache."""
+        with self._lock:
+            if version == self.version:
+                return
+            changed = self.version is not None
+            self.version = version
+        if changed:
+            self.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the hit/miss counters, the hit rate and the number of cached entries."""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "hits": self._stats["hits"],
+                "exact_hits": self._stats["exact_hits"],
+                "misses": self._stats["misses"],
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "stores": self._stats["stores"],
+                "evictions": self._stats["evictions"],
+                "expirations": self._stats["expirations"],
+                "invalidations": self._stats["invalidations"],
+                "size": len(self._entries),
+                "version": self.version,
+            }
@@ -0,0 +1,216 @@
+import json
+import os
+import sqlite3
+import threading
+import urllib.parse
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+# sqlite limits the number of bound parameters; ids are looked up in chunks of this size
+SQLITE_CHUNK_SIZE = 500
+
+class SqliteDocstore(Docstore, AddableMixin):
+    """
+    Docstore of a FAISS vector store kept in a sqlite file instead of a pickled InMemoryDocstore.
+
+    The file holds two tables: `documents` (chunk text and JSON metadata by docstore id) and
+    `index_ids` (FAISS vector position -> docstore id). Opened read-only, nothing is loaded at
+    startup: a search reads only the rows of the k documents it returns, so the chunk text never
+    stays resident. `index_to_docstore_id` is a mapping over the `index_ids` table that can be
+    given to FAISS.
+    """
+
+    def __init__(self, connection: sqlite3.Connection, path: str):
+        self.path = path
+        self._connection = connection
+        self._lock = threading.Lock()
+        self.index_to_docstore_id = SqliteIndexToDocstoreId(self)
+
+    @classmethod
+    def create(cls, path: str, wal: bool = False) -> "SqliteDocstore":
+        """
+        Creates (or opens for writing) a docstore file. With `wal`, commits are journaled without
+        waiting for the disk: they survive the process being killed, not a power loss, which suits
+        files that can be rebuilt (e.g. build checkpoints). Saved indexes never use it.
+        """
+        connection = sqlite3.connect(path, check_same_thread=False)
+        if wal:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, page_content TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        connection.execute("CREATE TABLE IF NOT EXISTS index_ids (position INTEGER PRIMARY KEY, id TEXT NOT NULL)")
+        connection.commit()
+        return cls(connection, path)
+
+    @classmethod
+    def open_read_only(cls, path: str) -> "SqliteDocstore":
+        """
+        Opens a docstore file read-only. The file is opened as immutable (no locks, no journal),
+        which holds because docstore files are never modified in place, only replaced by a rename.
+        """
+        uri = f"file:{urllib.parse.quote(os.path.abspath(path))}?mode=ro&immutable=1"
+        return cls(sqlite3.connect(uri, uri=True, check_same_thread=False), path)
+
+    @classmethod
+    def load_into_memory(cls, path: str) -> "SqliteDocstore":
+        """Copies a docstore file into an in-memory database that can be modified, then saved elsewhere."""
+        connection = sqlite3.connect(":memory:", check_same_thread=False)
+        source = sqlite3.connect(path)
+        try:
+            source.backup(connection)
+        finally:
+            source.close()
+        return cls(connection, path)
+
+    def _execute(self, query: str, parameters=()) -> List[tuple]:
+        with self._lock:
+            return self._connection.execute(query, parameters).fetchall()
+
+    def _executemany(self, query: str, rows: List[tuple]) -> None:
+        with self._lock:
+            self._connection.executemany(query, rows)
+            self._connection.commit()
+
+    @staticmethod
+    def _to_document(document_id: str, page_content: str, metadata: str) -> Document:
+        return Document(id=document_id, page_content=page_content, metadata=json.loads(metadata))
+
+    def search(self, search: str) -> Union[str, Document]:
+        """Returns the document stored under the id `search` (FAISS's lookup), or a not-found message."""
+        rows = self._execute("SELECT id, page_content, metadata FROM documents WHERE id = ?", (search,))
+        if not rows:
+            return f"ID {search} not found."
+        return self._to_document(*rows[0])
+
+    def get_many(self, ids: List[str]) -> List[Optional[Document]]:
+        """Returns the documents for `ids`, in order (None where missing), in as few queries as possible."""
+        found: Dict[str, Document] = {}
+        for start in range(0, len(ids), SQLITE_CHUNK_SIZE):
+            chunk = ids[start:start + SQLITE_CHUNK_SIZE]
+            rows = self._execute(
+                f"SELECT id, page_content, metadata FROM documents WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            )
+            found.update((row[0], self._to_document(*row)) for row in rows)
+        return [found.get(document_id) for document_id in ids]
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        """Adds documents by id; ids that already exist raise a ValueError, like InMemoryDocstore."""
+        overlapping = [document_id for document_id, document in zip(texts, self.get_many(list(texts))) if document is not None]
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {set(overlapping)}")
+        self._executemany(
+            "INSERT INTO documents (id, page_content, metadata) VALUES (?, ?, ?)",
+            [(document_id, document.page_content, json.dumps(document.metadata, default=str))
+             for document_id, document in texts.items()]
+        )
+
+    def delete(self, ids: List) -> None:
+        """Deletes documents by id; missing ids raise a ValueError, like InMemoryDocstore."""
+        missing = [document_id for document_id, document in zip(ids, self.get_many(list(ids))) if document is None]
+        if missing:
+            raise ValueError(f"Tried to delete ids that does not exist: {missing}")
+        self._executemany("DELETE FROM documents WHERE id = ?", [(document_id,) for document_id in ids])
+
+    def set_index_ids(self, index_to_docstore_id: Dict[int, str]) -> None:
+        """Replaces the whole position -> id table (e.g. after FAISS.delete renumbered the vectors)."""
+        with self._lock:
+            self._connection.execute("DELETE FROM index_ids")
+            self._connection.executemany("INSERT INTO index_ids (position, id) VALUES (?, ?)",
+                                         list(index_to_docstore_id.items()))
+            self._connection.commit()
+
+    def append(self, start: int, documents: List[Document]) -> None:
+        """
+        Adds `documents` (which must have ids) at FAISS positions `start`, `start` + 1, ..., writing
+        the documents and their positions in one transaction. A document whose id is already stored
+        is replaced.
+        """
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO documents (id, page_content, metadata) VALUES (?, ?, ?)",
+                [(document.id, document.page_content, json.dumps(document.metadata, default=str)) for document in documents]
+            )
+            self._connection.executemany("INSERT INTO index_ids (position, id) VALUES (?, ?)",
+                                         [(start + offset, document.id) for offset, document in enumerate(documents)])
+
+    def truncate(self, position: int) -> None:
+        """
+        Deletes the FAISS positions from `position` on, and their documents unless an earlier position
+        also refers to them, in one transaction.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM documents WHERE id IN (SELECT id FROM index_ids WHERE position >= ?) "
+                "AND id NOT IN (SELECT id FROM index_ids WHERE position < ?)", (position, position)
+            )
+            self._connection.execute("DELETE FROM index_ids WHERE position >= ?", (position,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+class SqliteIndexToDocstoreId(MutableMapping):
+    """FAISS position -> docstore id mapping backed by the `index_ids` table of a SqliteDocstore."""
+
+    def __init__(self, docstore: SqliteDocstore):
+        self._docstore = docstore
+
+    def __getitem__(self, position: int) -> str:
+        rows = self._docstore._execute("SELECT id FROM index_ids WHERE position = ?", (int(position),))
+        if not rows:
+            raise KeyError(position)
+        return rows[0][0]
+
+    def __setitem__(self, position: int, document_id: str) -> None:
+        self._docstore._executemany("INSERT OR REPLACE INTO index_ids (position, id) VALUES (?, ?)",
+                                    [(int(position), document_id)])
+
+    def __delitem__(self, position: int) -> None:
+        if position not in self:
+            raise KeyError(position)
+        self._docstore._executemany("DELETE FROM index_ids WHERE position = ?", [(int(position),)])
+
+    def __contains__(self, position) -> bool:
+        return bool(self._docstore._execute("SELECT 1 FROM index_ids WHERE position = ?", (int(position),)))
+
+    def __iter__(self) -> Iterator[int]:
+        return iter([position for position, in self._docstore._execute("SELECT position FROM index_ids ORDER BY position")])
+
+    def __len__(self) -> int:
+        return self._docstore._execute("SELECT COUNT(*) FROM index_ids")[0][0]
+
+    def items(self) -> List[Tuple[int, str]]:
+        return self._docstore._execute("SELECT position, id FROM index_ids ORDER BY position")
+
+    def values(self) -> List[str]:
+        return [document_id for document_id, in self._docstore._execute("SELECT id FROM index_ids ORDER BY position")]
+
+    def update(self, other=(), **kwargs) -> None:
+        rows = dict(other, **kwargs)
+        self._docstore._executemany("INSERT OR REPLACE INTO index_ids (position, id) VALUES (?, ?)",
+                                    [(int(position), document_id) for position, document_id in rows.items()])
+
+def write_sqlite_docstore(path: str, docstore: Docstore, index_to_docstore_id: Dict[int, str]) -> SqliteDocstore:
+    """
+    Writes the documents of any docstore (e.g. an unpickled InMemoryDocstore) and its id mapping
+    into a new sqlite docstore file, and returns it.
+    """
+    target = SqliteDocstore.create(path)
+    positions_and_ids = sorted(index_to_docstore_id.items())
+    for start in range(0, len(positions_and_ids), SQLITE_CHUNK_SIZE):
+        chunk_ids = [document_id for _, document_id in positions_and_ids[start:start + SQLITE_CHUNK_SIZE]]
+        if isinstance(docstore, SqliteDocstore):
+            documents = docstore.get_many(chunk_ids)
+        else:
+            documents = [docstore.search(document_id) for document_id in chunk_ids]
+        missing = [document_id for document_id, document in zip(chunk_ids, documents) if not isinstance(document, Document)]
+        if missing:
+            raise ValueError(f"Docstore has no document for ids: {missing[:10]}")
+        target.add(dict(zip(chunk_ids, documents)))
+    target.set_index_ids(dict(positions_and_ids))
+    return target
@@ -0,0 +1,226 @@
+import json
+import os
+import shutil
+import sqlite3
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from utils.embeddings import EMBEDDING_BATCH_SIZE, embed_documents_with_retry
+from utils.knowledge_ingest import MANIFEST_VERSION, chunk_id, content_hash
+from utils.sqlite_docstore import SqliteDocstore
+from utils.vector_store import create_faiss_index
+
+# Checkpoint of a build in progress, in a directory next to the index: the vectors embedded so far
+# (raw float32, appended batch by batch), their chunks in a sqlite docstore, and the pages done with
+# the number of vectors they cover in a sqlite progress file
+CHECKPOINT_SUFFIX = ".building"
+CHECKPOINT_VERSION = 1
+VECTORS_FILE_NAME = "vectors.f32"
+DOCSTORE_FILE_NAME = "docstore.sqlite3"
+PROGRESS_FILE_NAME = "progress.sqlite3"
+
+class StreamingIndexBuilder:
+    """
+    Builds a FAISS vector store from pages fed one at a time. Besides the final index and the chunk
+    ids, memory holds one batch of chunks at a time, whatever the size of the corpus.
+
+    Each page is split as it arrives; its chunks are queued and embedded `batch_size` at a time
+    (see embed_documents_with_retry), then appended to the checkpoint in `folder_path` + ".building":
+    the vectors to a raw float32 file and the chunks to a sqlite docstore. A page counts as done once
+    all its chunks are written, and the done pages are recorded after every batch. A builder
+    created on an existing checkpoint resumes it: chunks of unfinished pages are dropped, and done
+    pages fed again with the same text are skipped without being embedded.
+
+    `finish` builds the index from the memory-mapped vectors file, adding them in batches.
+    """
+
+    def __init__(self, folder_path: str, embeddings: Embeddings, batch_size: Optional[int] = None):
+        self.embeddings = embeddings
+        self.batch_size = batch_size or EMBEDDING_BATCH_SIZE
+        self.checkpoint_path = folder_path.rstrip(os.sep) + CHECKPOINT_SUFFIX
+        os.makedirs(self.checkpoint_path, exist_ok=True)
+        self._vectors_file = os.path.join(self.checkpoint_path, VECTORS_FILE_NAME)
+        self.docstore = SqliteDocstore.create(os.path.join(self.checkpoint_path, DOCSTORE_FILE_NAME), wal=True)
+
+        progress = self._load_progress()
+        if not self._is_consistent(progress):
+            # e.g. after a power loss: the files were not all written; start over
+            print(f"Discarding inconsistent build checkpoint in {self.checkpoint_path}")
+            self._reset_progress()
+            progress = {"dimension": None, "count": 0, "pages": {}}
+        # Done pages: their hash, chunk ids and first vector position
+        self.pages: Dict[str, Dict[str, Any]] = progress["pages"]
+        self.dimension: Optional[int] = progress["dimension"]
+        self.count: int = progress["count"]
+        self.resumed_pages = len(self.pages)
+        # Vectors and chunks written after the last saved progress belong to unfinished pages
+        with open(self._vectors_file, "ab") as f:
+            f.truncate(self.count * 4 * (self.dimension or 0))
+        self.docstore.truncate(self.count)
+        self.written = self.count
+        if self.resumed_pages:
+            print(f"Resuming knowledge base build from {self.checkpoint_path}: "
+                  f"{self.resumed_pages} pages, {self.count} chunks already embedded")
+
+        self._queue: List[Document] = []
+        self._queued_pages: List[Tuple[str, Dict[str, Any]]] = []
+        self._seen: set = set()
+        self.report = {
+            "full_build": True,
+            "rebuilt": False,
+            "resumed": self.resumed_pages > 0,
+            "pages": {"added": [], "changed": [], "removed": [], "unavailable": [], "unchanged": 0},
+            "chunks": {"added": 0, "removed": 0, "unchanged": 0},
+            "batches": 0,
+        }
+        self._started = time.perf_counter()
+
+    def _load_progress(self) -> Dict[str, Any]:
+        """Opens the progress database and returns the saved progress (empty for a new checkpoint)."""
+        self._progress = sqlite3.connect(os.path.join(self.checkpoint_path, PROGRESS_FILE_NAME), check_same_thread=False)
+        # Like the checkpoint docstore, committed without waiting for the disk (see SqliteDocstore.create)
+        self._progress.execute("PRAGMA journal_mode=WAL")
+        self._progress.execute("PRAGMA synchronous=NORMAL")
+        with self._progress:
+            self._progress.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+            self._progress.execute(
+                "CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, hash TEXT NOT NULL, start INTEGER NOT NULL, "
+                "chunk_ids TEXT NOT NULL)"
+            )
+        meta = dict(self._progress.execute("SELECT key, value FROM meta").fetchall())
+        if meta.get("version", CHECKPOINT_VERSION) != CHECKPOINT_VERSION:
+            print(f"Ignoring build checkpoint version {meta.get('version')} (expected {CHECKPOINT_VERSION})")
+            self._reset_progress()
+            meta = {}
+        pages = {url: {"hash": page_hash, "start": start, "chunk_ids": json.loads(chunk_ids)}
+                 for url, page_hash, start, chunk_ids in self._progress.execute("SELECT * FROM pages")}
+        return {"dimension": meta.get("dimension"), "count": meta.get("count", 0), "pages": pages}
+
+    def _reset_progress(self) -> None:
+        with self._progress:
+            self._progress.execute("DELETE FROM meta")
+            self._progress.execute("DELETE FROM pages")
+
+    def _is_consistent(self, progress: Dict[str, Any]) -> bool:
+        """Whether the vectors file and the docstore hold at least the vectors the progress counts."""
+        size = os.path.getsize(self._vectors_file) if os.path.exists(self._vectors_file) else 0
+        return (size >= progress["count"] * 4 * (progress["dimension"] or 0)
+                and len(self.docstore.index_to_docstore_id) >= progress["count"])
+
+    def _save_progress(self, completed: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Records newly completed pages and the new vector count, in one transaction."""
+        with self._progress:
+            self._progress.executemany(
+                "INSERT OR REPLACE INTO pages (url, hash, start, chunk_ids) VALUES (?, ?, ?, ?)",
+                [(url, page["hash"], page["start"], json.dumps(page["chunk_ids"])) for url, page in completed]
+            )
+            self._progress.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                       [("version", CHECKPOINT_VERSION), ("dimension", self.dimension),
+                                        ("count", self.count)])
+
+    def add_page(self, url: str, text: str, split_text: Callable[[str], List[str]]) -> None:
+        """Splits a scraped page and queues its chunks, embedding every full batch."""
+        self._seen.add(url)
+        page_hash = content_hash(text)
+        done_page = self.pages.get(url)
+        if done_page is not None and done_page["hash"] == page_hash:
+            self.report["pages"]["unchanged"] += 1
+            self.report["chunks"]["unchanged"] += len(done_page["chunk_ids"])
+            return
+        if done_page is not None:
+            # Changed since it was embedded: its vectors and chunks stay in the checkpoint, unused
+            del self.pages[url]
+
+        chunks = {chunk_id(url, chunk): chunk for chunk in split_text(text)}
+        self._queue.extend(Document(id=document_id, page_content=chunk, metadata={"source": url})
+                           for document_id, chunk in chunks.items())
+        self._queued_pages.append((url, {"hash": page_hash, "chunk_ids": list(chunks)}))
+        self.report["pages"]["changed" if done_page else "added"].append(url)
+        while len(self._queue) >= self.batch_size:
+            self._flush(self.batch_size)
+
+    def _flush(self, size: int) -> None:
+        """Embeds and writes the first `size` queued chunks, then records the pages they complete."""
+        batch, self._queue = self._queue[:size], self._queue[size:]
+        vectors = np.asarray(embed_documents_with_retry(self.embeddings, [document.page_content for document in batch]),
+                             dtype=np.float32)
+        if self.dimension is None:
+            self.dimension = vectors.shape[1]
+        with open(self._vectors_file, "r+b") as f:
+            f.seek(self.written * 4 * self.dimension)
+            f.write(vectors.tobytes())
+        self.docstore.append(self.written, batch)
+        self.written += len(batch)
+        self.report["batches"] += 1
+        self.report["chunks"]["added"] += len(batch)
+        self._complete_pages()
+
+    def _complete_pages(self) -> None:
+        """Records the queued pages whose chunks are all written, and saves the progress."""
+        # Pages are queued in order, so those whose chunks are all written form a prefix of the queue
+        completed = []
+        while self._queued_pages and self.count + len(self._queued_pages[0][1]["chunk_ids"]) <= self.written:
+            url, page = self._queued_pages.pop(0)
+            page["start"] = self.count
+            self.pages[url] = page
+            self.count += len(page["chunk_ids"])
+            completed.append((url, page))
+        if completed:
+            self._save_progress(completed)
+
+    def finish(self, urls: Optional[List[str]] = None,
+               index_type: Optional[str] = None) -> Tuple[Optional[FAISS], Dict[str, Any], Dict[str, Any]]:
+        """
+        Embeds the remaining chunks and returns the vector store over the done pages, its manifest
+        and the build report. With `urls`, done pages that are not in it are left out, and done pages
+        of resumed builds that were not fed again are kept (they failed to scrape this time). The
+        vector store reads its chunks from the checkpoint docstore until it is saved and `discard`ed.
+        """
+        if self._queue:
+            self._flush(len(self._queue))
+        self._complete_pages()
+        if urls is not None:
+            wanted = set(urls)
+            for url in [url for url in self.pages if url not in wanted]:
+                del self.pages[url]
+                self.report["pages"]["removed"].append(url)
+            self.report["pages"]["unavailable"] = [url for url in self.pages if url not in self._seen]
+        manifest = {"version": MANIFEST_VERSION,
+                    "pages": {url: {"hash": page["hash"], "chunk_ids": page["chunk_ids"]} for url, page in self.pages.items()}}
+        self.report["seconds"] = round(time.perf_counter() - self._started, 3)
+        pages = sorted(self.pages.values(), key=lambda page: page["start"])
+        index_to_docstore_id = dict(enumerate(document_id for page in pages for document_id in page["chunk_ids"]))
+        if not index_to_docstore_id:
+            return None, manifest, self.report
+
+        vectors = np.memmap(self._vectors_file, dtype=np.float32, mode="r", shape=(self.count, self.dimension))
+        if len(index_to_docstore_id) < self.count:
+            # Vectors of replaced or removed pages are left out by copying the others to a new file
+            vectors = self._compact(vectors, pages)
+        index = create_faiss_index(vectors, index_type, batch_size=self.batch_size * 10)
+        return FAISS(self.embeddings, index, self.docstore, index_to_docstore_id), manifest, self.report
+
+    def _compact(self, vectors: np.ndarray, pages: List[Dict[str, Any]]) -> np.ndarray:
+        compact_file = os.path.join(self.checkpoint_path, "compact-" + VECTORS_FILE_NAME)
+        total = 0
+        with open(compact_file, "wb") as f:
+            for page in pages:
+                count = len(page["chunk_ids"])
+                f.write(np.ascontiguousarray(vectors[page["start"]:page["start"] + count]).tobytes())
+                total += count
+        return np.memmap(compact_file, dtype=np.float32, mode="r", shape=(total, self.dimension))
+
+    def close(self) -> None:
+        """Closes the checkpoint files; a new builder on the same folder resumes the build."""
+        self.docstore.close()
+        self._progress.close()
+
+    def discard(self) -> None:
+        """Deletes the checkpoint, once the built index has been saved."""
+        self.close()
+        shutil.rmtree(self.checkpoint_path, ignore_errors=True)
@@ -0,0 +1,179 @@
+import re
+import threading
+import unicodedata
+from bisect import bisect_right
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+# Common character substitutions used to obfuscate words ("h4ck", "p@ssw0rd", "$teal")
+LEETSPEAK_TABLE = str.maketrans({
+    "0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s", "!": "i", "|": "i",
+})
+ZERO_WIDTH_CHARACTERS = re.compile("[​‌‍⁠﻿]")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def _fold(text: str, leetspeak: bool) -> str:
+    """Lowercases the text and strips accents and zero-width characters (whitespace is kept as is)."""
+    text = text.lower()
+    if not text.isascii():
+        # Decompose accented letters and drop everything that is not ASCII (accents, zero-width characters)
+        text = ZERO_WIDTH_CHARACTERS.sub("", text)
+        text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    if leetspeak:
+        text = text.translate(LEETSPEAK_TABLE)
+    return text
+
+def normalize_text(text: str, leetspeak: bool = False) -> str:
+    """
+    Lowercases the text, strips accents and zero-width characters and collapses whitespace.
+    With `leetspeak=True`, common digit/symbol substitutions are mapped back to letters.
+    """
+    return " ".join(_fold(text, leetspeak).split())
+
+@lru_cache(maxsize=2048)
+def tokenize(text: str, leetspeak: bool = False) -> Tuple[str, ...]:
+    """
+    Splits normalized text into word tokens. Results are cached because the same query is
+    checked by several matchers during one request.
+    With `leetspeak=True`, runs of single letters ("h a c k", "h.a.c.k") are also joined into one word.
+    """
+    # Tokens never contain whitespace, so there is nothing to collapse
+    tokens = TOKEN_PATTERN.findall(_fold(text, leetspeak))
+    if not leetspeak:
+        return tuple(tokens)
+
+    joined: List[str] = []
+    letters: List[str] = []
+    for token in tokens + [""]:
+        if len(token) == 1:
+            letters.append(token)
+            continue
+        if len(letters) >= 3:
+            joined.append("".join(letters))
+        else:
+            joined.extend(letters)
+        letters = []
+        if token:
+            joined.append(token)
+    return tuple(joined)
+
+class SequenceRuleMatcher:
+    """
+    Matches many "term A ... term B ... term C" rules against a text in a single pass.
+
+    Each rule is an ordered list of term groups; a group matches a word that starts with any of
+    its terms, and the groups must appear in order (like the regex `a.*b.*c`). Terms shorter than
+    `min_prefix_length` ("me", "de", "for") only match whole words. A rule may be given as
+    (name, groups, max_gap) to allow at most `max_gap` other words between consecutive groups
+    (0: adjacent words, like "me de acesso"). All terms of all rules are compiled once into a
+    prefix table, so the cost of a check grows with the length of the text rather than with the
+    number of rules.
+    """
+
+    def __init__(self, rules: Sequence[Tuple], leetspeak: bool = True, min_prefix_length: int = 4):
+        self.leetspeak = leetspeak
+        self.min_prefix_length = min_prefix_length
+        self.rule_names: List[str] = []
+        self._rule_groups: List[List[Tuple[int, ...]]] = []
+        self._rule_max_gaps: List[Optional[int]] = []
+        self._term_ids: Dict[str, int] = {}
+        self._whole_word_terms: Set[str] = set()
+        self._rules_by_first_term: Dict[int, List[int]] = {}
+
+        for rule_name, groups, *options in rules:
+            rule_index = len(self.rule_names)
+            compiled_groups = []
+            for group in groups:
+                compiled_groups.append(tuple(self._term_id(term) for term in group))
+            self.rule_names.append(rule_name)
+            self._rule_groups.append(compiled_groups)
+            self._rule_max_gaps.append(options[0] if options else None)
+            for term_id in compiled_groups[0]:
+                self._rules_by_first_term.setdefault(term_id, []).append(rule_index)
+
+        self._term_lengths = sorted({len(term) for term in self._term_ids})
+        self._lock = threading.Lock()
+        self._hits: Counter = Counter()
+        self._checks = 0
+
+    def _term_id(self, term: str) -> int:
+        normalized_term = "".join(TOKEN_PATTERN.findall(normalize_text(term, self.leetspeak)))
+        if not normalized_term:
+            raise ValueError(f"Empty term in rule set: {term!r}")
+        if len(normalized_term) < self.min_prefix_length:
+            self._whole_word_terms.add(normalized_term)
+        return self._term_ids.setdefault(normalized_term, len(self._term_ids))
+
+    def _term_positions(self, tokens: Tuple[str, ...]) -> Dict[int, List[int]]:
+        """Maps each term id to the (sorted) token positions of the words it is a prefix of."""
+        positions: Dict[int, List[int]] = {}
+        term_ids = self._term_ids
+        whole_word_terms = self._whole_word_terms
+        for position, token in enumerate(tokens):
+            for length in self._term_lengths:
+                if length > len(token):
+                    break
+                term = token[:length]
+                term_id = term_ids.get(term)
+                if term_id is not None and (length == len(token) or term not in whole_word_terms):
+                    positions.setdefault(term_id, []).append(position)
+        return positions
+
+    def _rule_matches_within_gap(self, rule_index: int, positions: Dict[int, List[int]], max_gap: int) -> bool:
+        # Every position a group can take given the positions the previous group could take
+        reachable: List[int] = [-1]
+        for group_index, group in enumerate(self._rule_groups[rule_index]):
+            group_positions = sorted({position for term_id in group for position in positions.get(term_id, ())})
+            if group_index == 0:
+                reachable = group_positions
+            else:
+                reachable = [position for position in group_positions
+                             if any(previous < position <= previous + max_gap + 1 for previous in reachable)]
+            if not reachable:
+                return False
+        return True
+
+    def _rule_matches(self, rule_index: int, positions: Dict[int, List[int]]) -> bool:
+        max_gap = self._rule_max_gaps[rule_index]
+        if max_gap is not None:
+            return self._rule_matches_within_gap(rule_index, positions, max_gap)
+        last_position = -1
+        for group in self._rule_groups[rule_index]:
+            next_position = None
+            for term_id in group:
+                term_positions = positions.get(term_id)
+                if not term_positions:
+                    continue
+                index = bisect_right(term_positions, last_position)
+                if index < len(term_positions) and (next_position is None or term_positions[index] < next_position):
+                    next_position = term_positions[index]
+            if next_position is None:
+                return False
+            last_position = next_position
+        return True
+
+    def match(self, text: str) -> Optional[str]:
+        """Returns the name of the first rule (in declaration order) matching the text, or None."""
+        positions = self._term_positions(tokenize(text, self.leetspeak))
+
+        candidates = set()
+        for term_id in positions:
+            candidates.update(self._rules_by_first_term.get(term_id, ()))
+
+        matched_rule = None
+        for rule_index in sorted(candidates):
+            if self._rule_matches(rule_index, positions):
+                matched_rule = self.rule_names[rule_index]
+                break
+
+        with self._lock:
+            self._checks += 1
+            if matched_rule is not None:
+                self._hits[matched_rule] += 1
+        return matched_rule
+
+    def stats(self) -> Dict[str, object]:
+        """Returns the number of checks performed and the hit count of every rule that fired."""
+        with self._lock:
+            return {"checks": self._checks, "hits": dict(self._hits)}
@@ -0,0 +1,245 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence
+
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import BaseTool
+
+# Tool calls requested by the LLM in one turn run concurrently. Every call has a deadline, and a tool
+# can be limited to a number of calls in flight (1 keeps it serialized, e.g. a tool sending email).
+# TOOL_TIMEOUTS and TOOL_CONCURRENCY override them per tool: "create_support_ticket=20,web_search=5".
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "30"))  # seconds
+# Threads running the blocking tools of one agent; calls abandoned at their deadline keep one until they return
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "8"))
+
+def _parse_overrides(value: str) -> Dict[str, float]:
+    overrides = {}
+    for item in value.split(","):
+        name, _, number = item.partition("=")
+        if name.strip() and number.strip():
+            try:
+                overrides[name.strip()] = float(number)
+            except ValueError:
+                print(f"tool_executor: Ignoring invalid override '{item.strip()}'")
+    return overrides
+
+TOOL_TIMEOUTS = _parse_overrides(os.getenv("TOOL_TIMEOUTS", ""))
+TOOL_CONCURRENCY = {name: int(limit) for name, limit in _parse_overrides(os.getenv("TOOL_CONCURRENCY", "")).items()}
+
+class _SlotTimeout(Exception):
+    """A call of a concurrency-limited tool got no free slot within its deadline."""
+
+class _ConcurrencyLimit:
+    """
+    Calls of one tool in flight. A call waiting for its turn is a queued callback, not a blocked
+    thread, so it never holds a worker of the pool; a released slot is handed to the next waiter.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._in_flight = 0
+        self._waiting: Deque[Callable[[], None]] = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self, grant: Callable[[], None]) -> None:
+        """Calls `grant` (without blocking) once the call holds a slot; `grant` must release it if it gives up."""
+        with self._lock:
+            if self._in_flight >= self.limit:
+                self._waiting.append(grant)
+                return
+            self._in_flight += 1
+        grant()
+
+    def release(self) -> None:
+        with self._lock:
+            if not self._waiting:
+                self._in_flight -= 1
+                return
+            grant = self._waiting.popleft()
+        grant()
+
+class _PendingCall:
+    """A call of the sync path: its result, the time it must get a slot by, and when it started."""
+
+    def __init__(self, slot_deadline: float):
+        self.result: Future = Future()
+        self.slot_deadline = slot_deadline
+        self.started = threading.Event()
+        self.started_at = 0.0
+
+class ToolExecutor:
+    """
+    Executes the tool calls of one LLM turn concurrently and returns their ToolMessages in the
+    order of the calls. A call that fails, or misses its deadline, gets an error ToolMessage
+    (status "error") instead of failing the turn. Blocking tools run in a thread pool; tools with
+    a coroutine are awaited directly by `arun`.
+
+    `concurrency` limits the calls of a tool in flight across turns and requests, in both the sync
+    and the async path; tools without a limit are unbounded (up to the thread pool). A call waiting
+    for its turn holds no thread, and its deadline starts when it starts; if no slot frees up within
+    the deadline, it fails without running.
+    """
+
+    def __init__(self, tools: Sequence[BaseTool], timeout: float = TOOL_TIMEOUT,
+                 timeouts: Optional[Dict[str, float]] = None, concurrency: Optional[Dict[str, int]] = None,
+                 max_workers: int = TOOL_MAX_WORKERS):
+        self.tools_by_name = {tool.name: tool for tool in tools}
+        self.timeout = timeout
+        self.timeouts = {**(timeouts or {}), **TOOL_TIMEOUTS}
+        limits = {**(concurrency or {}), **TOOL_CONCURRENCY}
+        self._limits = {name: _ConcurrencyLimit(limit) for name, limit in limits.items() if limit > 0}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool_executor")
+
+    def timeout_for(self, tool_name: str) -> float:
+        return self.timeouts.get(tool_name, self.timeout)
+
+    @staticmethod
+    def _with_id(tool_call: Dict[str, Any]) -> Dict[str, Any]:
+        return {**tool_call, "id": tool_call.get("id") or str(uuid.uuid4()), "type": "tool_call"}
+
+    def _error_message(self, tool_call: Dict[str, Any], content: str) -> ToolMessage:
+        print(f"tool_executor: {content}")
+        return ToolMessage(content=content, tool_call_id=tool_call["id"], name=tool_call.get("name"), status="error")
+
+    def _failed(self, tool_call: Dict[str, Any], error: BaseException) -> ToolMessage:
+        tool_name = tool_call.get("name")
+        if isinstance(error, _SlotTimeout):
+            return self._error_message(
+                tool_call, f"Error executing tool {tool_name}: no free slot within {self.timeout_for(tool_name):g}s")
+        if isinstance(error, (FutureTimeoutError, asyncio.TimeoutError)):
+            return self._error_message(
+                tool_call, f"Error executing tool {tool_name}: timed out after {self.timeout_for(tool_name):g}s")
+        return self._error_message(tool_call, f"Error executing tool {tool_name}: {str(error)}")
+
+    def _acquire(self, tool_name: str, grant: Callable[[], None]) -> None:
+        limit = self._limits.get(tool_name)
+        if limit is None:
+            grant()
+        else:
+            limit.acquire(grant)
+
+    def _release(self, tool_name: str) -> None:
+        limit = self._limits.get(tool_name)
+        if limit is not None:
+            limit.release()
+
+    def _submit(self, tool: BaseTool, tool_call: Dict[str, Any]) -> Future:
+        """Runs a blocking tool call that holds its slot in a worker thread; the slot is freed when it ends."""
+        future = self._executor.submit(tool.invoke, tool_call)
+        future.add_done_callback(lambda _: self._release(tool.name))
+        return future
+
+    def _start(self, tool: BaseTool, tool_call: Dict[str, Any], call: _PendingCall) -> None:
+        """Sync path: starts a call that got its slot, unless it waited past its deadline."""
+        if time.monotonic() > call.slot_deadline:
+            call.result.cancel()
+        if not call.result.set_running_or_notify_cancel():
+            self._release(tool.name)
+            return
+        call.started_at = time.monotonic()
+        call.started.set()
+
+        def copy_result(future: Future) -> None:
+            error = future.exception()
+            if error is not None:
+                call.result.set_exception(error)
+            else:
+                call.result.set_result(future.result())
+
+        self._submit(tool, tool_call).add_done_callback(copy_result)
+
+    async def _slot(self, tool_name: str) -> None:
+        """Async path: waits (without polling) until the call holds a slot of its tool."""
+        if tool_name not in self._limits:
+            return
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def hand_over() -> None:
+            # On the event loop; a call that timed out waiting passes the slot on
+            if granted.cancelled():
+                self._release(tool_name)
+            else:
+                granted.set_result(None)
+
+        def grant() -> None:
+            try:
+                loop.call_soon_threadsafe(hand_over)
+            except RuntimeError:
+                # The loop is closed: nobody is waiting any more
+                self._release(tool_name)
+
+        self._acquire(tool_name, grant)
+        try:
+            await asyncio.wait_for(granted, self.timeout_for(tool_name))
+        except asyncio.TimeoutError:
+            raise _SlotTimeout() from None
+        except BaseException:
+            # Cancelled right after getting the slot: nobody will use it
+            if granted.done() and not granted.cancelled():
+                self._release(tool_name)
+            raise
+
+    def run(self, tool_calls: Sequence[Dict[str, Any]]) -> List[ToolMessage]:
+        """Executes `tool_calls` concurrently; returns one ToolMessage per call, in order."""
+        tool_calls = [self._with_id(tool_call) for tool_call in tool_calls]
+        submitted = time.monotonic()
+        calls: List[Optional[_PendingCall]] = []
+        for tool_call in tool_calls:
+            tool = self.tools_by_name.get(tool_call.get("name"))
+            call = _PendingCall(submitted + self.timeout_for(tool.name)) if tool is not None else None
+            if call is not None:
+                self._acquire(tool.name, lambda tool=tool, tool_call=tool_call, call=call: self._start(tool, tool_call, call))
+            calls.append(call)
+
+        messages = []
+        for tool_call, call in zip(tool_calls, calls):
+            if call is None:
+                messages.append(self._error_message(tool_call, f"Unknown tool: {tool_call.get('name')}"))
+                continue
+            timeout = self.timeout_for(tool_call["name"])
+            try:
+                # Waiting for a slot and running each get the deadline; cancel() fails once the call started
+                if not call.started.wait(max(call.slot_deadline - time.monotonic(), 0.0)) and call.result.cancel():
+                    raise _SlotTimeout()
+                call.started.wait()
+                messages.append(call.result.result(timeout=max(call.started_at + timeout - time.monotonic(), 0.0)))
+            except Exception as e:
+                messages.append(self._failed(tool_call, e))
+        return messages
+
+    async def _arun_one(self, tool_call: Dict[str, Any]) -> ToolMessage:
+        tool = self.tools_by_name.get(tool_call.get("name"))
+        if tool is None:
+            return self._error_message(tool_call, f"Unknown tool: {tool_call.get('name')}")
+        try:
+            await self._slot(tool.name)
+        except _SlotTimeout as e:
+            return self._failed(tool_call, e)
+        if getattr(tool, "coroutine", None) is not None:
+            call = asyncio.ensure_future(tool.ainvoke(tool_call))
+            call.add_done_callback(lambda _: self._release(tool.name))
+        else:
+            call = asyncio.wrap_future(self._submit(tool, tool_call))
+        try:
+            return await asyncio.wait_for(call, self.timeout_for(tool.name))
+        except Exception as e:
+            return self._failed(tool_call, e)
+
+    async def arun(self, tool_calls: Sequence[Dict[str, Any]]) -> List[ToolMessage]:
+        """Async version of `run`."""
+        return list(await asyncio.gather(*(self._arun_one(self._with_id(tool_call)) for tool_call in tool_calls)))
+
+    def node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Graph node executing the tool calls of the last message (a drop-in for LangGraph's ToolNode)."""
+        return {"messages": self.run(state["messages"][-1].tool_calls)}
+
+    async def anode(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Async version of `node`."""
+        return {"messages": await self.arun(state["messages"][-1].tool_calls)}
@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+class TTLCache:
+    """
+    Thread-safe in-memory cache with a time to live per entry and least recently used eviction.
+
+    Entries expire `ttl` seconds after they are stored; beyond `max_entries`, expired entries are
+    dropped first, then the least recently used one. Keys are used as given, so callers normalize
+    them (e.g. with utils.text_matching.tokenize).
+    """
+
+    def __init__(self, ttl: float = 900.0, max_entries: int = 1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()  # key -> (expires at, value)
+        self._lock = threading.Lock()
+        self._stats: Counter = Counter()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Returns the value cached under `key`, or None if there is none or it expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Caches `value` under `key` for `ttl` seconds (default: the cache's)."""
+        now = time.monotonic()
+        with self._lock:
+            self._entries.pop(key, None)
+            if len(self._entries) >= self.max_entries:
+                for expired_key in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+                    del self._entries[expired_key]
+                    self._stats["expirations"] += 1
+            while len(self._entries) >= self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+            self._entries[key] = (now + (self.ttl if ttl is None else ttl), value)
+            self._stats["stores"] += 1
+
+    def clear(self) -> None:
+        """Drops every cached entry."""
+        with self._lock:
+            self._entries.clear()
+            self._stats["invalidations"] += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the hit/miss counters, the hit rate and the number of cached entries."""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "hits": self._stats["hits"],
+                "misses": self._stats["misses"],
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "stores": self._stats["stores"],
+                "evictions": self._stats["evictions"],
+                "expirations": self._stats["expirations"],
+                "invalidations": self._stats["invalidations"],
+                "size": len(self._entries),
+            }
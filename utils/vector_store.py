@@ -0,0 +1,233 @@
+import math
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import uuid
+from typing import List, Optional
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from utils.embeddings import EMBEDDING_BATCH_SIZE, embed_documents_with_retry
+from utils.sqlite_docstore import SqliteDocstore, write_sqlite_docstore
+
+# Memory-map the FAISS index file instead of reading it into private memory. The mapped pages are
+# read-only and shared through the OS page cache, so every worker process serving the same index
+# shares a single copy of the vectors.
+FAISS_MMAP_ENABLED = os.getenv("FAISS_MMAP_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# IO_FLAG_MMAP maps the inverted lists of IVF indexes; IO_FLAG_MMAP_IFC (faiss >= 1.9) maps the codes
+# of flat indexes. faiss rejects the combination for IVF indexes, so the flags are tried in turn.
+# Older faiss versions without IO_FLAG_MMAP_IFC still read flat indexes into memory.
+FAISS_MMAP_FLAGS = [
+    faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_READ_ONLY,
+    faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY,
+]
+
+# Format of the docstore saved next to the index: "sqlite" (chunks read on demand, see
+# utils/sqlite_docstore.py) or "pickle" (the InMemoryDocstore written by FAISS.save_local)
+FAISS_DOCSTORE_FORMAT = os.getenv("FAISS_DOCSTORE_FORMAT", "sqlite").lower()
+
+# Type of index built for new vector stores:
+# - "flat": exact search, memory and query time linear in the number of vectors
+# - "ivf_flat": vectors clustered into FAISS_IVF_NLIST lists, FAISS_IVF_NPROBE of them scanned per query
+# - "ivf_pq": like ivf_flat with vectors compressed by product quantization (FAISS_PQ_M bytes of
+#   FAISS_PQ_NBITS bits each per vector), for corpora that do not fit in memory as floats
+# - "hnsw": graph index, FAISS_HNSW_EF_SEARCH candidates explored per query; cannot delete vectors
+# The type is fixed when the index is built; the search parameters (nprobe, efSearch) are applied on load.
+FAISS_INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat").lower()
+FAISS_IVF_NLIST = int(os.getenv("FAISS_IVF_NLIST", "0"))  # 0: about 4 * sqrt(number of vectors)
+FAISS_IVF_NPROBE = int(os.getenv("FAISS_IVF_NPROBE", "16"))
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "0"))  # 0: dimension / 8
+FAISS_PQ_NBITS = int(os.getenv("FAISS_PQ_NBITS", "8"))
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_HNSW_EF_CONSTRUCTION = int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "200"))
+FAISS_HNSW_EF_SEARCH = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
+
+# faiss k-means wants at least this many training vectors per cluster, and uses at most this many
+MIN_TRAINING_VECTORS_PER_CENTROID = 39
+MAX_TRAINING_VECTORS_PER_CENTROID = 256
+
+def _ivf_nlist(num_vectors: int, nlist: Optional[int] = None) -> int:
+    nlist = nlist or FAISS_IVF_NLIST
+    if nlist:
+        return nlist
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // MIN_TRAINING_VECTORS_PER_CENTROID))
+
+def _pq_m(dimension: int, pq_m: Optional[int] = None) -> int:
+    """Number of PQ sub-quantizers: the configured one, or the largest divisor of the dimension up to dimension / 8."""
+    pq_m = pq_m or FAISS_PQ_M
+    if pq_m:
+        return pq_m
+    return next(m for m in range(max(1, dimension // 8), 0, -1) if dimension % m == 0)
+
+def index_factory_string(index_type: str, num_vectors: int, dimension: int, nlist: Optional[int] = None,
+                         pq_m: Optional[int] = None) -> str:
+    """Returns the faiss.index_factory description of an index of `index_type` for `num_vectors` vectors."""
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{FAISS_HNSW_M},Flat"
+    if index_type == "ivf_flat":
+        return f"IVF{_ivf_nlist(num_vectors, nlist)},Flat"
+    if index_type == "ivf_pq":
+        # "np" skips polysemous training, a slow simulated annealing only useful for Hamming-distance search
+        return f"IVF{_ivf_nlist(num_vectors, nlist)},PQ{_pq_m(dimension, pq_m)}x{FAISS_PQ_NBITS}np"
+    raise ValueError(f"Unknown FAISS index type {index_type!r}, expected one of {FAISS_INDEX_TYPES}")
+
+def configure_search(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> faiss.Index:
+    """Sets the search-time parameters of IVF (nprobe) and HNSW (efSearch) indexes; other indexes are unchanged."""
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search or FAISS_HNSW_EF_SEARCH
+    try:
+        faiss.extract_index_ivf(index).nprobe = nprobe or FAISS_IVF_NPROBE
+    except RuntimeError:
+        pass  # not an IVF index
+    return index
+
+def _training_sample(vectors: np.ndarray, index: faiss.Index) -> np.ndarray:
+    """
+    Evenly spaced rows of `vectors`, as many as faiss would use to train `index` (it subsamples to
+    MAX_TRAINING_VECTORS_PER_CENTROID points per centroid), so a memory-mapped array is not read whole.
+    """
+    try:
+        centroids = faiss.extract_index_ivf(index).nlist
+    except RuntimeError:
+        centroids = 1  # not an IVF index
+    if isinstance(faiss.downcast_index(index), faiss.IndexIVFPQ):
+        # every PQ sub-quantizer is a k-means over 2 ** nbits centroids
+        centroids = max(centroids, 2 ** FAISS_PQ_NBITS)
+    size = min(len(vectors), centroids * MAX_TRAINING_VECTORS_PER_CENTROID)
+    if size == len(vectors):
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+    rows = np.linspace(0, len(vectors) - 1, size).astype(np.int64)
+    return np.ascontiguousarray(vectors[rows], dtype=np.float32)
+
+def create_faiss_index(vectors: np.ndarray, index_type: Optional[str] = None, nlist: Optional[int] = None,
+                       pq_m: Optional[int] = None, batch_size: Optional[int] = None) -> faiss.Index:
+    """
+    Builds an L2 index of `index_type` (defaults to FAISS_INDEX_TYPE) over `vectors`, training it
+    first if needed. Falls back to a flat index when there are too few vectors to train it.
+
+    `vectors` can be memory-mapped (np.memmap): training reads only a sample of it, and with
+    `batch_size` vectors are added that many at a time, so they are never all copied into memory.
+    """
+    index_type = (index_type or FAISS_INDEX_TYPE).lower()
+    num_vectors, dimension = vectors.shape
+    description = index_factory_string(index_type, num_vectors, dimension, nlist, pq_m)
+    if index_type.startswith("ivf"):
+        minimum = _ivf_nlist(num_vectors, nlist)
+        if index_type == "ivf_pq":
+            minimum = max(minimum, 2 ** FAISS_PQ_NBITS)
+        if num_vectors < minimum:
+            print(f"{num_vectors} vectors are too few to train a {description} index; building a flat index instead.")
+            description = "Flat"
+
+    index = faiss.index_factory(dimension, description)
+    if hasattr(index, "hnsw"):
+        index.hnsw.efConstruction = FAISS_HNSW_EF_CONSTRUCTION
+    if not index.is_trained:
+        index.train(_training_sample(vectors, index))
+    batch_size = batch_size or max(num_vectors, 1)
+    for start in range(0, num_vectors, batch_size):
+        index.add(np.ascontiguousarray(vectors[start:start + batch_size], dtype=np.float32))
+    return configure_search(index)
+
+def build_faiss_vectorstore(documents: List[Document], embeddings: Embeddings, index_type: Optional[str] = None) -> FAISS:
+    """
+    Embeds `documents` (in batches, see embed_documents_with_retry) and returns a vector store over
+    them with an index of `index_type` (see create_faiss_index). Documents keep their `id` as
+    docstore id; the others get a random one.
+    """
+    texts = [document.page_content for document in documents]
+    vectors = np.asarray([vector for start in range(0, len(texts), EMBEDDING_BATCH_SIZE)
+                          for vector in embed_documents_with_retry(embeddings, texts[start:start + EMBEDDING_BATCH_SIZE])],
+                         dtype=np.float32)
+    index = create_faiss_index(vectors, index_type)
+    ids = [document.id or str(uuid.uuid4()) for document in documents]
+    docstore = InMemoryDocstore({
+        document_id: Document(id=document_id, page_content=document.page_content, metadata=document.metadata)
+        for document_id, document in zip(ids, documents)
+    })
+    return FAISS(embeddings, index, docstore, dict(enumerate(ids)))
+
+def read_faiss_index(index_file: str, mmap: Optional[bool] = None) -> faiss.Index:
+    """
+    Reads a FAISS index file, memory-mapped and read-only if `mmap` is enabled (defaults to
+    FAISS_MMAP_ENABLED). Falls back to a regular read if the index type cannot be mapped.
+    """
+    if FAISS_MMAP_ENABLED if mmap is None else mmap:
+        error = None
+        for flags in FAISS_MMAP_FLAGS:
+            try:
+                return faiss.read_index(index_file, flags)
+            except RuntimeError as e:
+                error = e
+        print(f"Could not memory-map {index_file}: {error}. Reading it into memory instead.")
+    return faiss.read_index(index_file)
+
+def _docstore_file(folder_path: str, index_name: str) -> str:
+    return os.path.join(folder_path, f"{index_name}.sqlite3")
+
+def load_faiss_local(folder_path: str, embeddings: Embeddings, index_name: str = "index",
+                     mmap: Optional[bool] = None) -> FAISS:
+    """
+    Loads a vector store saved by `save_faiss_local` (or `FAISS.save_local`). The index is read
+    through `read_faiss_index`, and the docstore separately: from `index_name.sqlite3` if present,
+    else from the pickled `index_name.pkl`.
+
+    A memory-mapped store is read-only: the index can be searched but not modified, and the sqlite
+    docstore is read in place. Without mmap, both are loaded into memory and can be modified.
+    Either way, save changes with `save_faiss_local`, never by rewriting the files in place.
+    """
+    use_mmap = FAISS_MMAP_ENABLED if mmap is None else mmap
+    started = time.perf_counter()
+    index = configure_search(read_faiss_index(os.path.join(folder_path, f"{index_name}.faiss"), use_mmap))
+    docstore_file = _docstore_file(folder_path, index_name)
+    if os.path.exists(docstore_file):
+        if use_mmap:
+            docstore = SqliteDocstore.open_read_only(docstore_file)
+        else:
+            docstore = SqliteDocstore.load_into_memory(docstore_file)
+        index_to_docstore_id = docstore.index_to_docstore_id
+    else:
+        # The pickle is written by this application's own save_local (same trust as load_local's
+        # allow_dangerous_deserialization=True)
+        with open(os.path.join(folder_path, f"{index_name}.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+    print(f"Loaded FAISS index {folder_path} ({index.ntotal} vectors) in {time.perf_counter() - started:.2f}s")
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+def save_faiss_local(vectorstore: FAISS, folder_path: str, index_name: str = "index",
+                     docstore_format: Optional[str] = None) -> None:
+    """
+    Saves a vector store with its docstore in `docstore_format` ("sqlite" or "pickle", defaults to
+    FAISS_DOCSTORE_FORMAT). The files are written to a temporary directory and renamed into place,
+    so processes that opened the previous files keep reading them instead of files being rewritten
+    under them. The docstore file of the other format, now stale, is removed.
+    """
+    docstore_format = docstore_format or FAISS_DOCSTORE_FORMAT
+    os.makedirs(folder_path, exist_ok=True)
+    temporary_path = tempfile.mkdtemp(prefix=f".{index_name}-", dir=folder_path)
+    try:
+        if docstore_format == "sqlite":
+            faiss.write_index(vectorstore.index, os.path.join(temporary_path, f"{index_name}.faiss"))
+            write_sqlite_docstore(_docstore_file(temporary_path, index_name), vectorstore.docstore,
+                                  vectorstore.index_to_docstore_id).close()
+            file_names, stale_file_name = [f"{index_name}.sqlite3", f"{index_name}.faiss"], f"{index_name}.pkl"
+        else:
+            vectorstore.save_local(temporary_path, index_name)
+            file_names, stale_file_name = [f"{index_name}.pkl", f"{index_name}.faiss"], f"{index_name}.sqlite3"
+        for file_name in file_names:
+            os.replace(os.path.join(temporary_path, file_name), os.path.join(folder_path, file_name))
+        if os.path.exists(os.path.join(folder_path, stale_file_name)):
+            os.remove(os.path.join(folder_path, stale_file_name))
+    finally:
+        shutil.rmtree(temporary_path, ignore_errors=True)
@@ -0,0 +1,206 @@
+import asyncio
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Dict, Optional
+
+from utils.text_matching import tokenize
+from utils.ttl_cache import TTLCache
+
+# Web search used by the knowledge agent (as a tool and as the fallback for insufficient answers).
+# Results are cached by normalized query, every search has a hard deadline, and a circuit breaker
+# stops calling a backend that keeps failing.
+WEB_SEARCH_TIMEOUT = float(os.getenv("WEB_SEARCH_TIMEOUT", "5"))  # seconds
+WEB_SEARCH_CACHE_ENABLED = os.getenv("WEB_SEARCH_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+WEB_SEARCH_CACHE_TTL = float(os.getenv("WEB_SEARCH_CACHE_TTL", "900"))  # seconds
+WEB_SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("WEB_SEARCH_CACHE_MAX_ENTRIES", "1000"))
+# Consecutive failures (errors or timeouts) that open the circuit, and how long it stays open before
+# one probe search is let through
+WEB_SEARCH_BREAKER_FAILURES = int(os.getenv("WEB_SEARCH_BREAKER_FAILURES", "3"))
+WEB_SEARCH_BREAKER_RESET = float(os.getenv("WEB_SEARCH_BREAKER_RESET", "30"))  # seconds
+# Threads running blocking backends; searches abandoned at their deadline keep one until they return
+WEB_SEARCH_MAX_WORKERS = int(os.getenv("WEB_SEARCH_MAX_WORKERS", "8"))
+
+class DuckDuckGoBackend:
+    """Searches with LangChain's DuckDuckGoSearchRun, created once and reused."""
+
+    name = "duckduckgo"
+
+    def __init__(self):
+        self._tool = None
+        self._lock = threading.Lock()
+
+    def search(self, query: str) -> str:
+        with self._lock:
+            if self._tool is None:
+                from langchain_community.tools import DuckDuckGoSearchRun
+                self._tool = DuckDuckGoSearchRun()
+        return self._tool.run(query)
+
+class CircuitBreaker:
+    """
+    Closed: calls go through and consecutive failures are counted. After `failure_threshold` of
+    them the circuit opens: calls are refused without reaching the backend. After `reset_timeout`
+    seconds it is half-open: a single probe call goes through (others are still refused); its
+    success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._stats: Counter = Counter()
+
+    def allow(self) -> bool:
+        """Whether a call may go through now; a True in the half-open state makes it the probe."""
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                self._stats["probes"] += 1
+                return True
+            self._stats["rejected"] += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                self._stats["closed"] += 1
+            self.state, self._failures, self._probing = "closed", 0, False
+
+    def record_cancelled(self) -> None:
+        """A call was abandoned by its caller: neither a success nor a failure, but no longer the probe."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    self._stats["opened"] += 1
+                self.state, self._opened_at, self._probing = "open", time.monotonic(), False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self._failures, "opened": self._stats["opened"],
+                    "closed": self._stats["closed"], "probes": self._stats["probes"], "rejected": self._stats["rejected"]}
+
+class WebSearchClient:
+    """
+    Runs searches on a pluggable backend: any object with `search(query) -> str`, and optionally
+    `async asearch(query) -> str` (blocking backends run in a thread pool when awaited). Results are
+    cached by normalized query ("Taxas do Pix?" and "taxas do pix" share an entry); errors never
+    are. A search that misses its deadline is abandoned, and like an error it returns a
+    "Search error: ..." message and counts as a failure for the circuit breaker.
+    """
+
+    def __init__(self, backend: Any = None, timeout: float = WEB_SEARCH_TIMEOUT, cache: Optional[TTLCache] = None,
+                 breaker: Optional[CircuitBreaker] = None, max_workers: int = WEB_SEARCH_MAX_WORKERS):
+        self.backend = backend or DuckDuckGoBackend()
+        self.timeout = timeout
+        self.cache = cache
+        self.breaker = breaker or CircuitBreaker(WEB_SEARCH_BREAKER_FAILURES, WEB_SEARCH_BREAKER_RESET)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="web_search")
+        self._lock = threading.Lock()
+        self._stats: Counter = Counter()
+
+    @staticmethod
+    def _cache_key(query: str) -> str:
+        return " ".join(tokenize(query))
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def _before(self, query: str) -> Optional[str]:
+        """The result to return without calling the backend (cached or short-circuited), if any."""
+        self._count("searches")
+        if self.cache is not None:
+            cached = self.cache.get(self._cache_key(query))
+            if cached is not None:
+                return cached
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            return "Search error: web search is temporarily unavailable."
+        self._count("backend_calls")
+        return None
+
+    def _after(self, query: str, result: str) -> str:
+        self.breaker.record_success()
+        if self.cache is not None:
+            self.cache.set(self._cache_key(query), result)
+        return result
+
+    def _failed(self, query: str, error: BaseException) -> str:
+        self.breaker.record_failure()
+        if isinstance(error, (FutureTimeoutError, asyncio.TimeoutError)):
+            self._count("timeouts")
+            print(f"web_search: search timed out after {self.timeout}s: {query!r}")
+            return f"Search error: the web search timed out after {self.timeout:g}s."
+        self._count("errors")
+        print(f"web_search: Search tool error: {error}")
+        return f"Search error: {error}"
+
+    def search(self, query: str) -> str:
+        """Returns the search results for `query` within the deadline, or a "Search error: ..." message."""
+        result = self._before(query)
+        if result is not None:
+            return result
+        try:
+            return self._after(query, self._executor.submit(self.backend.search, query).result(self.timeout))
+        except Exception as e:
+            return self._failed(query, e)
+
+    async def asearch(self, query: str) -> str:
+        """Async version of `search`."""
+        result = self._before(query)
+        if result is not None:
+            return result
+        native = getattr(self.backend, "asearch", None)
+        if native is not None:
+            call = native(query)
+        else:
+            call = asyncio.get_running_loop().run_in_executor(self._executor, self.backend.search, query)
+        try:
+            return self._after(query, await asyncio.wait_for(call, self.timeout))
+        except asyncio.CancelledError:
+            # e.g. a speculative search whose result is no longer needed
+            self._count("cancelled")
+            self.breaker.record_cancelled()
+            raise
+        except Exception as e:
+            return self._failed(query, e)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the search counters, the circuit breaker state and the result cache counters."""
+        with self._lock:
+            stats = {name: self._stats[name] for name in ("searches", "backend_calls", "timeouts", "errors", "short_circuited", "cancelled")}
+        stats["backend"] = getattr(self.backend, "name", type(self.backend).__name__)
+        stats["circuit_breaker"] = self.breaker.stats()
+        stats["cache"] = self.cache.stats() if self.cache is not None else None
+        return stats
+
+web_search_client = WebSearchClient(
+    cache=TTLCache(WEB_SEARCH_CACHE_TTL, WEB_SEARCH_CACHE_MAX_ENTRIES) if WEB_SEARCH_CACHE_ENABLED else None
+)
+
+def set_search_backend(backend: Any) -> None:
+    """Replaces the backend of the shared client (e.g. with a local stub); cached results are dropped."""
+    web_search_client.backend = backend
+    web_search_client.breaker.record_success()
+    if web_search_client.cache is not None:
+        web_search_client.cache.clear()
+
+def get_web_search_stats() -> Dict[str, Any]:
+    return web_search_client.stats()